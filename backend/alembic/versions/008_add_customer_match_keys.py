@@ -0,0 +1,48 @@
+"""Add customer_match_keys blocking index for fuzzy identity resolution.
+
+Revision ID: 008
+Revises: 007_add_integration_tables
+Create Date: 2026-10-16 10:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '008_add_customer_match_keys'
+down_revision: Union[str, None] = '007_add_integration_tables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create customer_match_keys table.
+
+    Existing customers are not indexed here; run
+    IdentityResolver.rebuild_match_index (POST /api/cdp/identity/match-index/rebuild)
+    per organization after upgrading.
+    """
+    op.create_table(
+        'customer_match_keys',
+        sa.Column('id', sa.String(12), primary_key=True),
+        sa.Column('organization_id', sa.String(12), sa.ForeignKey('organizations.id'), nullable=False),
+        sa.Column('customer_id', sa.String(12), sa.ForeignKey('customers.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('key_type', sa.String(20), nullable=False),
+        sa.Column('key_value', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), onupdate=sa.func.now()),
+    )
+
+    op.create_index(
+        'ix_customer_match_keys_lookup', 'customer_match_keys',
+        ['organization_id', 'key_type', 'key_value', 'customer_id']
+    )
+    op.create_index('ix_customer_match_keys_customer', 'customer_match_keys', ['customer_id'])
+
+
+def downgrade() -> None:
+    """Drop customer_match_keys table."""
+    op.drop_index('ix_customer_match_keys_customer', table_name='customer_match_keys')
+    op.drop_index('ix_customer_match_keys_lookup', table_name='customer_match_keys')
+    op.drop_table('customer_match_keys')
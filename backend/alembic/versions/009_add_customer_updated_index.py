@@ -0,0 +1,25 @@
+"""Add (organization_id, updated_at) index on customers for incremental segment computation.
+
+Revision ID: 009
+Revises: 008_add_customer_match_keys
+Create Date: 2026-10-16 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '009_add_customer_updated_index'
+down_revision: Union[str, None] = '008_add_customer_match_keys'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create ix_customers_org_updated."""
+    op.create_index('ix_customers_org_updated', 'customers', ['organization_id', 'updated_at'])
+
+
+def downgrade() -> None:
+    """Drop ix_customers_org_updated."""
+    op.drop_index('ix_customers_org_updated', table_name='customers')
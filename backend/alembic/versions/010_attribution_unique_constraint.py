@@ -0,0 +1,51 @@
+"""Back attribution upserts with a unique constraint and repair organization_id.
+
+Replaces the ix_attributions_unique unique index with the
+uq_attributions_conversion_touchpoint_model constraint, and resets
+organization_id on rows written with the conversion ID in its place.
+
+Revision ID: 010
+Revises: 009_add_customer_updated_index
+Create Date: 2026-10-16 14:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '010_attribution_unique_constraint'
+down_revision: Union[str, None] = '009_add_customer_updated_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Repair organization_id and swap the unique index for a constraint."""
+    op.execute(
+        """
+        UPDATE attributions
+        SET organization_id = (
+            SELECT conversion_events.organization_id
+            FROM conversion_events
+            WHERE conversion_events.id = attributions.conversion_event_id
+        )
+        WHERE organization_id = conversion_event_id
+        """
+    )
+
+    op.drop_index('ix_attributions_unique', table_name='attributions')
+    with op.batch_alter_table('attributions') as batch_op:
+        batch_op.create_unique_constraint(
+            'uq_attributions_conversion_touchpoint_model',
+            ['conversion_event_id', 'touchpoint_id', 'model_type'],
+        )
+
+
+def downgrade() -> None:
+    """Restore the ix_attributions_unique index."""
+    with op.batch_alter_table('attributions') as batch_op:
+        batch_op.drop_constraint('uq_attributions_conversion_touchpoint_model', type_='unique')
+    op.create_index(
+        'ix_attributions_unique', 'attributions',
+        ['conversion_event_id', 'touchpoint_id', 'model_type'], unique=True
+    )
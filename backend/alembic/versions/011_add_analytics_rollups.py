@@ -0,0 +1,57 @@
+"""Add analytics_rollups for pre-aggregated dashboard metrics.
+
+Revision ID: 011
+Revises: 010_attribution_unique_constraint
+Create Date: 2026-10-16 16:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011_add_analytics_rollups'
+down_revision: Union[str, None] = '010_attribution_unique_constraint'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create analytics_rollups table.
+
+    Existing conversions and attributions are not rolled up here; run
+    RollupStore.rebuild (POST /api/analytics/rollups/rebuild) per
+    organization before enabling analytics_rollups_enabled.
+    """
+    op.create_table(
+        'analytics_rollups',
+        sa.Column('id', sa.String(12), primary_key=True),
+        sa.Column('organization_id', sa.String(12), sa.ForeignKey('organizations.id'), nullable=False),
+        sa.Column('granularity', sa.String(8), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('channel', sa.String(50), nullable=False, server_default=''),
+        sa.Column('campaign_id', sa.String(12), nullable=False, server_default=''),
+        sa.Column('model_type', sa.String(32), nullable=False, server_default=''),
+        sa.Column('conversion_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('conversion_value', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('attribution_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('attributed_value', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('weight_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), onupdate=sa.func.now()),
+        sa.UniqueConstraint(
+            'organization_id', 'granularity', 'bucket', 'channel', 'campaign_id', 'model_type',
+            name='uq_analytics_rollups_bucket'
+        ),
+    )
+
+    op.create_index(
+        'ix_analytics_rollups_org_bucket', 'analytics_rollups',
+        ['organization_id', 'granularity', 'bucket']
+    )
+
+
+def downgrade() -> None:
+    """Drop analytics_rollups table."""
+    op.drop_index('ix_analytics_rollups_org_bucket', table_name='analytics_rollups')
+    op.drop_table('analytics_rollups')
@@ -0,0 +1,26 @@
+"""Add response_curves to marketing_mix_models for curve-based budget optimization.
+
+Revision ID: 012
+Revises: 011_add_analytics_rollups
+Create Date: 2026-10-16 18:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '012_add_mmm_response_curves'
+down_revision: Union[str, None] = '011_add_analytics_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add marketing_mix_models.response_curves."""
+    op.add_column('marketing_mix_models', sa.Column('response_curves', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop marketing_mix_models.response_curves."""
+    op.drop_column('marketing_mix_models', 'response_curves')
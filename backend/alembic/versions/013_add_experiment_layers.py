@@ -0,0 +1,30 @@
+"""Add experiment layers and per-variant bucket allocations.
+
+Revision ID: 013
+Revises: 012_add_mmm_response_curves
+Create Date: 2026-10-16 20:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '013_add_experiment_layers'
+down_revision: Union[str, None] = '012_add_mmm_response_curves'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add experiments.layer and experiment_variants.buckets."""
+    op.add_column('experiments', sa.Column('layer', sa.String(100), nullable=True))
+    op.create_index('idx_experiments_layer', 'experiments', ['layer', 'status'])
+    op.add_column('experiment_variants', sa.Column('buckets', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop experiments.layer and experiment_variants.buckets."""
+    op.drop_column('experiment_variants', 'buckets')
+    op.drop_index('idx_experiments_layer', table_name='experiments')
+    op.drop_column('experiments', 'layer')
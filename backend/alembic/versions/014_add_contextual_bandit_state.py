@@ -0,0 +1,26 @@
+"""Add contextual bandit checkpoints to experiment variants.
+
+Revision ID: 014
+Revises: 013_add_experiment_layers
+Create Date: 2026-10-16 22:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '014_add_contextual_bandit_state'
+down_revision: Union[str, None] = '013_add_experiment_layers'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add experiment_variants.contextual_state."""
+    op.add_column('experiment_variants', sa.Column('contextual_state', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop experiment_variants.contextual_state."""
+    op.drop_column('experiment_variants', 'contextual_state')
@@ -0,0 +1,50 @@
+"""Add experiment_metrics for running per-variant metric statistics.
+
+Revision ID: 015
+Revises: 014_add_contextual_bandit_state
+Create Date: 2026-10-16 23:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '015_add_experiment_metrics'
+down_revision: Union[str, None] = '014_add_contextual_bandit_state'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create experiment_metrics table.
+
+    Conversions tracked before this revision are not summarized here; run
+    experiment_stats.rebuild (POST /api/optimization/experiments/{id}/stats/rebuild)
+    for experiments that were already running.
+    """
+    op.create_table(
+        'experiment_metrics',
+        sa.Column('id', sa.String(12), primary_key=True),
+        sa.Column('experiment_id', sa.String(12), sa.ForeignKey('experiments.id'), nullable=False),
+        sa.Column('variant_id', sa.String(12), sa.ForeignKey('experiment_variants.id'), nullable=False),
+        sa.Column('metric_name', sa.String(100), nullable=False),
+        sa.Column('conversions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('value_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('value_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('value_sum_squares', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), onupdate=sa.func.now()),
+        sa.UniqueConstraint('variant_id', 'metric_name', name='uq_experiment_metrics_variant_metric'),
+    )
+
+    op.create_index(
+        'ix_experiment_metrics_experiment_metric', 'experiment_metrics',
+        ['experiment_id', 'metric_name']
+    )
+
+
+def downgrade() -> None:
+    """Drop experiment_metrics table."""
+    op.drop_index('ix_experiment_metrics_experiment_metric', table_name='experiment_metrics')
+    op.drop_table('experiment_metrics')
@@ -0,0 +1,35 @@
+"""Keep md5 bucketing for experiments started before bucket allocations.
+
+Revision ID: 016
+Revises: 015_add_experiment_metrics
+Create Date: 2026-10-17 12:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '016_add_experiment_bucketing'
+down_revision: Union[str, None] = '015_add_experiment_metrics'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add experiments.bucketing and mark experiments started before revision 013.
+
+    Those experiments have variants without stored buckets; marking them
+    keeps their visitors in the variants the md5 hash gave them.
+    """
+    op.add_column('experiments', sa.Column('bucketing', sa.String(20), nullable=True))
+    op.execute(
+        "UPDATE experiments SET bucketing = 'md5' "
+        "WHERE start_date IS NOT NULL AND id IN ("
+        "SELECT experiment_id FROM experiment_variants WHERE buckets IS NULL)"
+    )
+
+
+def downgrade() -> None:
+    """Drop experiments.bucketing."""
+    op.drop_column('experiments', 'bucketing')
@@ -0,0 +1,26 @@
+"""Add experiments.released_buckets for sticky assignment after re-allocation.
+
+Revision ID: 017
+Revises: 016_add_experiment_bucketing
+Create Date: 2026-10-17 13:00:00.000000
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '017_add_experiment_released_buckets'
+down_revision: Union[str, None] = '016_add_experiment_bucketing'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add experiments.released_buckets."""
+    op.add_column('experiments', sa.Column('released_buckets', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drop experiments.released_buckets."""
+    op.drop_column('experiments', 'released_buckets')
@@ -12,19 +12,16 @@ Provides comprehensive analytics and statistics for:
 - ROI reporting
 - Conversion tracking
 """
-
+import logging
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta, date
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, and_, or_
+from sqlalchemy import select, func, and_, or_
 from pydantic import BaseModel, Field
 
 from ..core.database import get_session
 from ..models.campaign import Campaign
-from ..models.asset import Asset
-from ..models.task import Task
-from ..models.scheduled_post import ScheduledPost
 from ..models.user import User
 from ..models.deliverable import Deliverable
 from ..models.attribution import AttributionModelType
@@ -35,9 +32,14 @@ from ..services.analytics.attribution_engine import AttributionEngine
 from ..services.analytics.marketing_mix_modeling import MarketingMixModelingService
 from ..services.analytics.analytics_dashboard import AnalyticsDashboardService
 from ..services.analytics.conversion_tracker import ConversionTracker
+from ..services.analytics.data_driven_attribution import DataDrivenAttributionTrainer
+from ..services.analytics.overview_stats import OverviewStatsService
+from ..services.analytics.rollups import RollupStore
 from .auth import get_current_active_user
 from ..models.user import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(tags=["Analytics"])
 
 
@@ -249,146 +251,8 @@ async def get_overview_stats(
     current_user: User = Depends(get_current_active_user)
 ):
     """Get overview statistics for the dashboard."""
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
-
-    # Campaign stats
-    campaign_result = await session.execute(select(Campaign))
-    campaigns = campaign_result.scalars().all()
-
-    campaign_by_status = {}
-    created_this_week = 0
-    created_this_month = 0
-    completed = 0
-
-    for c in campaigns:
-        campaign_by_status[c.status] = campaign_by_status.get(c.status, 0) + 1
-        if c.created_at >= week_ago:
-            created_this_week += 1
-        if c.created_at >= month_ago:
-            created_this_month += 1
-        if c.status == "completed":
-            completed += 1
-
-    total_campaigns = len(campaigns)
-    completion_rate = (completed / total_campaigns * 100) if total_campaigns > 0 else 0
-
-    # Asset stats
-    asset_result = await session.execute(select(Asset))
-    assets = asset_result.scalars().all()
-
-    asset_by_type = {}
-    asset_by_status = {}
-    assets_this_week = 0
-
-    for a in assets:
-        asset_by_type[a.asset_type] = asset_by_type.get(a.asset_type, 0) + 1
-        asset_by_status[a.status] = asset_by_status.get(a.status, 0) + 1
-        if a.created_at >= week_ago:
-            assets_this_week += 1
-
-    # Task stats
-    task_result = await session.execute(select(Task))
-    tasks = task_result.scalars().all()
-
-    task_by_status = {}
-    overdue = 0
-    high_priority = 0
-    completed_tasks = 0
-
-    for t in tasks:
-        task_by_status[t.status] = task_by_status.get(t.status, 0) + 1
-        if t.due_date and t.due_date < now and t.status != "completed":
-            overdue += 1
-        if t.priority == "high":
-            high_priority += 1
-        if t.status == "completed":
-            completed_tasks += 1
-
-    total_tasks = len(tasks)
-    task_completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-
-    # Scheduled post stats
-    post_result = await session.execute(select(ScheduledPost))
-    posts = post_result.scalars().all()
-
-    post_by_status = {}
-    post_by_platform = {}
-    published_this_week = 0
-    scheduled_this_week = 0
-
-    for p in posts:
-        post_by_status[p.status] = post_by_status.get(p.status, 0) + 1
-        post_by_platform[p.platform] = post_by_platform.get(p.platform, 0) + 1
-        if p.published_at and p.published_at >= week_ago:
-            published_this_week += 1
-        if p.scheduled_at and p.scheduled_at >= week_ago:
-            scheduled_this_week += 1
-
-    # Recent activity
-    recent_activity = []
-
-    # Recent campaigns
-    recent_campaigns = await session.execute(
-        select(Campaign).order_by(desc(Campaign.created_at)).limit(5)
-    )
-    for c in recent_campaigns.scalars():
-        recent_activity.append(ActivityItem(
-            id=c.id,
-            type="campaign",
-            action="created",
-            title=c.name,
-            timestamp=c.created_at
-        ))
-
-    # Recent assets
-    recent_assets = await session.execute(
-        select(Asset).order_by(desc(Asset.created_at)).limit(5)
-    )
-    for a in recent_assets.scalars():
-        recent_activity.append(ActivityItem(
-            id=a.id,
-            type="asset",
-            action="created",
-            title=a.name,
-            timestamp=a.created_at
-        ))
-
-    # Sort by timestamp
-    recent_activity.sort(key=lambda x: x.timestamp, reverse=True)
-    recent_activity = recent_activity[:10]
-
-    return OverviewStats(
-        campaigns=CampaignStats(
-            total=total_campaigns,
-            by_status=campaign_by_status,
-            created_this_week=created_this_week,
-            created_this_month=created_this_month,
-            completion_rate=completion_rate
-        ),
-        assets=AssetStats(
-            total=len(assets),
-            by_type=asset_by_type,
-            by_status=asset_by_status,
-            created_this_week=assets_this_week
-        ),
-        tasks=TaskStats(
-            total=total_tasks,
-            by_status=task_by_status,
-            completion_rate=task_completion_rate,
-            overdue_count=overdue,
-            high_priority_count=high_priority
-        ),
-        scheduled_posts=ScheduledPostStats(
-            total=len(posts),
-            by_status=post_by_status,
-            by_platform=post_by_platform,
-            published_this_week=published_this_week,
-            scheduled_this_week=scheduled_this_week
-        ),
-        recent_activity=recent_activity
-    )
+    service = OverviewStatsService(session)
+    return OverviewStats(**await service.get_overview(current_user.organization_id))
 
 
 @router.get("/campaigns/{campaign_id}/performance")
@@ -492,6 +356,63 @@ async def process_attribution(
     }
 
 
+@router.post("/attribution/reattribute")
+async def reattribute_conversions(
+    organization_id: str = Query(..., description="Organization ID"),
+    start_date: datetime = Query(..., description="Start of the conversion time range"),
+    end_date: datetime = Query(..., description="End of the conversion time range (exclusive)"),
+    model_types: Optional[List[AttributionModelType]] = Query(None, description="Models to apply"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Re-run attribution for every conversion in a time range."""
+    engine = AttributionEngine(session)
+
+    processed = await engine.reattribute_conversions(
+        organization_id, start_date, end_date, model_types=model_types
+    )
+
+    return {
+        "organization_id": organization_id,
+        "processed_count": processed,
+        "status": "completed"
+    }
+
+
+@router.post("/attribution/data-driven/train")
+async def train_data_driven_attribution(
+    background_tasks: BackgroundTasks,
+    organization_id: str = Query(..., description="Organization ID"),
+    lookback_days: int = Query(90, ge=7, le=730, description="Days of journeys to train on"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Train Markov-chain and Shapley-value attribution for an organization.
+
+    Enqueues a Celery task; falls back to a background task when Celery is
+    unavailable. Once trained, both models are applied to every conversion.
+    """
+    try:
+        from ..tasks.analytics_tasks import train_data_driven_attribution_task
+
+        task = train_data_driven_attribution_task.delay(
+            organization_id=organization_id,
+            lookback_days=lookback_days
+        )
+        return {"success": True, "task_id": task.id, "message": "Data-driven attribution training started"}
+    except Exception as exc:
+        logger.warning(f"Celery unavailable ({type(exc).__name__}: {exc}), training attribution in-process")
+
+    trainer = DataDrivenAttributionTrainer(session)
+
+    async def do_train():
+        await trainer.train(organization_id, lookback_days=lookback_days)
+
+    background_tasks.add_task(do_train)
+
+    return {"success": True, "task_id": None, "message": "Data-driven attribution training started"}
+
+
 # ============== ROI Endpoints ==============
 
 @router.get("/roi/report", response_model=ROIReportResponse)
@@ -847,3 +768,21 @@ async def export_report(
     )
 
     return export
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(
+    background_tasks: BackgroundTasks,
+    organization_id: str = Query(..., description="Organization ID"),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recompute the organization's dashboard rollups from raw conversions and attributions."""
+    rollups = RollupStore(session)
+
+    async def do_rebuild():
+        await rollups.rebuild(organization_id)
+
+    background_tasks.add_task(do_rebuild)
+
+    return {"success": True, "message": "Rollup rebuild started"}
@@ -9,7 +9,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, BackgroundTasks
 from pydantic import BaseModel, Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc, func
@@ -26,7 +26,8 @@ from ..models.customer_segment import CustomerSegment, SegmentType, SegmentStatu
 from ..models.segment_membership import SegmentMembership
 from ..services.cdp import (
     IdentityResolver, EventProcessor, EventIngestionService,
-    ProfileEnricher, ClientSDK
+    ProfileEnricher, ClientSDK, SpoolFullError, get_ingestion_queue,
+    IdentityCache, get_identity_cache, get_segment_index
 )
 
 logger = logging.getLogger(__name__)
@@ -210,6 +211,12 @@ async def create_customer(
     await db.commit()
     await db.refresh(customer)
 
+    identity_cache = get_identity_cache()
+    if identity_cache is not None and customer.anonymous_id:
+        await identity_cache.invalidate(
+            customer.organization_id, "anonymous_id", customer.anonymous_id
+        )
+
     # Create identities from external_ids
     resolver = IdentityResolver(db)
     for id_type, id_value in profile.external_ids.items():
@@ -326,6 +333,8 @@ async def update_customer(
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
 
+    old_identity_keys = _identity_cache_keys(customer)
+
     if profile.external_ids is not None:
         # Merge external IDs
         merged = {**(customer.external_ids or {}), **profile.external_ids}
@@ -342,9 +351,35 @@ async def update_customer(
     await db.commit()
     await db.refresh(customer)
 
+    # Both the old and the new identifiers may be cached (the new ones as misses)
+    identity_cache = get_identity_cache()
+    new_identity_keys = _identity_cache_keys(customer)
+    if identity_cache is not None and new_identity_keys != old_identity_keys:
+        await identity_cache.invalidate_customer(customer.id)
+        await identity_cache.invalidate_keys(old_identity_keys | new_identity_keys)
+
     return customer
 
 
+def _identity_cache_keys(customer: Customer) -> set:
+    """Identity cache keys for a customer's external IDs, email and phone."""
+    identifiers = [
+        (id_type, id_value)
+        for id_type, id_value in (customer.external_ids or {}).items()
+        if id_type and id_value
+    ]
+    traits = customer.traits or {}
+    if traits.get("email"):
+        identifiers.append(("email", str(traits["email"]).lower().strip()))
+    phone = "".join(c for c in str(traits.get("phone") or "") if c.isdigit())
+    if phone:
+        identifiers.append(("phone", phone))
+    return {
+        IdentityCache.make_key(customer.organization_id, id_type, id_value)
+        for id_type, id_value in identifiers
+    }
+
+
 @router.delete("/customers/{customer_id}")
 async def delete_customer(
     customer_id: str,
@@ -363,6 +398,10 @@ async def delete_customer(
     customer.soft_delete()
     await db.commit()
 
+    identity_cache = get_identity_cache()
+    if identity_cache is not None:
+        await identity_cache.invalidate_customer(customer.id)
+
     return {"success": True, "message": "Customer deleted"}
 
 
@@ -410,16 +449,59 @@ async def enrich_customer(
     return {"success": True, "message": "Enrichment started"}
 
 
+@router.post("/customers/computed-traits/recompute")
+async def recompute_computed_traits(
+    organization_id: str,
+    background_tasks: BackgroundTasks,
+    chunk_size: int = Query(5000, ge=100, le=50000),
+    db: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recompute computed traits for all customers of an organization.
+
+    Enqueues a Celery task (poll its state for chunked progress); falls back
+    to a background task when Celery is unavailable.
+    """
+    try:
+        from ..tasks.cdp_tasks import recompute_computed_traits_task
+
+        task = recompute_computed_traits_task.delay(
+            organization_id=organization_id,
+            chunk_size=chunk_size
+        )
+        return {"success": True, "task_id": task.id, "message": "Trait recomputation started"}
+    except Exception as exc:
+        logger.warning(f"Celery unavailable ({type(exc).__name__}: {exc}), recomputing traits in-process")
+
+    enricher = ProfileEnricher(db)
+
+    async def do_recompute():
+        await enricher.update_organization_computed_traits(organization_id, chunk_size=chunk_size)
+
+    background_tasks.add_task(do_recompute)
+
+    return {"success": True, "task_id": None, "message": "Trait recomputation started"}
+
+
 # ============== Event Endpoints ==============
 
 @router.post("/events", response_model=Dict[str, Any])
 async def track_event(
     event: EventCreate,
     organization_id: str,
+    response: Response,
+    queue: bool = Query(False, description="Accept and acknowledge; process in the background"),
     db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """Track a new event."""
+    if queue:
+        result = await _enqueue_events([event.model_dump(mode="json")], organization_id, db)
+        if result["errors"]:
+            raise HTTPException(status_code=400, detail=result["errors"][0]["error"])
+        response.status_code = 202
+        return {"success": True, "queued": True, "received_at": result["received_at"]}
+
     event_data = event.model_dump()
     event_data["organization_id"] = organization_id
 
@@ -441,22 +523,79 @@ async def track_event(
 async def track_events_batch(
     request: BatchEventRequest,
     organization_id: str,
+    response: Response,
+    queue: bool = Query(False, description="Accept and acknowledge; process in the background"),
     db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """Track multiple events in a batch."""
     events_data = []
     for e in request.events:
-        event_dict = e.model_dump()
+        event_dict = e.model_dump(mode="json") if queue else e.model_dump()
         event_dict["organization_id"] = organization_id
         if request.context:
             event_dict["context"] = {**request.context, **event_dict.get("context", {})}
         events_data.append(event_dict)
 
+    if queue:
+        result = await _enqueue_events(events_data, organization_id, db)
+        response.status_code = 202
+        return BatchEventResponse(
+            sent=len(events_data),
+            success=result["queued"],
+            failed=result["failed"],
+            errors=result["errors"]
+        )
+
     processor = EventProcessor(db)
     result = await processor.process_batch(events_data, organization_id)
 
-    return BatchEventResponse(**result)
+    return BatchEventResponse(
+        sent=len(events_data),
+        success=result["processed"],
+        failed=result["failed"],
+        errors=result["errors"]
+    )
+
+
+async def _enqueue_events(
+    events: List[Dict[str, Any]],
+    organization_id: str,
+    db: AsyncSession
+) -> Dict[str, Any]:
+    """Spool events for background ingestion, mapping backpressure to HTTP errors."""
+    if get_ingestion_queue() is None:
+        raise HTTPException(status_code=503, detail="Async event ingestion is not enabled")
+
+    service = EventIngestionService(db)
+    try:
+        return await service.enqueue_batch_http(
+            events, {"X-Organization-ID": organization_id}
+        )
+    except SpoolFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
+@router.get("/events/ingestion/metrics", response_model=Dict[str, Any])
+async def get_ingestion_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get async ingestion queue depth, drain lag and throughput counters."""
+    queue = get_ingestion_queue()
+    if queue is None:
+        return {"enabled": False}
+    return {"enabled": True, **queue.metrics()}
+
+
+@router.get("/identity/cache/metrics", response_model=Dict[str, Any])
+async def get_identity_cache_metrics(
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get identity resolution cache hit/miss counters."""
+    identity_cache = get_identity_cache()
+    if identity_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **identity_cache.stats()}
 
 
 @router.get("/events", response_model=List[EventResponse])
@@ -533,6 +672,13 @@ async def get_customer_events(
 
 # ============== Segment Endpoints ==============
 
+def _invalidate_segment_index(organization_id: str):
+    """Rebuild the real-time segment index after a segment change."""
+    segment_index = get_segment_index()
+    if segment_index is not None:
+        segment_index.invalidate(organization_id)
+
+
 @router.post("/segments", response_model=SegmentResponse)
 async def create_segment(
     segment: SegmentCreate,
@@ -558,6 +704,8 @@ async def create_segment(
     await db.commit()
     await db.refresh(new_segment)
 
+    _invalidate_segment_index(organization_id)
+
     return new_segment
 
 
@@ -629,12 +777,17 @@ async def update_segment(
         raise HTTPException(status_code=404, detail="Segment not found")
 
     update_data = segment_update.model_dump(exclude_unset=True)
+    if "criteria" in update_data and update_data["criteria"] != segment.criteria:
+        # Membership no longer reflects the criteria; next compute is a full pass
+        segment.computed_at = None
     for field, value in update_data.items():
         setattr(segment, field, value)
 
     await db.commit()
     await db.refresh(segment)
 
+    _invalidate_segment_index(segment.organization_id)
+
     return segment
 
 
@@ -656,6 +809,8 @@ async def delete_segment(
     segment.soft_delete()
     await db.commit()
 
+    _invalidate_segment_index(segment.organization_id)
+
     return {"success": True, "message": "Segment deleted"}
 
 
@@ -663,6 +818,7 @@ async def delete_segment(
 async def compute_segment(
     segment_id: str,
     background_tasks: BackgroundTasks,
+    incremental: bool = Query(False, description="Only re-evaluate customers changed since the last computation"),
     db: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
@@ -671,7 +827,7 @@ async def compute_segment(
 
     # Run in background for large segments
     async def do_compute():
-        await enricher.compute_segment(segment_id)
+        await enricher.compute_segment(segment_id, incremental=incremental)
 
     background_tasks.add_task(do_compute)
 
@@ -781,6 +937,23 @@ async def resolve_identity(
     )
 
 
+@router.post("/identity/match-index/rebuild")
+async def rebuild_match_index(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Rebuild the fuzzy-matching blocking-key index for the organization."""
+    resolver = IdentityResolver(db)
+
+    async def do_rebuild():
+        await resolver.rebuild_match_index(current_user.organization_id)
+
+    background_tasks.add_task(do_rebuild)
+
+    return {"success": True, "message": "Match index rebuild started"}
+
+
 @router.post("/customers/{customer_id}/identities")
 async def add_identity(
     customer_id: str,
@@ -59,6 +59,7 @@ class ExperimentCreateRequest(BaseModel):
     campaign_id: Optional[str] = None
     secondary_metrics: Optional[List[str]] = None
     auto_winner_selection: bool = False
+    layer: Optional[str] = Field(default=None, max_length=100)
 
 
 class ExperimentResponse(BaseModel):
@@ -72,6 +73,7 @@ class ExperimentResponse(BaseModel):
     hypothesis: str
     primary_metric: str
     traffic_allocation: float
+    layer: Optional[str] = None
     start_date: Optional[datetime]
     end_date: Optional[datetime]
     winner_variant_id: Optional[str]
@@ -94,6 +96,26 @@ class AssignmentResponse(BaseModel):
     assignment_id: str
 
 
+class BatchAssignmentRequest(BaseModel):
+    """Request to assign a user to several experiments."""
+    experiment_ids: List[str] = Field(..., min_length=1, max_length=100)
+    user_id: Optional[str] = None
+    anonymous_id: Optional[str] = None
+    context: Optional[Dict[str, Any]] = None
+
+
+class BatchAssignmentResponse(BaseModel):
+    """Assignments keyed by experiment ID."""
+    assignments: Dict[str, AssignmentResponse]
+    not_enrolled: List[str]
+    not_running: List[str]
+
+
+class RampRequest(BaseModel):
+    """Request to change the share of traffic enrolled in an experiment."""
+    traffic_allocation: float = Field(..., ge=0, le=1)
+
+
 class MetricTrackRequest(BaseModel):
     """Request to track experiment metric."""
     variant_id: str
@@ -191,6 +213,17 @@ class BanditRewardRequest(BaseModel):
     """Request to report bandit reward."""
     variant_id: str
     reward: float = Field(..., ge=0, le=1)
+    # Set for rewards of contextual recommendations
+    context: Optional[Dict[str, Any]] = None
+    audience: Optional[Dict[str, Any]] = None
+
+
+class ContextualRecommendationRequest(BaseModel):
+    """Request for a contextual bandit recommendation."""
+    context: Dict[str, Any] = Field(default_factory=dict)
+    audience: Optional[Dict[str, Any]] = None
+    algorithm: str = "linucb"
+    alpha: float = Field(default=1.0, ge=0)
 
 
 class AutoOptimizationSettings(BaseModel):
@@ -263,7 +296,8 @@ async def create_experiment(
             minimum_detectable_effect=request.minimum_detectable_effect,
             campaign_id=request.campaign_id,
             secondary_metrics=request.secondary_metrics,
-            auto_winner_selection=request.auto_winner_selection
+            auto_winner_selection=request.auto_winner_selection,
+            layer=request.layer
         )
         
         return ExperimentResponse(
@@ -276,6 +310,7 @@ async def create_experiment(
             hypothesis=experiment.hypothesis,
             primary_metric=experiment.primary_metric,
             traffic_allocation=experiment.traffic_allocation,
+            layer=experiment.layer,
             start_date=experiment.start_date,
             end_date=experiment.end_date,
             winner_variant_id=experiment.winner_variant_id,
@@ -314,6 +349,7 @@ async def list_experiments(
             hypothesis=e.hypothesis,
             primary_metric=e.primary_metric,
             traffic_allocation=e.traffic_allocation,
+            layer=e.layer,
             start_date=e.start_date,
             end_date=e.end_date,
             winner_variant_id=e.winner_variant_id,
@@ -345,6 +381,7 @@ async def get_experiment(
         hypothesis=experiment.hypothesis,
         primary_metric=experiment.primary_metric,
         traffic_allocation=experiment.traffic_allocation,
+        layer=experiment.layer,
         start_date=experiment.start_date,
         end_date=experiment.end_date,
         winner_variant_id=experiment.winner_variant_id,
@@ -371,6 +408,7 @@ async def start_experiment(
             hypothesis=experiment.hypothesis,
             primary_metric=experiment.primary_metric,
             traffic_allocation=experiment.traffic_allocation,
+            layer=experiment.layer,
             start_date=experiment.start_date,
             end_date=experiment.end_date,
             winner_variant_id=experiment.winner_variant_id,
@@ -405,6 +443,37 @@ async def stop_experiment(
             hypothesis=experiment.hypothesis,
             primary_metric=experiment.primary_metric,
             traffic_allocation=experiment.traffic_allocation,
+            layer=experiment.layer,
+            start_date=experiment.start_date,
+            end_date=experiment.end_date,
+            winner_variant_id=experiment.winner_variant_id,
+            created_at=experiment.created_at
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/experiments/{experiment_id}/ramp", response_model=ExperimentResponse)
+async def ramp_experiment(
+    experiment_id: str,
+    request: RampRequest,
+    engine: ABTestingEngine = Depends(get_ab_testing_engine),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Change the share of traffic enrolled in an experiment without reshuffling enrolled users."""
+    try:
+        experiment = await engine.ramp_experiment(experiment_id, request.traffic_allocation)
+        return ExperimentResponse(
+            id=experiment.id,
+            organization_id=experiment.organization_id,
+            name=experiment.name,
+            description=experiment.description,
+            experiment_type=experiment.experiment_type.value,
+            status=experiment.status.value,
+            hypothesis=experiment.hypothesis,
+            primary_metric=experiment.primary_metric,
+            traffic_allocation=experiment.traffic_allocation,
+            layer=experiment.layer,
             start_date=experiment.start_date,
             end_date=experiment.end_date,
             winner_variant_id=experiment.winner_variant_id,
@@ -447,14 +516,25 @@ async def get_experiment_results(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/experiments/{experiment_id}/assign", response_model=AssignmentResponse)
+@router.post("/experiments/{experiment_id}/stats/rebuild")
+async def rebuild_experiment_statistics(
+    experiment_id: str,
+    engine: ABTestingEngine = Depends(get_ab_testing_engine),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Recompute the experiment's running metric totals from its assignments."""
+    metrics = await engine.rebuild_statistics(experiment_id)
+    return {"success": True, "metrics": metrics}
+
+
+@router.post("/experiments/{experiment_id}/assign", response_model=Optional[AssignmentResponse])
 async def assign_user_to_experiment(
     experiment_id: str,
     request: AssignmentRequest,
     engine: ABTestingEngine = Depends(get_ab_testing_engine),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Assign user to experiment variant."""
+    """Assign user to experiment variant (null if the user is not enrolled)."""
     try:
         assignment = await engine.assign_user(
             experiment_id=experiment_id,
@@ -462,6 +542,8 @@ async def assign_user_to_experiment(
             anonymous_id=request.anonymous_id,
             context=request.context
         )
+        if assignment is None:
+            return None
         
         return AssignmentResponse(
             variant_id=assignment.variant_id,
@@ -474,6 +556,46 @@ async def assign_user_to_experiment(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/experiments/assign/batch", response_model=BatchAssignmentResponse)
+async def assign_user_to_experiments(
+    request: BatchAssignmentRequest,
+    engine: ABTestingEngine = Depends(get_ab_testing_engine),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Assign a user to several experiments at once (e.g. for server-side rendering)."""
+    try:
+        assignments = await engine.assign_many(
+            experiment_ids=request.experiment_ids,
+            user_id=request.user_id,
+            anonymous_id=request.anonymous_id,
+            context=request.context
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return BatchAssignmentResponse(
+        assignments={
+            experiment_id: AssignmentResponse(
+                variant_id=assignment.variant_id,
+                variant_name=assignment.variant_name,
+                is_control=assignment.is_control,
+                configuration=assignment.configuration,
+                assignment_id=assignment.assignment_id
+            )
+            for experiment_id, assignment in assignments.items()
+            if assignment is not None
+        },
+        not_enrolled=[
+            experiment_id for experiment_id, assignment in assignments.items()
+            if assignment is None
+        ],
+        not_running=[
+            experiment_id for experiment_id in dict.fromkeys(request.experiment_ids)
+            if experiment_id not in assignments
+        ]
+    )
+
+
 @router.post("/experiments/{experiment_id}/track")
 async def track_experiment_metric(
     experiment_id: str,
@@ -863,6 +985,34 @@ async def get_bandit_recommendation(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/bandits/{experiment_id}/recommend", response_model=BanditRecommendationResponse)
+async def get_contextual_bandit_recommendation(
+    experiment_id: str,
+    request: ContextualRecommendationRequest,
+    engine: BanditEngine = Depends(get_bandit_engine),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get contextual bandit recommendation for a request's context and audience."""
+    try:
+        recommendation = await engine.get_contextual_recommendation(
+            experiment_id=experiment_id,
+            context=request.context,
+            audience=request.audience,
+            algorithm=request.algorithm,
+            alpha=request.alpha
+        )
+        
+        return BanditRecommendationResponse(
+            variant_id=recommendation.variant_id,
+            variant_name=recommendation.variant_name,
+            algorithm=recommendation.algorithm,
+            confidence=recommendation.confidence,
+            estimated_conversion_rate=recommendation.estimated_conversion_rate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/bandits/{experiment_id}/reward")
 async def report_bandit_reward(
     experiment_id: str,
@@ -872,17 +1022,25 @@ async def report_bandit_reward(
 ):
     """Report reward for a bandit variant."""
     try:
-        variant = await engine.update_variant_performance(
-            variant_id=request.variant_id,
-            reward=request.reward
-        )
+        if request.context is not None or request.audience is not None:
+            variant = await engine.update_contextual_performance(
+                variant_id=request.variant_id,
+                reward=request.reward,
+                context=request.context or {},
+                audience=request.audience
+            )
+        else:
+            variant = await engine.update_variant_performance(
+                variant_id=request.variant_id,
+                reward=request.reward
+            )
         
         return {
-            "variant_id": variant.id,
-            "successes": variant.bandit_successes,
-            "failures": variant.bandit_failures,
-            "pulls": variant.bandit_pulls,
-            "conversion_rate": variant.get_bandit_score()
+            "variant_id": variant.variant_id,
+            "successes": variant.successes,
+            "failures": variant.failures,
+            "pulls": variant.pulls,
+            "conversion_rate": variant.successes / variant.pulls if variant.pulls else 0.5
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
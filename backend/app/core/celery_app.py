@@ -24,6 +24,8 @@ celery_app = Celery(
     backend=REDIS_URL,
     include=[
         "app.tasks.campaign_tasks",
+        "app.tasks.cdp_tasks",
+        "app.tasks.analytics_tasks",
     ],
 )
 
@@ -57,6 +59,8 @@ celery_app.conf.update(
     task_default_queue="default",
     task_routes={
         "app.tasks.campaign_tasks.*": {"queue": "campaigns"},
+        "app.tasks.cdp_tasks.*": {"queue": "cdp"},
+        "app.tasks.analytics_tasks.*": {"queue": "analytics"},
     },
 )
 
@@ -71,6 +71,14 @@ class Settings(BaseSettings):
     rate_limit_requests: int = 100
     rate_limit_window: int = 60  # seconds
 
+    # LLM transport (one pooled client shared by every OpenRouterService)
+    llm_http2: bool = True  # Multiplex LLM calls over HTTP/2 (needs the h2 package)
+    llm_max_connections: int = 32
+    llm_keepalive_expiry_seconds: float = 60.0
+    llm_initial_concurrency: int = 8  # Concurrent LLM calls at start; adapts (AIMD) to 429/5xx
+    llm_min_concurrency: int = 1
+    llm_max_concurrency: int = 32
+
     # Onboarding
     onboarding_max_pages: int = 50
     onboarding_timeout_seconds: int = 300  # 5 minutes
@@ -111,10 +119,41 @@ class Settings(BaseSettings):
     cdp_batch_size: int = 1000
     cdp_enrichment_enabled: bool = True
 
+    # Async (accept-and-ack) ingestion via a durable on-disk spool
+    cdp_async_ingestion_enabled: bool = False
+    cdp_spool_dir: str = "data/event_spool"
+    cdp_spool_max_bytes: int = 512 * 1024 * 1024  # Reject with 429 beyond this
+    cdp_spool_segment_bytes: int = 8 * 1024 * 1024
+    cdp_spool_seal_interval_seconds: float = 1.0  # Max time an event waits before draining
+    cdp_spool_fsync: bool = True
+    cdp_ingestion_workers: int = 4
+
+    # Identity resolution cache (local LRU/TTL, optional shared Redis tier)
+    cdp_identity_cache_enabled: bool = True
+    cdp_identity_cache_size: int = 100_000
+    cdp_identity_cache_ttl_seconds: float = 300.0
+    cdp_identity_cache_negative_ttl_seconds: float = 10.0  # Cached "no customer" lookups
+    cdp_identity_cache_redis_url: Optional[str] = None  # e.g., redis://localhost:6379/1
+
+    # Real-time segment membership on event ingest
+    cdp_realtime_segments_enabled: bool = True
+    cdp_segment_index_ttl_seconds: float = 60.0  # Picks up segment edits made by other workers
+
     # External enrichment APIs
     clearbit_api_key: Optional[str] = None
     zerobounce_api_key: Optional[str] = None
 
+    # === Analytics Configuration ===
+    # Dashboard queries answered from hourly/daily rollups; enable after
+    # rebuilding rollups for existing data (POST /api/analytics/rollups/rebuild)
+    analytics_rollups_enabled: bool = False
+    analytics_rollups_timescale: bool = False  # Daily rollups from a TimescaleDB continuous aggregate
+    analytics_overview_cache_ttl_seconds: float = 30.0  # Per-org overview snapshot lifetime (0 disables)
+    analytics_query_fanout_width: int = 4  # Concurrent dashboard queries per request (1 runs them in order)
+    mmm_search_workers: int = 0  # Processes for MMM hyperparameter search (0 = CPU count, 1 = in-process)
+    mmm_data_cache_size: int = 16  # MMM models whose daily spend matrices stay in memory (0 disables)
+    mmm_response_curve_cache_size: int = 64  # Trained MMM versions whose response curves stay parsed (0 disables)
+
     # === Enterprise Integrations Configuration ===
     integrations_enabled: bool = True
 
@@ -157,6 +196,21 @@ class Settings(BaseSettings):
     experiment_default_confidence: float = 0.95
     bandit_default_algorithm: str = "thompson_sampling"
     predictive_model_retrain_days: int = 7
+    predictive_model_cache_bytes: int = 256 * 1024 * 1024  # Deserialized estimators kept in memory (0 disables)
+    predictive_model_preload: bool = False  # Deserialize active models at startup
+    predictive_stats_flush_interval_seconds: float = 10.0  # Prediction counters buffered this long (0 = every call)
+    predictive_training_workers: int = 1  # Processes fitting predictive models (0 = fit in a thread)
+    predictive_max_incremental_updates: int = 10  # Stacked incremental retrains before a full refit is required
+    model_artifact_dir: str = "data/model_artifacts"  # Content-addressed trained model files
+    model_artifact_s3: bool = False  # Also keep model artifacts in the S3 bucket
+    experiment_snapshot_ttl_seconds: float = 30.0  # Running experiments reloaded for assignment this often
+    experiment_exposure_flush_interval_seconds: float = 5.0  # Assignment rows buffered this long (0 = every call)
+    experiment_exposure_buffer_max: int = 10000  # Buffered assignment rows that force a flush
+    experiment_sticky_cache_size: int = 100000  # Assignments in re-allocated buckets remembered per process
+    bandit_counter_flush_interval_seconds: float = 2.0  # Bandit pulls/rewards written to the database this often
+    bandit_counter_sync_interval_seconds: float = 0.25  # Bandit deltas shared through Redis this often
+    bandit_counters_redis_url: Optional[str] = None  # e.g., redis://localhost:6379/2
+    bandit_contextual_checkpoint_interval_seconds: float = 30.0  # Contextual bandit state written this often
     
     # === Additional Integration Configuration ===
     # Microsoft Dynamics OAuth credentials
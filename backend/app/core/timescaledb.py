@@ -137,6 +137,14 @@ class TimescaleDBSetup:
             chunk_time_interval="7 days"
         )
 
+    async def setup_analytics_rollups_hypertable(self) -> bool:
+        """Setup hypertable for analytics_rollups table."""
+        return await self.create_hypertable(
+            table_name="analytics_rollups",
+            time_column="bucket",
+            chunk_time_interval="30 days"
+        )
+
     async def setup_all_hypertables(self) -> Dict[str, bool]:
         """Setup all hypertables for analytics tables."""
         results = {}
@@ -145,6 +153,7 @@ class TimescaleDBSetup:
         results["conversion_events"] = await self.setup_conversion_events_hypertable()
         results["attribution_touchpoints"] = await self.setup_touchpoints_hypertable()
         results["mmm_channel_daily"] = await self.setup_mmm_daily_hypertable()
+        results["analytics_rollups"] = await self.setup_analytics_rollups_hypertable()
 
         return results
 
@@ -157,7 +166,8 @@ class TimescaleDBSetup:
         time_bucket: str,
         time_column: str,
         aggregations: List[Dict[str, str]],
-        group_by_columns: Optional[List[str]] = None
+        group_by_columns: Optional[List[str]] = None,
+        where: Optional[str] = None
     ) -> bool:
         """
         Create a continuous aggregate view.
@@ -170,6 +180,7 @@ class TimescaleDBSetup:
             aggregations: List of aggregation definitions.
                 Each dict should have: {"function": "sum", "column": "value", "alias": "total_value"}
             group_by_columns: Additional columns to group by.
+            where: Optional SQL condition on source rows.
 
         Returns:
             True if successful.
@@ -189,16 +200,17 @@ class TimescaleDBSetup:
                 group_cols.extend(group_by_columns)
 
             group_by_clause = ", ".join(group_cols)
+            select_cols = [f"{group_cols[0]} as bucket", *group_cols[1:], *agg_exprs]
+            where_clause = f"WHERE {where}" if where else ""
 
             # Create materialized view
             create_query = text(f"""
                 CREATE MATERIALIZED VIEW IF NOT EXISTS {view_name}
                 WITH (timescaledb.continuous) AS
                 SELECT
-                    time_bucket('{time_bucket}', {time_column}) as bucket,
-                    {", ".join(group_by_columns) if group_by_columns else ""}
-                    {", ".join(agg_exprs)}
+                    {", ".join(select_cols)}
                 FROM {table_name}
+                {where_clause}
                 GROUP BY {group_by_clause}
                 WITH NO DATA;
             """)
@@ -259,6 +271,32 @@ class TimescaleDBSetup:
             group_by_columns=["organization_id", "model_type"]
         )
 
+    async def create_analytics_rollups_daily(self) -> bool:
+        """Create daily dashboard rollups over the hourly analytics_rollups rows."""
+        created = await self.create_continuous_aggregate(
+            view_name="analytics_rollups_daily",
+            table_name="analytics_rollups",
+            time_bucket="1 day",
+            time_column="bucket",
+            aggregations=[
+                {"function": "sum", "column": "conversion_count", "alias": "conversion_count"},
+                {"function": "sum", "column": "conversion_value", "alias": "conversion_value"},
+                {"function": "sum", "column": "attribution_count", "alias": "attribution_count"},
+                {"function": "sum", "column": "attributed_value", "alias": "attributed_value"},
+                {"function": "sum", "column": "weight_sum", "alias": "weight_sum"}
+            ],
+            group_by_columns=["organization_id", "channel", "campaign_id", "model_type"],
+            where="granularity = 'hour'"
+        )
+        if created:
+            created = await self.add_refresh_policy(
+                "analytics_rollups_daily",
+                start_offset="3 days",
+                end_offset="1 hour",
+                schedule_interval="15 minutes"
+            )
+        return created
+
     # ============== Retention Policies ==============
 
     async def add_retention_policy(
@@ -525,6 +563,7 @@ async def setup_timescaledb(db: AsyncSession) -> Dict[str, Any]:
         "conversion_metrics_hourly": await setup.create_conversion_metrics_hourly(),
         "touchpoint_metrics_daily": await setup.create_touchpoint_metrics_daily(),
         "attribution_metrics_daily": await setup.create_attribution_metrics_daily(),
+        "analytics_rollups_daily": await setup.create_analytics_rollups_daily(),
     }
 
     return results
@@ -96,9 +96,63 @@ async def lifespan(app: FastAPI):
     # Create tables if they don't exist (safe no-op if already created)
     await db.create_tables()
 
+    # Start the write-behind CDP ingestion workers (replays any spooled events)
+    if settings.cdp_async_ingestion_enabled:
+        from .services.cdp.event_spool import start_ingestion_queue
+        await start_ingestion_queue(db.async_session)
+
+    # Share identity cache invalidations across workers
+    if settings.cdp_identity_cache_enabled and settings.cdp_identity_cache_redis_url:
+        from .services.cdp.identity_cache import get_identity_cache
+        await get_identity_cache().start_invalidation_listener()
+
+    # Write bandit pulls and rewards back to the database in the background
+    from .services.optimization.bandit_counters import get_bandit_counters
+    await get_bandit_counters().start(db.async_session)
+    from .services.optimization.contextual_bandit import get_contextual_bandits
+    await get_contextual_bandits().start(db.async_session)
+
+    # Write prediction counters in the background, also for idle models
+    from .services.optimization.model_registry import get_prediction_stats_buffer
+    await get_prediction_stats_buffer().start(db.async_session)
+
+    # Deserialize active predictive models before the first request
+    if settings.predictive_model_preload:
+        from .services.optimization.model_registry import get_model_registry
+        registry = get_model_registry()
+        if registry is not None:
+            await registry.warm(db.async_session)
+
     yield
 
     # Shutdown
+    if settings.cdp_async_ingestion_enabled:
+        from .services.cdp.event_spool import stop_ingestion_queue
+        await stop_ingestion_queue()
+
+    if settings.cdp_identity_cache_enabled and settings.cdp_identity_cache_redis_url:
+        from .services.cdp.identity_cache import get_identity_cache
+        await get_identity_cache().stop_invalidation_listener()
+
+    # Write bandit counters still buffered in memory
+    await get_bandit_counters().stop()
+    await get_contextual_bandits().stop()
+
+    # Write prediction counters still buffered in memory
+    await get_prediction_stats_buffer().stop()
+
+    # Write experiment assignments still buffered in memory
+    from .services.optimization.experiment_assignment import get_assignment_service
+    async with db.async_session() as session:
+        await get_assignment_service().exposures.flush(session)
+
+    from .services.optimization.predictive_training import shutdown_training_executor
+    shutdown_training_executor()
+
+    # Close the pooled LLM connections
+    from .services.ai.llm_transport import close_llm_transport
+    await close_llm_transport()
+
     await db.close()
 
 
@@ -201,6 +255,12 @@ def create_app() -> FastAPI:
         else:
             checks["checks"]["openrouter_connection"] = "skipped (no key)"
 
+        # LLM concurrency limit, in-flight/queued calls and latency
+        from .services.ai.llm_transport import llm_transport_stats
+        llm_stats = llm_transport_stats()
+        if llm_stats is not None:
+            checks["checks"]["llm_transport"] = llm_stats
+
         # If critical keys are missing, mark degraded (not unhealthy - app can still work with limited features)
         if not settings.openrouter_api_key:
             checks["status"] = "degraded"
@@ -20,6 +20,7 @@ from .data_subject_request import (
 )
 from .customer import Customer
 from .customer_identity import CustomerIdentity, IdentityType, IdentitySource
+from .customer_match_key import CustomerMatchKey
 from .customer_event import CustomerEvent, EventType, EventSource
 from .customer_segment import CustomerSegment, SegmentType, SegmentStatus
 from .segment_membership import SegmentMembership
@@ -32,12 +33,14 @@ from .marketing_mix_model import (
     MarketingMixModel, MMMChannel, MMMChannelDaily, MMMPrediction,
     MMMBudgetOptimizer, MMMModelStatus, MMMChannelType
 )
+from .analytics_rollup import AnalyticsRollup
 
 # Optimization & Experiments
 from .experiment import Experiment, ExperimentType, ExperimentStatus
 from .experiment_variant import ExperimentVariant
 from .experiment_assignment import ExperimentAssignment
 from .experiment_result import ExperimentResult
+from .experiment_metric import ExperimentMetric
 from .predictive_model import PredictiveModel, PredictiveModelType, PredictiveModelStatus
 
 __all__ = [
@@ -110,6 +113,7 @@ __all__ = [
     "CustomerIdentity",
     "IdentityType",
     "IdentitySource",
+    "CustomerMatchKey",
     "CustomerEvent",
     "EventType",
     "EventSource",
@@ -136,6 +140,7 @@ __all__ = [
     "MMMBudgetOptimizer",
     "MMMModelStatus",
     "MMMChannelType",
+    "AnalyticsRollup",
 
     # Optimization & Experiments
     "Experiment",
@@ -144,6 +149,7 @@ __all__ = [
     "ExperimentVariant",
     "ExperimentAssignment",
     "ExperimentResult",
+    "ExperimentMetric",
     "PredictiveModel",
     "PredictiveModelType",
     "PredictiveModelStatus",
@@ -0,0 +1,74 @@
+"""
+Analytics rollup model for pre-aggregated dashboard metrics.
+
+Stores hourly and daily totals per (organization, channel, campaign,
+attribution model) so dashboard queries read a handful of buckets instead
+of scanning raw conversions and attributions.
+"""
+from typing import Dict, Any
+
+from sqlalchemy import Column, String, ForeignKey, DateTime, Index, Float, Integer, UniqueConstraint
+
+from .base import Base
+
+
+class AnalyticsRollup(Base):
+    """
+    Analytics rollup bucket.
+
+    Conversion rows carry empty channel, campaign and model dimensions and
+    count attributed conversions by conversion time. Attribution rows carry
+    all three dimensions and sum attributions by calculation time. Empty
+    strings stand in for "no value" so the unique constraint can serve as
+    the upsert conflict target.
+    """
+
+    # Organization scoping
+    organization_id = Column(String(12), ForeignKey("organizations.id"), nullable=False)
+
+    # Bucket
+    granularity = Column(String(8), nullable=False)  # "hour" or "day"
+    bucket = Column(DateTime, nullable=False)  # Start of the bucket (UTC)
+
+    # Dimensions
+    channel = Column(String(50), default="", nullable=False)
+    campaign_id = Column(String(12), default="", nullable=False)
+    model_type = Column(String(32), default="", nullable=False)
+
+    # Conversion totals
+    conversion_count = Column(Integer, default=0, nullable=False)
+    conversion_value = Column(Float, default=0.0, nullable=False)
+
+    # Attribution totals
+    attribution_count = Column(Integer, default=0, nullable=False)
+    attributed_value = Column(Float, default=0.0, nullable=False)
+    weight_sum = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        # One row per bucket and dimension combination (upsert conflict target)
+        UniqueConstraint(
+            "organization_id", "granularity", "bucket", "channel", "campaign_id", "model_type",
+            name="uq_analytics_rollups_bucket"
+        ),
+        # Range scans by organization
+        Index("ix_analytics_rollups_org_bucket", "organization_id", "granularity", "bucket"),
+    )
+
+    def __repr__(self):
+        return f"<AnalyticsRollup {self.granularity} {self.bucket} channel={self.channel} model={self.model_type}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert rollup to dictionary representation."""
+        return {
+            "organization_id": self.organization_id,
+            "granularity": self.granularity,
+            "bucket": self.bucket.isoformat() if self.bucket else None,
+            "channel": self.channel,
+            "campaign_id": self.campaign_id,
+            "model_type": self.model_type,
+            "conversion_count": self.conversion_count,
+            "conversion_value": self.conversion_value,
+            "attribution_count": self.attribution_count,
+            "attributed_value": self.attributed_value,
+            "weight_sum": self.weight_sum,
+        }
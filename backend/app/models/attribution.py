@@ -8,7 +8,7 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 from enum import Enum
 
-from sqlalchemy import Column, String, ForeignKey, JSON, DateTime, Index, Enum as SQLEnum, Float, Integer, Text
+from sqlalchemy import Column, String, ForeignKey, JSON, DateTime, Index, Enum as SQLEnum, Float, Integer, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base, generate_id
@@ -115,8 +115,11 @@ class Attribution(Base):
 
     # Indexes for analytics queries
     __table_args__ = (
-        # Unique constraint: one attribution per conversion-touchpoint-model
-        Index("ix_attributions_unique", "conversion_event_id", "touchpoint_id", "model_type", unique=True),
+        # One attribution per conversion-touchpoint-model (upsert conflict target)
+        UniqueConstraint(
+            "conversion_event_id", "touchpoint_id", "model_type",
+            name="uq_attributions_conversion_touchpoint_model"
+        ),
         # Composite index for conversion queries
         Index("ix_attributions_conversion", "conversion_event_id", "model_type"),
         # Composite index for touchpoint queries
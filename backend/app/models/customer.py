@@ -84,6 +84,7 @@ class Customer(Base):
         Index("ix_customers_org_engagement", "organization_id", "engagement_score"),
         Index("ix_customers_org_ltv", "organization_id", "lifetime_value"),
         Index("ix_customers_org_last_seen", "organization_id", "last_seen_at"),
+        Index("ix_customers_org_updated", "organization_id", "updated_at"),
         Index("ix_customers_is_deleted", "is_deleted"),
     )
 
@@ -0,0 +1,44 @@
+"""
+Blocking keys for probabilistic identity resolution.
+
+Each row is one normalized key (email local-part, phone digits, phonetic
+name code, ...) derived from a customer's traits and external IDs. Fuzzy
+matching looks candidates up by key instead of scanning JSON columns.
+Rows are maintained automatically on customer writes (see
+`app.services.cdp.match_index`).
+"""
+from sqlalchemy import Column, String, ForeignKey, Index
+
+from .base import Base
+
+
+class CustomerMatchKey(Base):
+    """
+    Blocking key linking a normalized identifier fragment to a customer.
+    """
+
+    # Organization scoping (denormalized for index-only candidate lookups)
+    organization_id = Column(String(12), ForeignKey("organizations.id"), nullable=False)
+
+    customer_id = Column(
+        String(12),
+        ForeignKey("customers.id", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    # Key kind (email, email_local, email_domain, phone, name, last_name, company, ...)
+    key_type = Column(String(20), nullable=False)
+    key_value = Column(String(255), nullable=False)
+
+    __table_args__ = (
+        # Candidate lookup: (org, type, value) -> customer_id
+        Index(
+            "ix_customer_match_keys_lookup",
+            "organization_id", "key_type", "key_value", "customer_id"
+        ),
+        # Maintenance on customer write
+        Index("ix_customer_match_keys_customer", "customer_id"),
+    )
+
+    def __repr__(self):
+        return f"<CustomerMatchKey {self.key_type}={self.key_value} customer={self.customer_id}>"
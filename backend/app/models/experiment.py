@@ -59,6 +59,14 @@ class Experiment(Base):
     
     # Traffic allocation
     traffic_allocation = Column(Float, default=1.0, nullable=False)  # % of total traffic (0.0 to 1.0)
+    # Experiments in the same layer are mutually exclusive (disjoint buckets of the layer)
+    layer = Column(String(100), nullable=True)
+    # "md5" for experiments that were running before bucket allocations were
+    # stored; they keep hashing visitors the way they started
+    bucketing = Column(String(20), nullable=True)
+    # Buckets some variant gave up while the experiment ran, as [start, end)
+    # ranges; visitors in them may already be assigned to another variant
+    released_buckets = Column(JSON, nullable=True)
     
     # Timeline
     start_date = Column(DateTime, nullable=True)
@@ -115,6 +123,7 @@ class Experiment(Base):
             "primary_metric": self.primary_metric,
             "secondary_metrics": self.secondary_metrics,
             "traffic_allocation": self.traffic_allocation,
+            "layer": self.layer,
             "start_date": self.start_date.isoformat() if self.start_date else None,
             "end_date": self.end_date.isoformat() if self.end_date else None,
             "min_sample_size": self.min_sample_size,
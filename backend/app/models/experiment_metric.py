@@ -0,0 +1,55 @@
+"""
+Experiment Metric model.
+
+Running sufficient statistics per (variant, metric), updated as
+conversions are tracked, so experiment results are computed from one row
+per variant instead of scanning assignments.
+"""
+from typing import Dict, Any
+
+from sqlalchemy import Column, String, ForeignKey, Float, Integer, Index, UniqueConstraint
+
+from .base import Base
+
+
+class ExperimentMetric(Base):
+    """
+    Experiment metric totals for one variant.
+
+    `conversions` counts converted assignments tracked under this metric;
+    the value columns accumulate the metric values they reported (count,
+    sum and sum of squares), enough for means, variances and the
+    sequential tests in `experiment_stats`. Sample sizes come from the
+    variant's `total_assignments`.
+    """
+
+    experiment_id = Column(String(12), ForeignKey("experiments.id"), nullable=False)
+    variant_id = Column(String(12), ForeignKey("experiment_variants.id"), nullable=False)
+    metric_name = Column(String(100), nullable=False)
+
+    # Totals
+    conversions = Column(Integer, default=0, nullable=False)
+    value_count = Column(Integer, default=0, nullable=False)
+    value_sum = Column(Float, default=0.0, nullable=False)
+    value_sum_squares = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        # One row per variant and metric (upsert conflict target)
+        UniqueConstraint("variant_id", "metric_name", name="uq_experiment_metrics_variant_metric"),
+        Index("ix_experiment_metrics_experiment_metric", "experiment_id", "metric_name"),
+    )
+
+    def __repr__(self):
+        return f"<ExperimentMetric {self.variant_id} {self.metric_name} n={self.value_count}>"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert metric totals to dictionary."""
+        return {
+            "experiment_id": self.experiment_id,
+            "variant_id": self.variant_id,
+            "metric_name": self.metric_name,
+            "conversions": self.conversions,
+            "value_count": self.value_count,
+            "value_sum": self.value_sum,
+            "value_sum_squares": self.value_sum_squares,
+        }
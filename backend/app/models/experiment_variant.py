@@ -34,6 +34,10 @@ class ExperimentVariant(Base):
     # Traffic allocation for this variant (must sum to 100% across all variants)
     traffic_percentage = Column(Float, nullable=False)  # 0.0 to 100.0
     
+    # Buckets owned by this variant, as [start, end) ranges of the experiment's
+    # (or its layer's) bucket space; set when the experiment starts
+    buckets = Column(JSON, nullable=True)
+    
     # Variant configuration (what changes in this variant)
     # Examples:
     # {
@@ -52,6 +56,10 @@ class ExperimentVariant(Base):
     bandit_failures = Column(Integer, default=0, nullable=False)   # Beta for Beta distribution
     bandit_pulls = Column(Integer, default=0, nullable=False)      # Total selections
     
+    # Contextual bandit checkpoint: ridge regression statistics (A, b) of
+    # this variant over the features they were built on
+    contextual_state = Column(JSON, nullable=True)
+    
     # Performance tracking (cached for quick access)
     total_assignments = Column(Integer, default=0, nullable=False)
     total_conversions = Column(Integer, default=0, nullable=False)
@@ -152,6 +152,17 @@ class MarketingMixModel(Base):
     #     "baseline": 0.22
     # }
 
+    # Response curves tabulated at training time: channel names and a model
+    # artifact reference (see mmm_response_curves, model_artifacts)
+    response_curves = Column(JSON, default=dict, nullable=True)
+    # Example:
+    # {
+    #     "points": 128,
+    #     "channels": {
+    #         "paid_search": {"daily_spend": [0, 120.5, ...], "daily_return": [0, 410.2, ...]}
+    #     }
+    # }
+
     # Model diagnostics
     diagnostics = Column(JSON, default=dict, nullable=False)
     # Example:
@@ -71,8 +71,9 @@ class PredictiveModel(Base):
     target_column = Column(String(100), nullable=False)  # e.g., "ctr", "conversion_rate"
     
     # Model parameters (serialized model)
-    # Stores the actual trained model (e.g., XGBoost, LightGBM, sklearn model)
-    # Serialized using pickle or joblib, stored as base64
+    # {"artifact": {...}} references the trained estimator in the model
+    # artifact store (see services/model_artifacts.py); older rows hold a
+    # base64 pickle in "serialized_model"
     model_parameters = Column(JSON, nullable=True)
     
     # Model metadata
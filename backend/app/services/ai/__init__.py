@@ -2,9 +2,12 @@
 AI services using OpenRouter.
 """
 from .openrouter import OpenRouterService, llm, llm_json
+from .llm_transport import get_llm_transport, set_llm_tenant
 
 __all__ = [
     "OpenRouterService",
     "llm",
     "llm_json",
+    "get_llm_transport",
+    "set_llm_tenant",
 ]
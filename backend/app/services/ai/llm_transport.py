@@ -0,0 +1,403 @@
+"""
+Process-wide transport for LLM API calls.
+
+Every `OpenRouterService` sends its requests through one `LLMTransport`:
+a single pooled `httpx.AsyncClient` (HTTP/2 when the `h2` package is
+installed, HTTP/1.1 keep-alive otherwise), so TLS handshakes and
+connections are reused across services and requests.
+
+Concurrency is bounded by an `AdaptiveLimiter` instead of fixed request
+spacing. Its limit follows AIMD: it grows by about one slot per limit's
+worth of successful calls while callers are waiting for slots, and halves
+(at most once per round trip) on 429s, 5xx responses, timeouts and
+connection errors. A `Retry-After` header pauses new calls until it
+expires. Waiting calls are queued per tenant and served round-robin, so a
+campaign generation's burst does not starve other organizations.
+
+The tenant is taken from the `llm_tenant` context variable, which the
+orchestrator sets to the organization ID for the calls of a campaign:
+
+    set_llm_tenant(organization_id)
+    await service.complete(...)
+"""
+import asyncio
+import importlib.util
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import httpx
+
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Organization whose calls are being made, for fair queuing
+llm_tenant: ContextVar[Optional[str]] = ContextVar("llm_tenant", default=None)
+
+
+def set_llm_tenant(tenant: Optional[str]) -> Token:
+    """Attribute LLM calls made from the current context to a tenant."""
+    return llm_tenant.set(tenant)
+
+
+def is_overload(status_code: int) -> bool:
+    """Whether a response status means the provider is shedding load."""
+    return status_code == 429 or status_code >= 500
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), if any."""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit with per-tenant round-robin queues.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 32,
+        backoff: float = 0.5,
+        latency_window: int = 512,
+    ):
+        """Initialize the limiter.
+
+        Args:
+            initial: Concurrent calls allowed at start.
+            minimum: Floor the limit never drops below.
+            maximum: Ceiling the limit never grows above.
+            backoff: Factor applied to the limit on overload.
+            latency_window: Recent call latencies kept for percentiles.
+        """
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.in_flight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._paused_until = 0.0
+        self._resume: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._completed = 0
+        self._overloads = 0
+        self._errors = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit) and time.monotonic() >= self._paused_until
+
+    async def acquire(self, tenant: Optional[str] = None) -> None:
+        """Wait for a slot. Every acquire must be paired with one `release`."""
+        if not self._queues and self._has_capacity():
+            self.in_flight += 1
+            return
+
+        tenant = tenant or DEFAULT_TENANT
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant, deque()).append(future)
+        self._schedule_resume()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted as we were cancelled: pass it on
+                self.in_flight -= 1
+                self._dispatch()
+            else:
+                future.cancel()
+                self._discard(tenant, future)
+            raise
+
+    def release(
+        self,
+        latency: Optional[float] = None,
+        overloaded: bool = False,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """Free a slot and adapt the limit to the call's outcome.
+
+        Args:
+            latency: Seconds the call took; None if it failed.
+            overloaded: The provider signalled overload (429, 5xx, timeout).
+            retry_after: Seconds the provider asked clients to wait.
+        """
+        saturated = self.in_flight >= int(self.limit) or bool(self._queues)
+        self.in_flight -= 1
+        now = time.monotonic()
+
+        if overloaded:
+            self._overloads += 1
+            # One decrease per round trip: calls already in flight when the
+            # provider pushed back report the same congestion
+            if now - self._last_decrease >= self._typical_latency():
+                self.limit = max(float(self.minimum), self.limit * self.backoff)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+        elif latency is None:
+            self._errors += 1
+        else:
+            self._completed += 1
+            self._latencies.append(latency)
+            if saturated:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+        self._dispatch()
+
+    def _typical_latency(self) -> float:
+        if not self._latencies:
+            return 1.0
+        return sorted(self._latencies)[len(self._latencies) // 2]
+
+    def _dispatch(self) -> None:
+        """Grant free slots to waiting calls, one tenant at a time."""
+        while self._queues and self._has_capacity():
+            tenant, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            # Move the tenant to the back of the rotation
+            del self._queues[tenant]
+            if queue:
+                self._queues[tenant] = queue
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+        self._schedule_resume()
+
+    def _discard(self, tenant: str, future: asyncio.Future) -> None:
+        queue = self._queues.get(tenant)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[tenant]
+
+    def _schedule_resume(self) -> None:
+        """Dispatch again when a Retry-After pause ends."""
+        delay = self._paused_until - time.monotonic()
+        if not self._queues or delay <= 0 or self._resume is not None:
+            return
+
+        def resume():
+            self._resume = None
+            self._dispatch()
+
+        self._resume = asyncio.get_running_loop().call_later(delay, resume)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limit, in-flight and queued calls, outcome counters and latency percentiles."""
+        latencies = sorted(self._latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000, 1)
+
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queued_by_tenant": {tenant: len(queue) for tenant, queue in self._queues.items()},
+            "paused_seconds": round(max(self._paused_until - time.monotonic(), 0.0), 2),
+            "completed": self._completed,
+            "overloads": self._overloads,
+            "errors": self._errors,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+        }
+
+
+class LLMTransport:
+    """
+    Shared pooled HTTP client behind an adaptive concurrency limit.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 120.0,
+        http2: Optional[bool] = None,
+        max_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        http_transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """Initialize the transport.
+
+        Args:
+            timeout: Default request timeout in seconds.
+            http2: Use HTTP/2 (defaults to the `llm_http2` setting; falls
+                back to HTTP/1.1 when `h2` is not installed).
+            max_connections: Pooled connections (defaults to the
+                `llm_max_connections` setting).
+            keepalive_expiry: Seconds an idle connection is kept (defaults to
+                the `llm_keepalive_expiry_seconds` setting).
+            limiter: Concurrency limiter (defaults to one built from the
+                `llm_*_concurrency` settings).
+            http_transport: Custom httpx transport (e.g. `httpx.MockTransport`).
+        """
+        settings = get_settings()
+        http2 = settings.llm_http2 if http2 is None else http2
+        if http2 and not HTTP2_AVAILABLE:
+            logger.info("h2 is not installed; LLM calls use HTTP/1.1 keep-alive connections")
+            http2 = False
+        max_connections = settings.llm_max_connections if max_connections is None else max_connections
+        keepalive_expiry = (
+            settings.llm_keepalive_expiry_seconds if keepalive_expiry is None else keepalive_expiry
+        )
+
+        self.http2 = http2
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=http_transport,
+            proxy=None,  # Explicitly disable proxy
+        )
+        self.limiter = limiter or AdaptiveLimiter(
+            initial=settings.llm_initial_concurrency,
+            minimum=settings.llm_min_concurrency,
+            maximum=settings.llm_max_concurrency,
+        )
+
+    async def post(self, url: str, tenant: Optional[str] = None, **kwargs) -> httpx.Response:
+        """POST once a slot is free; the response status adapts the limit."""
+        await self.limiter.acquire(tenant or llm_tenant.get())
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(url, **kwargs)
+        except (httpx.TimeoutException, httpx.TransportError):
+            self.limiter.release(overloaded=True)
+            raise
+        except BaseException:
+            self.limiter.release()
+            raise
+        self._release(response, time.perf_counter() - start)
+        return response
+
+    @asynccontextmanager
+    async def stream(
+        self, method: str, url: str, tenant: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[httpx.Response]:
+        """Stream a response, holding a slot until the body is consumed.
+
+        The slot is released when the context exits; the latency recorded
+        for the limit is the time to the response headers.
+        """
+        await self.limiter.acquire(tenant or llm_tenant.get())
+        start = time.perf_counter()
+        response: Optional[httpx.Response] = None
+        latency = 0.0
+        overloaded = failed = False
+        try:
+            async with self.client.stream(method, url, **kwargs) as response:
+                latency = time.perf_counter() - start
+                yield response
+        except (httpx.TimeoutException, httpx.TransportError):
+            overloaded = True
+            raise
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if overloaded:
+                self.limiter.release(overloaded=True)
+            elif response is None or (failed and not is_overload(response.status_code)):
+                self.limiter.release()
+            else:
+                self._release(response, latency)
+
+    def _release(self, response: httpx.Response, latency: float) -> None:
+        if is_overload(response.status_code):
+            self.limiter.release(overloaded=True, retry_after=retry_after_seconds(response))
+        elif response.is_success:
+            self.limiter.release(latency=latency)
+        else:
+            self.limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Limiter metrics plus the protocol in use."""
+        return {"http2": self.http2, **self.limiter.stats()}
+
+    async def close(self) -> None:
+        """Close pooled connections."""
+        await self.client.aclose()
+
+
+# Global transport, bound to the event loop it was created on
+_transport: Optional[LLMTransport] = None
+_transport_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_llm_transport() -> LLMTransport:
+    """Get or create the process-wide LLM transport for the running event loop.
+
+    Clients and waiters belong to one loop, so a new loop gets a new
+    transport. Code that runs a loop per job (`asyncio.run` in Celery
+    tasks) should call `close_llm_transport` before the loop ends.
+    """
+    global _transport, _transport_loop
+    loop = asyncio.get_running_loop()
+    if _transport is None or _transport_loop is not loop:
+        if _transport is not None:
+            _close_abandoned(_transport, _transport_loop)
+        _transport = LLMTransport()
+        _transport_loop = loop
+    return _transport
+
+
+def _close_abandoned(transport: LLMTransport, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Close a transport replaced by one for another event loop, on its own loop."""
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(transport.close(), loop)
+    elif not transport.client.is_closed:
+        logger.warning(
+            "Replacing an LLM transport whose event loop has ended without closing it; "
+            "call close_llm_transport() before the loop ends"
+        )
+
+
+def llm_transport_stats() -> Optional[Dict[str, Any]]:
+    """Metrics of the LLM transport, or None before the first call."""
+    return _transport.stats() if _transport is not None else None
+
+
+async def close_llm_transport() -> None:
+    """Close the LLM transport of the running event loop (at shutdown or the end of a job)."""
+    global _transport, _transport_loop
+    if _transport is None or _transport_loop is not asyncio.get_running_loop():
+        return
+    transport, _transport, _transport_loop = _transport, None, None
+    await transport.close()
@@ -4,15 +4,18 @@ OpenRouter integration for LLM access.
 We always use the highest quality model (Claude Opus) for everything.
 This is a premium agency-level platform - quality is non-negotiable.
 
-IMPORTANT: This module implements rate limiting and sequential processing
-to prevent timeout issues when making multiple LLM calls.
+Requests go through the process-wide `LLMTransport` (see `llm_transport`):
+one pooled connection set shared by every service, with an adaptive
+concurrency limit that backs off on 429/5xx responses instead of spacing
+calls a fixed interval apart.
 """
 import json
 import asyncio
 from typing import Optional, Dict, Any, List
 import httpx
 import logging
-import time
+
+from .llm_transport import get_llm_transport
 
 logger = logging.getLogger(__name__)
 
@@ -22,44 +25,11 @@ API_URL = "https://openrouter.ai/api/v1/chat/completions"
 # Use claude-3.5-sonnet as it's widely available and high quality
 DEFAULT_MODEL = "anthropic/claude-3.5-sonnet"
 
-# Rate limiting configuration
-MIN_REQUEST_INTERVAL = 1.0  # Minimum seconds between requests
+# Retry configuration
 MAX_RETRIES = 3
 RETRY_DELAY_BASE = 2.0  # Base delay for exponential backoff
 
 
-class RateLimiter:
-    """Simple rate limiter for LLM API calls."""
-    
-    def __init__(self, min_interval: float = MIN_REQUEST_INTERVAL):
-        self.min_interval = min_interval
-        self._last_request_time = 0.0
-        self._lock = asyncio.Lock()
-    
-    async def acquire(self):
-        """Wait until we can make another request."""
-        async with self._lock:
-            now = time.time()
-            elapsed = now - self._last_request_time
-            if elapsed < self.min_interval:
-                wait_time = self.min_interval - elapsed
-                logger.debug(f"Rate limiter: waiting {wait_time:.2f}s before next request")
-                await asyncio.sleep(wait_time)
-            self._last_request_time = time.time()
-
-
-# Global rate limiter instance
-_rate_limiter: Optional[RateLimiter] = None
-
-
-def _get_rate_limiter() -> RateLimiter:
-    """Get or create the global rate limiter."""
-    global _rate_limiter
-    if _rate_limiter is None:
-        _rate_limiter = RateLimiter()
-    return _rate_limiter
-
-
 class OpenRouterService:
     """
     Service for interacting with Claude Opus via OpenRouter.
@@ -83,12 +53,18 @@ class OpenRouterService:
         )
     """
 
-    def __init__(self, api_key: str, model: str = DEFAULT_MODEL, timeout: float = 120.0):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = DEFAULT_MODEL,
+        timeout: float = 120.0,
+        tenant: Optional[str] = None
+    ):
         self.api_key = api_key
         self.model = model
         self.timeout = timeout
-        self.client = httpx.AsyncClient(timeout=timeout, proxy=None)  # Explicitly disable proxy
-        self.rate_limiter = _get_rate_limiter()
+        # Fair-queuing key; defaults to the `llm_tenant` context variable
+        self.tenant = tenant
 
     async def complete(
         self,
@@ -137,19 +113,18 @@ class OpenRouterService:
             "X-Title": "Marketing Agent",
         }
 
-        # Implement retry logic with rate limiting
+        # Retry overloads and timeouts; the transport's limiter also backs off
         last_error = None
         for attempt in range(MAX_RETRIES):
             try:
-                # Wait for rate limiter
-                await self.rate_limiter.acquire()
-                
                 logger.debug(f"LLM request attempt {attempt + 1}/{MAX_RETRIES}")
                 
-                response = await self.client.post(
+                response = await get_llm_transport().post(
                     API_URL,
+                    tenant=self.tenant,
                     headers=headers,
-                    json=body
+                    json=body,
+                    timeout=self.timeout
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -279,11 +254,13 @@ class OpenRouterService:
         }
 
         try:
-            async with self.client.stream(
+            async with get_llm_transport().stream(
                 "POST",
                 API_URL,
+                tenant=self.tenant,
                 headers=headers,
-                json=body
+                json=body,
+                timeout=self.timeout
             ) as response:
                 response.raise_for_status()
 
@@ -343,10 +320,12 @@ class OpenRouterService:
             "X-Title": "Marketing Agent",
         }
 
-        response = await self.client.post(
+        response = await get_llm_transport().post(
             API_URL,
+            tenant=self.tenant,
             headers=headers,
-            json=body
+            json=body,
+            timeout=self.timeout
         )
         response.raise_for_status()
         data = response.json()
@@ -365,8 +344,11 @@ class OpenRouterService:
             return {"status": "error", "error": str(e)}
 
     async def close(self):
-        """Close the HTTP client."""
-        await self.client.aclose()
+        """Release the service.
+
+        The HTTP client is shared by all services and stays open; it is
+        closed at application shutdown (`close_llm_transport`).
+        """
 
 
 # Convenience functions for simple usage
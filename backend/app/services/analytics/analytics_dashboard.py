@@ -8,10 +8,20 @@ Provides comprehensive analytics and reporting capabilities for:
 - Channel effectiveness
 - Conversion funnels
 - Time-series analytics
+
+Aggregate queries over conversions and attributions are routed through
+pre-aggregated rollups when `analytics_rollups_enabled` is set: whole
+hours and days are read from rollup buckets and only the sub-hour edges of
+a range touch raw rows.
+
+Independent queries behind one endpoint (overview metrics, the parts of a
+routed range, funnel stages) run concurrently through `QueryFanout`.
 """
 import logging
 from typing import List, Dict, Any, Optional, Tuple
+from collections import defaultdict
 from dataclasses import dataclass
+from functools import partial
 from datetime import datetime, timedelta, date
 from enum import Enum
 
@@ -26,6 +36,9 @@ from ...models.conversion_event import ConversionEvent, ConversionType, Conversi
 from ...models.marketing_mix_model import MarketingMixModel, MMMChannel
 from ...models.campaign import Campaign
 from ...models.customer_event import CustomerEvent, EventType
+from ...core.config import get_settings
+from .query_fanout import QueryFanout
+from .rollups import RangePlan, RollupStore, ceil_bucket, floor_bucket, plan_range
 
 logger = logging.getLogger(__name__)
 
@@ -56,14 +69,40 @@ class AnalyticsDashboardService:
     reporting, ROI analysis, and attribution insights.
     """
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        use_rollups: Optional[bool] = None,
+        fanout_width: Optional[int] = None
+    ):
         """
         Initialize the Analytics Dashboard Service.
 
         Args:
             db: SQLAlchemy async session for database operations.
+            use_rollups: Answer aggregates from rollups where possible
+                (defaults to the `analytics_rollups_enabled` setting).
+            fanout_width: Maximum concurrent queries per call (defaults to
+                the `analytics_query_fanout_width` setting; 1 runs them in
+                order on `db`).
         """
         self.db = db
+        self.use_rollups = get_settings().analytics_rollups_enabled if use_rollups is None else use_rollups
+        self.fanout_width = fanout_width
+        self._rollups: Optional[RollupStore] = None
+
+    def _on(self, db: AsyncSession) -> "AnalyticsDashboardService":
+        """This service bound to a fan-out session (which does not fan out further)."""
+        if db is self.db:
+            return self
+        return AnalyticsDashboardService(db, use_rollups=self.use_rollups, fanout_width=1)
+
+    async def _gather(self, *queries) -> List[Any]:
+        """Run independent queries, each given the service to use, concurrently."""
+        async with QueryFanout(self.db, width=self.fanout_width) as fanout:
+            return await fanout.gather(*(
+                lambda db, query=query: query(self._on(db)) for query in queries
+            ))
 
     # ============== Overview Metrics ==============
 
@@ -94,224 +133,303 @@ class AnalyticsDashboardService:
         prev_start = start_date - period_length
         prev_end = start_date
 
-        metrics = {}
-
-        # Revenue metrics
-        metrics["total_revenue"] = await self._get_total_revenue(
-            organization_id, start_date, end_date, prev_start, prev_end
+        (
+            (conversions, revenue),
+            (prev_conversions, prev_revenue),
+            attributed,
+            prev_attributed,
+            top_channels,
+            active_campaigns,
+        ) = await self._gather(
+            lambda service: service._conversion_totals(organization_id, start_date, end_date),
+            lambda service: service._conversion_totals(organization_id, prev_start, prev_end),
+            lambda service: service._attribution_totals(organization_id, start_date, end_date),
+            lambda service: service._attribution_totals(organization_id, prev_start, prev_end),
+            lambda service: service._get_top_channels(organization_id, start_date, end_date),
+            lambda service: service._get_active_campaigns_count(organization_id, start_date, end_date),
         )
 
-        # Conversion metrics
-        metrics["total_conversions"] = await self._get_total_conversions(
-            organization_id, start_date, end_date, prev_start, prev_end
-        )
+        return {
+            "total_revenue": self._comparison_metric("Total Revenue", revenue, prev_revenue, "USD"),
+            "total_conversions": self._comparison_metric(
+                "Total Conversions", conversions, prev_conversions, "count"
+            ),
+            "attributed_revenue": self._comparison_metric(
+                "Attributed Revenue",
+                attributed[()]["attributed_value"],
+                prev_attributed[()]["attributed_value"],
+                "USD"
+            ),
+            "top_channels": top_channels,
+            "active_campaigns": active_campaigns,
+        }
 
-        # Attribution metrics
-        metrics["attributed_revenue"] = await self._get_attributed_revenue(
-            organization_id, start_date, end_date, prev_start, prev_end
-        )
+    @staticmethod
+    def _comparison_metric(name: str, current: float, previous: float, unit: str) -> DashboardMetric:
+        """Metric with its change against the previous period."""
+        change_pct = ((current - previous) / previous * 100) if previous > 0 else 0
 
-        # Channel performance
-        metrics["top_channels"] = await self._get_top_channels(
-            organization_id, start_date, end_date
+        return DashboardMetric(
+            name=name,
+            value=float(current),
+            previous_value=float(previous),
+            change_pct=float(change_pct),
+            unit=unit
         )
 
-        # Campaign performance
-        metrics["active_campaigns"] = await self._get_active_campaigns_count(
-            organization_id, start_date, end_date
+    async def _get_top_channels(
+        self,
+        organization_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Get top performing channels."""
+        totals = await self._attribution_totals(
+            organization_id, start_date, end_date, group_by=("channel",)
         )
+        top = sorted(totals.items(), key=lambda item: item[1]["attributed_value"], reverse=True)[:limit]
 
-        return metrics
+        return [
+            {
+                "channel": channel,
+                "attributed_revenue": float(row["attributed_value"]),
+                "touchpoint_count": int(row["attribution_count"]),
+                "avg_weight": float(row["weight_sum"] / row["attribution_count"]) if row["attribution_count"] else 0.0
+            }
+            for (channel,), row in top
+        ]
 
-    async def _get_total_revenue(
+    async def _get_active_campaigns_count(
         self,
         organization_id: str,
         start_date: datetime,
-        end_date: datetime,
-        prev_start: datetime,
-        prev_end: datetime
+        end_date: datetime
     ) -> DashboardMetric:
-        """Get total revenue with comparison."""
-        # Current period
-        query = select(func.sum(ConversionEvent.conversion_value)).where(
+        """Get count of active campaigns."""
+        query = select(func.count(Campaign.id)).where(
             and_(
-                ConversionEvent.organization_id == organization_id,
-                ConversionEvent.conversion_timestamp >= start_date,
-                ConversionEvent.conversion_timestamp <= end_date,
-                ConversionEvent.status == ConversionStatus.ATTRIBUTED
+                Campaign.organization_id == organization_id,
+                Campaign.status == "active"
             )
         )
         result = await self.db.execute(query)
-        current = result.scalar() or 0
+        count = result.scalar() or 0
 
-        # Previous period
-        query = select(func.sum(ConversionEvent.conversion_value)).where(
-            and_(
-                ConversionEvent.organization_id == organization_id,
-                ConversionEvent.conversion_timestamp >= prev_start,
-                ConversionEvent.conversion_timestamp <= prev_end,
-                ConversionEvent.status == ConversionStatus.ATTRIBUTED
-            )
+        return DashboardMetric(
+            name="Active Campaigns",
+            value=float(count),
+            unit="count"
         )
-        result = await self.db.execute(query)
-        previous = result.scalar() or 0
 
-        change_pct = ((current - previous) / previous * 100) if previous > 0 else 0
+    # ============== Rollup Routing ==============
 
-        return DashboardMetric(
-            name="Total Revenue",
-            value=float(current),
-            previous_value=float(previous),
-            change_pct=float(change_pct),
-            unit="USD"
-        )
+    def _plan(self, start: datetime, end: datetime, inclusive: bool = True) -> RangePlan:
+        """Route a range: whole buckets to rollups (when enabled), everything else to raw rows."""
+        if not self.use_rollups:
+            return RangePlan(raw=[(start, end, inclusive)])
+        return plan_range(start, end, inclusive)
 
-    async def _get_total_conversions(
+    def _rollup_store(self) -> RollupStore:
+        if self._rollups is None:
+            self._rollups = RollupStore(self.db)
+        return self._rollups
+
+    @staticmethod
+    def _within(column, start: datetime, end: datetime, inclusive: bool):
+        return and_(column >= start, column <= end if inclusive else column < end)
+
+    async def _conversion_totals(
         self,
         organization_id: str,
         start_date: datetime,
         end_date: datetime,
-        prev_start: datetime,
-        prev_end: datetime
-    ) -> DashboardMetric:
-        """Get total conversions with comparison."""
-        # Current period
-        query = select(func.count(ConversionEvent.id)).where(
+        inclusive: bool = True
+    ) -> Tuple[int, float]:
+        """Count and value of attributed conversions in [start_date, end_date]."""
+        plan = self._plan(start_date, end_date, inclusive)
+        parts = [
+            partial(AnalyticsDashboardService._raw_conversion_totals, organization_id=organization_id,
+                    start=start, end=end, inclusive=end_inclusive)
+            for start, end, end_inclusive in plan.raw
+        ]
+        if plan.buckets:
+            parts.append(lambda service: service._rollup_store().totals(organization_id, plan.buckets))
+        results = await self._gather(*parts)
+
+        count, value = 0, 0.0
+        for raw_count, raw_value in results[:len(plan.raw)]:
+            count += raw_count
+            value += raw_value
+        if plan.buckets:
+            totals = results[-1].get((), {})
+            count += int(totals.get("conversion_count", 0))
+            value += totals.get("conversion_value", 0.0)
+
+        return count, value
+
+    async def _raw_conversion_totals(
+        self,
+        organization_id: str,
+        start: datetime,
+        end: datetime,
+        inclusive: bool
+    ) -> Tuple[int, float]:
+        query = select(
+            func.count(ConversionEvent.id).label("count"),
+            func.sum(ConversionEvent.conversion_value).label("value")
+        ).where(
             and_(
                 ConversionEvent.organization_id == organization_id,
-                ConversionEvent.conversion_timestamp >= start_date,
-                ConversionEvent.conversion_timestamp <= end_date,
+                self._within(ConversionEvent.conversion_timestamp, start, end, inclusive),
                 ConversionEvent.status == ConversionStatus.ATTRIBUTED
             )
         )
-        result = await self.db.execute(query)
-        current = result.scalar() or 0
+        row = (await self.db.execute(query)).one()
+        return row.count or 0, row.value or 0
 
-        # Previous period
-        query = select(func.count(ConversionEvent.id)).where(
-            and_(
-                ConversionEvent.organization_id == organization_id,
-                ConversionEvent.conversion_timestamp >= prev_start,
-                ConversionEvent.conversion_timestamp <= prev_end,
-                ConversionEvent.status == ConversionStatus.ATTRIBUTED
-            )
-        )
-        result = await self.db.execute(query)
-        previous = result.scalar() or 0
-
-        change_pct = ((current - previous) / previous * 100) if previous > 0 else 0
-
-        return DashboardMetric(
-            name="Total Conversions",
-            value=float(current),
-            previous_value=float(previous),
-            change_pct=float(change_pct),
-            unit="count"
-        )
-
-    async def _get_attributed_revenue(
+    async def _attribution_totals(
         self,
         organization_id: str,
         start_date: datetime,
         end_date: datetime,
-        prev_start: datetime,
-        prev_end: datetime
-    ) -> DashboardMetric:
-        """Get attributed revenue with comparison."""
-        # Current period
-        query = select(func.sum(Attribution.attributed_value)).where(
-            and_(
-                Attribution.organization_id == organization_id,
-                Attribution.calculated_at >= start_date,
-                Attribution.calculated_at <= end_date
-            )
-        )
-        result = await self.db.execute(query)
-        current = result.scalar() or 0
-
-        # Previous period
-        query = select(func.sum(Attribution.attributed_value)).where(
-            and_(
-                Attribution.organization_id == organization_id,
-                Attribution.calculated_at >= prev_start,
-                Attribution.calculated_at <= prev_end
-            )
-        )
-        result = await self.db.execute(query)
-        previous = result.scalar() or 0
+        group_by: Tuple[str, ...] = (),
+        model_types: Optional[List[AttributionModelType]] = None,
+        inclusive: bool = True
+    ) -> Dict[Tuple, Dict[str, float]]:
+        """
+        Attribution count, value and weight sum by calculation time.
 
-        change_pct = ((current - previous) / previous * 100) if previous > 0 else 0
+        Args:
+            organization_id: Organization ID.
+            start_date: Start of the range.
+            end_date: End of the range.
+            group_by: Any of "channel" and "model_type" (as its value).
+            model_types: Restrict to these models.
+            inclusive: Whether the range includes `end_date`.
 
-        return DashboardMetric(
-            name="Attributed Revenue",
-            value=float(current),
-            previous_value=float(previous),
-            change_pct=float(change_pct),
-            unit="USD"
+        Returns:
+            attribution_count, attributed_value and weight_sum keyed by the
+            tuple of group-by values.
+        """
+        plan = self._plan(start_date, end_date, inclusive)
+        parts = [
+            partial(AnalyticsDashboardService._raw_attribution_totals, organization_id=organization_id,
+                    start=start, end=end, inclusive=end_inclusive, group_by=group_by, model_types=model_types)
+            for start, end, end_inclusive in plan.raw
+        ]
+        if plan.buckets:
+            parts.append(lambda service: service._rollup_store().totals(
+                organization_id, plan.buckets, group_by=group_by,
+                attributions=True, model_types=model_types
+            ))
+
+        merged: Dict[Tuple, Dict[str, float]] = defaultdict(
+            lambda: {"attribution_count": 0, "attributed_value": 0.0, "weight_sum": 0.0}
         )
-
-    async def _get_top_channels(
+        for part in await self._gather(*parts):
+            for key, row in part.items():
+                totals = merged[key]
+                totals["attribution_count"] += int(row["attribution_count"] or 0)
+                totals["attributed_value"] += row["attributed_value"] or 0.0
+                totals["weight_sum"] += row["weight_sum"] or 0.0
+
+        if not group_by:
+            return {(): merged[()]}
+        return {key: totals for key, totals in merged.items() if totals["attribution_count"]}
+
+    async def _raw_attribution_totals(
         self,
         organization_id: str,
-        start_date: datetime,
-        end_date: datetime,
-        limit: int = 5
-    ) -> List[Dict[str, Any]]:
-        """Get top performing channels."""
+        start: datetime,
+        end: datetime,
+        inclusive: bool,
+        group_by: Tuple[str, ...],
+        model_types: Optional[List[AttributionModelType]]
+    ) -> Dict[Tuple, Dict[str, float]]:
+        columns = {"channel": AttributionTouchpoint.channel, "model_type": Attribution.model_type}
+        group_columns = [columns[name].label(name) for name in group_by]
+        conditions = [
+            Attribution.organization_id == organization_id,
+            self._within(Attribution.calculated_at, start, end, inclusive)
+        ]
+        if model_types:
+            conditions.append(Attribution.model_type.in_(model_types))
+
         query = select(
-            AttributionTouchpoint.channel,
-            func.sum(Attribution.attributed_value).label("total_attributed"),
-            func.count(Attribution.id).label("touchpoint_count"),
-            func.avg(Attribution.weight).label("avg_weight")
-        ).join(
-            AttributionTouchpoint,
-            Attribution.touchpoint_id == AttributionTouchpoint.id
-        ).where(
-            and_(
-                Attribution.organization_id == organization_id,
-                Attribution.calculated_at >= start_date,
-                Attribution.calculated_at <= end_date
+            *group_columns,
+            func.count(Attribution.id).label("attribution_count"),
+            func.sum(Attribution.attributed_value).label("attributed_value"),
+            func.sum(Attribution.weight).label("weight_sum")
+        ).where(and_(*conditions)).group_by(*group_columns)
+        if "channel" in group_by:
+            query = query.join(
+                AttributionTouchpoint,
+                Attribution.touchpoint_id == AttributionTouchpoint.id
             )
-        ).group_by(
-            AttributionTouchpoint.channel
-        ).order_by(
-            desc("total_attributed")
-        ).limit(limit)
 
-        result = await self.db.execute(query)
-        rows = result.all()
-
-        return [
-            {
-                "channel": row.channel,
-                "attributed_revenue": float(row.total_attributed or 0),
-                "touchpoint_count": row.touchpoint_count,
-                "avg_weight": float(row.avg_weight or 0)
+        totals = {}
+        for row in (await self.db.execute(query)).all():
+            key = tuple(
+                value.value if isinstance(value, AttributionModelType) else value
+                for value in (getattr(row, name) for name in group_by)
+            )
+            totals[key] = {
+                "attribution_count": row.attribution_count,
+                "attributed_value": row.attributed_value,
+                "weight_sum": row.weight_sum,
             }
-            for row in rows
-        ]
+        return totals
 
-    async def _get_active_campaigns_count(
+    async def _rollup_time_series(
         self,
         organization_id: str,
+        metric: str,
+        granularity: str,
         start_date: datetime,
         end_date: datetime
-    ) -> DashboardMetric:
-        """Get count of active campaigns."""
-        query = select(func.count(Campaign.id)).where(
-            and_(
-                Campaign.organization_id == organization_id,
-                Campaign.status == "active"
+    ) -> List[TimeSeriesPoint]:
+        """Time series from rollup buckets, with partial edge buckets routed like any range."""
+        attributions = metric == "attributed_revenue"
+        measure = {
+            "revenue": "conversion_value",
+            "conversions": "conversion_count",
+            "attributed_revenue": "attributed_value",
+        }[metric]
+        count_measure = "attribution_count" if attributions else "conversion_count"
+
+        first, last = ceil_bucket(start_date, granularity), floor_bucket(end_date, granularity)
+        points: Dict[datetime, float] = {}
+
+        if first < last:
+            totals = await self._rollup_store().totals(
+                organization_id, [(granularity, first, last)], group_by=("bucket",), attributions=attributions
             )
-        )
-        result = await self.db.execute(query)
-        count = result.scalar() or 0
+            for (bucket,), row in totals.items():
+                if row[count_measure]:
+                    points[bucket] = float(row[measure])
 
-        return DashboardMetric(
-            name="Active Campaigns",
-            value=float(count),
-            unit="count"
-        )
+        if first > last:
+            edges = [(floor_bucket(start_date, granularity), start_date, end_date, True)]
+        else:
+            edges = [(last, last, end_date, True)]
+            if start_date < first:
+                edges.append((floor_bucket(start_date, granularity), start_date, first, False))
+
+        for bucket, start, end, inclusive in edges:
+            if attributions:
+                row = (await self._attribution_totals(
+                    organization_id, start, end, inclusive=inclusive
+                ))[()]
+                count, value = row["attribution_count"], row["attributed_value"]
+            else:
+                count, value = await self._conversion_totals(organization_id, start, end, inclusive)
+                if metric == "conversions":
+                    value = count
+            if count:
+                points[bucket] = float(value)
+
+        return [TimeSeriesPoint(timestamp=bucket, value=points[bucket]) for bucket in sorted(points)]
 
     # ============== Attribution Reports ==============
 
@@ -441,31 +559,14 @@ class AnalyticsDashboardService:
             AttributionModelType.POSITION_BASED
         ]
 
-        comparison = {}
+        comparison = {model_type.value: {} for model_type in models}
 
-        for model_type in models:
-            query = select(
-                AttributionTouchpoint.channel,
-                func.sum(Attribution.attributed_value).label("total_attributed")
-            ).join(
-                AttributionTouchpoint,
-                Attribution.touchpoint_id == AttributionTouchpoint.id
-            ).where(
-                and_(
-                    Attribution.organization_id == organization_id,
-                    Attribution.model_type == model_type,
-                    Attribution.calculated_at >= start_date,
-                    Attribution.calculated_at <= end_date
-                )
-            ).group_by(AttributionTouchpoint.channel)
-
-            result = await self.db.execute(query)
-            rows = result.all()
-
-            comparison[model_type.value] = {
-                row.channel: float(row.total_attributed or 0)
-                for row in rows
-            }
+        totals = await self._attribution_totals(
+            organization_id, start_date, end_date,
+            group_by=("model_type", "channel"), model_types=models
+        )
+        for (model_type, channel), row in totals.items():
+            comparison[model_type][channel] = float(row["attributed_value"])
 
         return {
             "period": {
@@ -607,6 +708,13 @@ class AnalyticsDashboardService:
         if not start_date:
             start_date = end_date - timedelta(days=30)
 
+        if self.use_rollups and granularity in ("hour", "day") and metric in (
+            "revenue", "conversions", "attributed_revenue"
+        ):
+            return await self._rollup_time_series(
+                organization_id, metric, granularity, start_date, end_date
+            )
+
         # Determine time truncation
         if granularity == "hour":
             trunc_func = func.date_trunc("hour", ConversionEvent.conversion_timestamp)
@@ -704,21 +812,16 @@ class AnalyticsDashboardService:
             ("purchases", EventType.PURCHASE)
         ]
 
+        counts = await self._gather(*(
+            partial(AnalyticsDashboardService._count_events, organization_id=organization_id,
+                    event_type=event_type, start_date=start_date, end_date=end_date)
+            for _, event_type in stages
+        ))
+
         funnel_data = []
         previous_count = None
 
-        for stage_name, event_type in stages:
-            query = select(func.count(CustomerEvent.id)).where(
-                and_(
-                    CustomerEvent.organization_id == organization_id,
-                    CustomerEvent.event_type == event_type,
-                    CustomerEvent.timestamp >= start_date,
-                    CustomerEvent.timestamp <= end_date
-                )
-            )
-            result = await self.db.execute(query)
-            count = result.scalar() or 0
-
+        for (stage_name, _), count in zip(stages, counts):
             conversion_rate = None
             if previous_count and previous_count > 0:
                 conversion_rate = (count / previous_count) * 100
@@ -746,6 +849,24 @@ class AnalyticsDashboardService:
             "overall_conversion_rate": float(overall_rate)
         }
 
+    async def _count_events(
+        self,
+        organization_id: str,
+        event_type: EventType,
+        start_date: datetime,
+        end_date: datetime
+    ) -> int:
+        query = select(func.count(CustomerEvent.id)).where(
+            and_(
+                CustomerEvent.organization_id == organization_id,
+                CustomerEvent.event_type == event_type,
+                CustomerEvent.timestamp >= start_date,
+                CustomerEvent.timestamp <= end_date
+            )
+        )
+        result = await self.db.execute(query)
+        return result.scalar() or 0
+
     # ============== Customer Journey Analytics ==============
 
     async def get_customer_journey_metrics(
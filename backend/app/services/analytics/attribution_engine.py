@@ -7,7 +7,9 @@ Implements various attribution models including:
 - Linear attribution
 - Time-decay attribution
 - Position-based (U-shaped) attribution
-- Data-driven attribution
+- W-shaped attribution
+- Data-driven attribution (Markov chain, Shapley value) from trained
+  channel weights
 """
 import logging
 from typing import List, Dict, Any, Optional, Tuple
@@ -17,16 +19,29 @@ from enum import Enum
 
 import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, and_, func, desc, update
 
 from ...models.attribution import (
-    Attribution, AttributionModelType, AttributionStatus, AttributionModelConfig
+    Attribution, AttributionModelType, AttributionModelConfig
 )
 from ...models.attribution_touchpoint import AttributionTouchpoint, TouchpointType
 from ...models.conversion_event import ConversionEvent, ConversionStatus
+from .attribution_writer import AttributionWriter
+from .batch_attribution import TouchpointLayout, attribution_weights, load_touchpoint_layout
+from .data_driven_attribution import DATA_DRIVEN_MODEL_TYPES, load_trained_channel_weights
+from .rollups import RollupStore
 
 logger = logging.getLogger(__name__)
 
+# Models applied when a caller does not choose any
+DEFAULT_MODEL_TYPES = (
+    AttributionModelType.FIRST_TOUCH,
+    AttributionModelType.LAST_TOUCH,
+    AttributionModelType.LINEAR,
+    AttributionModelType.TIME_DECAY,
+    AttributionModelType.POSITION_BASED,
+)
+
 
 @dataclass
 class AttributionResult:
@@ -58,6 +73,7 @@ class AttributionEngine:
             db: SQLAlchemy async session for database operations.
         """
         self.db = db
+        self._trained_weights: Dict[str, Dict[AttributionModelType, Dict[str, float]]] = {}
 
     # ============== Attribution Model Calculations ==============
 
@@ -387,6 +403,62 @@ class AttributionEngine:
 
         return results
 
+    async def calculate_channel_weight_attribution(
+        self,
+        touchpoints: List[AttributionTouchpoint],
+        conversion_value: float,
+        channel_weights: Dict[str, float],
+        model_type: AttributionModelType = AttributionModelType.MARKOV_CHAIN
+    ) -> List[AttributionResult]:
+        """
+        Calculate attribution from trained data-driven channel weights.
+
+        Each channel in the journey gets credit in proportion to its trained
+        weight, shared equally by its touchpoints. Falls back to linear when
+        no channel in the journey has a weight.
+
+        Args:
+            touchpoints: List of touchpoints in chronological order.
+            conversion_value: Total conversion value.
+            channel_weights: Trained weight per channel.
+            model_type: Data-driven model the weights come from.
+
+        Returns:
+            List of attribution results.
+        """
+        if not touchpoints:
+            return []
+
+        total = len(touchpoints)
+        conversion_time = touchpoints[-1].touchpoint_timestamp
+        touches = {}
+        for tp in touchpoints:
+            touches[tp.channel] = touches.get(tp.channel, 0) + 1
+
+        raw = [channel_weights.get(tp.channel, 0.0) / touches[tp.channel] for tp in touchpoints]
+        total_weight = sum(raw)
+        weights = [w / total_weight for w in raw] if total_weight > 0 else [1.0 / total] * total
+
+        results = []
+        for i, (tp, weight) in enumerate(zip(touchpoints, weights)):
+            hours_to_conv = self._calculate_hours_to_conversion(
+                tp.touchpoint_timestamp, conversion_time
+            )
+
+            results.append(AttributionResult(
+                touchpoint_id=tp.id,
+                conversion_event_id=tp.conversion_event_id,
+                model_type=model_type,
+                weight=weight,
+                attributed_value=conversion_value * weight,
+                position=i + 1,
+                total_touchpoints=total,
+                hours_to_conversion=hours_to_conv,
+                confidence_score=1.0
+            ))
+
+        return results
+
     # ============== Main Attribution Processing ==============
 
     async def process_conversion(
@@ -400,20 +472,15 @@ class AttributionEngine:
 
         Args:
             conversion_event: The conversion event to attribute.
-            model_types: List of attribution models to apply.
+            model_types: List of attribution models to apply. Defaults to the
+                rule-based models plus any data-driven models the organization
+                has trained.
             config: Optional model configuration.
 
         Returns:
             Dictionary mapping model types to attribution results.
         """
-        if model_types is None:
-            model_types = [
-                AttributionModelType.FIRST_TOUCH,
-                AttributionModelType.LAST_TOUCH,
-                AttributionModelType.LINEAR,
-                AttributionModelType.TIME_DECAY,
-                AttributionModelType.POSITION_BASED,
-            ]
+        previous_status = {conversion_event.id: conversion_event.status}
 
         # Get touchpoints for this conversion
         touchpoints = await self._get_touchpoints_for_conversion(conversion_event)
@@ -421,9 +488,14 @@ class AttributionEngine:
         if not touchpoints:
             logger.warning(f"No touchpoints found for conversion {conversion_event.id}")
             conversion_event.status = ConversionStatus.EXCLUDED
+            await self._record_conversion_rollups([conversion_event], previous_status)
             await self.db.commit()
             return {}
 
+        trained = await self._trained_channel_weights(conversion_event.organization_id)
+        if model_types is None:
+            model_types = list(DEFAULT_MODEL_TYPES) + list(trained)
+
         # Update conversion event
         conversion_event.attributed_touchpoint_count = len(touchpoints)
         conversion_event.status = ConversionStatus.PROCESSING
@@ -438,7 +510,10 @@ class AttributionEngine:
                 results[model_type] = model_results
 
                 # Store attributions in database
-                await self._store_attributions(model_results, model_type, config)
+                await self._store_attributions(
+                    model_results, model_type, config,
+                    {conversion_event.id: conversion_event.organization_id}
+                )
 
             except Exception as e:
                 logger.error(f"Error calculating {model_type} attribution: {e}")
@@ -447,6 +522,7 @@ class AttributionEngine:
         # Update conversion status
         conversion_event.status = ConversionStatus.ATTRIBUTED
         conversion_event.processed_at = datetime.utcnow()
+        await self._record_conversion_rollups([conversion_event], previous_status)
         await self.db.commit()
 
         return results
@@ -460,6 +536,9 @@ class AttributionEngine:
     ) -> List[AttributionResult]:
         """Calculate attribution for a specific model type."""
         conversion_value = conversion_event.conversion_value
+        params = self._model_parameters(
+            model_type, config, await self._trained_channel_weights(conversion_event.organization_id)
+        )
 
         if model_type == AttributionModelType.FIRST_TOUCH:
             return await self.calculate_first_touch_attribution(touchpoints, conversion_value)
@@ -471,32 +550,67 @@ class AttributionEngine:
             return await self.calculate_linear_attribution(touchpoints, conversion_value)
 
         elif model_type == AttributionModelType.TIME_DECAY:
-            half_life = 7.0
-            if config and config.parameters:
-                half_life = config.parameters.get("time_decay_half_life_days", 7.0)
             return await self.calculate_time_decay_attribution(
-                touchpoints, conversion_value, half_life
+                touchpoints, conversion_value, params["half_life_days"]
             )
 
         elif model_type == AttributionModelType.POSITION_BASED:
-            first_weight = 0.4
-            last_weight = 0.4
-            if config and config.parameters:
-                weights = config.parameters.get("position_weights", {})
-                first_weight = weights.get("first", 0.4)
-                last_weight = weights.get("last", 0.4)
             return await self.calculate_position_based_attribution(
-                touchpoints, conversion_value, first_weight, last_weight
+                touchpoints, conversion_value, params["first_touch_weight"], params["last_touch_weight"]
             )
 
         elif model_type == AttributionModelType.W_SHAPED:
             return await self.calculate_w_shaped_attribution(touchpoints, conversion_value)
 
+        elif "channel_weights" in params:
+            return await self.calculate_channel_weight_attribution(
+                touchpoints, conversion_value, params["channel_weights"], model_type
+            )
+
         else:
             # Default to linear for unsupported models
             logger.warning(f"Model type {model_type} not fully implemented, using linear")
             return await self.calculate_linear_attribution(touchpoints, conversion_value)
 
+    def _model_parameters(
+        self,
+        model_type: AttributionModelType,
+        config: AttributionModelConfig = None,
+        trained: Dict[AttributionModelType, Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """Resolve model parameters from an optional model configuration.
+
+        Data-driven models get `channel_weights` from the configuration, or
+        else from the organization's trained weights, when either has them.
+        """
+        params: Dict[str, Any] = {"half_life_days": 7.0, "first_touch_weight": 0.4, "last_touch_weight": 0.4}
+        if model_type in DATA_DRIVEN_MODEL_TYPES:
+            channel_weights = (config.parameters or {}).get("channel_weights") if config else None
+            channel_weights = channel_weights or (trained or {}).get(model_type)
+            if channel_weights:
+                params["channel_weights"] = channel_weights
+        if not (config and config.parameters):
+            return params
+
+        if model_type == AttributionModelType.TIME_DECAY:
+            params["half_life_days"] = config.parameters.get("time_decay_half_life_days", 7.0)
+        elif model_type == AttributionModelType.POSITION_BASED:
+            weights = config.parameters.get("position_weights", {})
+            params["first_touch_weight"] = weights.get("first", 0.4)
+            params["last_touch_weight"] = weights.get("last", 0.4)
+        return params
+
+    async def _trained_channel_weights(
+        self,
+        organization_id: str
+    ) -> Dict[AttributionModelType, Dict[str, float]]:
+        """Trained data-driven channel weights, loaded once per engine."""
+        if organization_id not in self._trained_weights:
+            self._trained_weights[organization_id] = await load_trained_channel_weights(
+                self.db, organization_id
+            )
+        return self._trained_weights[organization_id]
+
     async def _get_touchpoints_for_conversion(
         self,
         conversion_event: ConversionEvent
@@ -535,52 +649,40 @@ class AttributionEngine:
         self,
         results: List[AttributionResult],
         model_type: AttributionModelType,
-        config: AttributionModelConfig = None
+        config: AttributionModelConfig = None,
+        organization_ids: Dict[str, str] = None
     ) -> None:
-        """Store attribution results in the database."""
-        for result in results:
-            # Check if attribution already exists
-            query = select(Attribution).where(
-                and_(
-                    Attribution.conversion_event_id == result.conversion_event_id,
-                    Attribution.touchpoint_id == result.touchpoint_id,
-                    Attribution.model_type == model_type
-                )
-            )
-            existing = await self.db.execute(query)
-            existing_attribution = existing.scalar_one_or_none()
-
-            if existing_attribution:
-                # Update existing
-                existing_attribution.weight = result.weight
-                existing_attribution.attributed_value = result.attributed_value
-                existing_attribution.touchpoint_position = result.position
-                existing_attribution.total_touchpoints = result.total_touchpoints
-                existing_attribution.hours_to_conversion = result.hours_to_conversion
-                existing_attribution.confidence_score = result.confidence_score
-                existing_attribution.status = AttributionStatus.RECALCULATED
-                existing_attribution.calculated_at = datetime.utcnow()
-            else:
-                # Create new
-                attribution = Attribution(
-                    organization_id=result.conversion_event_id,  # Will be set properly below
-                    conversion_event_id=result.conversion_event_id,
-                    touchpoint_id=result.touchpoint_id,
-                    model_type=model_type,
-                    weight=result.weight,
-                    attributed_value=result.attributed_value,
-                    model_parameters=config.parameters if config else {},
-                    touchpoint_position=result.position,
-                    total_touchpoints=result.total_touchpoints,
-                    hours_to_conversion=result.hours_to_conversion,
-                    confidence_score=result.confidence_score,
-                    status=AttributionStatus.CALCULATED,
-                    calculated_at=datetime.utcnow()
-                )
-                self.db.add(attribution)
-
+        """Upsert attribution results in the database."""
+        await AttributionWriter(self.db).write(
+            results,
+            organization_ids or {},
+            model_parameters=config.parameters if config else {}
+        )
         await self.db.flush()
 
+    async def _record_conversion_rollups(
+        self,
+        conversions: List[ConversionEvent],
+        previous_status: Dict[str, ConversionStatus]
+    ) -> None:
+        """Add conversions that became attributed to the rollups and remove ones that no longer are."""
+        changed = [
+            conversion for conversion in conversions
+            if (previous_status.get(conversion.id) == ConversionStatus.ATTRIBUTED)
+            != (conversion.status == ConversionStatus.ATTRIBUTED)
+        ]
+        if not changed:
+            return
+
+        rollups = RollupStore(self.db)
+        deltas = rollups.deltas()
+        for conversion in changed:
+            deltas.add_conversion(
+                conversion.organization_id, conversion.conversion_timestamp, conversion.conversion_value,
+                1 if conversion.status == ConversionStatus.ATTRIBUTED else -1
+            )
+        await rollups.apply(deltas)
+
     def _calculate_hours_to_conversion(
         self,
         touchpoint_time: datetime,
@@ -619,6 +721,15 @@ class AttributionEngine:
         result = await self.db.execute(query)
         conversions = result.scalars().all()
 
+        try:
+            await self.process_conversions_batch(conversions)
+            return len(conversions)
+        except Exception as e:
+            logger.error(f"Batch attribution failed, retrying conversions one at a time: {e}")
+            await self.db.rollback()
+            result = await self.db.execute(query)
+            conversions = result.scalars().all()
+
         processed = 0
         for conversion in conversions:
             try:
@@ -632,6 +743,188 @@ class AttributionEngine:
 
         return processed
 
+    async def process_conversions_batch(
+        self,
+        conversions: List[ConversionEvent],
+        model_types: List[AttributionModelType] = None,
+        config: AttributionModelConfig = None
+    ) -> int:
+        """
+        Attribute a block of conversions at once.
+
+        Loads every touchpoint for the block with one query and computes each
+        model's weights for all conversions with array operations. Results
+        match `process_conversion` run on each conversion.
+
+        Args:
+            conversions: Conversion events to attribute.
+            model_types: List of attribution models to apply. Defaults to the
+                rule-based models plus any data-driven models the organization
+                has trained.
+            config: Optional model configuration.
+
+        Returns:
+            Number of conversions attributed (conversions without touchpoints
+            are marked excluded and not counted).
+        """
+        if not conversions:
+            return 0
+
+        organization_ids = {conversion.organization_id for conversion in conversions}
+        if len(organization_ids) > 1:
+            processed = 0
+            for organization_id in sorted(organization_ids):
+                processed += await self.process_conversions_batch(
+                    [c for c in conversions if c.organization_id == organization_id], model_types, config
+                )
+            return processed
+
+        trained = await self._trained_channel_weights(conversions[0].organization_id)
+        if model_types is None:
+            model_types = list(DEFAULT_MODEL_TYPES) + list(trained)
+
+        layout, empty = (await load_touchpoint_layout(self.db, conversions)).without_empty()
+        by_id = {conversion.id: conversion for conversion in conversions}
+        previous_status = {conversion.id: conversion.status for conversion in conversions}
+
+        for conversion_id in empty:
+            logger.warning(f"No touchpoints found for conversion {conversion_id}")
+            by_id[conversion_id].status = ConversionStatus.EXCLUDED
+
+        if layout.conversion_ids:
+            await self._update_touchpoint_journeys(layout)
+
+            results = []
+            for model_type in model_types:
+                results.extend(self._layout_results(
+                    layout, model_type, self._model_parameters(model_type, config, trained)
+                ))
+            await AttributionWriter(self.db).write(
+                results,
+                {conversion.id: conversion.organization_id for conversion in conversions},
+                model_parameters=config.parameters if config else {}
+            )
+
+            processed_at = datetime.utcnow()
+            for conversion_id, count in zip(layout.conversion_ids, layout.lengths.tolist()):
+                conversion = by_id[conversion_id]
+                conversion.attributed_touchpoint_count = count
+                conversion.status = ConversionStatus.ATTRIBUTED
+                conversion.processed_at = processed_at
+
+        await self._record_conversion_rollups(conversions, previous_status)
+        await self.db.commit()
+        return len(layout.conversion_ids)
+
+    async def reattribute_conversions(
+        self,
+        organization_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        model_types: List[AttributionModelType] = None,
+        config: AttributionModelConfig = None,
+        chunk_size: int = 2000
+    ) -> int:
+        """
+        Re-run attribution for every conversion in a time range.
+
+        Conversions are processed in blocks of `chunk_size`, each committed
+        separately.
+
+        Args:
+            organization_id: Organization ID.
+            start_date: Start of the conversion time range (inclusive).
+            end_date: End of the conversion time range (exclusive).
+            model_types: List of attribution models to apply. Defaults to the
+                rule-based models plus any data-driven models the organization
+                has trained.
+            config: Optional model configuration.
+            chunk_size: Conversions per block.
+
+        Returns:
+            Number of conversions attributed.
+        """
+        in_range = and_(
+            ConversionEvent.organization_id == organization_id,
+            ConversionEvent.conversion_timestamp >= start_date,
+            ConversionEvent.conversion_timestamp < end_date,
+            ConversionEvent.status.in_([
+                ConversionStatus.PENDING,
+                ConversionStatus.ATTRIBUTED,
+                ConversionStatus.EXCLUDED,
+            ])
+        )
+
+        processed = 0
+        last_id = ""
+        while True:
+            result = await self.db.execute(
+                select(ConversionEvent).where(and_(in_range, ConversionEvent.id > last_id))
+                .order_by(ConversionEvent.id).limit(chunk_size)
+            )
+            conversions = list(result.scalars().all())
+            if not conversions:
+                break
+
+            processed += await self.process_conversions_batch(conversions, model_types, config)
+            last_id = conversions[-1].id
+
+        return processed
+
+    def _layout_results(
+        self,
+        layout: TouchpointLayout,
+        model_type: AttributionModelType,
+        params: Dict[str, Any]
+    ) -> List[AttributionResult]:
+        """Compute one model's results for every conversion in a layout."""
+        weights = attribution_weights(layout, model_type, **params)
+        values = np.repeat(layout.conversion_values, layout.lengths) * weights
+        conversion_ids = np.repeat(np.array(layout.conversion_ids, dtype=object), layout.lengths)
+        totals = np.repeat(layout.lengths, layout.lengths)
+
+        return [
+            AttributionResult(
+                touchpoint_id=touchpoint_id,
+                conversion_event_id=conversion_id,
+                model_type=model_type,
+                weight=weight,
+                attributed_value=value,
+                position=position + 1,
+                total_touchpoints=total,
+                hours_to_conversion=hours,
+                confidence_score=1.0
+            )
+            for touchpoint_id, conversion_id, weight, value, position, total, hours in zip(
+                layout.touchpoint_ids,
+                conversion_ids.tolist(),
+                weights.tolist(),
+                values.tolist(),
+                layout.positions.tolist(),
+                totals.tolist(),
+                layout.hours_to_last_touch.tolist(),
+            )
+        ]
+
+    async def _update_touchpoint_journeys(self, layout: TouchpointLayout) -> None:
+        """Bulk UPDATE journey position and conversion link of laid-out touchpoints."""
+        conversion_ids = np.repeat(np.array(layout.conversion_ids, dtype=object), layout.lengths)
+        rows = {
+            touchpoint_id: {
+                "id": touchpoint_id,
+                "position_in_journey": position + 1,
+                "time_to_conversion_hours": hours,
+                "conversion_event_id": conversion_id,
+            }
+            for touchpoint_id, conversion_id, position, hours in zip(
+                layout.touchpoint_ids,
+                conversion_ids.tolist(),
+                layout.positions.tolist(),
+                layout.hours_to_conversion.tolist(),
+            )
+        }
+        await self.db.execute(update(AttributionTouchpoint), list(rows.values()))
+
     # ============== Reporting ==============
 
     async def get_attribution_summary(
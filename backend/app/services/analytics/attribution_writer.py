@@ -0,0 +1,159 @@
+"""
+Bulk persistence for attribution results.
+
+Writes every result of a batch with one upsert keyed on
+(conversion_event_id, touchpoint_id, model_type): new rows are inserted as
+CALCULATED, existing rows are overwritten and marked RECALCULATED.
+PostgreSQL and SQLite use `INSERT ... ON CONFLICT DO UPDATE`; other
+dialects look up existing keys with one query and split the batch into a
+bulk UPDATE and a bulk INSERT. Analytics rollups are adjusted by the
+difference between the replaced and the new rows.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.attribution import Attribution, AttributionModelType, AttributionStatus
+from .rollups import RollupStore
+
+logger = logging.getLogger(__name__)
+
+# Columns overwritten when a result is recalculated
+UPSERT_COLUMNS = (
+    "organization_id",
+    "weight",
+    "attributed_value",
+    "model_parameters",
+    "touchpoint_position",
+    "total_touchpoints",
+    "hours_to_conversion",
+    "confidence_score",
+)
+
+ResultKey = Tuple[str, str, AttributionModelType]
+
+
+class AttributionWriter:
+    """
+    Upserts attribution results in bulk.
+    """
+
+    def __init__(self, db: AsyncSession, chunk_size: int = 2000, rollups: bool = True):
+        """Initialize the writer.
+
+        Args:
+            db: SQLAlchemy async session for database operations.
+            chunk_size: Rows per statement.
+            rollups: Keep analytics rollups in step with the written rows.
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.dialect = db.get_bind().dialect.name
+        self.rollups = RollupStore(db, chunk_size=chunk_size) if rollups else None
+
+    async def write(
+        self,
+        results: Sequence[Any],
+        organization_ids: Dict[str, str],
+        model_parameters: Optional[Dict[str, Any]] = None
+    ) -> int:
+        """Upsert attribution results. Does not commit.
+
+        Args:
+            results: `AttributionResult`s, for any mix of conversions and models.
+            organization_ids: Organization ID of each conversion in `results`.
+            model_parameters: Parameters recorded on every row.
+
+        Returns:
+            Number of rows written.
+        """
+        now = datetime.utcnow()
+        rows: Dict[ResultKey, Dict[str, Any]] = {}
+        for result in results:
+            key = (result.conversion_event_id, result.touchpoint_id, result.model_type)
+            rows[key] = {
+                "organization_id": organization_ids[result.conversion_event_id],
+                "conversion_event_id": result.conversion_event_id,
+                "touchpoint_id": result.touchpoint_id,
+                "model_type": result.model_type,
+                "weight": result.weight,
+                "attributed_value": result.attributed_value,
+                "model_parameters": model_parameters or {},
+                "touchpoint_position": result.position,
+                "total_touchpoints": result.total_touchpoints,
+                "hours_to_conversion": result.hours_to_conversion,
+                "confidence_score": result.confidence_score,
+                "status": AttributionStatus.CALCULATED,
+                "calculated_at": now,
+            }
+
+        batch = list(rows.values())
+        for start in range(0, len(batch), self.chunk_size):
+            chunk = batch[start:start + self.chunk_size]
+            if self.rollups:
+                await self.rollups.record_attributions(chunk)
+            if self.dialect in ("postgresql", "sqlite"):
+                await self._upsert(chunk, now)
+            else:
+                await self._split_write(chunk, now)
+
+        return len(batch)
+
+    async def _upsert(self, rows: List[Dict[str, Any]], now: datetime) -> None:
+        """INSERT ... ON CONFLICT (conversion, touchpoint, model) DO UPDATE."""
+        dialect_insert = postgresql.insert if self.dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(Attribution)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["conversion_event_id", "touchpoint_id", "model_type"],
+            set_={
+                **{column: stmt.excluded[column] for column in UPSERT_COLUMNS},
+                "status": AttributionStatus.RECALCULATED,
+                "calculated_at": stmt.excluded.calculated_at,
+                "updated_at": now,
+            },
+        )
+        await self.db.execute(stmt, rows)
+
+    async def _split_write(self, rows: List[Dict[str, Any]], now: datetime) -> None:
+        """Look up existing keys, then bulk UPDATE by primary key and bulk INSERT the rest."""
+        keys = [(r["conversion_event_id"], r["touchpoint_id"], r["model_type"]) for r in rows]
+        existing = {
+            (row.conversion_event_id, row.touchpoint_id, row.model_type): row.id
+            for row in (await self.db.execute(
+                select(
+                    Attribution.id,
+                    Attribution.conversion_event_id,
+                    Attribution.touchpoint_id,
+                    Attribution.model_type,
+                ).where(and_(
+                    Attribution.conversion_event_id.in_({key[0] for key in keys}),
+                    tuple_(
+                        Attribution.conversion_event_id,
+                        Attribution.touchpoint_id,
+                        Attribution.model_type,
+                    ).in_(keys),
+                ))
+            )).all()
+        }
+
+        updates, inserts = [], []
+        for key, row in zip(keys, rows):
+            if key in existing:
+                updates.append({
+                    "id": existing[key],
+                    **{column: row[column] for column in UPSERT_COLUMNS},
+                    "status": AttributionStatus.RECALCULATED,
+                    "calculated_at": row["calculated_at"],
+                    "updated_at": now,
+                })
+            else:
+                inserts.append(row)
+
+        if updates:
+            await self.db.execute(update(Attribution), updates)
+        if inserts:
+            await self.db.execute(insert(Attribution), inserts)
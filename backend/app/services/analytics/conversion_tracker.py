@@ -18,6 +18,7 @@ from ...models.conversion_event import ConversionEvent, ConversionType, Conversi
 from ...models.attribution_touchpoint import AttributionTouchpoint, TouchpointType, TouchpointStatus
 from ...models.customer_event import CustomerEvent, EventType
 from ...models.campaign import Campaign
+from .rollups import RollupStore
 
 logger = logging.getLogger(__name__)
 
@@ -772,13 +773,20 @@ class ConversionTracker:
         if not conversion:
             return False
 
-        conversion.conversion_value = new_value
-        await self.db.commit()
-
-        # Re-process attribution if already attributed
+        # Re-process attribution if already attributed; the old value leaves
+        # the rollups now and the new one is added when re-attributed
         if conversion.status == ConversionStatus.ATTRIBUTED:
+            rollups = RollupStore(self.db)
+            deltas = rollups.deltas()
+            deltas.add_conversion(
+                conversion.organization_id, conversion.conversion_timestamp,
+                conversion.conversion_value, sign=-1
+            )
+            await rollups.apply(deltas)
             conversion.status = ConversionStatus.PENDING
-            await self.db.commit()
+
+        conversion.conversion_value = new_value
+        await self.db.commit()
 
         return True
 
@@ -0,0 +1,410 @@
+"""
+Data-driven attribution: Markov-chain removal effect and Shapley value.
+
+Both models are trained offline over an organization's touchpoint paths and
+reduce to one weight per channel. The weights are stored in the
+organization's `AttributionModelConfig` (`parameters["channel_weights"]`),
+so attributing a conversion is a table lookup (see
+`batch_attribution.attribution_weights`).
+
+Training compresses paths into a path-frequency table: each distinct
+channel sequence with its number of converting and non-converting
+journeys.
+
+- Markov chain: transition probabilities between start, channel,
+  conversion and null states are estimated from the table as a sparse
+  matrix. A channel's removal effect is the relative drop in the
+  probability of reaching conversion when its state is removed.
+- Shapley value: the value of a coalition of channels is the number of
+  conversions whose path only uses channels in the coalition. Every
+  coalition's value is computed once into a table (a subset-sum
+  transform), and each channel's Shapley value is read from that table.
+  Channels beyond `max_channels` are pooled into one player whose value is
+  split by their conversion share.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from math import factorial
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.attribution import AttributionModelConfig, AttributionModelType
+from ...models.attribution_touchpoint import AttributionTouchpoint, TouchpointStatus
+from ...models.conversion_event import ConversionEvent, ConversionStatus
+from .batch_attribution import load_touchpoint_layout
+
+logger = logging.getLogger(__name__)
+
+DATA_DRIVEN_MODEL_TYPES = (
+    AttributionModelType.MARKOV_CHAIN,
+    AttributionModelType.SHAPLEY_VALUE,
+)
+
+MODEL_NAMES = {
+    AttributionModelType.MARKOV_CHAIN: "Markov chain (removal effect)",
+    AttributionModelType.SHAPLEY_VALUE: "Shapley value",
+}
+
+
+@dataclass
+class PathTable:
+    """
+    Distinct channel paths with their outcome counts.
+
+    Path `i` is `codes[offsets[i]:offsets[i + 1]]`, indexes into `channels`.
+    """
+    channels: List[str]
+    offsets: np.ndarray
+    codes: np.ndarray
+    conversions: np.ndarray
+    nulls: np.ndarray
+
+    @classmethod
+    def from_paths(
+        cls,
+        converting: Sequence[Tuple[str, ...]],
+        non_converting: Sequence[Tuple[str, ...]] = ()
+    ) -> "PathTable":
+        """Build a table from raw channel paths."""
+        # [converting, non-converting] journeys per distinct path
+        outcomes: Dict[Tuple[str, ...], List[int]] = {}
+        for outcome, paths in enumerate((converting, non_converting)):
+            for path in paths:
+                if path:
+                    outcomes.setdefault(tuple(path), [0, 0])[outcome] += 1
+
+        channels = sorted({channel for path in outcomes for channel in path})
+        code = {channel: i for i, channel in enumerate(channels)}
+        paths = list(outcomes)
+        lengths = [len(path) for path in paths]
+        return cls(
+            channels=channels,
+            offsets=np.concatenate(([0], np.cumsum(lengths))).astype(np.int64),
+            codes=np.array([code[channel] for path in paths for channel in path], dtype=np.int64),
+            conversions=np.array([outcomes[path][0] for path in paths], dtype=np.float64),
+            nulls=np.array([outcomes[path][1] for path in paths], dtype=np.float64),
+        )
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Number of touchpoints in each distinct path."""
+        return np.diff(self.offsets)
+
+    @property
+    def total_conversions(self) -> float:
+        """Number of converting journeys."""
+        return float(self.conversions.sum())
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    """Scale non-negative values to sum to 1 (uniform when all are zero)."""
+    values = np.maximum(values, 0.0)
+    total = values.sum()
+    if total <= 0:
+        return np.full(len(values), 1.0 / len(values)) if len(values) else values
+    return values / total
+
+
+def markov_channel_weights(table: PathTable) -> Tuple[Dict[str, float], float]:
+    """
+    Markov-chain removal-effect channel weights.
+
+    Args:
+        table: Path-frequency table.
+
+    Returns:
+        Channel weights summing to 1, and the chain's conversion probability.
+    """
+    k = len(table.channels)
+    start, conversion, null = 0, k + 1, k + 2
+    states = table.codes + 1
+    journeys = table.conversions + table.nulls
+    lengths = table.lengths
+    first = table.offsets[:-1]
+    last = table.offsets[1:] - 1
+
+    # Inner transitions: every touchpoint that is not the last of its path
+    inner = np.ones(len(states), dtype=bool)
+    inner[last] = False
+    path_of = np.repeat(np.arange(len(lengths)), lengths)
+    inner_idx = np.flatnonzero(inner)
+
+    src = np.concatenate((np.full(len(first), start), states[inner_idx], states[last], states[last]))
+    dst = np.concatenate((states[first], states[inner_idx + 1], np.full(len(last), conversion), np.full(len(last), null)))
+    weight = np.concatenate((journeys, journeys[path_of[inner_idx]], table.conversions, table.nulls))
+
+    counts = sparse.coo_matrix((weight, (src, dst)), shape=(k + 1, k + 3)).tocsr()
+    row_totals = np.asarray(counts.sum(axis=1)).ravel()
+    transitions = sparse.diags(1.0 / np.where(row_totals > 0, row_totals, 1.0)) @ counts
+
+    transient = transitions[:, :k + 1].tocsc()
+    to_conversion = transitions[:, conversion].toarray().ravel()
+    identity = sparse.identity(k + 1, format="csc")
+
+    def conversion_probability(removed: Optional[int] = None) -> float:
+        q = transient
+        if removed is not None:
+            keep = np.ones(k + 1)
+            keep[removed] = 0.0
+            q = (transient @ sparse.diags(keep)).tocsc()
+        return float(np.atleast_1d(spsolve(identity - q, to_conversion))[start])
+
+    base = conversion_probability()
+    if base <= 0:
+        return {channel: 1.0 / k for channel in table.channels}, 0.0
+
+    removal = np.array([1.0 - conversion_probability(state) / base for state in range(1, k + 1)])
+    return dict(zip(table.channels, _normalize(removal).tolist())), base
+
+
+def shapley_channel_weights(table: PathTable, max_channels: int = 12) -> Dict[str, float]:
+    """
+    Shapley-value channel weights.
+
+    Args:
+        table: Path-frequency table.
+        max_channels: Players in the cooperative game; further channels are
+            pooled into one player.
+
+    Returns:
+        Channel weights summing to 1.
+    """
+    k_all = len(table.channels)
+    path_of = np.repeat(np.arange(len(table.lengths)), table.lengths)
+    share = np.bincount(table.codes, weights=table.conversions[path_of], minlength=k_all)
+
+    ranked = np.argsort(-share, kind="stable")
+    players = ranked[:max_channels] if k_all > max_channels else ranked
+    player_of = np.full(k_all, len(players), dtype=np.int64)
+    player_of[players] = np.arange(len(players))
+    k = len(players) + (1 if k_all > len(players) else 0)
+
+    # Coalition of each path: bitmask of the players it touches
+    bits = np.left_shift(1, player_of[table.codes])
+    masks = np.zeros(len(table.lengths), dtype=np.int64)
+    np.bitwise_or.at(masks, path_of, bits)
+
+    # v(S) for every coalition S: conversions whose path only uses players in S
+    size = 1 << k
+    value = np.bincount(masks, weights=table.conversions, minlength=size)
+    coalitions = np.arange(size)
+    for player in range(k):
+        with_player = coalitions[(coalitions >> player) & 1 == 1]
+        value[with_player] += value[with_player ^ (1 << player)]
+
+    popcount = np.zeros(size, dtype=np.int64)
+    for player in range(k):
+        popcount += (coalitions >> player) & 1
+    coefficient = np.array([factorial(s) * factorial(k - s - 1) / factorial(k) for s in range(k)])
+
+    phi = np.zeros(k)
+    for player in range(k):
+        without = coalitions[(coalitions >> player) & 1 == 0]
+        marginal = value[without | (1 << player)] - value[without]
+        phi[player] = float((coefficient[popcount[without]] * marginal).sum())
+
+    weights = np.zeros(k_all)
+    weights[players] = phi[:len(players)]
+    if k > len(players):
+        pooled = np.setdiff1d(np.arange(k_all), players)
+        weights[pooled] = phi[-1] * _normalize(share[pooled])
+    return dict(zip(table.channels, _normalize(weights).tolist()))
+
+
+class DataDrivenAttributionTrainer:
+    """
+    Trains Markov-chain and Shapley-value channel weights for an organization.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize the trainer.
+
+        Args:
+            db: SQLAlchemy async session for database operations.
+        """
+        self.db = db
+
+    async def load_path_table(
+        self,
+        organization_id: str,
+        start_date: datetime,
+        end_date: datetime,
+        chunk_size: int = 5000
+    ) -> PathTable:
+        """
+        Collect converting and non-converting channel paths.
+
+        Converting paths are each conversion's lookback-window journey.
+        Non-converting paths are the touchpoint sequences of customers with
+        no conversion in the range.
+
+        Args:
+            organization_id: Organization ID.
+            start_date: Start of the training range.
+            end_date: End of the training range.
+            chunk_size: Conversions per touchpoint query.
+
+        Returns:
+            The path-frequency table.
+        """
+        in_range = and_(
+            ConversionEvent.organization_id == organization_id,
+            ConversionEvent.conversion_timestamp >= start_date,
+            ConversionEvent.conversion_timestamp < end_date,
+            ConversionEvent.status.in_([
+                ConversionStatus.PENDING, ConversionStatus.PROCESSING, ConversionStatus.ATTRIBUTED
+            ])
+        )
+
+        converting: List[Tuple[str, ...]] = []
+        last_id = ""
+        while True:
+            result = await self.db.execute(
+                select(ConversionEvent).where(and_(in_range, ConversionEvent.id > last_id))
+                .order_by(ConversionEvent.id).limit(chunk_size)
+            )
+            conversions = list(result.scalars().all())
+            if not conversions:
+                break
+            layout = await load_touchpoint_layout(self.db, conversions)
+            channels = [layout.channels[c] for c in layout.channel_codes.tolist()]
+            offsets = layout.offsets.tolist()
+            converting.extend(tuple(channels[a:b]) for a, b in zip(offsets[:-1], offsets[1:]))
+            last_id = conversions[-1].id
+
+        converted_customers = select(ConversionEvent.customer_id).where(
+            and_(in_range, ConversionEvent.customer_id.isnot(None))
+        )
+        rows = (await self.db.execute(
+            select(AttributionTouchpoint.customer_id, AttributionTouchpoint.channel).where(
+                and_(
+                    AttributionTouchpoint.organization_id == organization_id,
+                    AttributionTouchpoint.customer_id.isnot(None),
+                    AttributionTouchpoint.customer_id.not_in(converted_customers),
+                    AttributionTouchpoint.touchpoint_timestamp >= start_date,
+                    AttributionTouchpoint.touchpoint_timestamp < end_date,
+                    AttributionTouchpoint.status != TouchpointStatus.EXCLUDED,
+                )
+            ).order_by(AttributionTouchpoint.customer_id, AttributionTouchpoint.touchpoint_timestamp)
+        )).all()
+
+        non_converting: Dict[str, List[str]] = {}
+        for customer_id, channel in rows:
+            non_converting.setdefault(customer_id, []).append(channel)
+
+        return PathTable.from_paths(converting, [tuple(path) for path in non_converting.values()])
+
+    async def train(
+        self,
+        organization_id: str,
+        lookback_days: int = 90,
+        model_types: Sequence[AttributionModelType] = DATA_DRIVEN_MODEL_TYPES,
+        max_channels: int = 12,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Train data-driven channel weights and store them in model configs.
+
+        Args:
+            organization_id: Organization ID.
+            lookback_days: Days of conversions and touchpoints to train on.
+            model_types: Data-driven models to train.
+            max_channels: Shapley players before channels are pooled.
+            now: End of the training range (defaults to utcnow).
+
+        Returns:
+            Channel weights and training statistics per model.
+        """
+        now = now or datetime.utcnow()
+        table = await self.load_path_table(organization_id, now - timedelta(days=lookback_days), now)
+        if not table.total_conversions:
+            logger.warning(f"No converting paths for org {organization_id}, skipping data-driven training")
+            return {"organization_id": organization_id, "status": "skipped", "models": {}}
+
+        stats = {
+            "trained_at": now.isoformat(),
+            "training_window_days": lookback_days,
+            "conversions": int(table.total_conversions),
+            "non_converting_paths": int(table.nulls.sum()),
+            "distinct_paths": len(table.lengths),
+        }
+        models: Dict[str, Any] = {}
+        for model_type in model_types:
+            if model_type == AttributionModelType.MARKOV_CHAIN:
+                weights, probability = markov_channel_weights(table)
+                parameters = {**stats, "conversion_probability": probability}
+            elif model_type == AttributionModelType.SHAPLEY_VALUE:
+                weights = shapley_channel_weights(table, max_channels)
+                parameters = {**stats, "max_channels": max_channels}
+            else:
+                raise ValueError(f"Not a data-driven attribution model: {model_type}")
+
+            await self._save_weights(organization_id, model_type, {**parameters, "channel_weights": weights})
+            models[model_type.value] = weights
+
+        await self.db.commit()
+        logger.info(
+            f"Trained {', '.join(models)} attribution for org {organization_id} "
+            f"on {stats['conversions']} conversions ({stats['distinct_paths']} distinct paths)"
+        )
+        return {"organization_id": organization_id, "status": "completed", **stats, "models": models}
+
+    async def _save_weights(
+        self,
+        organization_id: str,
+        model_type: AttributionModelType,
+        parameters: Dict[str, Any]
+    ) -> None:
+        """Write trained parameters to the organization's default config for a model."""
+        result = await self.db.execute(
+            select(AttributionModelConfig).where(
+                and_(
+                    AttributionModelConfig.organization_id == organization_id,
+                    AttributionModelConfig.model_type == model_type,
+                    AttributionModelConfig.is_default == "Y",
+                )
+            )
+        )
+        config = result.scalar_one_or_none()
+        if config is None:
+            config = AttributionModelConfig(
+                organization_id=organization_id,
+                model_type=model_type,
+                name=MODEL_NAMES[model_type],
+                is_default="Y",
+                parameters={},
+            )
+            self.db.add(config)
+
+        config.parameters = {**(config.parameters or {}), **parameters}
+        await self.db.flush()
+
+
+async def load_trained_channel_weights(
+    db: AsyncSession,
+    organization_id: str
+) -> Dict[AttributionModelType, Dict[str, float]]:
+    """Trained channel weights of an organization's active data-driven model configs."""
+    result = await db.execute(
+        select(AttributionModelConfig).where(
+            and_(
+                AttributionModelConfig.organization_id == organization_id,
+                AttributionModelConfig.model_type.in_(DATA_DRIVEN_MODEL_TYPES),
+                AttributionModelConfig.is_active == "Y",
+            )
+        ).order_by(AttributionModelConfig.is_default)
+    )
+
+    trained = {}
+    for config in result.scalars().all():
+        weights = (config.parameters or {}).get("channel_weights")
+        if weights:
+            # Ordered by is_default ("N" < "Y"), so the default config wins
+            trained[config.model_type] = weights
+    return trained
@@ -9,7 +9,16 @@ Uses statistical modeling techniques including:
 - Adstock transformation for carryover effects
 - Hill saturation for diminishing returns
 - Time-series decomposition for seasonality/trend
+
+Adstock and saturation run as vectorized kernels over all channels (see
+`mmm_transforms`). With `model_config["hyperparameter_search"]` set,
+training first searches per-channel parameters by time-series
+cross-validation (see `mmm_hyperparameters`). Training also tabulates each
+channel's fitted response curve, which budget optimization allocates over
+(see `mmm_response_curves`). Daily channel data is loaded as arrays by
+`mmm_data.MMMDataLoader`.
 """
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
@@ -18,18 +27,24 @@ import json
 
 import numpy as np
 import pandas as pd
-from scipy.optimize import minimize
 from sklearn.linear_model import Ridge
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import r2_score, mean_absolute_percentage_error
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select
 
 from ...models.marketing_mix_model import (
-    MarketingMixModel, MMMChannel, MMMChannelDaily, MMMPrediction,
+    MarketingMixModel, MMMChannel, MMMPrediction,
     MMMBudgetOptimizer, MMMModelStatus, MMMChannelType
 )
 
+from .mmm_data import MMMDataLoader
+from .mmm_hyperparameters import HyperparameterSearch, SearchData, SearchSpace, time_series_folds
+from .mmm_response_curves import (
+    ResponseCurves, build_response_curves, get_response_curve_cache, load_response_curves, save_response_curves,
+)
+from .mmm_transforms import adstock_matrix, median_adstock, saturation_matrix
+
 logger = logging.getLogger(__name__)
 
 
@@ -64,6 +79,7 @@ class MarketingMixModelingService:
             db: SQLAlchemy async session for database operations.
         """
         self.db = db
+        self.data_loader = MMMDataLoader(db)
 
     # ============== Adstock and Saturation Transformations ==============
 
@@ -87,23 +103,8 @@ class MarketingMixModelingService:
         Returns:
             Adstocked spend array.
         """
-        adstocked = np.zeros_like(spend)
-
-        for i in range(len(spend)):
-            if i == 0:
-                adstocked[i] = spend[i]
-            else:
-                # Geometric decay with optional peak delay
-                if peak_delay == 0:
-                    adstocked[i] = spend[i] + decay * adstocked[i - 1]
-                else:
-                    # Delayed peak using gamma-like distribution
-                    adstocked[i] = spend[i]
-                    for j in range(1, min(peak_delay + 1, i + 1)):
-                        weight = ((j / peak_delay) ** peak_delay) * np.exp(peak_delay - j)
-                        adstocked[i] += decay * weight * spend[i - j]
-
-        return adstocked
+        spend = np.asarray(spend, dtype=float)
+        return adstock_matrix(spend[:, None], [decay], [peak_delay])[:, 0]
 
     def apply_saturation(
         self,
@@ -127,24 +128,8 @@ class MarketingMixModelingService:
         Returns:
             Saturated spend array.
         """
-        if half_spend is None:
-            half_spend = np.median(adstocked_spend) if len(adstocked_spend) > 0 else 1.0
-
-        if shape == "hill":
-            # Hill function: S = x^k / (x^k + half^k)
-            return adstocked_spend ** k / (adstocked_spend ** k + half_spend ** k)
-
-        elif shape == "logistic":
-            # Logistic function
-            return 1 / (1 + np.exp(-k * (adstocked_spend - half_spend) / half_spend))
-
-        elif shape == "linear":
-            # Linear with ceiling
-            return np.minimum(adstocked_spend / (adstocked_spend + half_spend), 1.0)
-
-        else:
-            # Default to Hill
-            return adstocked_spend ** k / (adstocked_spend ** k + half_spend ** k)
+        adstocked_spend = np.asarray(adstocked_spend, dtype=float)
+        return saturation_matrix(adstocked_spend[:, None], [shape], [k], [half_spend])[:, 0]
 
     def transform_features(
         self,
@@ -166,29 +151,29 @@ class MarketingMixModelingService:
             DataFrame with transformed features.
         """
         df_transformed = df.copy()
+        channels = [channel for channel in channel_cols if channel in df.columns]
+        if not channels:
+            return df_transformed
+
+        adstock = [adstock_params.get(channel, {}) for channel in channels]
+        saturation = [saturation_params.get(channel, {}) for channel in channels]
+
+        # All channels at once: (days, channels)
+        adstocked = adstock_matrix(
+            df[channels].to_numpy(dtype=float),
+            [params.get("decay", 0.3) for params in adstock],
+            [params.get("peak_delay", 0) for params in adstock]
+        )
+        saturated = saturation_matrix(
+            adstocked,
+            [params.get("shape", "hill") for params in saturation],
+            [params.get("k", 2.0) for params in saturation],
+            [params.get("half_spend", None) for params in saturation]
+        )
 
-        for channel in channel_cols:
-            if channel not in df.columns:
-                continue
-
-            # Get parameters
-            adstock = adstock_params.get(channel, {})
-            saturation = saturation_params.get(channel, {})
-
-            decay = adstock.get("decay", 0.3)
-            peak_delay = adstock.get("peak_delay", 0)
-
-            shape = saturation.get("shape", "hill")
-            k = saturation.get("k", 2.0)
-            half_spend = saturation.get("half_spend", None)
-
-            # Apply transformations
-            spend = df[channel].values
-            adstocked = self.apply_adstock(spend, decay, peak_delay)
-            saturated = self.apply_saturation(adstocked, shape, k, half_spend)
-
-            df_transformed[f"{channel}_adstocked"] = adstocked
-            df_transformed[f"{channel}_saturated"] = saturated
+        for i, channel in enumerate(channels):
+            df_transformed[f"{channel}_adstocked"] = adstocked[:, i]
+            df_transformed[f"{channel}_saturated"] = saturated[:, i]
 
         return df_transformed
 
@@ -231,39 +216,18 @@ class MarketingMixModelingService:
 
             # Get channel columns
             channel_cols = [ch.channel_name for ch in model.channels]
+            model_config = model.model_config or {}
+            controls = self._control_variables(df, model_config)
 
-            # Apply transformations
-            df_transformed = self.transform_features(
-                df,
-                channel_cols,
-                model.adstock_params,
-                model.saturation_params
-            )
-
-            # Prepare features
-            feature_cols = [f"{ch}_saturated" for ch in channel_cols]
-
-            # Add control variables
-            if model.model_config.get("include_seasonality", True):
-                df_transformed["seasonality"] = self._calculate_seasonality(df_transformed)
-                feature_cols.append("seasonality")
-
-            if model.model_config.get("include_trend", True):
-                df_transformed["trend"] = np.arange(len(df_transformed))
-                feature_cols.append("trend")
+            # Search adstock/saturation parameters before the final fit
+            search_summary = None
+            if model_config.get("hyperparameter_search"):
+                search_summary = await asyncio.to_thread(
+                    self.search_hyperparameters, model, df, channel_cols, controls
+                )
 
-            # Prepare X and y
-            X = df_transformed[feature_cols].fillna(0)
-            y = df_transformed[model.target_variable].values
-
-            # Scale features
-            scaler = StandardScaler()
-            X_scaled = scaler.fit_transform(X)
-
-            # Train Ridge regression
-            alpha = model.model_config.get("regularization", 1.0)
-            ridge = Ridge(alpha=alpha, fit_intercept=True)
-            ridge.fit(X_scaled, y)
+            # Transform, scale and fit
+            ridge, scaler, feature_cols, X_scaled, y = self._fit(model, df, channel_cols, controls)
 
             # Predictions
             y_pred = ridge.predict(X_scaled)
@@ -292,6 +256,16 @@ class MarketingMixModelingService:
                 model, df, contributions, channel_cols
             )
 
+            # Tabulate response curves for budget optimization
+            curves = self._build_response_curves(
+                model, df, channel_cols, ridge.coef_[:len(channel_cols)] / scaler.scale_[:len(channel_cols)]
+            )
+            mean_spend = df[channel_cols].to_numpy(dtype=float).mean(axis=0)
+            for channel, mroi in zip(channel_cols, curves.marginal_roi(mean_spend, 1)):
+                if channel in channel_rois:
+                    channel_rois[channel]["mroi"] = float(mroi)
+            model.response_curves = await asyncio.to_thread(save_response_curves, curves)
+
             # Update model
             model.performance_metrics = {
                 "r_squared": float(r2),
@@ -300,6 +274,9 @@ class MarketingMixModelingService:
                 "rmse": float(rmse),
                 "mae": float(mae),
             }
+            if search_summary:
+                model.performance_metrics["cv_rmse"] = search_summary["cv_rmse"]
+                model.diagnostics = {**(model.diagnostics or {}), "hyperparameter_search": search_summary}
 
             model.model_coefficients = {
                 "intercept": float(ridge.intercept_),
@@ -335,28 +312,238 @@ class MarketingMixModelingService:
             await self.db.commit()
             raise
 
-    async def _load_training_data(
+    def search_hyperparameters(
         self,
-        model: MarketingMixModel
-    ) -> pd.DataFrame:
-        """Load training data from database."""
-        # Query daily data for all channels
-        query = select(MMMChannelDaily).where(
-            MMMChannelDaily.model_id == model.id
-        ).order_by(MMMChannelDaily.date)
+        model: MarketingMixModel,
+        df: pd.DataFrame,
+        channel_cols: List[str],
+        controls: Dict[str, np.ndarray]
+    ) -> Dict[str, Any]:
+        """
+        Search per-channel adstock decay and saturation parameters.
 
-        result = await self.db.execute(query)
-        daily_data = result.scalars().all()
+        Configured by `model_config["hyperparameter_search"]`, e.g.
+        {"method": "grid", "passes": 2, "cv_splits": 5, "space": {"decay": [...]}}.
+        The best parameters found replace the model's `adstock_params` and
+        `saturation_params` for the searched channels; peak delays and curve
+        shapes are kept.
 
-        if not daily_data:
-            raise ValueError(f"No training data found for model {model.id}")
+        Args:
+            model: Model being trained.
+            df: Training data.
+            channel_cols: Channel spend columns.
+            controls: Control variables included in every fit.
 
-        # Convert to DataFrame
-        df = pd.DataFrame([d.to_dict() for d in daily_data])
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.sort_values("date")
+        Returns:
+            Search summary (method, trials, cross-validated RMSE).
+        """
+        config = model.model_config.get("hyperparameter_search")
+        config = config if isinstance(config, dict) else {}
+        adstock_params = dict(model.adstock_params or {})
+        saturation_params = dict(model.saturation_params or {})
 
-        return df
+        channels = [channel for channel in channel_cols if channel in df.columns]
+        if not channels:
+            return {}
+        adstock = [adstock_params.get(channel, {}) for channel in channels]
+        saturation = [saturation_params.get(channel, {}) for channel in channels]
+
+        spend = df[channels].to_numpy(dtype=float)
+        data = SearchData(
+            spend=spend,
+            target=df[model.target_variable].to_numpy(dtype=float),
+            controls=np.column_stack(list(controls.values())) if controls else np.empty((len(df), 0)),
+            peak_delays=np.array([params.get("peak_delay", 0) for params in adstock]),
+            shapes=[params.get("shape", "hill") for params in saturation],
+            folds=time_series_folds(len(df), config.get("cv_splits", 5)),
+            alpha=model.model_config.get("regularization", 1.0),
+        )
+
+        # Start from the configured parameters (half_spend as a median multiple)
+        decay = np.array([params.get("decay", 0.3) for params in adstock], dtype=float)
+        adstocked = adstock_matrix(spend, decay, data.peak_delays)
+        medians = median_adstock(adstocked)
+        half_ratio = np.array([
+            params["half_spend"] / median if params.get("half_spend") and median > 0 else 1.0
+            for params, median in zip(saturation, medians)
+        ])
+        initial = np.vstack([decay, [params.get("k", 2.0) for params in saturation], half_ratio])
+
+        result = HyperparameterSearch(
+            data,
+            method=config.get("method", "random"),
+            space=SearchSpace.from_config(config.get("space")),
+            n_trials=config.get("n_trials", 200),
+            passes=config.get("passes", 2),
+            workers=config.get("workers"),
+            seed=config.get("seed", 0),
+        ).run(initial)
+
+        for i, channel in enumerate(channels):
+            adstock_params[channel] = {**adstock[i], "decay": float(result.decay[i])}
+            saturation_params[channel] = {
+                **saturation[i], "k": float(result.k[i]), "half_spend": float(result.half_spend[i])
+            }
+        model.adstock_params = adstock_params
+        model.saturation_params = saturation_params
+
+        logger.info(
+            f"MMM search for model {model.id}: {result.trials} candidates in {result.duration_seconds:.1f}s, "
+            f"CV RMSE {result.baseline_cv_rmse:.2f} -> {result.cv_rmse:.2f}"
+        )
+        return result.summary()
+
+    def _fit(
+        self,
+        model: MarketingMixModel,
+        df: pd.DataFrame,
+        channel_cols: List[str],
+        controls: Dict[str, np.ndarray]
+    ) -> Tuple[Ridge, StandardScaler, List[str], np.ndarray, np.ndarray]:
+        """Fit the Ridge regression on transformed, scaled features.
+
+        Returns:
+            Tuple of (ridge, scaler, feature_cols, X_scaled, y).
+        """
+        # Apply transformations
+        df_transformed = self.transform_features(
+            df,
+            channel_cols,
+            model.adstock_params or {},
+            model.saturation_params or {}
+        )
+
+        # Prepare features
+        feature_cols = [f"{ch}_saturated" for ch in channel_cols]
+
+        # Add control variables
+        for name, values in controls.items():
+            df_transformed[name] = values
+            feature_cols.append(name)
+
+        # Prepare X and y
+        X = df_transformed[feature_cols].fillna(0)
+        y = df_transformed[model.target_variable].values
+
+        # Scale features
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        # Train Ridge regression
+        alpha = (model.model_config or {}).get("regularization", 1.0)
+        ridge = Ridge(alpha=alpha, fit_intercept=True)
+        ridge.fit(X_scaled, y)
+
+        return ridge, scaler, feature_cols, X_scaled, y
+
+    def _build_response_curves(
+        self,
+        model: MarketingMixModel,
+        df: pd.DataFrame,
+        channel_cols: List[str],
+        coefficients: np.ndarray
+    ) -> ResponseCurves:
+        """Tabulate each channel's fitted response curve.
+
+        Args:
+            model: Model being trained (adstock/saturation already final).
+            df: Training data.
+            channel_cols: Channel spend columns, in feature order.
+            coefficients: Fitted coefficient per unit of saturated feature.
+
+        Returns:
+            The response curves.
+        """
+        adstock = [(model.adstock_params or {}).get(channel, {}) for channel in channel_cols]
+        saturation = [(model.saturation_params or {}).get(channel, {}) for channel in channel_cols]
+        spend = df[channel_cols].to_numpy(dtype=float)
+        decays = [params.get("decay", 0.3) for params in adstock]
+        peak_delays = [params.get("peak_delay", 0) for params in adstock]
+
+        # Default half-saturation is the median adstocked training spend, as in training
+        medians = median_adstock(adstock_matrix(spend, decays, peak_delays))
+        half_spend = [
+            params.get("half_spend") or float(median)
+            for params, median in zip(saturation, medians)
+        ]
+        return build_response_curves(
+            channel_cols,
+            spend.max(axis=0) if len(spend) else np.ones(len(channel_cols)),
+            decays,
+            peak_delays,
+            [params.get("shape", "hill") for params in saturation],
+            [params.get("k", 2.0) for params in saturation],
+            half_spend,
+            coefficients,
+        )
+
+    def get_response_curves(self, model: MarketingMixModel) -> ResponseCurves:
+        """Response curves of a trained model, from the cache when parsed before.
+
+        Raises:
+            ValueError: If the model has no response curves yet (see
+                `_ensure_response_curves`).
+        """
+        payload = model.response_curves or {}
+        if not payload.get("channels"):
+            raise ValueError(f"Model {model.id} has no response curves")
+
+        cache = get_response_curve_cache()
+        key = (model.id, model.trained_at.isoformat() if model.trained_at else None)
+        curves = cache.get(key) if cache is not None else None
+        if curves is None:
+            curves = load_response_curves(payload)
+            if cache is not None:
+                cache.put(key, curves)
+        return curves
+
+    async def _ensure_response_curves(self, model: MarketingMixModel) -> ResponseCurves:
+        """Response curves of a trained model, tabulated on first use if missing.
+
+        Models trained before curves were stored get them built from their
+        stored adstock/saturation parameters, channel coefficients and
+        training data, then persisted. If no channel coefficient was stored,
+        the Ridge fit is repeated with the stored parameters to recover them.
+        """
+        if (model.response_curves or {}).get("channels"):
+            return self.get_response_curves(model)
+
+        df = await self._load_training_data(model)
+        channel_cols = [ch.channel_name for ch in model.channels]
+        stored = (model.model_coefficients or {}).get("channels", {})
+        coefficients = np.array(
+            [float(stored.get(channel, {}).get("coefficient") or 0.0) for channel in channel_cols]
+        )
+        if not coefficients.any():
+            controls = self._control_variables(df, model.model_config or {})
+            ridge, scaler, *_ = await asyncio.to_thread(self._fit, model, df, channel_cols, controls)
+            n = len(channel_cols)
+            coefficients = ridge.coef_[:n] / scaler.scale_[:n]
+
+        curves = self._build_response_curves(model, df, channel_cols, coefficients)
+        model.response_curves = await asyncio.to_thread(save_response_curves, curves)
+        await self.db.commit()
+        logger.info(f"Tabulated response curves for model {model.id} on first use")
+        return self.get_response_curves(model)
+
+    def _control_variables(self, df: pd.DataFrame, model_config: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Seasonality and trend columns included in every fit."""
+        controls = {}
+        if model_config.get("include_seasonality", True):
+            controls["seasonality"] = np.asarray(self._calculate_seasonality(df), dtype=float)
+        if model_config.get("include_trend", True):
+            controls["trend"] = np.arange(len(df), dtype=float)
+        return controls
+
+    async def _load_training_data(
+        self,
+        model: MarketingMixModel
+    ) -> pd.DataFrame:
+        """Load training data: one row per date, a spend column per channel and the target."""
+        matrix = await self.data_loader.load(model)
+        if not len(matrix):
+            raise ValueError(f"No training data found for model {model.id}")
+        return matrix.to_frame(model.target_variable)
 
     def _calculate_seasonality(self, df: pd.DataFrame) -> np.ndarray:
         """Calculate seasonality features."""
@@ -379,7 +566,7 @@ class MarketingMixModelingService:
     ) -> Dict[str, float]:
         """Calculate contribution of each feature."""
         contributions = {}
-        total_pred = np.full_like(y, intercept)
+        total_pred = np.full(len(y), intercept, dtype=float)
 
         for i, coef in enumerate(coefficients):
             feature_contribution = X[:, i] * coef
@@ -413,7 +600,7 @@ class MarketingMixModelingService:
             roi = (attributed_revenue - total_spend) / total_spend if total_spend > 0 else 0
 
             channel_rois[channel] = {
-                "coefficient": float(model.model_coefficients.get("channels", {}).get(channel, {}).get("coefficient", 0)),
+                "coefficient": float((model.model_coefficients or {}).get("channels", {}).get(channel, {}).get("coefficient", 0)),
                 "roi": float(roi),
                 "mroi": float(roi),  # Simplified, should calculate marginal
                 "contribution_pct": float(contributions.get(f"feature_{i}", 0))
@@ -519,18 +706,30 @@ class MarketingMixModelingService:
         self,
         model_id: str,
         total_budget: float,
-        constraints: Dict[str, Any] = None
+        constraints: Dict[str, Any] = None,
+        period_days: int = 30,
+        persist: bool = True
     ) -> MMMBudgetOptimizer:
         """
         Optimize budget allocation across channels.
 
+        Allocates over the model's tabulated response curves. Per-channel
+        bounds are handled by the greedy marginal-ROI allocation; group
+        limits (`constraints["group_spend"]`) or `constraints["algorithm"] ==
+        "slsqp"` switch to SLSQP over the same curves.
+
         Args:
             model_id: ID of the trained model.
             total_budget: Total budget to allocate.
-            constraints: Optional constraints on allocation.
+            constraints: Optional constraints on allocation:
+                min_spend_per_channel, max_spend_per_channel,
+                group_spend ([{"channels": [...], "min": ..., "max": ...}]).
+            period_days: Days the budget covers.
+            persist: Save the result (False for interactive what-if calls).
 
         Returns:
-            Budget optimization result.
+            Budget optimization result. Its current total is the current
+            channel mix scaled to `total_budget`.
         """
         query = select(MarketingMixModel).where(MarketingMixModel.id == model_id)
         result = await self.db.execute(query)
@@ -540,91 +739,57 @@ class MarketingMixModelingService:
             raise ValueError(f"Model {model_id} is not ready for optimization")
 
         # Get channel data
-        channels = model.channels
-        n_channels = len(channels)
-
-        if n_channels == 0:
+        channel_names = [ch.channel_name for ch in model.channels]
+        if not channel_names:
             raise ValueError("No channels configured for model")
 
-        # Current allocation (from recent data)
-        current_allocation = await self._get_current_allocation(model)
-
-        # Get ROI estimates
-        roi_estimates = {
-            ch.channel_name: ch.roi or 1.0
-            for ch in channels
-        }
-
-        # Define optimization objective
-        def objective(x):
-            # Negative expected return (for minimization)
-            total_return = 0
-            for i, ch in enumerate(channels):
-                # Diminishing returns based on saturation
-                spend = x[i]
-                roi = roi_estimates[ch.channel_name]
-                # Simplified saturation: sqrt scaling
-                total_return += np.sqrt(spend) * roi * 10
-            return -total_return
-
-        # Constraints
-        constraints_list = [{"type": "eq", "fun": lambda x: np.sum(x) - total_budget}]
+        curves = (await self._ensure_response_curves(model)).subset(channel_names)
+        constraints = constraints or {}
 
         # Bounds
-        min_spend = constraints.get("min_spend_per_channel", {}) if constraints else {}
-        max_spend = constraints.get("max_spend_per_channel", {}) if constraints else {}
-
-        bounds = []
-        for ch in channels:
-            min_val = min_spend.get(ch.channel_name, 0)
-            max_val = max_spend.get(ch.channel_name, total_budget)
-            bounds.append((min_val, max_val))
-
-        # Initial guess (proportional to current)
-        total_current = sum(current_allocation.values())
-        if total_current > 0:
-            x0 = [
-                (current_allocation.get(ch.channel_name, 0) / total_current) * total_budget
-                for ch in channels
-            ]
-        else:
-            x0 = [total_budget / n_channels] * n_channels
+        min_spend = constraints.get("min_spend_per_channel", {})
+        max_spend = constraints.get("max_spend_per_channel", {})
+        lower = np.array([min_spend.get(name, 0) for name in channel_names], dtype=float)
+        upper = np.array([max_spend.get(name, np.inf) for name in channel_names], dtype=float)
 
         # Optimize
-        result = minimize(
-            objective,
-            x0,
-            method="SLSQP",
-            bounds=bounds,
-            constraints=constraints_list,
-            options={"maxiter": 1000, "ftol": 1e-6}
-        )
-
-        if not result.success:
-            logger.warning(f"Optimization did not converge: {result.message}")
-
-        # Build optimized allocation
-        optimized_allocation = {}
-        for i, ch in enumerate(channels):
-            spend = result.x[i]
-            roi = roi_estimates[ch.channel_name]
-            predicted_return = np.sqrt(spend) * roi * 10 if spend > 0 else 0
-
-            optimized_allocation[ch.channel_name] = {
-                "spend": float(spend),
-                "predicted_return": float(predicted_return),
-                "marginal_roi": float(roi)
+        groups = constraints.get("group_spend") or []
+        iterations = None
+        if groups or constraints.get("algorithm") == "slsqp":
+            algorithm = "slsqp"
+            spend, info = curves.optimize(total_budget, period_days, lower, upper, groups)
+            iterations = info["iterations"]
+        else:
+            algorithm = "marginal_roi"
+            spend = curves.allocate(total_budget, period_days, lower, upper)
+
+        returns = curves.evaluate(spend, period_days)
+        marginal = curves.marginal_roi(spend, period_days)
+        optimized_allocation = {
+            name: {
+                "spend": float(spend[i]),
+                "predicted_return": float(returns[i]),
+                "marginal_roi": float(marginal[i])
             }
+            for i, name in enumerate(channel_names)
+        }
 
-        # Calculate totals
-        current_total = sum(
-            current_allocation.get(ch, {}).get("predicted_return", 0)
-            for ch in current_allocation
-        )
-        optimized_total = sum(
-            opt.get("predicted_return", 0)
-            for opt in optimized_allocation.values()
-        )
+        # Current allocation from recent data, and the same mix at this budget
+        current_allocation = await self._get_current_allocation(model, period_days)
+        current_spend = np.array([
+            current_allocation.get(name, {}).get("spend", 0) for name in channel_names
+        ], dtype=float)
+        current_returns = curves.evaluate(current_spend, period_days)
+        for i, name in enumerate(channel_names):
+            if name in current_allocation:
+                current_allocation[name] = {**current_allocation[name], "predicted_return": float(current_returns[i])}
+
+        if current_spend.sum() > 0:
+            baseline_spend = current_spend / current_spend.sum() * total_budget
+        else:
+            baseline_spend = np.full(len(channel_names), total_budget / len(channel_names))
+        current_total = float(curves.evaluate(baseline_spend, period_days).sum())
+        optimized_total = float(returns.sum())
 
         improvement_pct = (
             (optimized_total - current_total) / current_total * 100
@@ -637,55 +802,37 @@ class MarketingMixModelingService:
             organization_id=model.organization_id,
             total_budget=total_budget,
             budget_currency="USD",
-            optimization_period_days=30,
-            constraints=constraints or {},
+            optimization_period_days=period_days,
+            constraints=constraints,
             current_allocation=current_allocation,
             optimized_allocation=optimized_allocation,
-            current_predicted_total=float(current_total),
-            optimized_predicted_total=float(optimized_total),
+            current_predicted_total=current_total,
+            optimized_predicted_total=optimized_total,
             improvement_pct=float(improvement_pct),
-            improvement_absolute=float(optimized_total - current_total),
+            improvement_absolute=optimized_total - current_total,
+            optimization_algorithm=algorithm,
+            iterations=iterations,
             status="completed",
             completed_at=datetime.utcnow()
         )
 
-        self.db.add(optimizer_result)
-        await self.db.commit()
+        if persist:
+            self.db.add(optimizer_result)
+            await self.db.commit()
 
         return optimizer_result
 
     async def _get_current_allocation(
         self,
-        model: MarketingMixModel
+        model: MarketingMixModel,
+        period_days: int = 30
     ) -> Dict[str, Dict[str, float]]:
-        """Get current budget allocation from recent data."""
-        query = select(MMMChannelDaily).where(
-            MMMChannelDaily.model_id == model.id
-        ).order_by(desc(MMMChannelDaily.date)).limit(30)
-
-        result = await self.db.execute(query)
-        recent_data = result.scalars().all()
-
-        allocation = {}
-        for day in recent_data:
-            channel_name = None
-            for ch in model.channels:
-                if ch.id == day.channel_id:
-                    channel_name = ch.channel_name
-                    break
-
-            if channel_name:
-                if channel_name not in allocation:
-                    allocation[channel_name] = {"spend": 0, "predicted_return": 0}
-                allocation[channel_name]["spend"] += day.spend or 0
-
-        # Calculate predicted returns
-        for ch_name, data in allocation.items():
-            ch = next((c for c in model.channels if c.channel_name == ch_name), None)
-            if ch and ch.roi:
-                data["predicted_return"] = data["spend"] * (1 + ch.roi)
-
-        return allocation
+        """Get current budget allocation: spend per channel over the latest period."""
+        matrix = await self.data_loader.load(model)
+        return {
+            channel: {"spend": spend, "predicted_return": 0.0}
+            for channel, spend in matrix.recent_spend(period_days).items()
+        }
 
     # ============== Reporting ==============
 
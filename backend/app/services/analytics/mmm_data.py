@@ -0,0 +1,245 @@
+"""
+Columnar daily data loader for Marketing Mix Models.
+
+`MMMChannelDaily` stores one row per (channel, date). The loader pivots in
+SQL (one SUM ... FILTER column per channel, grouped by date) and streams
+the result in partitions straight into pre-allocated (days, channels)
+arrays, without materializing ORM objects.
+
+Loaded matrices are cached per model. Any flush that creates, updates or
+deletes daily rows invalidates that model's matrix once the transaction
+commits (see the session listeners at the bottom of this module).
+"""
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ...core.config import get_settings
+from ...models.marketing_mix_model import MarketingMixModel, MMMChannelDaily
+
+logger = logging.getLogger(__name__)
+
+PARTITION_SIZE = 1000
+
+
+@dataclass
+class MMMDailyMatrix:
+    """A model's daily spend by channel and its target, one row per date."""
+    dates: np.ndarray  # datetime64[D], ascending
+    channels: List[str]
+    spend: np.ndarray  # (days, channels); missing rows are 0
+    target: np.ndarray  # (days,); NaN where no row carries a target
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def to_frame(self, target_variable: str) -> pd.DataFrame:
+        """Wide DataFrame: date, one spend column per channel, and the target."""
+        df = pd.DataFrame(self.spend, columns=self.channels)
+        df.insert(0, "date", pd.to_datetime(self.dates))
+        df[target_variable] = self.target
+        return df
+
+    def recent_spend(self, period_days: int) -> Dict[str, float]:
+        """Spend per channel over the latest `period_days` days."""
+        if not len(self.dates):
+            return {}
+        recent = self.dates > self.dates[-1] - np.timedelta64(period_days, "D")
+        return dict(zip(self.channels, self.spend[recent].sum(axis=0).tolist()))
+
+
+class MMMDataLoader:
+    """
+    Loads a model's daily channel data as arrays.
+    """
+
+    def __init__(self, db: AsyncSession, partition_size: int = PARTITION_SIZE):
+        """Initialize the loader.
+
+        Args:
+            db: Database session.
+            partition_size: Rows fetched per streamed partition.
+        """
+        self.db = db
+        self.partition_size = partition_size
+
+    async def load(self, model: MarketingMixModel) -> MMMDailyMatrix:
+        """Get a model's daily matrix, from the cache when still valid."""
+        channels = _channel_key(model)
+        cache = get_mmm_data_cache()
+        if cache is None:
+            return await self.query(model)
+
+        matrix = cache.get(model.id, channels)
+        if matrix is not None:
+            return matrix
+
+        generation = cache.generation(model.id)
+        matrix = await self.query(model)
+        cache.put(model.id, channels, matrix, generation)
+        return matrix
+
+    async def query(self, model: MarketingMixModel) -> MMMDailyMatrix:
+        """Load a model's daily matrix from the database."""
+        channel_ids = [channel_id for channel_id, _ in _channel_key(model)]
+        names = [name for _, name in _channel_key(model)]
+        scope = MMMChannelDaily.model_id == model.id
+
+        n_days = (await self.db.execute(
+            select(func.count(func.distinct(MMMChannelDaily.date))).where(scope)
+        )).scalar() or 0
+
+        # Server-side pivot: one spend column per channel
+        query = (
+            select(
+                MMMChannelDaily.date,
+                func.max(MMMChannelDaily.target_value),
+                *(
+                    func.sum(MMMChannelDaily.spend).filter(MMMChannelDaily.channel_id == channel_id)
+                    for channel_id in channel_ids
+                ),
+            )
+            .where(scope)
+            .group_by(MMMChannelDaily.date)
+            .order_by(MMMChannelDaily.date)
+            .execution_options(yield_per=self.partition_size)
+        )
+
+        dates = np.empty(n_days, dtype="datetime64[D]")
+        values = np.empty((n_days, len(channel_ids) + 1))
+        filled = 0
+        result = await self.db.stream(query)
+        async for partition in result.partitions():
+            end = filled + len(partition)
+            if end > len(dates):
+                # Days added since the count; grow rather than drop them
+                dates = np.concatenate([dates, np.empty(end - len(dates), dtype=dates.dtype)])
+                values = np.vstack([values, np.empty((end - len(values), values.shape[1]))])
+            dates[filled:end] = [row[0] for row in partition]
+            values[filled:end] = np.array([tuple(row[1:]) for row in partition], dtype=float)
+            filled = end
+
+        values = values[:filled]
+        return MMMDailyMatrix(
+            dates=dates[:filled],
+            channels=names,
+            spend=np.nan_to_num(values[:, 1:]),
+            target=values[:, 0],
+        )
+
+
+def _channel_key(model: MarketingMixModel) -> Tuple[Tuple[str, str], ...]:
+    """(channel id, channel name) pairs the matrix columns follow."""
+    return tuple((channel.id, channel.channel_name) for channel in model.channels)
+
+
+class MMMDataCache:
+    """
+    Process-wide LRU of per-model daily matrices.
+    """
+
+    def __init__(self, max_models: int = 16):
+        """Initialize the cache.
+
+        Args:
+            max_models: Models whose daily matrices are kept in memory.
+        """
+        self.max_models = max_models
+        self._matrices: "OrderedDict[str, Tuple[Any, MMMDailyMatrix]]" = OrderedDict()
+        # Bumped on invalidation so a load racing a write is not cached
+        self._generations: Dict[str, int] = {}
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, model_id: str, channels: Any) -> Optional[MMMDailyMatrix]:
+        """Get a model's matrix if it was loaded for the same channels, or None."""
+        entry = self._matrices.get(model_id)
+        if entry is None or entry[0] != channels:
+            self._counters["misses"] += 1
+            return None
+        self._matrices.move_to_end(model_id)
+        self._counters["hits"] += 1
+        return entry[1]
+
+    def generation(self, model_id: str) -> int:
+        """Current invalidation generation, taken before loading."""
+        return self._generations.get(model_id, 0)
+
+    def put(self, model_id: str, channels: Any, matrix: MMMDailyMatrix, generation: int):
+        """Store a matrix unless the model was invalidated meanwhile."""
+        if self._generations.get(model_id, 0) != generation:
+            return
+        # Shared between requests: callers must not modify it in place
+        for array in (matrix.dates, matrix.spend, matrix.target):
+            array.setflags(write=False)
+        self._matrices[model_id] = (channels, matrix)
+        self._matrices.move_to_end(model_id)
+        while len(self._matrices) > self.max_models:
+            self._matrices.popitem(last=False)
+
+    def invalidate(self, model_id: str):
+        """Drop a model's matrix after its daily rows changed."""
+        self._generations[model_id] = self._generations.get(model_id, 0) + 1
+        self._matrices.pop(model_id, None)
+        self._counters["invalidations"] += 1
+
+    def clear(self):
+        """Drop all matrices."""
+        for model_id in list(self._matrices):
+            self.invalidate(model_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics."""
+        return {"models": len(self._matrices), **self._counters}
+
+
+# Global cache instance
+_data_cache: Optional[MMMDataCache] = None
+
+
+def get_mmm_data_cache() -> Optional[MMMDataCache]:
+    """Get the process-wide MMM data cache (None if disabled)."""
+    global _data_cache
+    settings = get_settings()
+    if settings.mmm_data_cache_size <= 0:
+        return None
+    if _data_cache is None:
+        _data_cache = MMMDataCache(max_models=settings.mmm_data_cache_size)
+    return _data_cache
+
+
+# ============== Invalidation ==============
+
+_PENDING_KEY = "mmm_data_models"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_mmm_data_changes(session: Session, flush_context) -> None:
+    """Remember which models' daily rows a flush touched."""
+    model_ids: Set[str] = {
+        obj.model_id
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, MMMChannelDaily) and obj.model_id is not None
+    }
+    if model_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(model_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_mmm_data_after_commit(session: Session) -> None:
+    model_ids = session.info.pop(_PENDING_KEY, None)
+    cache = get_mmm_data_cache()
+    if model_ids and cache is not None:
+        for model_id in model_ids:
+            cache.invalidate(model_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_mmm_data_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
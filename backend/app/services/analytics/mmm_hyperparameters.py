@@ -0,0 +1,353 @@
+"""
+Hyperparameter search over per-channel adstock and saturation parameters.
+
+Each candidate assigns every channel a decay rate, a Hill/logistic shape
+`k` and a half-saturation point (as a multiple of the channel's median
+adstocked spend). Candidates are scored by expanding-window time-series
+cross-validation of the same standardized ridge regression `train_model`
+fits, solved in closed form from accumulated Gram matrices so a fold costs
+one small linear solve.
+
+Two strategies:
+- "grid": coordinate search. Each pass sweeps the full grid of one
+  channel's parameters while holding the others at their best values.
+- "random": joint samples from the grid for all channels at once.
+
+Candidates are scored in a process pool (`mmm_search_workers`); the spend
+matrix is shipped to each worker once. Inside daemonic processes (Celery
+prefork workers), which cannot start children, scoring runs in-process.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.model_selection import TimeSeriesSplit
+
+from ...core.config import get_settings
+from .mmm_transforms import adstock_matrix, median_adstock, saturation_matrix
+
+logger = logging.getLogger(__name__)
+
+SEARCH_METHODS = ("grid", "random")
+
+# Candidate rows
+DECAY, K, HALF_RATIO = 0, 1, 2
+
+
+@dataclass
+class SearchSpace:
+    """Values tried for each channel's parameters."""
+    decay: Sequence[float] = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+    k: Sequence[float] = (0.5, 1.0, 1.5, 2.0, 3.0)
+    half_spend_ratio: Sequence[float] = (0.25, 0.5, 1.0, 2.0, 4.0)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "SearchSpace":
+        """Build from a config dict, keeping defaults for missing keys."""
+        config = config or {}
+        return cls(**{key: tuple(config[key]) for key in ("decay", "k", "half_spend_ratio") if key in config})
+
+    def combinations(self) -> List[Tuple[float, float, float]]:
+        """Every (decay, k, half_spend_ratio) for one channel."""
+        return list(product(self.decay, self.k, self.half_spend_ratio))
+
+
+@dataclass
+class SearchData:
+    """Inputs shared by every candidate (shipped to each worker once)."""
+    spend: np.ndarray  # (days, channels)
+    target: np.ndarray  # (days,)
+    controls: np.ndarray  # (days, controls)
+    peak_delays: np.ndarray
+    shapes: List[str]
+    folds: List[Tuple[int, int]]  # (train_end, test_end); test starts at train_end
+    alpha: float = 1.0
+
+
+@dataclass
+class SearchResult:
+    """Best candidate found by a search."""
+    method: str
+    decay: np.ndarray
+    k: np.ndarray
+    half_spend: np.ndarray
+    cv_rmse: float
+    baseline_cv_rmse: float
+    trials: int
+    duration_seconds: float
+    workers: int = 1
+    history: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serializable summary for model diagnostics."""
+        return {
+            "method": self.method,
+            "cv_rmse": float(self.cv_rmse),
+            "baseline_cv_rmse": float(self.baseline_cv_rmse),
+            "trials": self.trials,
+            "workers": self.workers,
+            "duration_seconds": round(self.duration_seconds, 3),
+        }
+
+
+def time_series_folds(n_days: int, n_splits: int) -> List[Tuple[int, int]]:
+    """Expanding-window folds as (train_end, test_end) index pairs."""
+    n_splits = max(2, min(n_splits, n_days // 10 or 2))
+    return [
+        (int(test[0]), int(test[-1]) + 1)
+        for _, test in TimeSeriesSplit(n_splits=n_splits).split(np.empty(n_days))
+    ]
+
+
+def design_matrix(data: SearchData, candidate: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Saturated channel features plus controls for a candidate.
+
+    Returns:
+        The feature matrix and the absolute half-saturation points.
+    """
+    adstocked = adstock_matrix(data.spend, candidate[DECAY], data.peak_delays)
+    half_spend = candidate[HALF_RATIO] * median_adstock(adstocked)
+    saturated = saturation_matrix(adstocked, data.shapes, candidate[K], half_spend)
+    return np.nan_to_num(np.hstack([saturated, data.controls])), half_spend
+
+
+def cv_rmse(data: SearchData, candidate: np.ndarray) -> float:
+    """Out-of-fold RMSE of standardized ridge regression for a candidate."""
+    X, _ = design_matrix(data, candidate)
+    return matrix_cv_rmse(X, data.target, data.folds, data.alpha)
+
+
+def matrix_cv_rmse(X: np.ndarray, y: np.ndarray, folds: List[Tuple[int, int]], alpha: float) -> float:
+    """Out-of-fold RMSE of standardized ridge regression on a design matrix.
+
+    Equivalent to StandardScaler + Ridge(fit_intercept=True) refit on each
+    expanding training window. Training windows are nested, so the Gram
+    matrix is accumulated block by block instead of rescaling every fold.
+    """
+    n_features = X.shape[1]
+    gram = np.zeros((n_features, n_features))
+    cross = np.zeros(n_features)
+    sums = np.zeros(n_features)
+    y_sum = 0.0
+    seen = 0
+
+    squared_error, count = 0.0, 0
+    for train_end, test_end in folds:
+        block, y_block = X[seen:train_end], y[seen:train_end]
+        gram += block.T @ block
+        cross += block.T @ y_block
+        sums += block.sum(axis=0)
+        y_sum += float(y_block.sum())
+        seen = train_end
+
+        mean = sums / train_end
+        y_mean = y_sum / train_end
+        variance = np.diag(gram) / train_end - mean ** 2
+        scale = np.sqrt(np.maximum(variance, 0.0))
+        scale[scale < 1e-12] = 1.0  # Constant columns, as StandardScaler
+
+        centered_gram = (gram - train_end * np.outer(mean, mean)) / np.outer(scale, scale)
+        centered_cross = (cross - train_end * mean * y_mean) / scale
+        coef = np.linalg.solve(centered_gram + alpha * np.eye(n_features), centered_cross)
+
+        predicted = ((X[train_end:test_end] - mean) / scale) @ coef + y_mean
+        squared_error += float(np.sum((y[train_end:test_end] - predicted) ** 2))
+        count += test_end - train_end
+    return float(np.sqrt(squared_error / count)) if count else float("inf")
+
+
+def sweep_scores(
+    data: SearchData,
+    best: np.ndarray,
+    channel: int,
+    combinations: List[Tuple[float, float, float]]
+) -> List[float]:
+    """Scores of `best` with one channel's parameters replaced by each combination.
+
+    Only that channel's column is recomputed, and its adstock once per decay.
+    """
+    X, _ = design_matrix(data, best)
+    spend = data.spend[:, [channel]]
+    peak_delay = [data.peak_delays[channel]]
+    shape = [data.shapes[channel]]
+
+    adstocked = {}
+    scores = []
+    for decay, k, ratio in combinations:
+        if decay not in adstocked:
+            adstocked[decay] = adstock_matrix(spend, [decay], peak_delay)
+        column = adstocked[decay]
+        X[:, channel] = np.nan_to_num(
+            saturation_matrix(column, shape, [k], ratio * median_adstock(column))[:, 0]
+        )
+        scores.append(matrix_cv_rmse(X, data.target, data.folds, data.alpha))
+    return scores
+
+
+# Worker state: set once per process by the pool initializer
+_worker_data: Optional[SearchData] = None
+
+
+def _init_worker(data: SearchData) -> None:
+    global _worker_data
+    _worker_data = data
+
+
+def _score_batch(candidates: List[np.ndarray]) -> List[float]:
+    return [cv_rmse(_worker_data, candidate) for candidate in candidates]
+
+
+def _sweep_batch(task: Tuple[np.ndarray, int, List[Tuple[float, float, float]]]) -> List[float]:
+    return sweep_scores(_worker_data, *task)
+
+
+class HyperparameterSearch:
+    """
+    Searches per-channel adstock/saturation parameters by cross-validation.
+    """
+
+    def __init__(
+        self,
+        data: SearchData,
+        method: str = "random",
+        space: Optional[SearchSpace] = None,
+        n_trials: int = 200,
+        passes: int = 2,
+        workers: Optional[int] = None,
+        seed: int = 0
+    ):
+        """Initialize the search.
+
+        Args:
+            data: Spend, target, controls and folds.
+            method: "grid" (coordinate) or "random".
+            space: Values tried per channel.
+            n_trials: Candidates sampled by random search.
+            passes: Sweeps over all channels for grid search.
+            workers: Scoring processes (defaults to `mmm_search_workers`;
+                0 = CPU count, 1 = in-process).
+            seed: Random search seed.
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method: {method}")
+        self.data = data
+        self.method = method
+        self.space = space or SearchSpace()
+        self.n_trials = n_trials
+        self.passes = passes
+        self.rng = np.random.default_rng(seed)
+
+        workers = get_settings().mmm_search_workers if workers is None else workers
+        self.workers = workers or os.cpu_count() or 1
+        if self.workers > 1 and multiprocessing.current_process().daemon:
+            logger.info("Daemonic process cannot start workers; scoring MMM candidates in-process")
+            self.workers = 1
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.trials = 0
+
+    def run(self, initial: np.ndarray) -> SearchResult:
+        """Search from an initial (3, channels) candidate.
+
+        Args:
+            initial: Rows of decay, k and half_spend_ratio per channel.
+
+        Returns:
+            The best candidate and its cross-validated error.
+        """
+        start = time.perf_counter()
+        initial = np.asarray(initial, dtype=float)
+        try:
+            baseline = self._score([initial])[0]
+            if self.method == "grid":
+                best, best_score, history = self._grid(initial, baseline)
+            else:
+                best, best_score, history = self._random(initial, baseline)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        _, half_spend = design_matrix(self.data, best)
+        return SearchResult(
+            method=self.method,
+            decay=best[DECAY],
+            k=best[K],
+            half_spend=half_spend,
+            cv_rmse=best_score,
+            baseline_cv_rmse=baseline,
+            trials=self.trials,
+            duration_seconds=time.perf_counter() - start,
+            workers=self.workers,
+            history=history,
+        )
+
+    def _grid(self, best: np.ndarray, best_score: float) -> Tuple[np.ndarray, float, List[float]]:
+        history = [best_score]
+        combinations = self.space.combinations()
+        for _ in range(self.passes):
+            improved = False
+            for channel in range(best.shape[1]):
+                scores = self._sweep(best, channel, combinations)
+                index = int(np.argmin(scores))
+                if scores[index] < best_score:
+                    best = best.copy()
+                    best[:, channel] = combinations[index]
+                    best_score, improved = scores[index], True
+            history.append(best_score)
+            if not improved:
+                break
+        return best, best_score, history
+
+    def _random(self, best: np.ndarray, best_score: float) -> Tuple[np.ndarray, float, List[float]]:
+        n_channels = best.shape[1]
+        candidates = [
+            np.vstack([
+                self.rng.choice(np.asarray(self.space.decay, dtype=float), n_channels),
+                self.rng.choice(np.asarray(self.space.k, dtype=float), n_channels),
+                self.rng.choice(np.asarray(self.space.half_spend_ratio, dtype=float), n_channels),
+            ])
+            for _ in range(self.n_trials)
+        ]
+        scores = self._score(candidates)
+        index = int(np.argmin(scores))
+        if scores[index] < best_score:
+            best, best_score = candidates[index], scores[index]
+        return best, best_score, [best_score]
+
+    def _score(self, candidates: List[np.ndarray]) -> List[float]:
+        """Score candidates, in the process pool when there is more than one worker."""
+        self.trials += len(candidates)
+        if self.workers <= 1 or len(candidates) < 2:
+            return [cv_rmse(self.data, candidate) for candidate in candidates]
+        return self._map(_score_batch, self._batches(candidates))
+
+    def _sweep(
+        self,
+        best: np.ndarray,
+        channel: int,
+        combinations: List[Tuple[float, float, float]]
+    ) -> List[float]:
+        """Score every combination for one channel, split across the pool."""
+        self.trials += len(combinations)
+        if self.workers <= 1:
+            return sweep_scores(self.data, best, channel, combinations)
+        return self._map(_sweep_batch, [(best, channel, batch) for batch in self._batches(combinations)])
+
+    def _batches(self, items: List[Any]) -> List[List[Any]]:
+        # A few batches per worker keeps them busy without per-item overhead
+        batch_size = max(1, -(-len(items) // (self.workers * 4)))
+        return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    def _map(self, function, tasks: List[Any]) -> List[float]:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.data,)
+            )
+        return [score for batch in self._executor.map(function, tasks) for score in batch]
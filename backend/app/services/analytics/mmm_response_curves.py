@@ -0,0 +1,408 @@
+"""
+Response curves and budget allocation for trained Marketing Mix Models.
+
+A channel's response curve is the model's predicted incremental daily
+return at a constant daily spend: the steady-state adstock of that spend,
+through the fitted saturation curve, times the channel's fitted (unscaled)
+coefficient. `train_model` tabulates each curve on a dense spend grid and
+writes the tables to the model artifact store; `MarketingMixModel.response_curves`
+keeps the channel names and the artifact reference (models trained before
+that hold the tables inline).
+
+Allocation works on the tables:
+- "marginal_roi": each curve's upper concave envelope is a list of
+  segments with decreasing marginal ROI. Funding the steepest segments
+  first across all channels is the greedy marginal-ROI allocation, done as
+  one sort and cumulative sum.
+- "slsqp": SLSQP over the interpolated curves, for constraints the greedy
+  pass cannot express (spend limits on groups of channels).
+
+Parsed curves and their envelopes are cached per trained model version so
+repeated "what if" allocations skip both.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.optimize import minimize
+
+from ...core.config import get_settings
+from ..model_artifacts import get_model_artifact_store, is_artifact_ref
+from .mmm_transforms import adstock_steady_state, saturation_matrix
+
+logger = logging.getLogger(__name__)
+
+CURVE_POINTS = 128
+# Grid spans to this multiple of the largest observed daily spend
+CURVE_SPEND_MULTIPLE = 3.0
+
+
+def _upper_envelope(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Upper concave envelope of a tabulated curve.
+
+    Returns:
+        Breakpoints (including the first and last x) and the slope of each
+        segment between them, non-increasing.
+    """
+    hull: List[int] = []
+    for i in range(len(x)):
+        while len(hull) >= 2:
+            a, b = hull[-2], hull[-1]
+            # Drop b if it lies on or under the chord from a to i
+            if (y[b] - y[a]) * (x[i] - x[a]) <= (y[i] - y[a]) * (x[b] - x[a]):
+                hull.pop()
+            else:
+                break
+        hull.append(i)
+    breaks = x[hull]
+    slopes = np.diff(y[hull]) / np.maximum(np.diff(breaks), 1e-12)
+    return breaks, slopes
+
+
+class ResponseCurves:
+    """
+    Tabulated per-channel response curves with cached marginal-ROI envelopes.
+    """
+
+    def __init__(self, channels: Sequence[str], daily_spend: np.ndarray, daily_return: np.ndarray):
+        """Initialize from tables.
+
+        Args:
+            channels: Channel names, one per row.
+            daily_spend: (channels, points) increasing daily spend grid.
+            daily_return: (channels, points) predicted incremental daily return.
+        """
+        self.channels = list(channels)
+        self.daily_spend = np.asarray(daily_spend, dtype=float)
+        self.daily_return = np.asarray(daily_return, dtype=float)
+        self.marginal = np.array([
+            np.gradient(returns, spend) if len(spend) > 1 and spend[-1] > 0 else np.zeros_like(spend)
+            for spend, returns in zip(self.daily_spend, self.daily_return)
+        ])
+        self.envelopes = [
+            _upper_envelope(spend, returns)
+            for spend, returns in zip(self.daily_spend, self.daily_return)
+        ]
+
+    # ============== Serialization ==============
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable tables."""
+        return {
+            "points": self.daily_spend.shape[1] if self.channels else 0,
+            "channels": {
+                channel: {
+                    "daily_spend": self.daily_spend[i].tolist(),
+                    "daily_return": self.daily_return[i].tolist(),
+                }
+                for i, channel in enumerate(self.channels)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "ResponseCurves":
+        """Rebuild from `to_dict` output."""
+        channels = list(payload.get("channels", {}))
+        tables = [payload["channels"][channel] for channel in channels]
+        return cls(
+            channels,
+            np.array([table["daily_spend"] for table in tables], dtype=float).reshape(len(channels), -1),
+            np.array([table["daily_return"] for table in tables], dtype=float).reshape(len(channels), -1),
+        )
+
+    def subset(self, channels: Sequence[str]) -> "ResponseCurves":
+        """Curves for `channels` in that order; unknown channels get a flat zero curve."""
+        index = {channel: i for i, channel in enumerate(self.channels)}
+        points = self.daily_spend.shape[1] if self.channels else 2
+        subset = ResponseCurves.__new__(ResponseCurves)
+        subset.channels = list(channels)
+        subset.daily_spend = np.zeros((len(channels), points))
+        subset.daily_return = np.zeros((len(channels), points))
+        subset.marginal = np.zeros((len(channels), points))
+        subset.envelopes = []
+        for row, channel in enumerate(channels):
+            i = index.get(channel)
+            if i is None:
+                subset.daily_spend[row] = np.linspace(0.0, 1.0, points)
+                subset.envelopes.append((subset.daily_spend[row, [0, -1]], np.zeros(1)))
+                continue
+            subset.daily_spend[row] = self.daily_spend[i]
+            subset.daily_return[row] = self.daily_return[i]
+            subset.marginal[row] = self.marginal[i]
+            subset.envelopes.append(self.envelopes[i])
+        return subset
+
+    # ============== Evaluation ==============
+
+    def evaluate(self, spend: np.ndarray, days: int) -> np.ndarray:
+        """Predicted incremental return per channel for spend over `days` days.
+
+        Spend beyond the grid earns nothing extra (the curve is held flat).
+        """
+        daily = np.asarray(spend, dtype=float) / days
+        return days * np.array([
+            np.interp(daily[i], self.daily_spend[i], self.daily_return[i])
+            for i in range(len(self.channels))
+        ])
+
+    def marginal_roi(self, spend: np.ndarray, days: int) -> np.ndarray:
+        """Return on the next unit of spend per channel."""
+        daily = np.asarray(spend, dtype=float) / days
+        return np.array([
+            np.interp(daily[i], self.daily_spend[i], self.marginal[i], right=0.0)
+            for i in range(len(self.channels))
+        ])
+
+    # ============== Allocation ==============
+
+    def allocate(
+        self,
+        total_budget: float,
+        days: int,
+        lower: Optional[np.ndarray] = None,
+        upper: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Greedy marginal-ROI allocation of a budget over `days` days.
+
+        Args:
+            total_budget: Budget to allocate in full.
+            days: Period the budget covers.
+            lower: Minimum spend per channel.
+            upper: Maximum spend per channel (inf = unbounded).
+
+        Returns:
+            Spend per channel.
+        """
+        lower, upper = self._bounds(total_budget, lower, upper)
+        remaining = total_budget - lower.sum()
+
+        starts, widths, slopes, owners = [], [], [], []
+        for i, (breaks, envelope_slopes) in enumerate(self.envelopes):
+            # Envelope segments in period spend, then a tail past the grid
+            # that earns no more than the last segment
+            seg_start = np.append(breaks[:-1], breaks[-1]) * days
+            seg_end = np.append(breaks[1:], np.inf) * days
+            seg_slope = np.append(envelope_slopes, min(envelope_slopes[-1] if len(envelope_slopes) else 0.0, 0.0))
+
+            # Clip to this channel's bounds
+            start = np.maximum(seg_start, lower[i])
+            end = np.minimum(seg_end, upper[i])
+            keep = end > start
+            starts.append(start[keep])
+            widths.append(np.minimum(end[keep] - start[keep], remaining))
+            slopes.append(seg_slope[keep])
+            owners.append(np.full(keep.sum(), i))
+
+        widths = np.concatenate(widths) if widths else np.empty(0)
+        slopes = np.concatenate(slopes) if slopes else np.empty(0)
+        owners = np.concatenate(owners) if owners else np.empty(0, dtype=int)
+
+        # Steepest first; ties keep channel and segment order
+        order = np.lexsort((np.arange(len(slopes)), -slopes))
+        funded = np.clip(remaining - (np.cumsum(widths[order]) - widths[order]), 0.0, widths[order])
+
+        spend = lower.copy()
+        np.add.at(spend, owners[order], funded)
+        return spend
+
+    def optimize(
+        self,
+        total_budget: float,
+        days: int,
+        lower: Optional[np.ndarray] = None,
+        upper: Optional[np.ndarray] = None,
+        groups: Optional[List[Dict[str, Any]]] = None,
+        x0: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """SLSQP allocation over the interpolated curves.
+
+        Args:
+            total_budget: Budget to allocate in full.
+            days: Period the budget covers.
+            lower: Minimum spend per channel.
+            upper: Maximum spend per channel.
+            groups: Spend limits on channel groups, each
+                {"channels": [...], "min": ..., "max": ...}.
+            x0: Starting allocation (defaults to the greedy allocation).
+
+        Returns:
+            Spend per channel and solver info (iterations, success, message).
+        """
+        lower, upper = self._bounds(total_budget, lower, upper)
+        if x0 is None:
+            x0 = self.allocate(total_budget, days, lower, upper)
+
+        constraints = [{
+            "type": "eq",
+            "fun": lambda x: np.sum(x) - total_budget,
+            "jac": lambda x: np.ones_like(x),
+        }]
+        index = {channel: i for i, channel in enumerate(self.channels)}
+        for group in groups or []:
+            mask = np.zeros(len(self.channels))
+            mask[[index[channel] for channel in group.get("channels", []) if channel in index]] = 1.0
+            if group.get("min") is not None:
+                constraints.append({
+                    "type": "ineq",
+                    "fun": lambda x, m=mask, v=float(group["min"]): m @ x - v,
+                    "jac": lambda x, m=mask: m,
+                })
+            if group.get("max") is not None:
+                constraints.append({
+                    "type": "ineq",
+                    "fun": lambda x, m=mask, v=float(group["max"]): v - m @ x,
+                    "jac": lambda x, m=mask: -m,
+                })
+
+        # Scale to keep the objective and gradient well conditioned
+        scale = max(float(np.abs(self.evaluate(x0, days)).sum()), 1.0)
+        result = minimize(
+            lambda x: -self.evaluate(x, days).sum() / scale,
+            x0,
+            jac=lambda x: -self.marginal_roi(x, days) / scale,
+            method="SLSQP",
+            bounds=list(zip(lower, np.minimum(upper, total_budget))),
+            constraints=constraints,
+            options={"maxiter": 500, "ftol": 1e-9},
+        )
+        if not result.success:
+            logger.warning(f"Budget optimization did not converge: {result.message}")
+        info = {"iterations": int(result.nit), "success": bool(result.success), "message": str(result.message)}
+        return np.clip(result.x, lower, upper), info
+
+    def _bounds(
+        self,
+        total_budget: float,
+        lower: Optional[np.ndarray],
+        upper: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        n_channels = len(self.channels)
+        lower = np.zeros(n_channels) if lower is None else np.asarray(lower, dtype=float)
+        upper = np.full(n_channels, np.inf) if upper is None else np.asarray(upper, dtype=float)
+        if lower.sum() > total_budget + 1e-9:
+            raise ValueError("Minimum channel spend exceeds the total budget")
+        if upper.sum() < total_budget - 1e-9:
+            raise ValueError("Maximum channel spend is below the total budget")
+        return lower, upper
+
+
+def save_response_curves(curves: ResponseCurves) -> Dict[str, Any]:
+    """Write curve tables to the artifact store.
+
+    Returns:
+        The payload to store on the model: channel names, grid points and
+        the artifact reference.
+    """
+    ref = get_model_artifact_store().save({
+        "daily_spend": np.ascontiguousarray(curves.daily_spend),
+        "daily_return": np.ascontiguousarray(curves.daily_return),
+    })
+    return {
+        "points": curves.daily_spend.shape[1] if curves.channels else 0,
+        "channels": list(curves.channels),
+        "artifact": ref,
+    }
+
+
+def load_response_curves(payload: Dict[str, Any]) -> ResponseCurves:
+    """Rebuild curves from a stored payload, memory-mapping artifact tables."""
+    ref = payload.get("artifact")
+    if not is_artifact_ref(ref):
+        return ResponseCurves.from_dict(payload)
+    tables = get_model_artifact_store().load(ref)
+    return ResponseCurves(payload["channels"], tables["daily_spend"], tables["daily_return"])
+
+
+def build_response_curves(
+    channels: Sequence[str],
+    max_daily_spend: Sequence[float],
+    decays: Sequence[float],
+    peak_delays: Sequence[int],
+    shapes: Sequence[str],
+    k: Sequence[float],
+    half_spend: Sequence[float],
+    coefficients: Sequence[float],
+    points: int = CURVE_POINTS
+) -> ResponseCurves:
+    """Tabulate fitted response curves.
+
+    Args:
+        channels: Channel names.
+        max_daily_spend: Largest observed daily spend per channel.
+        decays: Adstock decay per channel.
+        peak_delays: Adstock peak delay per channel.
+        shapes: Saturation curve per channel.
+        k: Saturation shape parameter per channel.
+        half_spend: Absolute half-saturation point per channel (adstocked units).
+        coefficients: Fitted coefficient per unit of saturated feature.
+        points: Grid points per curve.
+
+    Returns:
+        The tabulated curves.
+    """
+    top = np.maximum(np.asarray(max_daily_spend, dtype=float), 1.0) * CURVE_SPEND_MULTIPLE
+    daily_spend = np.linspace(0.0, 1.0, points)[None, :] * top[:, None]
+
+    gain = adstock_steady_state(decays, peak_delays)
+    levels = (daily_spend * gain[:, None]).T  # (points, channels)
+    saturated = saturation_matrix(levels, shapes, k, half_spend)
+    baseline = saturation_matrix(np.zeros((1, len(channels))), shapes, k, half_spend)
+    response = np.nan_to_num(saturated - baseline) * np.asarray(coefficients, dtype=float)
+    return ResponseCurves(channels, daily_spend, response.T)
+
+
+class ResponseCurveCache:
+    """
+    Process-wide LRU of parsed response curves, keyed by model version.
+    """
+
+    def __init__(self, max_models: int = 64):
+        """Initialize the cache.
+
+        Args:
+            max_models: Trained model versions kept in memory.
+        """
+        self.max_models = max_models
+        self._curves: "OrderedDict[Tuple[str, Optional[str]], ResponseCurves]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, key: Tuple[str, Optional[str]]) -> Optional[ResponseCurves]:
+        """Get cached curves, or None."""
+        curves = self._curves.get(key)
+        if curves is None:
+            self._counters["misses"] += 1
+            return None
+        self._curves.move_to_end(key)
+        self._counters["hits"] += 1
+        return curves
+
+    def put(self, key: Tuple[str, Optional[str]], curves: ResponseCurves):
+        """Cache curves, evicting the least recently used model version."""
+        self._curves[key] = curves
+        self._curves.move_to_end(key)
+        while len(self._curves) > self.max_models:
+            self._curves.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached curves."""
+        self._curves.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics."""
+        return {"models": len(self._curves), **self._counters}
+
+
+# Global cache instance
+_curve_cache: Optional[ResponseCurveCache] = None
+
+
+def get_response_curve_cache() -> Optional[ResponseCurveCache]:
+    """Get the process-wide response curve cache (None if disabled)."""
+    global _curve_cache
+    settings = get_settings()
+    if settings.mmm_response_curve_cache_size <= 0:
+        return None
+    if _curve_cache is None:
+        _curve_cache = ResponseCurveCache(max_models=settings.mmm_response_curve_cache_size)
+    return _curve_cache
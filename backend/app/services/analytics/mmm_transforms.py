@@ -0,0 +1,131 @@
+"""
+Vectorized adstock and saturation kernels for Marketing Mix Modeling.
+
+Spend is laid out as a (days, channels) matrix and every channel is
+transformed at once:
+- Geometric adstock `a[t] = s[t] + decay * a[t - 1]` is a first-order
+  recursive filter, run with `scipy.signal.lfilter` down the day axis.
+- Delayed adstock is a finite convolution with the kernel
+  `[1, decay * w_1, ..., decay * w_P]`, `w_j = (j / P) ** P * exp(P - j)`.
+- Saturation curves broadcast per-channel parameters across the matrix.
+
+Channels sharing the same adstock parameters go through one filter call.
+Results match `MarketingMixModelingService.apply_adstock` and
+`apply_saturation` applied channel by channel.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+SATURATION_SHAPES = ("hill", "logistic", "linear")
+
+
+def delayed_adstock_kernel(decay: float, peak_delay: int) -> np.ndarray:
+    """FIR kernel of the delayed (peak_delay > 0) adstock."""
+    lags = np.arange(1, peak_delay + 1, dtype=float)
+    weights = (lags / peak_delay) ** peak_delay * np.exp(peak_delay - lags)
+    return np.concatenate(([1.0], decay * weights))
+
+
+def adstock_matrix(
+    spend: np.ndarray,
+    decays: Sequence[float],
+    peak_delays: Optional[Sequence[int]] = None
+) -> np.ndarray:
+    """Adstock every column of a (days, channels) spend matrix.
+
+    Args:
+        spend: Spend by day (rows) and channel (columns).
+        decays: Decay rate per channel.
+        peak_delays: Days to peak effect per channel (0 = geometric).
+
+    Returns:
+        Adstocked spend, same shape as `spend`.
+    """
+    spend = np.asarray(spend, dtype=float)
+    if peak_delays is None:
+        peak_delays = [0] * spend.shape[1]
+
+    groups: Dict[Tuple[float, int], List[int]] = defaultdict(list)
+    for column, (decay, peak_delay) in enumerate(zip(decays, peak_delays)):
+        groups[(float(decay), int(peak_delay or 0))].append(column)
+
+    adstocked = np.empty_like(spend)
+    if not len(spend):
+        return adstocked
+    for (decay, peak_delay), columns in groups.items():
+        if peak_delay == 0:
+            numerator, denominator = [1.0], [1.0, -decay]
+        else:
+            numerator, denominator = delayed_adstock_kernel(decay, peak_delay), [1.0]
+        adstocked[:, columns] = lfilter(numerator, denominator, spend[:, columns], axis=0)
+    return adstocked
+
+
+def adstock_steady_state(decays: Sequence[float], peak_delays: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Adstock of a constant daily spend of 1 once carryover has built up.
+
+    Geometric adstock converges to `1 / (1 - decay)`; delayed adstock to the
+    sum of its kernel.
+    """
+    if peak_delays is None:
+        peak_delays = [0] * len(decays)
+    return np.array([
+        1.0 / (1.0 - min(float(decay), 0.999)) if not peak_delay
+        else float(delayed_adstock_kernel(float(decay), int(peak_delay)).sum())
+        for decay, peak_delay in zip(decays, peak_delays)
+    ])
+
+
+def saturation_matrix(
+    adstocked: np.ndarray,
+    shapes: Sequence[str],
+    k: Sequence[float],
+    half_spend: Sequence[Optional[float]]
+) -> np.ndarray:
+    """Saturate every column of a (days, channels) adstocked matrix.
+
+    Args:
+        adstocked: Adstocked spend by day and channel.
+        shapes: Curve per channel ("hill", "logistic" or "linear"; anything
+            else is treated as "hill").
+        k: Shape parameter per channel.
+        half_spend: Spend at 50% saturation per channel; None uses the
+            channel's median adstocked spend.
+
+    Returns:
+        Saturated spend, same shape as `adstocked`.
+    """
+    adstocked = np.asarray(adstocked, dtype=float)
+    k = np.asarray(k, dtype=float)
+    half = np.array([np.nan if h is None else h for h in half_spend], dtype=float)
+    if np.isnan(half).any():
+        half = np.where(np.isnan(half), median_adstock(adstocked), half)
+
+    shapes = np.array([shape if shape in SATURATION_SHAPES else "hill" for shape in shapes])
+    saturated = np.empty_like(adstocked)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hill = shapes == "hill"
+        if hill.any():
+            x, kk, h = adstocked[:, hill], k[hill], half[hill]
+            saturated[:, hill] = x ** kk / (x ** kk + h ** kk)
+
+        logistic = shapes == "logistic"
+        if logistic.any():
+            x, kk, h = adstocked[:, logistic], k[logistic], half[logistic]
+            saturated[:, logistic] = 1 / (1 + np.exp(-kk * (x - h) / h))
+
+        linear = shapes == "linear"
+        if linear.any():
+            x, h = adstocked[:, linear], half[linear]
+            saturated[:, linear] = np.minimum(x / (x + h), 1.0)
+    return saturated
+
+
+def median_adstock(adstocked: np.ndarray) -> np.ndarray:
+    """Per-channel median adstocked spend (the default half-saturation point)."""
+    if not len(adstocked):
+        return np.ones(adstocked.shape[1])
+    return np.median(adstocked, axis=0)
@@ -0,0 +1,336 @@
+"""
+Organization overview statistics for the dashboard landing page.
+
+Counts campaigns, assets, tasks and scheduled posts with one grouped
+aggregate query per table (COUNT ... FILTER for the time-windowed and
+conditional counts), scoped to a single organization. The queries run
+concurrently through `QueryFanout`.
+
+Snapshots are cached per organization for `analytics_overview_cache_ttl_seconds`.
+Any flush that creates, updates or deletes one of the counted entities
+invalidates its organization's snapshot once the transaction commits (see
+the session listeners at the bottom of this module). Other worker
+processes pick up changes when their copy expires.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import and_, desc, event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ...core.config import get_settings
+from ...models.asset import Asset
+from ...models.campaign import Campaign
+from ...models.scheduled_post import ScheduledPost
+from ...models.task import Task
+from .query_fanout import QueryFanout
+
+logger = logging.getLogger(__name__)
+
+RECENT_ACTIVITY_LIMIT = 10
+
+
+def _key(value: Any) -> str:
+    """Dictionary key for a status/type column value."""
+    return value.value if hasattr(value, "value") else str(value)
+
+
+def _rate(part: int, total: int) -> float:
+    return (part / total * 100) if total > 0 else 0
+
+
+class OverviewStatsService:
+    """
+    Computes an organization's overview statistics from SQL aggregates.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_overview(self, organization_id: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get the overview snapshot, from the cache when fresh.
+
+        Args:
+            organization_id: Organization ID.
+            now: Reference time for the weekly/monthly windows.
+
+        Returns:
+            Dict shaped like the `/api/analytics/overview` response.
+        """
+        cache = get_overview_cache()
+        if cache is None:
+            return await self.compute(organization_id, now)
+
+        snapshot = cache.get(organization_id)
+        if snapshot is not None:
+            return snapshot
+
+        generation = cache.generation(organization_id)
+        snapshot = await self.compute(organization_id, now)
+        cache.put(organization_id, snapshot, generation)
+        return snapshot
+
+    async def compute(self, organization_id: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Compute the overview snapshot from the database."""
+        now = now or datetime.utcnow()
+        week_ago = now - timedelta(days=7)
+        month_ago = now - timedelta(days=30)
+
+        async with QueryFanout(self.db) as fanout:
+            campaigns, assets, tasks, posts, activity = await fanout.gather(
+                lambda db: self._campaign_stats(db, organization_id, week_ago, month_ago),
+                lambda db: self._asset_stats(db, organization_id, week_ago),
+                lambda db: self._task_stats(db, organization_id, now),
+                lambda db: self._post_stats(db, organization_id, week_ago),
+                lambda db: self._recent_activity(db, organization_id),
+            )
+        return {
+            "campaigns": campaigns,
+            "assets": assets,
+            "tasks": tasks,
+            "scheduled_posts": posts,
+            "recent_activity": activity,
+        }
+
+    # ============== Aggregates ==============
+
+    async def _campaign_stats(
+        self,
+        db: AsyncSession,
+        organization_id: str,
+        week_ago: datetime,
+        month_ago: datetime
+    ) -> Dict[str, Any]:
+        result = await db.execute(
+            select(
+                Campaign.status,
+                func.count().label("total"),
+                func.count().filter(Campaign.created_at >= week_ago).label("this_week"),
+                func.count().filter(Campaign.created_at >= month_ago).label("this_month"),
+            )
+            .where(Campaign.organization_id == organization_id)
+            .group_by(Campaign.status)
+        )
+        rows = result.all()
+
+        by_status = {_key(row.status): row.total for row in rows}
+        total = sum(by_status.values())
+        return {
+            "total": total,
+            "by_status": by_status,
+            "created_this_week": sum(row.this_week for row in rows),
+            "created_this_month": sum(row.this_month for row in rows),
+            "completion_rate": _rate(by_status.get("completed", 0), total),
+        }
+
+    async def _asset_stats(self, db: AsyncSession, organization_id: str, week_ago: datetime) -> Dict[str, Any]:
+        # Assets are scoped through their campaign
+        result = await db.execute(
+            select(
+                Asset.asset_type,
+                Asset.status,
+                func.count().label("total"),
+                func.count().filter(Asset.created_at >= week_ago).label("this_week"),
+            )
+            .join(Campaign, Asset.campaign_id == Campaign.id)
+            .where(Campaign.organization_id == organization_id)
+            .group_by(Asset.asset_type, Asset.status)
+        )
+        rows = result.all()
+
+        by_type: Dict[str, int] = {}
+        by_status: Dict[str, int] = {}
+        for row in rows:
+            by_type[_key(row.asset_type)] = by_type.get(_key(row.asset_type), 0) + row.total
+            by_status[_key(row.status)] = by_status.get(_key(row.status), 0) + row.total
+        return {
+            "total": sum(row.total for row in rows),
+            "by_type": by_type,
+            "by_status": by_status,
+            "created_this_week": sum(row.this_week for row in rows),
+        }
+
+    async def _task_stats(self, db: AsyncSession, organization_id: str, now: datetime) -> Dict[str, Any]:
+        result = await db.execute(
+            select(
+                Task.status,
+                func.count().label("total"),
+                func.count().filter(
+                    and_(Task.due_date < now, Task.status != "completed")
+                ).label("overdue"),
+                func.count().filter(Task.priority == "high").label("high_priority"),
+            )
+            .where(Task.organization_id == organization_id)
+            .group_by(Task.status)
+        )
+        rows = result.all()
+
+        by_status = {_key(row.status): row.total for row in rows}
+        total = sum(by_status.values())
+        return {
+            "total": total,
+            "by_status": by_status,
+            "completion_rate": _rate(by_status.get("completed", 0), total),
+            "overdue_count": sum(row.overdue for row in rows),
+            "high_priority_count": sum(row.high_priority for row in rows),
+        }
+
+    async def _post_stats(self, db: AsyncSession, organization_id: str, week_ago: datetime) -> Dict[str, Any]:
+        result = await db.execute(
+            select(
+                ScheduledPost.status,
+                ScheduledPost.platform,
+                func.count().label("total"),
+                func.count().filter(ScheduledPost.published_at >= week_ago).label("published"),
+                func.count().filter(ScheduledPost.scheduled_at >= week_ago).label("scheduled"),
+            )
+            .where(ScheduledPost.organization_id == organization_id)
+            .group_by(ScheduledPost.status, ScheduledPost.platform)
+        )
+        rows = result.all()
+
+        by_status: Dict[str, int] = {}
+        by_platform: Dict[str, int] = {}
+        for row in rows:
+            by_status[_key(row.status)] = by_status.get(_key(row.status), 0) + row.total
+            by_platform[_key(row.platform)] = by_platform.get(_key(row.platform), 0) + row.total
+        return {
+            "total": sum(row.total for row in rows),
+            "by_status": by_status,
+            "by_platform": by_platform,
+            "published_this_week": sum(row.published for row in rows),
+            "scheduled_this_week": sum(row.scheduled for row in rows),
+        }
+
+    async def _recent_activity(self, db: AsyncSession, organization_id: str) -> List[Dict[str, Any]]:
+        limit = RECENT_ACTIVITY_LIMIT // 2
+        campaigns = await db.execute(
+            select(Campaign.id, Campaign.name, Campaign.created_at)
+            .where(Campaign.organization_id == organization_id)
+            .order_by(desc(Campaign.created_at))
+            .limit(limit)
+        )
+        assets = await db.execute(
+            select(Asset.id, Asset.name, Asset.created_at)
+            .join(Campaign, Asset.campaign_id == Campaign.id)
+            .where(Campaign.organization_id == organization_id)
+            .order_by(desc(Asset.created_at))
+            .limit(limit)
+        )
+
+        activity = [
+            {"id": row.id, "type": kind, "action": "created", "title": row.name, "timestamp": row.created_at}
+            for kind, rows in (("campaign", campaigns.all()), ("asset", assets.all()))
+            for row in rows
+        ]
+        activity.sort(key=lambda item: item["timestamp"], reverse=True)
+        return activity[:RECENT_ACTIVITY_LIMIT]
+
+
+class OverviewSnapshotCache:
+    """
+    Process-wide cache of per-organization overview snapshots.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0):
+        """Initialize the cache.
+
+        Args:
+            ttl_seconds: Maximum age of a snapshot before it is recomputed.
+        """
+        self.ttl_seconds = ttl_seconds
+        self._snapshots: Dict[str, tuple] = {}
+        # Bumped on invalidation so a computation racing a write is not cached
+        self._generations: Dict[str, int] = {}
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, organization_id: str) -> Optional[Dict[str, Any]]:
+        """Get a fresh snapshot, or None."""
+        entry = self._snapshots.get(organization_id)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._counters["hits"] += 1
+            return entry[0]
+        self._counters["misses"] += 1
+        return None
+
+    def generation(self, organization_id: str) -> int:
+        """Current invalidation generation, taken before computing a snapshot."""
+        return self._generations.get(organization_id, 0)
+
+    def put(self, organization_id: str, snapshot: Dict[str, Any], generation: int):
+        """Store a snapshot unless the organization was invalidated meanwhile."""
+        if self._generations.get(organization_id, 0) == generation:
+            self._snapshots[organization_id] = (snapshot, time.monotonic())
+
+    def invalidate(self, organization_id: str):
+        """Drop an organization's snapshot after a write."""
+        self._generations[organization_id] = self._generations.get(organization_id, 0) + 1
+        self._snapshots.pop(organization_id, None)
+        self._counters["invalidations"] += 1
+
+    def clear(self):
+        """Drop all snapshots."""
+        for organization_id in list(self._snapshots):
+            self.invalidate(organization_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics."""
+        return {"organizations": len(self._snapshots), **self._counters}
+
+
+# Global cache instance
+_overview_cache: Optional[OverviewSnapshotCache] = None
+
+
+def get_overview_cache() -> Optional[OverviewSnapshotCache]:
+    """Get the process-wide overview cache (None if caching is disabled)."""
+    global _overview_cache
+    settings = get_settings()
+    if settings.analytics_overview_cache_ttl_seconds <= 0:
+        return None
+    if _overview_cache is None:
+        _overview_cache = OverviewSnapshotCache(
+            ttl_seconds=settings.analytics_overview_cache_ttl_seconds,
+        )
+    return _overview_cache
+
+
+# ============== Invalidation ==============
+
+_PENDING_KEY = "overview_stats_organizations"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_overview_changes(session: Session, flush_context) -> None:
+    """Remember which organizations' overview counts a flush touched."""
+    organization_ids: Set[str] = set()
+    campaign_ids: Set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Campaign, Task, ScheduledPost)):
+            organization_ids.add(obj.organization_id)
+        elif isinstance(obj, Asset):
+            campaign_ids.add(obj.campaign_id)
+    if campaign_ids:
+        organization_ids.update(session.connection().execute(
+            select(Campaign.organization_id).where(Campaign.id.in_(list(campaign_ids)))
+        ).scalars())
+    organization_ids.discard(None)
+    if organization_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(organization_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_overview_after_commit(session: Session) -> None:
+    organization_ids = session.info.pop(_PENDING_KEY, None)
+    cache = get_overview_cache()
+    if organization_ids and cache is not None:
+        for organization_id in organization_ids:
+            cache.invalidate(organization_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_overview_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,105 @@
+"""
+Concurrent fan-out of independent read queries.
+
+An `AsyncSession` runs one statement at a time, so dashboard code that
+awaits several independent aggregates on the request session pays the sum
+of their latencies. `QueryFanout` runs them concurrently instead, each on a
+session from a small per-request pool bound to the same engine, and
+returns their results in order.
+
+At most `width` sessions (and so pooled connections) are open at once,
+`analytics_query_fanout_width` by default; queued queries reuse sessions
+as they free up. Queries on pooled sessions do not see the request
+session's uncommitted changes, so only use this for reads.
+
+SQLite, mocked sessions and a width of 1 fall back to running the queries
+in order on the request session.
+
+    async with QueryFanout(db) as fanout:
+        revenue, channels = await fanout.gather(
+            lambda session: revenue_query(session),
+            lambda session: channel_query(session),
+        )
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+Query = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class QueryFanout:
+    """
+    Per-request pool of sessions for running independent reads concurrently.
+    """
+
+    def __init__(self, db: AsyncSession, width: Optional[int] = None):
+        """Initialize the fan-out.
+
+        Args:
+            db: Request session; its engine backs the pooled sessions.
+            width: Maximum concurrent queries (defaults to the
+                `analytics_query_fanout_width` setting).
+        """
+        self.db = db
+        self.width = get_settings().analytics_query_fanout_width if width is None else width
+
+        bind = getattr(db, "bind", None)
+        self.concurrent = (
+            self.width > 1 and isinstance(bind, AsyncEngine) and bind.dialect.name != "sqlite"
+        )
+        self._session_factory = (
+            async_sessionmaker(bind, class_=AsyncSession, expire_on_commit=False)
+            if self.concurrent else None
+        )
+        self._semaphore = asyncio.Semaphore(max(self.width, 1))
+        self._idle: List[AsyncSession] = []
+        self._sessions: List[AsyncSession] = []
+
+    async def __aenter__(self) -> "QueryFanout":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def gather(self, *queries: Query) -> List[Any]:
+        """Run queries concurrently and return their results in order.
+
+        Every query runs to completion before the first failure is raised,
+        so no pooled session is closed under a running statement.
+        """
+        if not self.concurrent or len(queries) < 2:
+            return [await query(self.db) for query in queries]
+
+        results = await asyncio.gather(*(self._run(query) for query in queries), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+
+    async def _run(self, query: Query) -> Any:
+        async with self._semaphore:
+            if self._idle:
+                session = self._idle.pop()
+            else:
+                session = self._session_factory()
+                self._sessions.append(session)
+            try:
+                return await query(session)
+            finally:
+                self._idle.append(session)
+
+    async def close(self) -> None:
+        """Close the pooled sessions, returning their connections."""
+        sessions, self._sessions, self._idle = self._sessions, [], []
+        for session in sessions:
+            try:
+                await session.close()
+            except Exception as e:
+                logger.warning(f"Failed to close fan-out session: {e}")
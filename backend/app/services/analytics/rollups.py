@@ -0,0 +1,446 @@
+"""
+Pre-aggregated rollups for dashboard metrics.
+
+Keeps hourly and daily totals per (organization, channel, campaign,
+attribution model) in the `analytics_rollups` table:
+- Attributed conversions (count and value) by conversion time
+- Attributions (count, value and weight) by calculation time
+
+The attribution writer and conversion tracker apply signed deltas as they
+change the underlying rows, so the buckets stay current without rescans.
+With `analytics_rollups_timescale` on PostgreSQL only hourly rows are
+written and daily totals come from the `analytics_rollups_daily`
+continuous aggregate (see `TimescaleDBSetup.create_analytics_rollups_daily`).
+
+`plan_range` splits a dashboard time range into whole buckets answered
+from rollups and sub-hour edges answered from raw rows, keeping reads
+O(buckets) instead of O(events).
+"""
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, column, delete, func, insert, select, table, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import get_settings
+from ...models.analytics_rollup import AnalyticsRollup
+from ...models.attribution import Attribution
+from ...models.attribution_touchpoint import AttributionTouchpoint
+from ...models.conversion_event import ConversionEvent, ConversionStatus
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+MEASURES = (
+    "conversion_count",
+    "conversion_value",
+    "attribution_count",
+    "attributed_value",
+    "weight_sum",
+)
+
+DIMENSIONS = ("channel", "campaign_id", "model_type")
+
+# Continuous aggregate over hourly rows (TimescaleDB only)
+DAILY_VIEW = "analytics_rollups_daily"
+
+RollupKey = Tuple[str, str, datetime, str, str, str]
+
+
+def floor_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the bucket containing `timestamp`."""
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """Start of the first bucket at or after `timestamp`."""
+    start = floor_bucket(timestamp, granularity)
+    return start if start == timestamp else start + GRANULARITIES[granularity]
+
+
+def _model_value(model_type: Any) -> str:
+    return getattr(model_type, "value", model_type) or ""
+
+
+class RollupDeltas:
+    """
+    Signed changes to rollup buckets, accumulated before one write.
+    """
+
+    def __init__(self, granularities: Sequence[str] = ("hour", "day")):
+        self.granularities = tuple(granularities)
+        self.totals: Dict[RollupKey, List[float]] = defaultdict(lambda: [0.0] * len(MEASURES))
+
+    def __bool__(self) -> bool:
+        return any(any(values) for values in self.totals.values())
+
+    def add_conversion(
+        self,
+        organization_id: str,
+        timestamp: datetime,
+        value: float,
+        sign: int = 1
+    ) -> None:
+        """Count an attributed conversion (sign=-1 to remove it)."""
+        self.add(organization_id, timestamp, ("", "", ""), (sign, sign * (value or 0.0), 0, 0.0, 0.0))
+
+    def add_attribution(
+        self,
+        organization_id: str,
+        timestamp: datetime,
+        channel: str,
+        campaign_id: Optional[str],
+        model_type: Any,
+        value: float,
+        weight: float,
+        sign: int = 1
+    ) -> None:
+        """Count an attribution row (sign=-1 to remove it)."""
+        self.add(
+            organization_id, timestamp, (channel or "", campaign_id or "", _model_value(model_type)),
+            (0, 0.0, sign, sign * (value or 0.0), sign * (weight or 0.0))
+        )
+
+    def add(self, organization_id: str, timestamp: datetime, dimensions: Tuple[str, str, str], measures) -> None:
+        """Add measures (in MEASURES order) to every granularity's bucket."""
+        if timestamp is None:
+            return
+        for granularity in self.granularities:
+            totals = self.totals[(organization_id, granularity, floor_bucket(timestamp, granularity), *dimensions)]
+            for i, amount in enumerate(measures):
+                totals[i] += amount
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Non-zero deltas as rollup rows."""
+        return [
+            {
+                "organization_id": key[0],
+                "granularity": key[1],
+                "bucket": key[2],
+                **dict(zip(DIMENSIONS, key[3:])),
+                **dict(zip(MEASURES, values)),
+            }
+            for key, values in self.totals.items()
+            if any(values)
+        ]
+
+
+@dataclass
+class RangePlan:
+    """A time range split into whole rollup buckets and raw edges."""
+    # (granularity, first bucket start, end exclusive)
+    buckets: List[Tuple[str, datetime, datetime]] = field(default_factory=list)
+    # (start, end, end inclusive) answered from raw rows
+    raw: List[Tuple[datetime, datetime, bool]] = field(default_factory=list)
+
+
+def plan_range(start: datetime, end: datetime, inclusive: bool = True) -> RangePlan:
+    """
+    Split the range [start, end] (or [start, end) if not `inclusive`) for routing.
+
+    Whole days come from daily rollups, whole hours at either side of them
+    from hourly rollups, and the sub-hour edges from raw rows.
+    """
+    hour_start, hour_end = ceil_bucket(start, "hour"), floor_bucket(end, "hour")
+    if hour_start >= hour_end:
+        return RangePlan(raw=[(start, end, inclusive)])
+
+    plan = RangePlan()
+    if start < hour_start:
+        plan.raw.append((start, hour_start, False))
+    if inclusive or hour_end < end:
+        plan.raw.append((hour_end, end, inclusive))
+
+    day_start, day_end = ceil_bucket(hour_start, "day"), floor_bucket(hour_end, "day")
+    if day_start < day_end:
+        plan.buckets.append(("day", day_start, day_end))
+        if hour_start < day_start:
+            plan.buckets.append(("hour", hour_start, day_start))
+        if day_end < hour_end:
+            plan.buckets.append(("hour", day_end, hour_end))
+    else:
+        plan.buckets.append(("hour", hour_start, hour_end))
+    return plan
+
+
+class RollupStore:
+    """
+    Reads and incrementally maintains analytics rollups.
+    """
+
+    def __init__(self, db: AsyncSession, chunk_size: int = 2000, timescale: Optional[bool] = None):
+        """Initialize the store.
+
+        Args:
+            db: SQLAlchemy async session for database operations.
+            chunk_size: Rows per statement.
+            timescale: Read daily rollups from the continuous aggregate
+                (defaults to the `analytics_rollups_timescale` setting on
+                PostgreSQL).
+        """
+        self.db = db
+        self.chunk_size = chunk_size
+        self.dialect = db.get_bind().dialect.name
+        if timescale is None:
+            timescale = get_settings().analytics_rollups_timescale and self.dialect == "postgresql"
+        self.timescale = timescale
+        self.granularities = ("hour",) if timescale else ("hour", "day")
+
+    def deltas(self) -> RollupDeltas:
+        """Empty deltas for the granularities this store writes."""
+        return RollupDeltas(self.granularities)
+
+    # ============== Maintenance ==============
+
+    async def apply(self, deltas: RollupDeltas) -> int:
+        """Add deltas to their buckets. Does not commit.
+
+        Returns:
+            Number of buckets touched.
+        """
+        rows = deltas.rows()
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            if self.dialect in ("postgresql", "sqlite"):
+                await self._upsert(chunk)
+            else:
+                await self._split_write(chunk)
+        return len(rows)
+
+    async def record_attributions(self, rows: List[Dict[str, Any]]) -> None:
+        """Apply the rollup change of upserting attribution rows. Does not commit.
+
+        Call before the upsert: rows already stored for the same
+        (conversion, touchpoint, model) key are subtracted from the bucket
+        of their previous calculation time.
+
+        Args:
+            rows: Attribution rows about to be written, with organization_id,
+                conversion_event_id, touchpoint_id, model_type,
+                attributed_value, weight and calculated_at.
+        """
+        if not rows:
+            return
+
+        keys = {(r["conversion_event_id"], r["touchpoint_id"], r["model_type"]) for r in rows}
+        previous = (await self.db.execute(
+            select(
+                Attribution.organization_id,
+                Attribution.conversion_event_id,
+                Attribution.touchpoint_id,
+                Attribution.model_type,
+                Attribution.attributed_value,
+                Attribution.weight,
+                Attribution.calculated_at,
+            ).where(Attribution.conversion_event_id.in_(list({key[0] for key in keys})))
+        )).all()
+        previous = [
+            row for row in previous
+            if (row.conversion_event_id, row.touchpoint_id, row.model_type) in keys
+        ]
+
+        touchpoints = {
+            row.id: (row.channel, row.campaign_id)
+            for row in (await self.db.execute(
+                select(AttributionTouchpoint.id, AttributionTouchpoint.channel, AttributionTouchpoint.campaign_id)
+                .where(AttributionTouchpoint.id.in_(list({key[1] for key in keys})))
+            )).all()
+        }
+
+        deltas = self.deltas()
+        for row in previous:
+            channel, campaign_id = touchpoints.get(row.touchpoint_id, ("", None))
+            deltas.add_attribution(
+                row.organization_id, row.calculated_at, channel, campaign_id,
+                row.model_type, row.attributed_value, row.weight, sign=-1
+            )
+        for row in rows:
+            channel, campaign_id = touchpoints.get(row["touchpoint_id"], ("", None))
+            deltas.add_attribution(
+                row["organization_id"], row["calculated_at"], channel, campaign_id,
+                row["model_type"], row["attributed_value"], row["weight"]
+            )
+        await self.apply(deltas)
+
+    async def rebuild(self, organization_id: str) -> int:
+        """
+        Recompute an organization's rollups from raw rows and commit.
+
+        Groups conversions and attributions by hour in the database and
+        derives daily rows from the hourly ones.
+
+        Returns:
+            Number of rollup rows written.
+        """
+        deltas = self.deltas()
+
+        hour = self._hour_expr(ConversionEvent.conversion_timestamp)
+        result = await self.db.execute(
+            select(
+                hour.label("hour"),
+                func.count(ConversionEvent.id).label("count"),
+                func.sum(ConversionEvent.conversion_value).label("value"),
+            ).where(and_(
+                ConversionEvent.organization_id == organization_id,
+                ConversionEvent.status == ConversionStatus.ATTRIBUTED,
+            )).group_by(hour)
+        )
+        for row in result.all():
+            deltas.add(
+                organization_id, self._as_datetime(row.hour), ("", "", ""),
+                (row.count, row.value or 0.0, 0, 0.0, 0.0)
+            )
+
+        hour = self._hour_expr(Attribution.calculated_at)
+        result = await self.db.execute(
+            select(
+                hour.label("hour"),
+                AttributionTouchpoint.channel,
+                AttributionTouchpoint.campaign_id,
+                Attribution.model_type,
+                func.count(Attribution.id).label("count"),
+                func.sum(Attribution.attributed_value).label("value"),
+                func.sum(Attribution.weight).label("weight"),
+            ).join(
+                AttributionTouchpoint,
+                Attribution.touchpoint_id == AttributionTouchpoint.id
+            ).where(
+                Attribution.organization_id == organization_id
+            ).group_by(hour, AttributionTouchpoint.channel, AttributionTouchpoint.campaign_id, Attribution.model_type)
+        )
+        for row in result.all():
+            deltas.add(
+                organization_id, self._as_datetime(row.hour),
+                (row.channel or "", row.campaign_id or "", _model_value(row.model_type)),
+                (0, 0.0, row.count, row.value or 0.0, row.weight or 0.0)
+            )
+
+        await self.db.execute(delete(AnalyticsRollup).where(AnalyticsRollup.organization_id == organization_id))
+        written = await self.apply(deltas)
+        await self.db.commit()
+
+        logger.info(f"Rebuilt {written} analytics rollups for org {organization_id}")
+        return written
+
+    def _hour_expr(self, timestamp_column):
+        """Hour truncation in the session's dialect."""
+        if self.dialect == "sqlite":
+            return func.strftime("%Y-%m-%d %H:00:00", timestamp_column)
+        return func.date_trunc("hour", timestamp_column)
+
+    @staticmethod
+    def _as_datetime(value: Any) -> Optional[datetime]:
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return value
+
+    async def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        """INSERT ... ON CONFLICT (bucket key) DO UPDATE SET measure = measure + excluded."""
+        rollups = AnalyticsRollup.__table__
+        dialect_insert = postgresql.insert if self.dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(AnalyticsRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["organization_id", "granularity", "bucket", *DIMENSIONS],
+            set_={
+                **{measure: rollups.c[measure] + stmt.excluded[measure] for measure in MEASURES},
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        await self.db.execute(stmt, rows)
+
+    async def _split_write(self, rows: List[Dict[str, Any]]) -> None:
+        """Look up existing buckets, then bulk UPDATE their totals and bulk INSERT the rest."""
+        key_columns = ("organization_id", "granularity", "bucket", *DIMENSIONS)
+        keys = [tuple(row[c] for c in key_columns) for row in rows]
+        existing = {
+            tuple(getattr(row, c) for c in key_columns): row
+            for row in (await self.db.execute(
+                select(AnalyticsRollup.id, *[getattr(AnalyticsRollup, c) for c in key_columns + MEASURES])
+                .where(tuple_(*[getattr(AnalyticsRollup, c) for c in key_columns]).in_(keys))
+            )).all()
+        }
+
+        updates, inserts = [], []
+        for key, row in zip(keys, rows):
+            if key in existing:
+                current = existing[key]
+                updates.append({
+                    "id": current.id,
+                    **{measure: getattr(current, measure) + row[measure] for measure in MEASURES},
+                })
+            else:
+                inserts.append(row)
+
+        if updates:
+            await self.db.execute(update(AnalyticsRollup), updates)
+        if inserts:
+            await self.db.execute(insert(AnalyticsRollup), inserts)
+
+    # ============== Reads ==============
+
+    def _source(self, granularity: str):
+        """Selectable holding rollups of a granularity, plus its row filter."""
+        if granularity == "day" and self.timescale:
+            view = table(DAILY_VIEW, *[column(c) for c in ("organization_id", "bucket", *DIMENSIONS, *MEASURES)])
+            return view, None
+        rollups = AnalyticsRollup.__table__
+        return rollups, rollups.c.granularity == granularity
+
+    async def totals(
+        self,
+        organization_id: str,
+        buckets: Iterable[Tuple[str, datetime, datetime]],
+        group_by: Sequence[str] = (),
+        attributions: bool = False,
+        model_types: Optional[Sequence[Any]] = None
+    ) -> Dict[Tuple, Dict[str, float]]:
+        """
+        Sum rollup measures over bucket ranges.
+
+        Args:
+            organization_id: Organization ID.
+            buckets: (granularity, start, end exclusive) ranges, e.g. from
+                `plan_range`.
+            group_by: Dimension names (and/or "bucket") to group by.
+            attributions: Sum attribution rows instead of conversion rows.
+            model_types: Restrict attribution rows to these models.
+
+        Returns:
+            Measures keyed by the tuple of group-by values.
+        """
+        merged: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: dict.fromkeys(MEASURES, 0.0))
+        for granularity, start, end in buckets:
+            source, row_filter = self._source(granularity)
+            conditions = [
+                source.c.organization_id == organization_id,
+                source.c.bucket >= start,
+                source.c.bucket < end,
+                source.c.model_type != "" if attributions else source.c.model_type == "",
+            ]
+            if row_filter is not None:
+                conditions.append(row_filter)
+            if model_types:
+                conditions.append(source.c.model_type.in_([_model_value(m) for m in model_types]))
+
+            group_columns = [source.c[name] for name in group_by]
+            result = await self.db.execute(
+                select(*group_columns, *[func.sum(source.c[m]).label(m) for m in MEASURES])
+                .where(and_(*conditions))
+                .group_by(*group_columns)
+            )
+            for row in result.all():
+                key = tuple(self._as_datetime(v) if name == "bucket" else v for name, v in zip(group_by, row))
+                totals = merged[key]
+                for measure in MEASURES:
+                    totals[measure] += getattr(row, measure) or 0.0
+        return dict(merged)
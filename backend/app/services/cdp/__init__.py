@@ -8,19 +8,36 @@ This module provides enterprise-grade customer data management including:
 - Client-side tracking SDK
 """
 
+from .identity_cache import IdentityCache, get_identity_cache
 from .identity_resolver import IdentityResolver, MatchResult, MatchConfidence
 from .event_processor import EventProcessor, ValidationResult
 from .event_ingestion import EventIngestionService
+from .event_spool import EventSpool, IngestionQueue, SpoolFullError, SpoolLockedError, get_ingestion_queue
 from .profile_enricher import ProfileEnricher
+from .segment_engine import SegmentEngine, CriteriaCompiler
+from .segment_index import SegmentPredicateIndex, get_segment_index
+from .trait_engine import ComputedTraitEngine
 from .client_sdk import ClientSDK
 
 __all__ = [
     "IdentityResolver",
     "MatchResult",
     "MatchConfidence",
+    "IdentityCache",
+    "get_identity_cache",
     "EventProcessor",
     "ValidationResult",
     "EventIngestionService",
+    "EventSpool",
+    "IngestionQueue",
+    "SpoolFullError",
+    "SpoolLockedError",
+    "get_ingestion_queue",
     "ProfileEnricher",
+    "SegmentEngine",
+    "CriteriaCompiler",
+    "SegmentPredicateIndex",
+    "get_segment_index",
+    "ComputedTraitEngine",
     "ClientSDK",
 ]
\ No newline at end of file
@@ -19,6 +19,7 @@ from ...models.customer import Customer
 from ...models.customer_event import CustomerEvent
 from ...models.customer_identity import CustomerIdentity, IdentityType
 from .event_processor import EventProcessor
+from .identity_cache import get_identity_cache
 
 logger = logging.getLogger(__name__)
 
@@ -330,6 +331,11 @@ class ClientSDK:
 
         await self.db.commit()
 
+        # The anonymous ID may have been cached as "no customer"
+        identity_cache = get_identity_cache()
+        if identity_cache is not None:
+            await identity_cache.invalidate(organization_id, "anonymous_id", anonymous_id)
+
         return {
             "success": True,
             "aliased_events": len(events),
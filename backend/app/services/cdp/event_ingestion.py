@@ -18,6 +18,8 @@ from sqlalchemy import select, and_
 from ...models.customer_event import CustomerEvent
 from ...models.customer import Customer
 from .event_processor import EventProcessor, ValidationResult
+from .identity_cache import get_identity_cache
+from .event_spool import IngestionQueue, SpoolRecord, get_ingestion_queue
 
 logger = logging.getLogger(__name__)
 
@@ -131,6 +133,106 @@ class EventIngestionService:
             "errors": results["errors"]
         }
 
+    # ============== Accept-and-Ack Ingestion ==============
+
+    async def enqueue_http(
+        self,
+        event_data: Dict[str, Any],
+        headers: Dict[str, str],
+        api_key: Optional[str] = None,
+        queue: Optional[IngestionQueue] = None
+    ) -> Dict[str, Any]:
+        """Validate an event and spool it for background processing.
+
+        The event is acknowledged as soon as it is durably spooled; identity
+        resolution, the database insert and profile enrichment happen later
+        in the ingestion workers.
+
+        Args:
+            event_data: Event data from HTTP request.
+            headers: HTTP headers.
+            api_key: API key for authentication.
+            queue: Ingestion queue (defaults to the global queue).
+
+        Returns:
+            Acknowledgement with status.
+
+        Raises:
+            SpoolFullError: If the spool is at capacity.
+        """
+        result = await self.enqueue_batch_http([event_data], headers, api_key, queue)
+        if result["errors"]:
+            return {
+                "success": False,
+                "error": result["errors"][0]["error"],
+                "error_type": "validation_error"
+            }
+        return {
+            "success": True,
+            "queued": True,
+            "received_at": result["received_at"],
+            "message": "Event accepted for processing"
+        }
+
+    async def enqueue_batch_http(
+        self,
+        events: List[Dict[str, Any]],
+        headers: Dict[str, str],
+        api_key: Optional[str] = None,
+        queue: Optional[IngestionQueue] = None
+    ) -> Dict[str, Any]:
+        """Validate a batch of events and spool the valid ones.
+
+        Args:
+            events: List of event data.
+            headers: HTTP headers.
+            api_key: API key for authentication.
+            queue: Ingestion queue (defaults to the global queue).
+
+        Returns:
+            Batch acknowledgement with per-event validation errors.
+
+        Raises:
+            SpoolFullError: If the spool is at capacity.
+        """
+        queue = queue or get_ingestion_queue()
+        if queue is None:
+            raise RuntimeError("Async ingestion is not enabled")
+
+        organization_id = self._extract_organization(headers, api_key)
+        if not organization_id:
+            raise ValueError("Organization ID required (provide via header or API key)")
+
+        accepted = []
+        errors = []
+        for i, event_data in enumerate(events):
+            event_data = self._enrich_from_headers(event_data, headers)
+            try:
+                validation = self.event_processor.validate_event(event_data)
+                if not validation.is_valid:
+                    raise ValueError(
+                        f"Event validation failed: {', '.join(validation.errors)}"
+                    )
+            except Exception as e:
+                errors.append({
+                    "index": i,
+                    "error": str(e),
+                    "event_name": event_data.get("event_name", "unknown")
+                })
+                continue
+            accepted.append(validation.normalized_event or event_data)
+
+        await queue.enqueue(organization_id, accepted)
+
+        return {
+            "success": not errors,
+            "batch_size": len(events),
+            "queued": len(accepted),
+            "failed": len(errors),
+            "errors": errors,
+            "received_at": datetime.utcnow().isoformat()
+        }
+
     def _extract_organization(
         self,
         headers: Dict[str, str],
@@ -403,6 +505,45 @@ class EventIngestionService:
 
         return results
 
+    async def process_spooled_events(
+        self,
+        records: List[SpoolRecord]
+    ) -> Dict[str, Any]:
+        """Process a batch of spooled events (ingestion worker handler).
+
+        Records are grouped by organization and written through the bulk
+        path of `EventProcessor.process_batch`, one transaction per group.
+        Database failures are raised so the worker retries the batch; the
+        queue is therefore at-least-once.
+
+        Args:
+            records: Spooled records to process.
+
+        Returns:
+            Processing results.
+        """
+        results = {
+            "processed": 0,
+            "failed": 0,
+            "customers_resolved": 0,
+            "errors": []
+        }
+
+        by_organization: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            by_organization.setdefault(record.organization_id, []).append(record.event)
+
+        for organization_id, events in by_organization.items():
+            batch_results = await self.event_processor.process_batch(
+                events, organization_id, raise_on_write_error=True
+            )
+            results["processed"] += batch_results["processed"]
+            results["failed"] += batch_results["failed"]
+            results["customers_resolved"] += batch_results["customers_resolved"]
+            results["errors"].extend(batch_results["errors"])
+
+        return results
+
     # ============== Real-time Streaming ==============
 
     async def stream_events(
@@ -514,6 +655,11 @@ class EventIngestionService:
 
         await self.db.commit()
 
+        # The anonymous ID may have been cached as "no customer"
+        identity_cache = get_identity_cache()
+        if identity_cache is not None:
+            await identity_cache.invalidate(organization_id, "anonymous_id", anonymous_id)
+
         return {
             "success": True,
             "aliased_events": len(events),
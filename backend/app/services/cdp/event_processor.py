@@ -9,14 +9,18 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from uuid import UUID
+import copy
 import json
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, func, insert
 
+from ...models.base import generate_id
 from ...models.customer import Customer
 from ...models.customer_event import CustomerEvent, EventType, EventSource
 from .identity_resolver import IdentityResolver
+from .profile_enricher import ProfileEnricher
+from .segment_index import get_segment_index
 
 logger = logging.getLogger(__name__)
 
@@ -58,6 +62,8 @@ class EventProcessor:
         """
         self.db = db
         self.identity_resolver = IdentityResolver(db)
+        self.profile_enricher = ProfileEnricher(db)
+        self.segment_index = get_segment_index()
 
     # ============== Event Ingestion ==============
 
@@ -302,6 +308,11 @@ class EventProcessor:
             logger.warning(f"Cannot enrich profile: customer {customer_id} not found")
             return
 
+        segment_index = None
+        if self.segment_index:
+            segment_index = await self.segment_index.get(self.db, customer.organization_id)
+            before = self.profile_enricher.snapshot_segment_inputs(customer, segment_index)
+
         # Update last seen
         customer.update_last_seen(event.timestamp)
 
@@ -316,49 +327,68 @@ class EventProcessor:
         # Update computed traits based on event type
         await self._update_computed_traits(customer, event)
 
+        # Re-check segments whose inputs changed
+        if segment_index and segment_index.segments:
+            await self.profile_enricher.apply_realtime_segments(segment_index, [(customer, before)])
+
         await self.db.commit()
 
     async def _update_computed_traits(self, customer: Customer, event: CustomerEvent):
         """Update computed traits based on event."""
-        computed = customer.computed_traits or {}
+        customer.computed_traits = self._apply_event_to_computed_traits(
+            customer.computed_traits or {},
+            event.event_type,
+            event.timestamp,
+            event.properties,
+            event.context
+        )
 
+    def _apply_event_to_computed_traits(
+        self,
+        computed: Dict[str, Any],
+        event_type: Optional[EventType],
+        timestamp: datetime,
+        properties: Optional[Dict[str, Any]],
+        context: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Fold a single event into a computed traits dictionary."""
         # Event count
         event_count = computed.get("total_events", 0) + 1
         computed["total_events"] = event_count
 
         # Event type counts
         event_type_counts = computed.get("event_type_counts", {})
-        event_type_key = event.event_type.value if event.event_type else "unknown"
+        event_type_key = event_type.value if event_type else "unknown"
         event_type_counts[event_type_key] = event_type_counts.get(event_type_key, 0) + 1
         computed["event_type_counts"] = event_type_counts
 
         # First/last event timestamps
         if "first_event_at" not in computed:
-            computed["first_event_at"] = event.timestamp.isoformat()
-        computed["last_event_at"] = event.timestamp.isoformat()
+            computed["first_event_at"] = timestamp.isoformat()
+        computed["last_event_at"] = timestamp.isoformat()
 
         # Purchase tracking
-        if event.event_type == EventType.PURCHASE:
+        if event_type == EventType.PURCHASE:
             purchase_count = computed.get("purchase_count", 0) + 1
             computed["purchase_count"] = purchase_count
 
             # Update lifetime value
-            purchase_value = event.properties.get("total", event.properties.get("value", 0))
+            purchase_value = properties.get("total", properties.get("value", 0))
             computed["total_purchase_value"] = computed.get("total_purchase_value", 0) + purchase_value
 
         # Page view tracking
-        if event.event_type == EventType.PAGE_VIEW:
+        if event_type == EventType.PAGE_VIEW:
             page_views = computed.get("page_view_count", 0) + 1
             computed["page_view_count"] = page_views
 
             # Track unique pages
-            page_url = event.context.get("page", {}).get("url") if event.context else None
+            page_url = context.get("page", {}).get("url") if context else None
             if page_url:
                 unique_pages = set(computed.get("unique_pages_viewed", []))
                 unique_pages.add(page_url)
                 computed["unique_pages_viewed"] = list(unique_pages)
 
-        customer.computed_traits = computed
+        return computed
 
     # ============== Event Transformation ==============
 
@@ -416,17 +446,33 @@ class EventProcessor:
     async def process_batch(
         self,
         events: List[Dict[str, Any]],
-        organization_id: str
+        organization_id: str,
+        bulk: bool = True,
+        raise_on_write_error: bool = False
     ) -> Dict[str, Any]:
         """Process a batch of events.
 
+        In bulk mode (the default) the whole batch is validated up front,
+        identities are resolved with set-based queries, events are written
+        with a single multi-row INSERT and the batch is committed once.
+        With ``bulk=False`` each event goes through `ingest_event`.
+
         Args:
             events: List of event data dictionaries.
             organization_id: Organization ID for all events.
+            bulk: Whether to use the single-transaction bulk path.
+            raise_on_write_error: In bulk mode, re-raise database failures
+                instead of reporting them as per-event errors, so callers
+                that can retry (e.g. the ingestion queue) do not drop events.
 
         Returns:
             Processing results summary.
         """
+        if bulk:
+            return await self._process_batch_bulk(
+                events, organization_id, raise_on_write_error
+            )
+
         results = {
             "processed": 0,
             "failed": 0,
@@ -447,16 +493,192 @@ class EventProcessor:
                     results["customers_resolved"] += 1
 
             except Exception as e:
-                results["failed"] += 1
-                results["errors"].append({
-                    "index": i,
-                    "error": str(e),
-                    "event_name": event_data.get("event_name", "unknown")
+                self._record_batch_error(results, i, event_data, e)
+
+        return results
+
+    async def _process_batch_bulk(
+        self,
+        events: List[Dict[str, Any]],
+        organization_id: str,
+        raise_on_write_error: bool = False
+    ) -> Dict[str, Any]:
+        """Process a batch of events in a single transaction."""
+        results = {
+            "processed": 0,
+            "failed": 0,
+            "customers_resolved": 0,
+            "errors": []
+        }
+
+        # Validate everything up front
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for i, event_data in enumerate(events):
+            if "organization_id" not in event_data:
+                event_data["organization_id"] = organization_id
+
+            try:
+                validation = self.validate_event(event_data)
+            except Exception as e:
+                self._record_batch_error(results, i, event_data, e)
+                continue
+            if not validation.is_valid:
+                self._record_batch_error(
+                    results, i, event_data,
+                    ValueError(f"Event validation failed: {', '.join(validation.errors)}")
+                )
+                continue
+            valid.append((i, validation.normalized_event or event_data))
+
+        if not valid:
+            return results
+
+        # Resolve identities for the whole batch
+        try:
+            resolved = await self.identity_resolver.resolve_identities_bulk(
+                [event_data for _, event_data in valid], organization_id
+            )
+        except Exception as e:
+            if raise_on_write_error:
+                raise
+            for i, event_data in valid:
+                self._record_batch_error(results, i, event_data, e)
+            return results
+
+        # Build event rows and fold profile updates per customer
+        rows = []
+        accepted = []
+        profile_updates: Dict[str, Dict[str, Any]] = {}
+        customers: Dict[str, Customer] = {}
+
+        for (i, event_data), (customer, anonymous_id) in zip(valid, resolved):
+            try:
+                row = self._build_event_row(
+                    event_data=event_data,
+                    organization_id=event_data.get("organization_id") or organization_id,
+                    customer_id=customer.id if customer else None,
+                    anonymous_id=anonymous_id
+                )
+            except Exception as e:
+                self._record_batch_error(results, i, event_data, e)
+                continue
+
+            rows.append(row)
+            accepted.append((i, event_data, customer))
+
+            if customer:
+                customers[customer.id] = customer
+                update = profile_updates.setdefault(customer.id, {
+                    "traits": dict(customer.traits or {}),
+                    "computed": copy.deepcopy(customer.computed_traits or {}),
+                    "first_seen_at": customer.first_seen_at,
+                    "last_seen_at": customer.last_seen_at,
                 })
-                logger.error(f"Failed to process event {i}: {e}")
+                update["last_seen_at"] = row["timestamp"]
+                if not update["first_seen_at"]:
+                    update["first_seen_at"] = row["timestamp"]
+                traits = (row["properties"] or {}).get("traits", {})
+                if traits:
+                    update["traits"].update(traits)
+                update["computed"] = self._apply_event_to_computed_traits(
+                    update["computed"],
+                    row["event_type"],
+                    row["timestamp"],
+                    row["properties"],
+                    row["context"]
+                )
+
+        if not rows:
+            return results
+
+        try:
+            segment_index = None
+            if self.segment_index and customers:
+                segment_index = await self.segment_index.get(self.db, organization_id)
+            segment_changes = []
+
+            await self.db.execute(insert(CustomerEvent), rows)
+
+            for customer_id, update in profile_updates.items():
+                customer = customers[customer_id]
+                if segment_index and segment_index.segments:
+                    before = self.profile_enricher.snapshot_segment_inputs(customer, segment_index)
+                    segment_changes.append((customer, before))
+                customer.traits = update["traits"]
+                customer.computed_traits = update["computed"]
+                customer.first_seen_at = update["first_seen_at"]
+                customer.last_seen_at = update["last_seen_at"]
+
+            if segment_changes:
+                await self.profile_enricher.apply_realtime_segments(segment_index, segment_changes)
+
+            await self.db.commit()
 
+        except Exception as e:
+            await self.db.rollback()
+            if raise_on_write_error:
+                raise
+            for i, event_data, _ in accepted:
+                self._record_batch_error(results, i, event_data, e)
+            return results
+
+        results["processed"] += len(accepted)
+        results["customers_resolved"] += sum(1 for _, _, customer in accepted if customer)
+
+        logger.debug(
+            f"Bulk-ingested {len(rows)} events for {len(profile_updates)} customers"
+        )
         return results
 
+    def _build_event_row(
+        self,
+        event_data: Dict[str, Any],
+        organization_id: str,
+        customer_id: Optional[str],
+        anonymous_id: Optional[str]
+    ) -> Dict[str, Any]:
+        """Build a CustomerEvent insert row from event data."""
+        now = datetime.utcnow()
+        return {
+            "id": generate_id(),
+            "organization_id": organization_id,
+            "workspace_id": event_data.get("workspace_id"),
+            "customer_id": customer_id,
+            "anonymous_id": anonymous_id,
+            "event_type": self._determine_event_type(
+                event_data.get("event_type"),
+                event_data.get("event_name")
+            ),
+            "event_name": event_data.get("event_name", "Unknown"),
+            "properties": event_data.get("properties", {}),
+            "context": event_data.get("context", {}),
+            "source": self._determine_event_source(event_data.get("source", "web")),
+            "timestamp": self._parse_timestamp(event_data.get("timestamp")),
+            "received_at": now,
+            "sent_at": self._parse_timestamp(event_data.get("sent_at")),
+            "integration_id": event_data.get("integration_id"),
+            "api_key_id": event_data.get("api_key_id"),
+            "consent_context": event_data.get("consent", {}),
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    def _record_batch_error(
+        self,
+        results: Dict[str, Any],
+        index: int,
+        event_data: Dict[str, Any],
+        error: Exception
+    ):
+        """Record a per-event failure in a batch results summary."""
+        results["failed"] += 1
+        results["errors"].append({
+            "index": index,
+            "error": str(error),
+            "event_name": event_data.get("event_name", "unknown")
+        })
+        logger.error(f"Failed to process event {index}: {error}")
+
     # ============== Helper Methods ==============
 
     def _parse_timestamp(self, timestamp: Any) -> datetime:
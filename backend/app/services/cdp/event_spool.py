@@ -0,0 +1,764 @@
+"""
+Durable write-behind spool for CDP event ingestion.
+
+Events accepted in async ingestion mode are appended to an on-disk,
+append-only segment log and acknowledged immediately. A pool of background
+workers drains sealed segments through the bulk event processor, so client
+latency no longer depends on database latency.
+
+Layout of a spool directory:
+
+    LOCK                   flock'd by the process that owns the directory
+    seg-000000000001.log   JSON-lines records, append-only
+    seg-000000000001.ack   records already processed and their byte offset (checkpoint)
+
+A segment is sealed when it reaches the configured size or age; sealed
+segments are claimed by one worker at a time, read in batches from their
+checkpoint, checkpointed after every committed batch, and deleted once
+fully drained. On startup every segment left on disk is treated as sealed
+and replayed from its checkpoint.
+
+Each process owns one spool directory: with several uvicorn workers the
+first process spools into the configured directory and the others into
+`slot-1`, `slot-2`, ... below it, so segment numbering and replay never
+cross processes. A restarted worker takes the lowest free slot and replays
+what the previous owner left; slots whose owner is gone for good (the
+service came back with fewer processes) are locked by whichever process
+gets there first and drained alongside its own slot.
+
+Appends only write to the OS under the spool lock; fsync happens outside
+it as a group commit, so one fsync covers every append written while the
+previous one was in progress. The async queue runs all disk work in
+threads to keep it off the event loop.
+"""
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "seg-"
+SEGMENT_SUFFIX = ".log"
+ACK_SUFFIX = ".ack"
+
+
+class SpoolFullError(Exception):
+    """Raised when the spool has no room for more events (backpressure)."""
+
+
+class SpoolLockedError(Exception):
+    """Raised when another process owns the spool directory."""
+
+
+@dataclass
+class SpoolRecord:
+    """A single spooled event."""
+    organization_id: str
+    event: Dict[str, Any]
+    enqueued_at: float
+    offset: int = 0  # Byte offset just past the record in its segment
+
+
+@dataclass
+class _Segment:
+    """Bookkeeping for one segment file."""
+    seq: int
+    path: str
+    size: int = 0
+    records: int = 0
+    acked: int = 0
+    acked_offset: int = 0  # Byte offset known to follow `offset_records` records
+    offset_records: int = 0
+    first_enqueued_at: Optional[float] = None
+    sealed: bool = False
+    claimed: bool = False
+
+    @property
+    def pending(self) -> int:
+        return self.records - self.acked
+
+
+class EventSpool:
+    """
+    Append-only, segmented on-disk event log.
+
+    All methods are synchronous, blocking and thread-safe; async callers run
+    them through `asyncio.to_thread`. The directory is locked for the
+    lifetime of the spool.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        segment_bytes: int,
+        seal_interval_seconds: float = 1.0,
+        fsync: bool = True
+    ):
+        """Open (or recover) a spool directory.
+
+        Args:
+            directory: Directory holding segment files.
+            max_bytes: Maximum bytes of unprocessed segments before rejecting.
+            segment_bytes: Size at which the active segment is sealed.
+            seal_interval_seconds: Age at which a non-empty active segment is sealed.
+            fsync: Whether appends return only once fsync'd.
+
+        Raises:
+            SpoolLockedError: If another process has the directory open.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.seal_interval_seconds = seal_interval_seconds
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._segments: Dict[int, _Segment] = {}
+        self._active: Optional[_Segment] = None
+        self._active_file = None
+        # Appends written to the OS / known durable, for group commit
+        self._written = 0
+        self._synced = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "LOCK"), "a")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise SpoolLockedError(f"Event spool {directory} is in use by another process")
+        self._recover()
+
+    # ============== Recovery ==============
+
+    def _recover(self):
+        """Load segments left on disk; all of them become sealed."""
+        next_seq = 1
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            segment = _Segment(seq=seq, path=os.path.join(self.directory, name), sealed=True)
+            records = self._read_records(segment.path)
+            segment.records = len(records)
+            segment.size = os.path.getsize(segment.path)
+            segment.acked, segment.offset_records, segment.acked_offset = self._read_ack(segment)
+            segment.acked = min(segment.acked, segment.records)
+            if segment.offset_records > segment.acked:
+                segment.offset_records = segment.acked_offset = 0
+            if segment.pending > 0:
+                segment.first_enqueued_at = records[segment.acked].enqueued_at
+                self._segments[seq] = segment
+            else:
+                self._remove_files(segment)
+            next_seq = max(next_seq, seq + 1)
+
+        if self._segments:
+            logger.info(
+                f"Recovered {len(self._segments)} spool segment(s) with "
+                f"{sum(s.pending for s in self._segments.values())} unprocessed event(s)"
+            )
+        self._open_active(next_seq)
+
+    def _open_active(self, seq: int):
+        """Start a new active segment."""
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}")
+        self._active = _Segment(seq=seq, path=path)
+        self._active_file = open(path, "ab")
+        self._segments[seq] = self._active
+
+    # ============== Writing ==============
+
+    def append(self, records: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """Append events to the active segment.
+
+        Args:
+            records: List of (organization_id, event_data) tuples.
+
+        Returns:
+            Number of records appended.
+
+        Raises:
+            SpoolFullError: If the spool is at capacity.
+        """
+        if not records:
+            return 0
+
+        now = time.time()
+        payload = b"".join(
+            json.dumps(
+                {"org": org_id, "ts": now, "event": event},
+                default=str,
+                separators=(",", ":")
+            ).encode() + b"\n"
+            for org_id, event in records
+        )
+
+        with self._lock:
+            if self._unprocessed_bytes() + len(payload) > self.max_bytes:
+                raise SpoolFullError(
+                    f"Event spool is full ({self.max_bytes} bytes pending)"
+                )
+
+            self._active_file.write(payload)
+            self._active_file.flush()
+            self._written += 1
+            ticket = self._written
+
+            active = self._active
+            active.size += len(payload)
+            active.records += len(records)
+            if active.first_enqueued_at is None:
+                active.first_enqueued_at = now
+
+            if active.size >= self.segment_bytes:
+                self._seal_active()
+
+        if self.fsync:
+            self._sync(ticket)
+        return len(records)
+
+    def _sync(self, ticket: int):
+        """Make the append numbered `ticket` durable (group commit).
+
+        Appends queue here behind the fsync in progress; the next one to run
+        fsyncs once for everything written in the meantime and the rest
+        return immediately.
+        """
+        with self._sync_lock:
+            with self._lock:
+                if self._synced >= ticket:
+                    return
+                target = self._written
+                # A dup keeps the file open if the segment is sealed meanwhile
+                fd = os.dup(self._active_file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            with self._lock:
+                self._synced = max(self._synced, target)
+
+    def seal_if_stale(self, max_age_seconds: Optional[float] = None) -> bool:
+        """Seal the active segment if its oldest record exceeds the seal interval.
+
+        Args:
+            max_age_seconds: Override for the seal interval (0 seals any non-empty segment).
+
+        Returns:
+            True if a segment was sealed.
+        """
+        if max_age_seconds is None:
+            max_age_seconds = self.seal_interval_seconds
+        with self._lock:
+            active = self._active
+            if active.records and time.time() - active.first_enqueued_at >= max_age_seconds:
+                self._seal_active()
+                return True
+        return False
+
+    def _seal_active(self):
+        """Close the active segment and start a new one. Caller holds the lock."""
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+            self._synced = self._written
+        self._active_file.close()
+        self._active.sealed = True
+        self._open_active(self._active.seq + 1)
+
+    # ============== Draining ==============
+
+    def claim_segment(self) -> Optional[int]:
+        """Claim the oldest sealed, unclaimed segment for draining."""
+        with self._lock:
+            for seq in sorted(self._segments):
+                segment = self._segments[seq]
+                if segment.sealed and not segment.claimed and segment.pending > 0:
+                    segment.claimed = True
+                    return seq
+        return None
+
+    def release_segment(self, seq: int):
+        """Release a claim without completing the segment (e.g. on failure)."""
+        with self._lock:
+            segment = self._segments.get(seq)
+            if segment:
+                segment.claimed = False
+
+    def read_pending(self, seq: int, limit: Optional[int] = None) -> List[SpoolRecord]:
+        """Read unprocessed records of a claimed segment, from its checkpoint.
+
+        Args:
+            seq: Segment sequence number.
+            limit: Maximum records to read (all pending records if None).
+        """
+        segment = self._segments[seq]
+        limit = segment.pending if limit is None else min(limit, segment.pending)
+        skip = segment.acked - segment.offset_records
+        return self._read_records(segment.path, segment.acked_offset, skip, limit)
+
+    def ack(
+        self,
+        seq: int,
+        count: int,
+        next_enqueued_at: Optional[float] = None,
+        offset: Optional[int] = None
+    ):
+        """Checkpoint `count` more records of a segment as processed.
+
+        Fully drained segments are deleted from disk.
+
+        Args:
+            seq: Segment sequence number.
+            count: Number of records processed since the last checkpoint.
+            next_enqueued_at: Enqueue time of the next pending record, if known.
+            offset: `SpoolRecord.offset` of the last processed record, so the
+                next read starts there instead of at the segment start.
+        """
+        with self._lock:
+            segment = self._segments[seq]
+            segment.acked = min(segment.acked + count, segment.records)
+            if offset is not None:
+                segment.acked_offset = offset
+                segment.offset_records = segment.acked
+
+            if segment.pending == 0:
+                self._remove_files(segment)
+                del self._segments[seq]
+                return
+
+            self._write_ack(segment)
+            segment.first_enqueued_at = next_enqueued_at
+
+    # ============== Metrics ==============
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and age statistics."""
+        with self._lock:
+            pending = [s for s in self._segments.values() if s.pending > 0]
+            oldest = min(
+                (s.first_enqueued_at for s in pending if s.first_enqueued_at),
+                default=None
+            )
+            return {
+                "queue_depth": sum(s.pending for s in pending),
+                "segments": len(pending),
+                "pending_bytes": self._unprocessed_bytes(),
+                "max_bytes": self.max_bytes,
+                "oldest_pending_age_seconds": (time.time() - oldest) if oldest else 0.0,
+            }
+
+    # ============== Helpers ==============
+
+    def close(self):
+        """Close the active segment file and release the directory."""
+        with self._lock:
+            if self._active_file and not self._active_file.closed:
+                self._active_file.close()
+            if not self._lock_file.closed:
+                self._lock_file.close()
+
+    def _unprocessed_bytes(self) -> int:
+        """Bytes held by segments that still have pending records."""
+        return sum(s.size for s in self._segments.values() if s.pending > 0)
+
+    def _read_records(
+        self,
+        path: str,
+        offset: int = 0,
+        skip: int = 0,
+        limit: Optional[int] = None
+    ) -> List[SpoolRecord]:
+        """Parse a segment file from `offset`, skipping a torn trailing write.
+
+        Args:
+            path: Segment file.
+            offset: Byte offset to start reading at.
+            skip: Valid records after `offset` to pass over.
+            limit: Maximum records to return.
+        """
+        records = []
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt spool record in {path}")
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                records.append(SpoolRecord(
+                    organization_id=data["org"],
+                    event=data["event"],
+                    enqueued_at=data["ts"],
+                    offset=offset
+                ))
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+
+    def _ack_path(self, segment: _Segment) -> str:
+        return segment.path[:-len(SEGMENT_SUFFIX)] + ACK_SUFFIX
+
+    def _read_ack(self, segment: _Segment) -> Tuple[int, int, int]:
+        """Read (acked, offset_records, acked_offset) from the checkpoint.
+
+        Checkpoints written before offsets were tracked hold only the count.
+        """
+        try:
+            with open(self._ack_path(segment)) as f:
+                fields = [int(value) for value in f.read().split()]
+        except (FileNotFoundError, ValueError):
+            return 0, 0, 0
+        if len(fields) == 3:
+            return fields[0], fields[1], fields[2]
+        return (fields[0] if fields else 0), 0, 0
+
+    def _write_ack(self, segment: _Segment):
+        """Atomically persist the segment checkpoint."""
+        path = self._ack_path(segment)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{segment.acked} {segment.offset_records} {segment.acked_offset}")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove_files(self, segment: _Segment):
+        for path in (segment.path, self._ack_path(segment)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class IngestionQueue:
+    """
+    Accept-and-ack ingestion queue backed by an EventSpool.
+
+    Request handlers await `enqueue`; a pool of asyncio workers drains sealed
+    segments through `EventIngestionService.process_spooled_events`. Spool
+    reads, appends and checkpoints run in threads.
+    """
+
+    def __init__(
+        self,
+        spool: EventSpool,
+        session_factory: async_sessionmaker,
+        workers: int = 4,
+        batch_size: int = 1000,
+        poll_interval_seconds: float = 0.25,
+        retry_backoff_seconds: float = 5.0,
+        orphans: Optional[List[EventSpool]] = None
+    ):
+        """Initialize the ingestion queue.
+
+        Args:
+            spool: Spool to append to and drain from.
+            session_factory: Factory producing AsyncSessions for workers.
+            workers: Number of concurrent drain workers.
+            batch_size: Maximum events per processor batch.
+            poll_interval_seconds: Idle sleep between segment claims.
+            retry_backoff_seconds: Sleep after a failed batch before retrying.
+            orphans: Locked spools of processes that no longer run, replayed
+                once and then released.
+        """
+        self.spool = spool
+        self.orphans = list(orphans or [])
+        self.session_factory = session_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+        self._counters = {
+            "accepted": 0,
+            "rejected": 0,
+            "processed": 0,
+            "failed": 0,
+            "batch_errors": 0,
+        }
+        self._last_drain_lag_seconds = 0.0
+
+    # ============== Producer Side ==============
+
+    async def enqueue(self, organization_id: str, events: List[Dict[str, Any]]) -> int:
+        """Append validated events to the spool.
+
+        Raises:
+            SpoolFullError: If the spool is at capacity.
+        """
+        if not events:
+            return 0
+        try:
+            count = await asyncio.to_thread(
+                self.spool.append, [(organization_id, event) for event in events]
+            )
+        except SpoolFullError:
+            self._counters["rejected"] += len(events)
+            raise
+        self._counters["accepted"] += count
+        return count
+
+    # ============== Worker Pool ==============
+
+    async def start(self):
+        """Start the drain workers."""
+        if self._tasks:
+            return
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"cdp-ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+        if self.orphans:
+            self._tasks.append(
+                asyncio.create_task(self._replay_orphans(), name="cdp-ingestion-orphan-replay")
+            )
+        logger.info(f"Started {self.workers} CDP ingestion worker(s)")
+
+    async def stop(self, drain: bool = True, timeout: float = 30.0):
+        """Stop the workers, optionally draining what is already spooled."""
+        if drain:
+            await self.drain(timeout=timeout)
+
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.spool.close)
+        # Whatever was not replayed stays on disk for the next start
+        for orphan in self.orphans:
+            await asyncio.to_thread(orphan.close)
+        self.orphans = []
+
+    async def drain(self, timeout: float = 30.0):
+        """Process sealed segments until none remain or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            seq = self.spool.claim_segment()
+            if seq is None:
+                if not await asyncio.to_thread(self.spool.seal_if_stale, 0):
+                    return
+                continue
+            try:
+                await self._drain_segment(seq)
+            except Exception as e:
+                logger.error(f"Failed to drain spool segment {seq}: {e}")
+                self.spool.release_segment(seq)
+                return
+
+    async def _worker(self, index: int):
+        """Claim and drain sealed segments until stopped."""
+        while not self._stopping.is_set():
+            seq = self.spool.claim_segment()
+            if seq is None:
+                await asyncio.to_thread(self.spool.seal_if_stale)
+                await asyncio.sleep(self.poll_interval_seconds)
+                continue
+
+            try:
+                await self._drain_segment(seq)
+            except asyncio.CancelledError:
+                self.spool.release_segment(seq)
+                raise
+            except Exception as e:
+                self._counters["batch_errors"] += 1
+                logger.error(f"Ingestion worker {index} failed on segment {seq}: {e}")
+                self.spool.release_segment(seq)
+                await asyncio.sleep(self.retry_backoff_seconds)
+
+    async def _replay_orphans(self):
+        """Drain every segment of the orphaned spools, then release them."""
+        while self.orphans:
+            orphan = self.orphans[0]
+            seq = orphan.claim_segment()
+            if seq is None:
+                await asyncio.to_thread(orphan.close)
+                self.orphans.pop(0)
+                logger.info(f"Replayed orphaned event spool {orphan.directory}")
+                continue
+
+            try:
+                await self._drain_segment(seq, orphan)
+            except asyncio.CancelledError:
+                orphan.release_segment(seq)
+                raise
+            except Exception as e:
+                self._counters["batch_errors"] += 1
+                logger.error(f"Failed to replay segment {seq} of {orphan.directory}: {e}")
+                orphan.release_segment(seq)
+                await asyncio.sleep(self.retry_backoff_seconds)
+
+    async def _drain_segment(self, seq: int, spool: Optional[EventSpool] = None):
+        """Process one claimed segment, checkpointing after each batch."""
+        from .event_ingestion import EventIngestionService
+
+        spool = spool or self.spool
+        while True:
+            # One record past the batch gives the next checkpoint's age
+            records = await asyncio.to_thread(spool.read_pending, seq, self.batch_size + 1)
+            if not records:
+                return
+            batch = records[:self.batch_size]
+
+            async with self.session_factory() as session:
+                service = EventIngestionService(session)
+                results = await service.process_spooled_events(batch)
+
+            self._counters["processed"] += results["processed"]
+            self._counters["failed"] += results["failed"]
+            self._last_drain_lag_seconds = time.time() - min(r.enqueued_at for r in batch)
+            next_enqueued_at = records[-1].enqueued_at if len(records) > len(batch) else None
+            await asyncio.to_thread(
+                spool.ack, seq, len(batch), next_enqueued_at, batch[-1].offset
+            )
+            if next_enqueued_at is None:
+                return
+
+    # ============== Metrics ==============
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth, drain lag and throughput counters."""
+        stats = self.spool.stats()
+        return {
+            **stats,
+            **self._counters,
+            "drain_lag_seconds": self._last_drain_lag_seconds,
+            "workers": len(self._tasks),
+        }
+
+
+# Global ingestion queue
+_ingestion_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> Optional[IngestionQueue]:
+    """Get the global ingestion queue, if async ingestion is enabled."""
+    return _ingestion_queue
+
+
+def open_spool(root: str, max_slots: int = 64, **kwargs) -> EventSpool:
+    """Open the first spool slot under `root` that no other process holds.
+
+    Slot 0 is `root` itself (where a single process spools); further slots
+    are `root/slot-N`.
+
+    Args:
+        root: Configured spool directory.
+        max_slots: Number of slots to try.
+        **kwargs: EventSpool options.
+
+    Raises:
+        SpoolLockedError: If every slot is taken.
+    """
+    for slot in range(max_slots):
+        directory = root if slot == 0 else os.path.join(root, f"slot-{slot}")
+        try:
+            return EventSpool(directory=directory, **kwargs)
+        except SpoolLockedError:
+            continue
+    raise SpoolLockedError(f"All {max_slots} event spool slots under {root} are in use")
+
+
+def _slot_directories(root: str) -> List[str]:
+    """Slot 0 and every `slot-N` directory present under `root`."""
+    slots = [(0, root)]
+    if os.path.isdir(root):
+        for name in os.listdir(root):
+            suffix = name[len("slot-"):]
+            if name.startswith("slot-") and suffix.isdigit() and os.path.isdir(os.path.join(root, name)):
+                slots.append((int(suffix), os.path.join(root, name)))
+    return [directory for _, directory in sorted(slots)]
+
+
+def _has_segments(directory: str) -> bool:
+    """Whether a directory holds any segment files."""
+    return os.path.isdir(directory) and any(
+        name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        for name in os.listdir(directory)
+    )
+
+
+def open_orphaned_spools(root: str, own: EventSpool, **kwargs) -> List[EventSpool]:
+    """Lock every other slot under `root` that holds events but has no owner.
+
+    A slot is orphaned when its process is gone and no process took it over,
+    e.g. slot-3 after restarting with three processes instead of four. The
+    returned spools stay locked until their segments are replayed.
+
+    Args:
+        root: Configured spool directory.
+        own: This process's spool, which is skipped.
+        **kwargs: EventSpool options.
+    """
+    orphans = []
+    for directory in _slot_directories(root):
+        if os.path.abspath(directory) == os.path.abspath(own.directory) or not _has_segments(directory):
+            continue
+        try:
+            orphan = EventSpool(directory=directory, **kwargs)
+        except SpoolLockedError:
+            continue
+        if orphan.stats()["queue_depth"] > 0:
+            orphans.append(orphan)
+        else:
+            orphan.close()
+    if orphans:
+        logger.info(f"Replaying {len(orphans)} orphaned event spool slot(s) under {root}")
+    return orphans
+
+
+async def start_ingestion_queue(session_factory: async_sessionmaker) -> IngestionQueue:
+    """Create and start the global ingestion queue from settings."""
+    global _ingestion_queue
+    settings = get_settings()
+
+    spool_options = dict(
+        max_bytes=settings.cdp_spool_max_bytes,
+        segment_bytes=settings.cdp_spool_segment_bytes,
+        seal_interval_seconds=settings.cdp_spool_seal_interval_seconds,
+        fsync=settings.cdp_spool_fsync,
+    )
+    # Recovery reads every segment left on disk
+    spool = await asyncio.to_thread(open_spool, settings.cdp_spool_dir, **spool_options)
+    orphans = await asyncio.to_thread(
+        open_orphaned_spools, settings.cdp_spool_dir, spool, **spool_options
+    )
+    _ingestion_queue = IngestionQueue(
+        spool=spool,
+        session_factory=session_factory,
+        workers=settings.cdp_ingestion_workers,
+        batch_size=settings.cdp_batch_size,
+        orphans=orphans,
+    )
+    await _ingestion_queue.start()
+    return _ingestion_queue
+
+
+async def stop_ingestion_queue():
+    """Drain and stop the global ingestion queue."""
+    global _ingestion_queue
+    if _ingestion_queue is not None:
+        await _ingestion_queue.stop(drain=True)
+        _ingestion_queue = None
@@ -0,0 +1,312 @@
+"""
+Identity resolution cache for the Customer Data Platform.
+
+Maps (organization_id, identifier type, identifier value) to a customer ID
+so repeat visitors resolve without touching the database. The in-process
+tier is a bounded LRU with TTL; an optional Redis tier shares entries (and
+invalidations, via pub/sub) across uvicorn workers.
+
+Misses are cached too ("negative" entries, shorter TTL) so anonymous
+visitors that have no profile yet do not re-run every lookup per event.
+Writers that change the identity graph must invalidate explicitly:
+`IdentityResolver.merge_profiles`, `link_identity`, `unlink_identity` and
+`ClientSDK.alias_anonymous_id` do so.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+# Sentinel stored for cached misses
+NO_CUSTOMER = ""
+
+_MISSING = object()
+
+
+class IdentityCache:
+    """
+    Two-tier (local LRU/TTL + optional Redis) identity lookup cache.
+
+    `get` returns the cached customer ID, `NO_CUSTOMER` for a cached miss,
+    or None when nothing is cached.
+    """
+
+    REDIS_PREFIX = "cdp:idcache"
+    INVALIDATION_CHANNEL = "cdp:idcache:invalidate"
+
+    def __init__(
+        self,
+        max_size: int = 100_000,
+        ttl_seconds: float = 300.0,
+        negative_ttl_seconds: float = 10.0,
+        redis_url: Optional[str] = None
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum local entries before LRU eviction.
+            ttl_seconds: Lifetime of positive entries.
+            negative_ttl_seconds: Lifetime of cached misses (0 disables them).
+            redis_url: Optional Redis URL for the shared tier.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float]]" = OrderedDict()
+        self._by_customer: Dict[str, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+
+        self._redis = None
+        if redis_url:
+            if REDIS_AVAILABLE:
+                self._redis = aioredis.from_url(redis_url, decode_responses=True)
+            else:
+                logger.warning("redis package not installed; identity cache is local-only")
+        self._listener: Optional[asyncio.Task] = None
+
+        self._counters = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "redis_hits": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    # ============== Lookup ==============
+
+    @staticmethod
+    def make_key(organization_id: str, id_type: str, value: Any) -> CacheKey:
+        """Build a cache key from an identifier."""
+        return (organization_id, id_type.lower(), str(value))
+
+    async def get(self, organization_id: str, id_type: str, value: Any) -> Optional[str]:
+        """Look up an identifier.
+
+        Returns:
+            Customer ID, `NO_CUSTOMER` for a cached miss, or None if not cached.
+        """
+        key = self.make_key(organization_id, id_type, value)
+        customer_id = self._get_local(key)
+
+        if customer_id is _MISSING and self._redis is not None:
+            try:
+                cached = await self._redis.get(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Identity cache Redis read failed: {e}")
+                cached = None
+            if cached is not None:
+                customer_id = NO_CUSTOMER if cached == "-" else cached
+                self._counters["redis_hits"] += 1
+                self._set_local(key, customer_id)
+
+        if customer_id is _MISSING:
+            self._counters["misses"] += 1
+            return None
+        if customer_id == NO_CUSTOMER:
+            self._counters["negative_hits"] += 1
+        else:
+            self._counters["hits"] += 1
+        return customer_id
+
+    async def set(
+        self,
+        organization_id: str,
+        id_type: str,
+        value: Any,
+        customer_id: Optional[str]
+    ):
+        """Cache a lookup result (None caches a miss)."""
+        customer_id = customer_id or NO_CUSTOMER
+        if customer_id == NO_CUSTOMER and self.negative_ttl_seconds <= 0:
+            return
+
+        key = self.make_key(organization_id, id_type, value)
+        self._set_local(key, customer_id)
+
+        if self._redis is not None:
+            ttl = self.ttl_seconds if customer_id else self.negative_ttl_seconds
+            try:
+                pipe = self._redis.pipeline()
+                pipe.set(self._redis_key(key), customer_id or "-", ex=max(int(ttl), 1))
+                if customer_id:
+                    customer_key = f"{self.REDIS_PREFIX}:customer:{customer_id}"
+                    pipe.sadd(customer_key, json.dumps(key))
+                    pipe.expire(customer_key, max(int(self.ttl_seconds), 1))
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Identity cache Redis write failed: {e}")
+
+    # ============== Invalidation ==============
+
+    async def invalidate(self, organization_id: str, id_type: str, value: Any):
+        """Drop a single identifier from both tiers."""
+        await self.invalidate_keys([self.make_key(organization_id, id_type, value)])
+
+    async def invalidate_keys(self, keys: Iterable[CacheKey]):
+        """Drop identifiers from both tiers and notify other workers."""
+        keys = list(keys)
+        if not keys:
+            return
+        self._drop_local(keys)
+
+        if self._redis is not None:
+            try:
+                await self._redis.delete(*[self._redis_key(k) for k in keys])
+                await self._redis.publish(
+                    self.INVALIDATION_CHANNEL, json.dumps({"keys": keys})
+                )
+            except Exception as e:
+                logger.warning(f"Identity cache Redis invalidation failed: {e}")
+
+    async def invalidate_customer(self, customer_id: str):
+        """Drop every identifier currently mapped to a customer."""
+        with self._lock:
+            keys = set(self._by_customer.get(customer_id, ()))
+
+        if self._redis is not None:
+            try:
+                customer_key = f"{self.REDIS_PREFIX}:customer:{customer_id}"
+                members = await self._redis.smembers(customer_key)
+                keys.update(tuple(json.loads(m)) for m in members)
+                await self._redis.delete(customer_key)
+            except Exception as e:
+                logger.warning(f"Identity cache Redis invalidation failed: {e}")
+
+        await self.invalidate_keys(keys)
+
+    async def clear(self):
+        """Drop all local entries."""
+        with self._lock:
+            self._entries.clear()
+            self._by_customer.clear()
+
+    # ============== Cross-worker Invalidation ==============
+
+    async def start_invalidation_listener(self):
+        """Subscribe to invalidations published by other workers."""
+        if self._redis is None or self._listener is not None:
+            return
+        self._listener = asyncio.create_task(self._listen(), name="cdp-identity-cache-listener")
+
+    async def stop_invalidation_listener(self):
+        """Stop the invalidation subscriber and close Redis."""
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    self._drop_local(tuple(k) for k in payload.get("keys", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Identity cache invalidation listener error: {e}")
+                await asyncio.sleep(1.0)
+
+    # ============== Metrics ==============
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and size."""
+        lookups = self._counters["hits"] + self._counters["negative_hits"] + self._counters["misses"]
+        hits = self._counters["hits"] + self._counters["negative_hits"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "redis_enabled": self._redis is not None,
+        }
+
+    # ============== Local Tier ==============
+
+    def _redis_key(self, key: CacheKey) -> str:
+        return f"{self.REDIS_PREFIX}:{key[0]}:{key[1]}:{key[2]}"
+
+    def _get_local(self, key: CacheKey):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            customer_id, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove_local(key)
+                return _MISSING
+            self._entries.move_to_end(key)
+            return customer_id
+
+    def _set_local(self, key: CacheKey, customer_id: str):
+        ttl = self.ttl_seconds if customer_id else self.negative_ttl_seconds
+        with self._lock:
+            if key in self._entries:
+                self._remove_local(key)
+            self._entries[key] = (customer_id, time.monotonic() + ttl)
+            if customer_id:
+                self._by_customer.setdefault(customer_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove_local(oldest)
+                self._counters["evictions"] += 1
+
+    def _drop_local(self, keys: Iterable[CacheKey]):
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._remove_local(key)
+                    self._counters["invalidations"] += 1
+
+    def _remove_local(self, key: CacheKey):
+        """Remove an entry and its reverse index. Caller holds the lock."""
+        customer_id, _ = self._entries.pop(key)
+        if customer_id:
+            keys = self._by_customer.get(customer_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_customer[customer_id]
+
+
+# Global identity cache
+_identity_cache: Optional[IdentityCache] = None
+
+
+def get_identity_cache() -> Optional[IdentityCache]:
+    """Get the process-wide identity cache (None if disabled)."""
+    global _identity_cache
+    settings = get_settings()
+    if not settings.cdp_identity_cache_enabled:
+        return None
+    if _identity_cache is None:
+        _identity_cache = IdentityCache(
+            max_size=settings.cdp_identity_cache_size,
+            ttl_seconds=settings.cdp_identity_cache_ttl_seconds,
+            negative_ttl_seconds=settings.cdp_identity_cache_negative_ttl_seconds,
+            redis_url=settings.cdp_identity_cache_redis_url,
+        )
+    return _identity_cache
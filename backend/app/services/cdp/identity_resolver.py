@@ -5,13 +5,16 @@ Provides deterministic and probabilistic matching algorithms
 to unify customer profiles across multiple touchpoints.
 """
 import logging
+from collections import Counter
 from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from difflib import SequenceMatcher
 
+import numpy as np
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, func
+from sqlalchemy import select, and_, func
 from sqlalchemy.orm import selectinload
 
 try:
@@ -22,6 +25,8 @@ except ImportError:
 
 from ...models.customer import Customer
 from ...models.customer_identity import CustomerIdentity, IdentityType, IdentitySource
+from .identity_cache import IdentityCache, NO_CUSTOMER, get_identity_cache
+from .match_index import candidate_ranking, rebuild_match_keys
 
 logger = logging.getLogger(__name__)
 
@@ -59,13 +64,27 @@ class IdentityResolver:
     EMAIL_MATCH_THRESHOLD = 0.95  # Near-exact for emails
     PHONE_MATCH_THRESHOLD = 0.90  # High for phones
 
-    def __init__(self, db: AsyncSession):
+    # Fields compared during fuzzy matching: (name, weight, threshold)
+    SIMILARITY_FIELDS = (
+        ("email", 0.4, EMAIL_MATCH_THRESHOLD),
+        ("phone", 0.3, PHONE_MATCH_THRESHOLD),
+        ("first_name", 0.1, FUZZY_MATCH_THRESHOLD),
+        ("last_name", 0.1, FUZZY_MATCH_THRESHOLD),
+        ("company", 0.1, FUZZY_MATCH_THRESHOLD),
+    )
+
+    # Candidates scored per fuzzy match, strongest blocking-key overlap first
+    FUZZY_CANDIDATE_LIMIT = 25
+
+    def __init__(self, db: AsyncSession, cache: Optional[IdentityCache] = None):
         """Initialize the identity resolver.
 
         Args:
             db: SQLAlchemy async session for database operations.
+            cache: Identity cache (defaults to the process-wide cache).
         """
         self.db = db
+        self.cache = cache if cache is not None else get_identity_cache()
 
     # ============== Deterministic Matching ==============
 
@@ -91,7 +110,9 @@ class IdentityResolver:
         email = email.lower().strip()
 
         # Check customer identities table first
-        query = select(CustomerIdentity).where(
+        query = select(CustomerIdentity).options(
+            selectinload(CustomerIdentity.customer)
+        ).where(
             and_(
                 CustomerIdentity.identity_type == IdentityType.EMAIL,
                 CustomerIdentity.identity_value == email,
@@ -145,7 +166,9 @@ class IdentityResolver:
         if normalize:
             phone = self._normalize_phone(phone)
 
-        query = select(CustomerIdentity).where(
+        query = select(CustomerIdentity).options(
+            selectinload(CustomerIdentity.customer)
+        ).where(
             and_(
                 CustomerIdentity.identity_type == IdentityType.PHONE,
                 CustomerIdentity.identity_value == phone,
@@ -196,7 +219,9 @@ class IdentityResolver:
         identity_type = self._map_to_identity_type(id_type)
 
         if identity_type:
-            query = select(CustomerIdentity).where(
+            query = select(CustomerIdentity).options(
+                selectinload(CustomerIdentity.customer)
+            ).where(
                 and_(
                     CustomerIdentity.identity_type == identity_type,
                     CustomerIdentity.identity_value == id_value,
@@ -269,7 +294,9 @@ class IdentityResolver:
         if not device_id:
             return None
 
-        query = select(CustomerIdentity).where(
+        query = select(CustomerIdentity).options(
+            selectinload(CustomerIdentity.customer)
+        ).where(
             and_(
                 CustomerIdentity.identity_type == IdentityType.DEVICE_ID,
                 CustomerIdentity.identity_value == device_id,
@@ -305,24 +332,35 @@ class IdentityResolver:
         Returns:
             List of match results sorted by confidence.
         """
-        results = []
-
-        # Get candidates based on available identifiers
+        # Get candidates from the blocking-key index; score their traits
+        # before materializing full Customer objects for the survivors
         candidates = await self._get_match_candidates(traits, organization_id)
+        if not candidates:
+            return []
 
-        for customer in candidates:
-            confidence, matched_fields, details = self._calculate_similarity(
-                customer, traits
-            )
+        confidences, matched_fields, details = self._score_trait_dicts(
+            [candidate_traits for _, candidate_traits in candidates], traits
+        )
+        survivors = {
+            candidates[i][0]: i for i in np.flatnonzero(confidences >= min_confidence)
+        }
+        if not survivors:
+            return []
+
+        result = await self.db.execute(
+            select(Customer).where(Customer.id.in_(list(survivors)))
+        )
 
-            if confidence >= min_confidence:
-                results.append(MatchResult(
-                    customer=customer,
-                    confidence=confidence,
-                    match_type="fuzzy",
-                    matched_fields=matched_fields,
-                    match_details=details
-                ))
+        results = [
+            MatchResult(
+                customer=customer,
+                confidence=float(confidences[survivors[customer.id]]),
+                match_type="fuzzy",
+                matched_fields=matched_fields[survivors[customer.id]],
+                match_details=details[survivors[customer.id]]
+            )
+            for customer in result.scalars().all()
+        ]
 
         # Sort by confidence descending
         results.sort(key=lambda x: x.confidence, reverse=True)
@@ -371,69 +409,100 @@ class IdentityResolver:
         traits2: Dict[str, Any]
     ) -> Tuple[float, List[str], Dict[str, Any]]:
         """Calculate similarity between two trait dictionaries."""
-        scores = []
+        confidences, matched_fields, details = self._score_trait_dicts([traits1], traits2)
+        return float(confidences[0]), matched_fields[0], details[0]
+
+    def _score_trait_dicts(
+        self,
+        candidates: List[Dict[str, Any]],
+        traits: Dict[str, Any]
+    ) -> Tuple[np.ndarray, List[List[str]], List[Dict[str, Any]]]:
+        """Weighted field similarity of each candidate against `traits`.
+
+        Builds a (candidates x fields) similarity matrix, masks fields below
+        their threshold, and takes the weighted mean of the rest per row.
+
+        Returns:
+            Tuple of (confidences array, matched_fields per candidate,
+            match_details per candidate).
+        """
+        n = len(candidates)
+        fields = self.SIMILARITY_FIELDS
+        similarity = np.zeros((n, len(fields)))
+
+        for j, (field, _, threshold) in enumerate(fields):
+            query = self._comparable(field, traits.get(field))
+            if not query:
+                continue
+            values = [self._comparable(field, c.get(field)) for c in candidates]
+            similarity[:, j] = self._similarity_many(query, values, threshold)
+
+        weights = np.array([weight for _, weight, _ in fields])
+        thresholds = np.array([threshold for _, _, threshold in fields])
+        matched = similarity >= thresholds
+
+        weighted = np.where(matched, similarity * weights, 0.0).sum(axis=1)
+        total_weight = np.where(matched, weights, 0.0).sum(axis=1)
+        confidences = np.divide(
+            weighted, total_weight, out=np.zeros(n), where=total_weight > 0
+        )
+
         matched_fields = []
-        details = {}
-
-        # Check email (highest weight)
-        email1 = traits1.get("email", "").lower().strip()
-        email2 = traits2.get("email", "").lower().strip()
-        if email1 and email2:
-            email_sim = self._string_similarity(email1, email2)
-            if email_sim >= self.EMAIL_MATCH_THRESHOLD:
-                scores.append((email_sim, 0.4))  # 40% weight
-                matched_fields.append("email")
-                details["email_similarity"] = email_sim
-
-        # Check phone
-        phone1 = self._normalize_phone(traits1.get("phone", ""))
-        phone2 = self._normalize_phone(traits2.get("phone", ""))
-        if phone1 and phone2:
-            phone_sim = self._string_similarity(phone1, phone2)
-            if phone_sim >= self.PHONE_MATCH_THRESHOLD:
-                scores.append((phone_sim, 0.3))  # 30% weight
-                matched_fields.append("phone")
-                details["phone_similarity"] = phone_sim
-
-        # Check first name
-        first1 = traits1.get("first_name", "").lower().strip()
-        first2 = traits2.get("first_name", "").lower().strip()
-        if first1 and first2:
-            first_sim = self._string_similarity(first1, first2)
-            if first_sim >= self.FUZZY_MATCH_THRESHOLD:
-                scores.append((first_sim, 0.1))  # 10% weight
-                matched_fields.append("first_name")
-                details["first_name_similarity"] = first_sim
-
-        # Check last name
-        last1 = traits1.get("last_name", "").lower().strip()
-        last2 = traits2.get("last_name", "").lower().strip()
-        if last1 and last2:
-            last_sim = self._string_similarity(last1, last2)
-            if last_sim >= self.FUZZY_MATCH_THRESHOLD:
-                scores.append((last_sim, 0.1))  # 10% weight
-                matched_fields.append("last_name")
-                details["last_name_similarity"] = last_sim
-
-        # Check company
-        company1 = traits1.get("company", "").lower().strip()
-        company2 = traits2.get("company", "").lower().strip()
-        if company1 and company2:
-            company_sim = self._string_similarity(company1, company2)
-            if company_sim >= self.FUZZY_MATCH_THRESHOLD:
-                scores.append((company_sim, 0.1))  # 10% weight
-                matched_fields.append("company")
-                details["company_similarity"] = company_sim
-
-        # Calculate weighted average
-        if scores:
-            total_weight = sum(weight for _, weight in scores)
-            weighted_sum = sum(score * weight for score, weight in scores)
-            confidence = weighted_sum / total_weight if total_weight > 0 else 0
-        else:
-            confidence = 0
+        details = []
+        for i in range(n):
+            row_fields = []
+            row_details = {}
+            for j in np.flatnonzero(matched[i]):
+                field = fields[j][0]
+                row_fields.append(field)
+                row_details[f"{field}_similarity"] = float(similarity[i, j])
+            matched_fields.append(row_fields)
+            details.append(row_details)
+
+        return confidences, matched_fields, details
+
+    def _comparable(self, field: str, value: Any) -> str:
+        """Normalize a trait value for similarity comparison."""
+        if field == "phone" and isinstance(value, (str, int)):
+            return self._normalize_phone(str(value))
+        if not isinstance(value, str):
+            return ""
+        return value.lower().strip()
 
-        return confidence, matched_fields, details
+    def _similarity_many(
+        self,
+        query: str,
+        values: List[str],
+        threshold: float
+    ) -> np.ndarray:
+        """Similarity of `query` to each value (0 where missing).
+
+        Both similarity measures are 2 * matched characters / total length,
+        so the length ratio and then the shared character counts bound the
+        score from above. Pairs whose bound is already below the threshold
+        (with slack for fuzzywuzzy's rounding) are skipped without running
+        the string comparison.
+        """
+        scores = np.zeros(len(values))
+        query_len = len(query)
+        query_chars = None
+        cutoff = threshold - 0.01
+        for i, value in enumerate(values):
+            if not value:
+                continue
+            if value == query:
+                scores[i] = 1.0
+                continue
+            total = query_len + len(value)
+            if 2.0 * min(query_len, len(value)) / total < cutoff:
+                continue
+            if query_chars is None:
+                query_chars = Counter(query)
+            shared = sum((query_chars & Counter(value)).values())
+            if 2.0 * shared / total < cutoff:
+                continue
+            scores[i] = self._string_similarity(query, value)
+        return scores
 
     # ============== Profile Merging ==============
 
@@ -520,6 +589,11 @@ class IdentityResolver:
         await self.db.commit()
         await self.db.refresh(primary, ['identities'])
 
+        if self.cache is not None:
+            await self.cache.invalidate_customer(secondary_id)
+            await self.cache.invalidate_customer(primary_id)
+            await self._invalidate_identifiers(primary)
+
         logger.info(
             f"Merged customer {secondary_id} into {primary_id}. Reason: {merge_reason}"
         )
@@ -695,6 +769,15 @@ class IdentityResolver:
         await self.db.commit()
         await self.db.refresh(identity)
 
+        if self.cache is not None:
+            organization_id = await self.db.scalar(
+                select(Customer.organization_id).where(Customer.id == customer_id)
+            )
+            await self.cache.invalidate_keys([
+                IdentityCache.make_key(organization_id, cache_type, id_value)
+                for cache_type in {id_type.lower(), identity_type.value}
+            ])
+
         logger.info(f"Linked {id_type}={id_value} to customer {customer_id}")
         return identity
 
@@ -735,6 +818,9 @@ class IdentityResolver:
 
         await self.db.commit()
 
+        if self.cache is not None:
+            await self.cache.invalidate_customer(customer_id)
+
         if identities:
             logger.info(
                 f"Unlinked {len(identities)} {id_type} identity(s) from customer {customer_id}"
@@ -744,6 +830,22 @@ class IdentityResolver:
 
     # ============== Helper Methods ==============
 
+    async def _invalidate_identifiers(self, customer: Customer):
+        """Drop cache entries (including cached misses) for a customer's identifiers."""
+        keys = []
+        for identity in customer.identities or []:
+            keys.append(IdentityCache.make_key(
+                customer.organization_id, identity.identity_type.value, identity.identity_value
+            ))
+        for id_type, id_value in (customer.external_ids or {}).items():
+            if id_type and id_value:
+                keys.append(IdentityCache.make_key(customer.organization_id, id_type, id_value))
+        if customer.anonymous_id:
+            keys.append(IdentityCache.make_key(
+                customer.organization_id, "anonymous_id", customer.anonymous_id
+            ))
+        await self.cache.invalidate_keys(keys)
+
     def _normalize_phone(self, phone: str) -> str:
         """Normalize phone number by removing non-digits."""
         if not phone:
@@ -789,42 +891,51 @@ class IdentityResolver:
         self,
         traits: Dict[str, Any],
         organization_id: str,
-        limit: int = 100
-    ) -> List[Customer]:
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, Dict[str, Any]]]:
         """Get candidate customers for fuzzy matching.
 
-        Uses available identifiers to narrow down candidates.
+        Ranks candidates in the blocking-key index (see `match_index`) and
+        loads the comparable traits of the strongest `limit` of them in the
+        same query.
+
+        Returns:
+            List of (customer_id, traits merged with external_ids) tuples.
         """
-        conditions = [Customer.organization_id == organization_id]
-
-        # Add conditions based on available traits
-        if traits.get("email"):
-            email_domain = traits["email"].split("@")[-1] if "@" in traits["email"] else ""
-            if email_domain:
-                conditions.append(
-                    or_(
-                        Customer.traits.contains({"email": traits["email"]}),
-                        Customer.external_ids.contains({"email": traits["email"]})
-                    )
-                )
+        ranking = candidate_ranking(
+            organization_id, traits, limit=limit or self.FUZZY_CANDIDATE_LIMIT
+        )
+        if ranking is None:
+            return []
+
+        # Join on primary key only so the planner cannot pick an
+        # organization-wide index; scope is re-checked on the rows
+        ranked = ranking.subquery()
+        result = await self.db.execute(
+            select(
+                Customer.id,
+                Customer.organization_id,
+                Customer.is_deleted,
+                Customer.traits,
+                Customer.external_ids
+            ).join(ranked, ranked.c.customer_id == Customer.id)
+        )
+        return [
+            (customer_id, {**(customer_traits or {}), **(external_ids or {})})
+            for customer_id, org_id, is_deleted, customer_traits, external_ids in result.all()
+            if org_id == organization_id and is_deleted == "N"
+        ]
 
-        if traits.get("phone"):
-            phone = self._normalize_phone(traits["phone"])
-            conditions.append(
-                or_(
-                    Customer.traits.contains({"phone": phone}),
-                    Customer.external_ids.contains({"phone": phone})
-                )
-            )
+    async def rebuild_match_index(self, organization_id: str) -> int:
+        """Backfill the blocking-key index for an organization.
 
-        if traits.get("company"):
-            conditions.append(
-                Customer.traits.contains({"company": traits["company"]})
-            )
+        Args:
+            organization_id: Organization to rebuild.
 
-        query = select(Customer).where(and_(*conditions)).limit(limit)
-        result = await self.db.execute(query)
-        return list(result.scalars().all())
+        Returns:
+            Number of customers indexed.
+        """
+        return await rebuild_match_keys(self.db, organization_id)
 
     async def resolve_identity_from_event(
         self,
@@ -857,45 +968,304 @@ class IdentityResolver:
             if customer:
                 return customer, None
 
-        # Priority 2: External IDs
-        if event_data.get("external_ids"):
-            ext_ids = event_data["external_ids"]
-            for id_type, id_value in ext_ids.items():
-                customer = await self.match_by_external_id(
-                    id_type, id_value, organization_id
-                )
+        # Priority 2-6: External IDs, email, phone, device ID, anonymous ID
+        for kind, id_type, value in self._event_identity_keys(event_data):
+            customer = await self._resolve_identifier(kind, id_type, value, organization_id)
+            if customer:
+                return customer, None
+
+        # No match found - use or create anonymous ID
+        anonymous_id = event_data.get("anonymous_id")
+        return None, anonymous_id or self._generate_anonymous_id()
+
+    async def _resolve_identifier(
+        self,
+        kind: str,
+        id_type: str,
+        value: Any,
+        organization_id: str
+    ) -> Optional[Customer]:
+        """Resolve a single identifier, consulting the identity cache first."""
+        if self.cache is not None:
+            cached_id = await self.cache.get(organization_id, id_type, value)
+            if cached_id == NO_CUSTOMER:
+                return None
+            if cached_id:
+                customer = await self._load_cached_customer(cached_id, organization_id)
                 if customer:
-                    return customer, None
+                    return customer
+                await self.cache.invalidate(organization_id, id_type, value)
+
+        if kind == "external":
+            customer = await self.match_by_external_id(id_type, value, organization_id)
+        elif kind == "email":
+            customer = await self.match_by_email(value, organization_id)
+        elif kind == "phone":
+            customer = await self.match_by_phone(value, organization_id)
+        elif kind == "device":
+            customer = await self.match_by_device_id(value, organization_id)
+        else:
+            customer = await self.match_by_anonymous_id(value, organization_id)
+
+        if self.cache is not None:
+            await self.cache.set(
+                organization_id, id_type, value, customer.id if customer else None
+            )
+        return customer
+
+    async def _load_cached_customer(
+        self,
+        customer_id: str,
+        organization_id: str
+    ) -> Optional[Customer]:
+        """Load a cached customer by primary key, rejecting stale entries."""
+        customer = await self.db.get(Customer, customer_id)
+        if customer and self._is_live_customer(customer, organization_id):
+            return customer
+        return None
+
+    @staticmethod
+    def _is_live_customer(customer: Customer, organization_id: str) -> bool:
+        return customer.organization_id == organization_id and customer.is_deleted == "N"
+
+    # ============== Bulk Resolution ==============
+
+    async def resolve_identities_bulk(
+        self,
+        events: List[Dict[str, Any]],
+        organization_id: str
+    ) -> List[Tuple[Optional[Customer], Optional[str]]]:
+        """Resolve customer identities for a batch of events.
+
+        Applies the same priority order as `resolve_identity_from_event`
+        (customer_id, external IDs, email, phone, device ID, anonymous ID),
+        but looks up every identifier in the batch with a handful of
+        set-based queries instead of several SELECTs per event. Identifiers
+        already in the identity cache are not queried at all.
+
+        Args:
+            events: Event data dictionaries containing identifiers.
+            organization_id: Organization to scope the search.
+
+        Returns:
+            List of (customer, anonymous_id) tuples, one per input event.
+        """
+        customer_ids = set()
+        identity_keys = set()
+        json_keys = set()
+        anonymous_ids = set()
+
+        # Identifiers answered by the identity cache skip the database
+        event_keys = [self._event_identity_keys(event_data) for event_data in events]
+        cached: Dict[Tuple[str, str, str], str] = {}
+        if self.cache is not None:
+            for key in {(k, t, str(v)) for keys in event_keys for k, t, v in keys}:
+                cached_id = await self.cache.get(organization_id, key[1], key[2])
+                if cached_id is not None:
+                    cached[key] = cached_id
+
+        for event_data, keys in zip(events, event_keys):
+            if event_data.get("customer_id"):
+                customer_ids.add(event_data["customer_id"])
+            for kind, id_type, value in keys:
+                if (kind, id_type, str(value)) in cached:
+                    continue
+                if kind == "anonymous":
+                    anonymous_ids.add(value)
+                    continue
+                identity_type = self._map_to_identity_type(id_type)
+                if identity_type:
+                    identity_keys.add((identity_type, str(value)))
+                if kind != "device":
+                    json_keys.add((id_type, value))
+
+        # customer_id -> Customer.id (org-scoped, not deleted)
+        known_customers = set()
+        for chunk in self._chunked(list(customer_ids)):
+            result = await self.db.execute(
+                select(Customer.id).where(
+                    and_(
+                        Customer.id.in_(chunk),
+                        Customer.organization_id == organization_id,
+                        Customer.is_deleted == "N"
+                    )
+                )
+            )
+            known_customers.update(result.scalars().all())
+
+        # (IdentityType, value) -> customer_id from the identity graph
+        identity_map: Dict[Tuple[IdentityType, str], str] = {}
+        values = list({value for _, value in identity_keys})
+        types = list({identity_type for identity_type, _ in identity_keys})
+        for chunk in self._chunked(values):
+            result = await self.db.execute(
+                select(
+                    CustomerIdentity.identity_type,
+                    CustomerIdentity.identity_value,
+                    CustomerIdentity.customer_id
+                ).join(
+                    Customer, Customer.id == CustomerIdentity.customer_id
+                ).where(
+                    and_(
+                        CustomerIdentity.identity_type.in_(types),
+                        CustomerIdentity.identity_value.in_(chunk),
+                        Customer.organization_id == organization_id,
+                        CustomerIdentity.is_deleted == "N"
+                    )
+                )
+            )
+            for identity_type, value, customer_id in result.all():
+                if (identity_type, value) in identity_keys:
+                    identity_map.setdefault((identity_type, value), customer_id)
+
+        # (id_type, value) -> customer_id from the external_ids JSON fallback,
+        # only for identifiers the identity graph could not answer
+        json_map: Dict[Tuple[str, str], str] = {}
+        pending: Dict[str, set] = {}
+        for id_type, value in json_keys:
+            if (self._map_to_identity_type(id_type), str(value)) not in identity_map:
+                pending.setdefault(id_type, set()).add(str(value))
+        for id_type, type_values in pending.items():
+            for chunk in self._chunked(list(type_values)):
+                result = await self.db.execute(
+                    select(
+                        Customer.id,
+                        Customer.external_ids[id_type].as_string()
+                    ).where(
+                        and_(
+                            Customer.organization_id == organization_id,
+                            Customer.is_deleted == "N",
+                            Customer.external_ids[id_type].as_string().in_(chunk)
+                        )
+                    )
+                )
+                for customer_id, value in result.all():
+                    json_map.setdefault((id_type, value), customer_id)
+
+        # anonymous_id -> customer_id
+        anonymous_map: Dict[str, str] = {}
+        for chunk in self._chunked(list(anonymous_ids)):
+            result = await self.db.execute(
+                select(Customer.id, Customer.anonymous_id).where(
+                    and_(
+                        Customer.organization_id == organization_id,
+                        Customer.anonymous_id.in_(chunk),
+                        Customer.is_deleted == "N"
+                    )
+                )
+            )
+            for customer_id, anonymous_id in result.all():
+                anonymous_map.setdefault(anonymous_id, customer_id)
+
+        def lookup(kind: str, id_type: str, value: str) -> Optional[str]:
+            if kind == "anonymous":
+                return anonymous_map.get(value)
+            identity_type = self._map_to_identity_type(id_type)
+            customer_id = identity_map.get((identity_type, value))
+            if not customer_id and kind != "device":
+                customer_id = json_map.get((id_type, value))
+            return customer_id
+
+        # Remember what the database said for identifiers the cache missed
+        if self.cache is not None:
+            looked_up = {(k, t, str(v)) for keys in event_keys for k, t, v in keys} - cached.keys()
+            for kind, id_type, value in looked_up:
+                await self.cache.set(
+                    organization_id, id_type, value, lookup(kind, id_type, value)
+                )
+
+        # Pick a customer for each event in priority order
+        resolved: List[Tuple[Optional[str], Optional[str]]] = []
+        from_cache = set()
+        for event_data, keys in zip(events, event_keys):
+            customer_id = event_data.get("customer_id")
+            if customer_id not in known_customers:
+                customer_id = None
+
+            if not customer_id:
+                for kind, id_type, value in keys:
+                    key = (kind, id_type, str(value))
+                    if key in cached:
+                        customer_id = cached[key] or None
+                        if customer_id:
+                            from_cache.add(customer_id)
+                    else:
+                        customer_id = lookup(*key)
+                    if customer_id:
+                        break
+
+            if customer_id:
+                resolved.append((customer_id, None))
+            else:
+                anonymous_id = event_data.get("anonymous_id")
+                resolved.append((None, anonymous_id or self._generate_anonymous_id()))
+
+        # Load the resolved customers in one pass
+        customers: Dict[str, Customer] = {}
+        matched_ids = list({customer_id for customer_id, _ in resolved if customer_id})
+        for chunk in self._chunked(matched_ids):
+            result = await self.db.execute(
+                select(Customer).where(Customer.id.in_(chunk))
+            )
+            for customer in result.scalars().all():
+                customers[customer.id] = customer
+
+        # Cached entries pointing at merged/deleted profiles: drop and re-resolve
+        stale = {
+            customer_id for customer_id in from_cache
+            if customer_id not in customers
+            or not self._is_live_customer(customers[customer_id], organization_id)
+        }
+        for customer_id in stale:
+            await self.cache.invalidate_customer(customer_id)
+
+        results = []
+        for event_data, (customer_id, anonymous_id) in zip(events, resolved):
+            if customer_id in stale:
+                results.append(await self.resolve_identity_from_event(event_data, organization_id))
+            elif customer_id:
+                results.append((customers.get(customer_id), anonymous_id))
+            else:
+                results.append((None, anonymous_id))
+        return results
+
+    def _event_identity_keys(
+        self,
+        event_data: Dict[str, Any]
+    ) -> List[Tuple[str, str, Any]]:
+        """List an event's identifiers in resolution priority order.
+
+        Each entry is (kind, id_type, normalized_value).
+        """
+        keys = []
+
+        for id_type, id_value in (event_data.get("external_ids") or {}).items():
+            if id_type and id_value:
+                keys.append(("external", id_type, id_value))
 
-        # Priority 3: Email
         email = event_data.get("email") or event_data.get("traits", {}).get("email")
         if email:
-            customer = await self.match_by_email(email, organization_id)
-            if customer:
-                return customer, None
+            keys.append(("email", "email", email.lower().strip()))
 
-        # Priority 4: Phone
         phone = event_data.get("phone") or event_data.get("traits", {}).get("phone")
         if phone:
-            customer = await self.match_by_phone(phone, organization_id)
-            if customer:
-                return customer, None
+            phone = self._normalize_phone(phone)
+            if phone:
+                keys.append(("phone", "phone", phone))
 
-        # Priority 5: Device ID
         device_id = event_data.get("context", {}).get("device", {}).get("id")
         if device_id:
-            customer = await self.match_by_device_id(device_id, organization_id)
-            if customer:
-                return customer, None
+            keys.append(("device", "device_id", device_id))
 
-        # No match found - use or create anonymous ID
-        anonymous_id = event_data.get("anonymous_id")
-        if anonymous_id:
-            customer = await self.match_by_anonymous_id(anonymous_id, organization_id)
-            if customer:
-                return customer, None
+        if event_data.get("anonymous_id"):
+            keys.append(("anonymous", "anonymous_id", event_data["anonymous_id"]))
 
-        return None, anonymous_id or self._generate_anonymous_id()
+        return keys
+
+    @staticmethod
+    def _chunked(items: List[Any], size: int = 500) -> List[List[Any]]:
+        """Split a list into chunks to keep IN-lists under bind parameter limits."""
+        return [items[i:i + size] for i in range(0, len(items), size)]
 
     def _generate_anonymous_id(self) -> str:
         """Generate a new anonymous ID."""
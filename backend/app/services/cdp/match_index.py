@@ -0,0 +1,376 @@
+"""
+Blocking-key candidate index for probabilistic identity resolution.
+
+Fuzzy matching used to narrow candidates with JSON `contains` predicates,
+which cannot use a B-tree index and scan every customer in the
+organization. Instead, each customer gets a small set of normalized
+blocking keys stored in `customer_match_keys`:
+
+    email          full normalized address
+    email_local    local-part without "+tag" suffix
+    email_domain   domain, for non-freemail domains only
+    phone          last 10 digits
+    name           Soundex(first) + Soundex(last)
+    last_name      first initial + Soundex(last)
+    company        normalized company name (legal suffixes stripped)
+    company_sx     Soundex of the normalized company name
+
+Candidate generation is then a handful of index range scans. Keys are
+rewritten automatically by Customer mapper events whenever a customer's
+traits, external IDs or deletion flag change in a flush;
+`rebuild_match_keys` backfills an organization.
+
+Latency: the goal is a sub-10ms fuzzy match at 1M+ customers per
+organization, and it is not met yet. `benchmarks/bench_fuzzy_match.py` on
+SQLite measured p50 8.1ms / p95 12.2ms at 100k customers and p50 11.6ms /
+p95 14.6ms at 300k; 1M has not been measured.
+"""
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Select, and_, delete, event, func, insert, inspect, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.base import generate_id
+from ...models.customer import Customer
+from ...models.customer_match_key import CustomerMatchKey
+
+logger = logging.getLogger(__name__)
+
+MatchKey = Tuple[str, str]
+
+# Relative strength of each key kind when ranking candidates
+KEY_WEIGHTS = {
+    "email": 10,
+    "phone": 8,
+    "email_local": 4,
+    "name": 3,
+    "company": 2,
+    "last_name": 1,
+    "company_sx": 1,
+    "email_domain": 1,
+}
+
+# Cap on rows read per key so very common keys cannot blow up a lookup
+MAX_BLOCK_SIZE = 500
+
+FREE_EMAIL_DOMAINS = frozenset({
+    "gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com",
+    "live.com", "msn.com", "aol.com", "icloud.com", "me.com", "mac.com",
+    "protonmail.com", "proton.me", "gmx.com", "mail.com", "yandex.com",
+})
+
+COMPANY_SUFFIXES = frozenset({
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation",
+    "co", "company", "gmbh", "plc", "sa", "ag", "bv", "pty",
+})
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+# ============== Key Derivation ==============
+
+def soundex(value: str) -> str:
+    """American Soundex code (e.g. 'Robert' -> 'R163'); '' for non-alphabetic input."""
+    letters = [c for c in value.lower() if "a" <= c <= "z"]
+    if not letters:
+        return ""
+
+    code = letters[0].upper()
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "hw":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def normalize_company(value: str) -> str:
+    """Lowercase, strip punctuation and trailing legal suffixes."""
+    tokens = re.findall(r"[a-z0-9]+", value.lower())
+    while len(tokens) > 1 and tokens[-1] in COMPANY_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def _text(value: Any) -> str:
+    return value.lower().strip() if isinstance(value, str) else ""
+
+
+def build_match_keys(
+    traits: Optional[Dict[str, Any]],
+    external_ids: Optional[Dict[str, Any]] = None
+) -> Set[MatchKey]:
+    """Derive blocking keys from traits and external IDs.
+
+    External IDs take precedence over traits, mirroring how
+    `IdentityResolver._calculate_similarity` combines them.
+
+    Args:
+        traits: Customer (or query) traits.
+        external_ids: Customer external IDs.
+
+    Returns:
+        Set of (key_type, key_value) tuples.
+    """
+    data = {**(traits or {}), **(external_ids or {})}
+    keys: Set[MatchKey] = set()
+
+    email = _text(data.get("email"))
+    if "@" in email:
+        local, _, domain = email.rpartition("@")
+        keys.add(("email", email))
+        local = local.split("+", 1)[0]
+        if len(local) >= 3:
+            keys.add(("email_local", local))
+        if domain and domain not in FREE_EMAIL_DOMAINS:
+            keys.add(("email_domain", domain))
+
+    phone = data.get("phone")
+    if phone:
+        digits = "".join(c for c in str(phone) if c.isdigit())
+        if len(digits) >= 7:
+            keys.add(("phone", digits[-10:]))
+
+    first = soundex(_text(data.get("first_name")))
+    last_name = _text(data.get("last_name"))
+    last = soundex(last_name)
+    if first and last:
+        keys.add(("name", first + last))
+    if last:
+        first_initial = _text(data.get("first_name"))[:1]
+        keys.add(("last_name", first_initial + last))
+
+    company = normalize_company(_text(data.get("company")))
+    if company:
+        keys.add(("company", company))
+        company_code = soundex(company)
+        if company_code:
+            keys.add(("company_sx", company_code))
+
+    return {(key_type, value[:255]) for key_type, value in keys}
+
+
+def _key_rows(customer_id: str, organization_id: str, keys: Iterable[MatchKey]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": generate_id(),
+            "organization_id": organization_id,
+            "customer_id": customer_id,
+            "key_type": key_type,
+            "key_value": key_value,
+        }
+        for key_type, key_value in keys
+    ]
+
+
+# ============== Candidate Lookup ==============
+
+def candidate_ranking(
+    organization_id: str,
+    traits: Dict[str, Any],
+    limit: int = 100,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> Optional[Select]:
+    """Build the query ranking customers that share blocking keys with `traits`.
+
+    Each key is an index range scan capped at `max_block_size` rows;
+    candidates are ranked by the summed weight of the keys they share.
+    The query selects `customer_id`, strongest first, and can be used as a
+    subquery to load candidate rows in the same round trip.
+
+    Args:
+        organization_id: Organization to scope the search.
+        traits: Traits of the profile being matched.
+        limit: Maximum candidates to return.
+        max_block_size: Maximum rows read per key.
+
+    Returns:
+        The ranking query, or None if `traits` yield no blocking keys.
+    """
+    keys = build_match_keys(traits)
+    if not keys:
+        return None
+
+    blocks = []
+    for key_type, key_value in sorted(keys):
+        block = select(CustomerMatchKey.customer_id).where(
+            and_(
+                CustomerMatchKey.organization_id == organization_id,
+                CustomerMatchKey.key_type == key_type,
+                CustomerMatchKey.key_value == key_value
+            )
+        ).limit(max_block_size).subquery()
+        blocks.append(select(
+            block.c.customer_id,
+            literal(KEY_WEIGHTS.get(key_type, 1)).label("weight")
+        ))
+
+    matches = union_all(*blocks).subquery()
+    return select(matches.c.customer_id).group_by(
+        matches.c.customer_id
+    ).order_by(
+        func.sum(matches.c.weight).desc()
+    ).limit(limit)
+
+
+async def find_candidate_ids(
+    db: AsyncSession,
+    organization_id: str,
+    traits: Dict[str, Any],
+    limit: int = 100,
+    max_block_size: int = MAX_BLOCK_SIZE
+) -> List[str]:
+    """Find candidate customer IDs sharing blocking keys with `traits`.
+
+    Args:
+        db: Async database session.
+        organization_id: Organization to scope the search.
+        traits: Traits of the profile being matched.
+        limit: Maximum candidates to return.
+        max_block_size: Maximum rows read per key.
+
+    Returns:
+        Candidate customer IDs, strongest first.
+    """
+    query = candidate_ranking(organization_id, traits, limit, max_block_size)
+    if query is None:
+        return []
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+# ============== Maintenance ==============
+
+async def rebuild_match_keys(
+    db: AsyncSession,
+    organization_id: str,
+    batch_size: int = 1000
+) -> int:
+    """Recompute blocking keys for every customer in an organization.
+
+    Customers are walked in ID order; each batch's ID range has its keys
+    deleted and rewritten in one transaction, so lookups keep seeing a
+    complete index for the rest of the organization while it rebuilds.
+    Keys of deleted customers in the range are dropped.
+
+    Args:
+        db: Async database session.
+        organization_id: Organization to rebuild.
+        batch_size: Customers processed per transaction.
+
+    Returns:
+        Number of customers indexed.
+    """
+    org_keys = CustomerMatchKey.organization_id == organization_id
+    indexed = 0
+    last_id = ""
+    while True:
+        result = await db.execute(
+            select(Customer.id, Customer.traits, Customer.external_ids, Customer.is_deleted).where(
+                and_(
+                    Customer.organization_id == organization_id,
+                    Customer.id > last_id
+                )
+            ).order_by(Customer.id).limit(batch_size)
+        )
+        batch = result.all()
+        if not batch:
+            break
+
+        rows = []
+        for customer_id, traits, external_ids, is_deleted in batch:
+            if is_deleted == "N":
+                rows.extend(_key_rows(customer_id, organization_id, build_match_keys(traits, external_ids)))
+                indexed += 1
+        await db.execute(
+            delete(CustomerMatchKey).where(
+                and_(
+                    org_keys,
+                    CustomerMatchKey.customer_id > last_id,
+                    CustomerMatchKey.customer_id <= batch[-1][0]
+                )
+            )
+        )
+        if rows:
+            await db.execute(insert(CustomerMatchKey), rows)
+        await db.commit()
+        last_id = batch[-1][0]
+
+    # Keys past the last customer belong to customers that no longer exist
+    await db.execute(delete(CustomerMatchKey).where(and_(org_keys, CustomerMatchKey.customer_id > last_id)))
+    await db.commit()
+
+    logger.info(f"Rebuilt match keys for {indexed} customer(s) in org {organization_id}")
+    return indexed
+
+
+_UNKNOWN = object()
+
+
+def _previous_value(state, attr: str):
+    """Pre-flush value of an attribute, _UNKNOWN if it was not loaded."""
+    history = state.attrs[attr].history
+    if not history.has_changes():
+        return getattr(state.object, attr)
+    return history.deleted[0] if history.deleted else _UNKNOWN
+
+
+def _keys_changed(customer: Customer) -> bool:
+    """Whether a dirty customer's blocking keys may differ from what is stored."""
+    state = inspect(customer)
+    if state.attrs.is_deleted.history.has_changes():
+        return True
+    if not (state.attrs.traits.history.has_changes() or state.attrs.external_ids.history.has_changes()):
+        return False
+
+    old_traits = _previous_value(state, "traits")
+    old_external_ids = _previous_value(state, "external_ids")
+    if old_traits is _UNKNOWN or old_external_ids is _UNKNOWN:
+        return True
+    return (
+        build_match_keys(old_traits, old_external_ids)
+        != build_match_keys(customer.traits, customer.external_ids)
+    )
+
+
+def _write_keys(connection, customer: Customer) -> None:
+    """Insert the blocking keys of one flushed customer."""
+    if customer.is_deleted == "Y":
+        return
+    rows = _key_rows(
+        customer.id,
+        customer.organization_id,
+        build_match_keys(customer.traits, customer.external_ids)
+    )
+    if rows:
+        connection.execute(insert(CustomerMatchKey.__table__), rows)
+
+
+@event.listens_for(Customer, "after_insert", propagate=True)
+def _insert_match_keys(mapper, connection, customer: Customer) -> None:
+    """Write blocking keys for a newly inserted customer."""
+    _write_keys(connection, customer)
+
+
+@event.listens_for(Customer, "after_update", propagate=True)
+def _update_match_keys(mapper, connection, customer: Customer) -> None:
+    """Rewrite blocking keys for a customer whose identifying fields changed."""
+    if not _keys_changed(customer):
+        return
+    connection.execute(
+        delete(CustomerMatchKey.__table__).where(CustomerMatchKey.customer_id == customer.id)
+    )
+    _write_keys(connection, customer)
@@ -4,13 +4,15 @@ Profile Enrichment Service for the Customer Data Platform.
 Provides data enrichment from external sources, computed traits calculation,
 and customer segmentation capabilities.
 """
+import copy
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from statistics import mean
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func, desc
+from sqlalchemy import select, and_, func, desc, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import selectinload
 
 from ...models.customer import Customer
@@ -18,6 +20,9 @@ from ...models.customer_event import CustomerEvent, EventType
 from ...models.customer_segment import CustomerSegment, SegmentType, SegmentStatus
 from ...models.segment_membership import SegmentMembership
 from ...core.config import get_settings
+from .segment_engine import SegmentEngine
+from .segment_index import OrgSegmentIndex
+from .trait_engine import ComputedTraitEngine
 
 logger = logging.getLogger(__name__)
 
@@ -394,37 +399,45 @@ class ProfileEnricher:
     async def update_all_computed_traits(self, customer_id: str):
         """Update all computed traits for a customer.
 
+        Uses the batch trait engine, so events are aggregated in one query
+        instead of once per calculator.
+
         Args:
             customer_id: Customer ID.
         """
         result = await self.db.execute(
-            select(Customer).where(Customer.id == customer_id)
+            select(Customer.id).where(Customer.id == customer_id)
         )
-        customer = result.scalar_one_or_none()
-
-        if not customer:
+        if result.scalar_one_or_none() is None:
             logger.warning(f"Customer {customer_id} not found for trait update")
             return
 
-        # Calculate all traits
-        computed_traits = customer.computed_traits or {}
-
-        computed_traits.update({
-            "engagement_score": await self.calculate_engagement_score(customer_id),
-            "ltv": await self.calculate_ltv(customer_id),
-            "churn_risk": await self.calculate_churn_risk(customer_id),
-            "recency_days": await self.calculate_recency(customer_id),
-            "frequency_90d": await self.calculate_frequency(customer_id, 90),
-            "frequency_30d": await self.calculate_frequency(customer_id, 30),
-            "monetary_value": await self.calculate_monetary_value(customer_id),
-            "last_computed_at": datetime.utcnow().isoformat()
-        })
-
-        customer.computed_traits = computed_traits
+        await ComputedTraitEngine(self.db).recompute_customers([customer_id])
         await self.db.commit()
 
         logger.info(f"Updated computed traits for customer {customer_id}")
 
+    async def update_organization_computed_traits(
+        self,
+        organization_id: str,
+        chunk_size: int = 5000,
+        progress: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Recompute computed traits for all customers of an organization.
+
+        Args:
+            organization_id: Organization ID.
+            chunk_size: Customers per aggregate query and bulk UPDATE.
+            progress: Optional async callback receiving (customers done, total).
+
+        Returns:
+            Recomputation statistics.
+        """
+        result = await ComputedTraitEngine(self.db).recompute_organization(
+            organization_id, chunk_size=chunk_size, progress=progress
+        )
+        return result.to_dict()
+
     # ============== Segmentation ==============
 
     async def assign_segments(self, customer_id: str) -> List[str]:
@@ -471,7 +484,11 @@ class ProfileEnricher:
         segment: CustomerSegment
     ) -> bool:
         """Evaluate if customer matches segment criteria."""
-        criteria = segment.criteria or {}
+        return self._matches_criteria(customer, segment.criteria)
+
+    def _matches_criteria(self, customer: Customer, criteria: Optional[Dict[str, Any]]) -> bool:
+        """Evaluate segment criteria against customer data."""
+        criteria = criteria or {}
         conditions = criteria.get("conditions", [])
         operator = criteria.get("operator", "and")
 
@@ -620,11 +637,21 @@ class ProfileEnricher:
 
         await self.db.commit()
 
-    async def compute_segment(self, segment_id: str) -> Dict[str, Any]:
+    async def compute_segment(
+        self,
+        segment_id: str,
+        incremental: bool = False
+    ) -> Dict[str, Any]:
         """Compute segment membership based on criteria.
 
+        Criteria are compiled to SQL and memberships reconciled with
+        set-based bulk writes (see `SegmentEngine`).
+
         Args:
             segment_id: Segment ID to compute.
+            incremental: Only re-evaluate customers updated since the last
+                computation. Falls back to a full computation if the
+                segment has never been computed.
 
         Returns:
             Computation results.
@@ -637,64 +664,176 @@ class ProfileEnricher:
         if not segment:
             return {"success": False, "error": "Segment not found"}
 
+        since = segment.computed_at if incremental else None
+        started_at = datetime.utcnow()
+
         # Mark as computing
         segment.mark_computing()
         await self.db.commit()
 
         try:
-            # Get all customers in organization
-            customers_result = await self.db.execute(
-                select(Customer).where(
-                    and_(
-                        Customer.organization_id == segment.organization_id,
-                        Customer.is_deleted == "N"
-                    )
-                )
-            )
-            customers = customers_result.scalars().all()
-
-            matched_count = 0
-            for customer in customers:
-                should_be_member = await self._evaluate_segment_criteria(customer, segment)
+            engine = SegmentEngine(self.db, self._evaluate_condition)
+            matched_count, diff = await engine.compute(segment, since=since)
 
-                # Check current membership
-                membership_result = await self.db.execute(
-                    select(SegmentMembership).where(
-                        and_(
-                            SegmentMembership.customer_id == customer.id,
-                            SegmentMembership.segment_id == segment_id
-                        )
-                    )
-                )
-                membership = membership_result.scalar_one_or_none()
-
-                if should_be_member and not membership:
-                    # Add to segment
-                    await self._add_to_segment(customer.id, segment_id)
-                    matched_count += 1
-                elif not should_be_member and membership and membership.is_active():
-                    # Remove from segment
-                    membership.leave("criteria_no_longer_match")
-                elif should_be_member and membership and not membership.is_active():
-                    # Rejoin segment
-                    membership.rejoin("criteria_match")
-                    matched_count += 1
-                elif should_be_member:
-                    matched_count += 1
-
-            # Mark as computed
+            # Mark as computed; changes made during the run are picked up
+            # by the next incremental pass
             segment.mark_computed(matched_count)
+            segment.computed_at = started_at
             await self.db.commit()
 
+            logger.info(
+                f"Computed segment {segment_id}: {matched_count} members "
+                f"(+{diff.joined} joined, +{diff.rejoined} rejoined, -{diff.left} left, "
+                f"{'incremental' if since else 'full'})"
+            )
+
             return {
                 "success": True,
                 "segment_id": segment_id,
                 "customer_count": matched_count,
-                "computed_at": segment.computed_at.isoformat()
+                "computed_at": segment.computed_at.isoformat(),
+                "incremental": since is not None,
+                "joined": diff.joined + diff.rejoined,
+                "left": diff.left,
             }
 
         except Exception as e:
+            await self.db.rollback()
             segment.status = SegmentStatus.ACTIVE  # Reset status
             await self.db.commit()
             logger.error(f"Segment computation failed: {e}")
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+
+    # ============== Real-time Segmentation ==============
+
+    def snapshot_segment_inputs(
+        self,
+        customer: Customer,
+        index: OrgSegmentIndex
+    ) -> Optional[Dict[str, Any]]:
+        """Capture the values of every field the organization's segments read.
+
+        Call before mutating a profile and pass the result to
+        `apply_realtime_segments` afterwards.
+
+        Args:
+            customer: Customer about to be updated.
+            index: The organization's segment predicate index.
+
+        Returns:
+            Field path -> value, or None for a customer with no events yet
+            (all segments are evaluated for them).
+        """
+        if not (customer.computed_traits or {}).get("total_events"):
+            return None
+        # Deep copy: traits and computed traits are mutated in place
+        return copy.deepcopy({f: self._get_field_value(customer, f) for f in index.fields})
+
+    async def apply_realtime_segments(
+        self,
+        index: OrgSegmentIndex,
+        changes: List[Tuple[Customer, Optional[Dict[str, Any]]]]
+    ) -> Dict[str, Dict[str, List[str]]]:
+        """Re-evaluate segments whose inputs changed and update memberships.
+
+        Changes are added to the session; the caller commits.
+
+        Args:
+            index: The organization's segment predicate index.
+            changes: (updated customer, snapshot taken before the update).
+
+        Returns:
+            Customer ID -> {"joined": [...], "left": [...]} segment IDs.
+        """
+        should_be_member: Dict[Tuple[str, str], bool] = {}
+        for customer, before in changes:
+            if customer.is_deleted == "Y":
+                continue
+            if before is None:
+                segments = list(index.segments.values())
+            else:
+                after = {f: self._get_field_value(customer, f) for f in index.fields}
+                segments = index.affected_segments(before, after)
+            for segment in segments:
+                should_be_member[(customer.id, segment.id)] = self._matches_criteria(customer, segment.criteria)
+
+        if not should_be_member:
+            return {}
+
+        customer_ids = {customer_id for customer_id, _ in should_be_member}
+        segment_ids = {segment_id for _, segment_id in should_be_member}
+        result = await self.db.execute(
+            select(SegmentMembership).where(
+                and_(
+                    SegmentMembership.customer_id.in_(customer_ids),
+                    SegmentMembership.segment_id.in_(segment_ids)
+                )
+            )
+        )
+        memberships = {(m.customer_id, m.segment_id): m for m in result.scalars().all()}
+
+        changed: Dict[str, Dict[str, List[str]]] = {}
+        count_deltas: Dict[str, int] = {}
+
+        def record(customer_id: str, segment_id: str, joined: bool):
+            count_deltas[segment_id] = count_deltas.get(segment_id, 0) + (1 if joined else -1)
+            changed.setdefault(customer_id, {"joined": [], "left": []})[
+                "joined" if joined else "left"
+            ].append(segment_id)
+
+        new_members = []
+        for (customer_id, segment_id), should_join in should_be_member.items():
+            membership = memberships.get((customer_id, segment_id))
+            is_member = membership is not None and membership.is_active()
+            if should_join == is_member:
+                continue
+
+            if not should_join:
+                membership.leave("criteria_no_longer_match")
+            elif membership is not None:
+                membership.rejoin("criteria_match")
+            else:
+                new_members.append((customer_id, segment_id))
+                continue
+            record(customer_id, segment_id, should_join)
+
+        for customer_id, segment_id in await self._insert_memberships(new_members):
+            record(customer_id, segment_id, True)
+
+        # Atomic increments keep counts current without a recompute
+        for segment_id, delta in count_deltas.items():
+            if delta:
+                await self.db.execute(
+                    update(CustomerSegment)
+                    .where(CustomerSegment.id == segment_id)
+                    .values(customer_count=CustomerSegment.customer_count + delta)
+                    .execution_options(synchronize_session=False)
+                )
+
+        return changed
+
+    async def _insert_memberships(self, members: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Insert new memberships, skipping ones another writer just created.
+
+        Returns:
+            (customer ID, segment ID) of the rows actually inserted.
+        """
+        if not members:
+            return []
+        dialect = self.db.get_bind().dialect.name
+        rows = [
+            {"customer_id": customer_id, "segment_id": segment_id, "joined_reason": "criteria_match"}
+            for customer_id, segment_id in members
+        ]
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            result = await self.db.execute(
+                dialect_insert(SegmentMembership)
+                .on_conflict_do_nothing(index_elements=["segment_id", "customer_id"])
+                .returning(SegmentMembership.customer_id, SegmentMembership.segment_id),
+                rows,
+            )
+            return [tuple(row) for row in result.all()]
+
+        await self.db.execute(insert(SegmentMembership), rows)
+        return members
@@ -0,0 +1,577 @@
+"""
+Set-based segment computation engine for the Customer Data Platform.
+
+Compiles `CustomerSegment.criteria` into a SQL WHERE clause over promoted
+Customer columns and JSON traits, then reconciles memberships with set
+operations instead of evaluating and querying customer by customer:
+
+    leaves   = active members  - matching customers  (bulk UPDATE)
+    rejoins  = former members  & matching customers  (bulk UPDATE)
+    joins    = matching customers - all members      (bulk INSERT ... SELECT)
+
+Conditions that cannot be expressed exactly in SQL for the current dialect
+(e.g. comparing against a list) are evaluated in Python with
+`ProfileEnricher._evaluate_condition` semantics on the SQL-narrowed
+candidates, and the diff is then done with Python sets.
+
+Incremental mode re-evaluates only customers updated since the segment's
+`computed_at`.
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    DateTime, Float, Integer, String, Text, and_, case, cast, exists,
+    false, func, insert, literal, not_, or_, select, true, update
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from ...models.customer import Customer
+from ...models.customer_segment import CustomerSegment
+from ...models.segment_membership import SegmentMembership
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DIALECTS = ("sqlite", "postgresql")
+JSON_FIELDS = ("traits", "computed_traits", "external_ids")
+
+# Chunk size for IN-lists and bulk writes
+CHUNK_SIZE = 1000
+
+
+class _NotCompilable(Exception):
+    """Raised when a condition has no exact SQL equivalent."""
+
+
+@dataclass
+class CompiledCriteria:
+    """Result of compiling segment criteria."""
+    where: ColumnElement
+    residual: List[Dict[str, Any]] = field(default_factory=list)
+    residual_operator: str = "and"
+
+    @property
+    def fully_compiled(self) -> bool:
+        return not self.residual
+
+
+@dataclass
+class SegmentDiff:
+    """Outcome of a membership reconciliation."""
+    joined: int = 0
+    rejoined: int = 0
+    left: int = 0
+    evaluated: Optional[int] = None
+
+
+# ============== Criteria Compilation ==============
+
+class CriteriaCompiler:
+    """
+    Translate segment criteria into SQLAlchemy expressions.
+
+    Mirrors `ProfileEnricher._evaluate_condition`: missing values never
+    satisfy comparisons, `ne` is true for missing values, string operators
+    are case-sensitive and only match string values.
+    """
+
+    def __init__(self, dialect: str):
+        """Initialize the compiler.
+
+        Args:
+            dialect: SQLAlchemy dialect name ('sqlite' or 'postgresql').
+        """
+        if dialect not in SUPPORTED_DIALECTS:
+            raise ValueError(f"Unsupported dialect for segment compilation: {dialect}")
+        self.dialect = dialect
+
+    def compile(self, criteria: Dict[str, Any]) -> CompiledCriteria:
+        """Compile criteria into a WHERE clause plus Python-evaluated residue.
+
+        Args:
+            criteria: Segment criteria ({"conditions": [...], "operator": "and"|"or"}).
+
+        Returns:
+            CompiledCriteria. For "and", compiled conditions narrow the
+            candidates and residual ones are checked in Python; for "or" any
+            residual condition means every customer is a candidate.
+        """
+        conditions = (criteria or {}).get("conditions", [])
+        operator = (criteria or {}).get("operator", "and")
+
+        if not conditions:
+            return CompiledCriteria(where=false())
+
+        compiled, residual = [], []
+        for condition in conditions:
+            try:
+                compiled.append(self.compile_condition(condition))
+            except _NotCompilable:
+                residual.append(condition)
+
+        if operator == "and":
+            return CompiledCriteria(
+                where=and_(true(), *compiled),
+                residual=residual,
+                residual_operator="and"
+            )
+
+        if residual:
+            return CompiledCriteria(where=true(), residual=conditions, residual_operator="or")
+        return CompiledCriteria(where=or_(*compiled))
+
+    def compile_condition(self, condition: Dict[str, Any]) -> ColumnElement:
+        """Compile a single condition.
+
+        Raises:
+            _NotCompilable: If the condition has no exact SQL equivalent.
+        """
+        field_name = condition.get("field", "")
+        op = condition.get("operator", "eq")
+        value = condition.get("value")
+
+        parts = field_name.split(".")
+        if parts[0] in JSON_FIELDS and len(parts) > 1:
+            return self._compile_json(getattr(Customer, parts[0]), parts[1:], op, value)
+        if len(parts) == 1 and parts[0] in Customer.__table__.columns:
+            return self._compile_column(Customer.__table__.columns[parts[0]], op, value)
+        raise _NotCompilable(field_name)
+
+    # ----- Promoted columns -----
+
+    def _compile_column(self, column, op: str, value: Any) -> ColumnElement:
+        column_type = column.type
+        if isinstance(column_type, (Float, Integer)):
+            kind = "number"
+        elif isinstance(column_type, DateTime):
+            kind = "datetime"
+            if isinstance(value, str):
+                try:
+                    value = datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+                except ValueError:
+                    raise _NotCompilable(column.name)
+        elif isinstance(column_type, (String, Text)):
+            kind = "string"
+        else:
+            raise _NotCompilable(column.name)
+
+        is_null = column.is_(None)
+        matches_kind = self._value_kind(value) == kind or (
+            kind == "datetime" and isinstance(value, datetime)
+        )
+
+        if op == "exists":
+            return self._compile_exists(is_null, value)
+        if op in ("eq", "ne"):
+            if value is None:
+                eq = is_null
+            elif matches_kind:
+                eq = and_(column.is_not(None), column == value)
+            else:
+                eq = false()
+            return eq if op == "eq" else not_(eq)
+        if op in ("gt", "gte", "lt", "lte"):
+            if value is None:
+                return false()
+            if not matches_kind:
+                raise _NotCompilable(column.name)
+            return and_(column.is_not(None), self._compare(column, op, value))
+        if op in ("contains", "starts_with", "ends_with"):
+            if kind != "string" or not isinstance(value, str):
+                raise _NotCompilable(column.name)
+            return and_(column.is_not(None), self._string_op(column, op, value))
+        return false()
+
+    # ----- JSON paths -----
+
+    def _compile_json(self, column, path: List[str], op: str, value: Any) -> ColumnElement:
+        if any('"' in p or "\\" in p for p in path):
+            raise _NotCompilable(".".join(path))
+        accessor = _JsonAccessor(self.dialect, column, path)
+        value_kind = self._value_kind(value)
+
+        if op == "exists":
+            return self._compile_exists(accessor.is_null(), value)
+        if op in ("eq", "ne"):
+            if value is None:
+                eq = accessor.is_null()
+            elif value_kind == "bool":
+                eq = and_(accessor.is_bool(), accessor.bool_value() if value else not_(accessor.bool_value()))
+            elif value_kind == "number":
+                eq = and_(accessor.is_number(), accessor.number_value() == value)
+            elif value_kind == "string":
+                eq = and_(accessor.is_string(), accessor.text_value() == value)
+            else:
+                raise _NotCompilable(op)
+            eq = func.coalesce(eq, false())
+            return eq if op == "eq" else not_(eq)
+        if op in ("gt", "gte", "lt", "lte"):
+            if value is None:
+                return false()
+            if value_kind == "number":
+                return and_(accessor.is_number(), self._compare(accessor.number_value(), op, value))
+            if value_kind == "string":
+                return and_(accessor.is_string(), self._compare(accessor.text_value(), op, value))
+            raise _NotCompilable(op)
+        if op in ("contains", "starts_with", "ends_with"):
+            if not isinstance(value, str):
+                raise _NotCompilable(op)
+            string_match = and_(accessor.is_string(), self._string_op(accessor.text_value(), op, value))
+            if op == "contains":
+                return or_(string_match, accessor.array_contains(value))
+            return string_match
+        return false()
+
+    # ----- Shared helpers -----
+
+    @staticmethod
+    def _value_kind(value: Any) -> Optional[str]:
+        if isinstance(value, bool):
+            return "bool"
+        if isinstance(value, (int, float)):
+            return "number"
+        if isinstance(value, str):
+            return "string"
+        return None
+
+    @staticmethod
+    def _compile_exists(is_null: ColumnElement, value: Any) -> ColumnElement:
+        if value is True:
+            return not_(is_null)
+        if value is False:
+            return is_null
+        raise _NotCompilable("exists")
+
+    @staticmethod
+    def _compare(expr, op: str, value: Any) -> ColumnElement:
+        return {
+            "gt": lambda: expr > value,
+            "gte": lambda: expr >= value,
+            "lt": lambda: expr < value,
+            "lte": lambda: expr <= value,
+        }[op]()
+
+    def _string_op(self, expr, op: str, value: str) -> ColumnElement:
+        """Case-sensitive substring/prefix/suffix match (LIKE is not, on SQLite)."""
+        if not value:
+            return true()
+        length = len(value)
+        if op == "contains":
+            position = func.instr(expr, value) if self.dialect == "sqlite" else func.strpos(expr, value)
+            return position > 0
+        if op == "starts_with":
+            return func.substr(expr, 1, length) == value
+        if self.dialect == "sqlite":
+            return func.substr(expr, -length) == value
+        return func.right(expr, length) == value
+
+
+class _JsonAccessor:
+    """Dialect-specific typed access to a JSON path."""
+
+    def __init__(self, dialect: str, column, path: List[str]):
+        self.dialect = dialect
+        self.column = column
+        if dialect == "sqlite":
+            self.path = "$" + "".join(f'."{p}"' for p in path)
+            self.json_type = func.json_type(column, self.path)
+        else:
+            self.path = literal(path, ARRAY(Text))
+            self.json_type = func.json_typeof(column.op("#>")(self.path))
+
+    def is_null(self) -> ColumnElement:
+        return or_(self.json_type.is_(None), self.json_type == "null")
+
+    def is_string(self) -> ColumnElement:
+        return self.json_type == ("text" if self.dialect == "sqlite" else "string")
+
+    def is_number(self) -> ColumnElement:
+        if self.dialect == "sqlite":
+            return self.json_type.in_(("integer", "real"))
+        return self.json_type == "number"
+
+    def is_bool(self) -> ColumnElement:
+        if self.dialect == "sqlite":
+            return self.json_type.in_(("true", "false"))
+        return self.json_type == "boolean"
+
+    def text_value(self):
+        if self.dialect == "sqlite":
+            return func.json_extract(self.column, self.path, type_=String)
+        return self.column.op("#>>", return_type=String)(self.path)
+
+    def number_value(self):
+        if self.dialect == "sqlite":
+            return func.json_extract(self.column, self.path, type_=Float)
+        # Guard the cast: PostgreSQL does not short-circuit AND
+        return case((self.is_number(), cast(self.text_value(), Float)), else_=None)
+
+    def bool_value(self):
+        if self.dialect == "sqlite":
+            return self.json_type == "true"
+        return self.text_value() == "true"
+
+    def array_contains(self, value: str) -> ColumnElement:
+        if self.dialect == "sqlite":
+            elements = func.json_each(self.column, self.path).table_valued("value", "type")
+            return and_(
+                self.json_type == "array",
+                exists().select_from(elements).where(
+                    and_(elements.c.type == "text", elements.c.value == value)
+                )
+            )
+        elements = func.json_array_elements_text(
+            case((self.json_type == "array", self.column.op("#>")(self.path)), else_=None)
+        ).table_valued("value")
+        return exists().select_from(elements).where(elements.c.value == value)
+
+
+# ============== Membership Reconciliation ==============
+
+class SegmentEngine:
+    """
+    Computes segment membership with set-based SQL.
+    """
+
+    JOINED_REASON = "criteria_match"
+    LEFT_REASON = "criteria_no_longer_match"
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        evaluate_condition: Callable[[Any, Dict[str, Any]], bool]
+    ):
+        """Initialize the engine.
+
+        Args:
+            db: SQLAlchemy async session for database operations.
+            evaluate_condition: Python evaluator for residual conditions
+                (normally `ProfileEnricher._evaluate_condition`).
+        """
+        self.db = db
+        self.evaluate_condition = evaluate_condition
+        self.dialect = db.get_bind().dialect.name
+
+    async def compute(
+        self,
+        segment: CustomerSegment,
+        since: Optional[datetime] = None
+    ) -> Tuple[int, SegmentDiff]:
+        """Reconcile a segment's memberships with its criteria.
+
+        Args:
+            segment: Segment to compute.
+            since: If set, only customers updated after this time are
+                re-evaluated (incremental mode).
+
+        Returns:
+            Tuple of (active member count, diff statistics).
+        """
+        if self.dialect in SUPPORTED_DIALECTS:
+            compiled = CriteriaCompiler(self.dialect).compile(segment.criteria)
+        else:
+            compiled = CompiledCriteria(
+                where=true(),
+                residual=(segment.criteria or {}).get("conditions", []),
+                residual_operator=(segment.criteria or {}).get("operator", "and")
+            )
+
+        in_org = Customer.organization_id == segment.organization_id
+        if since is None:
+            universe = [in_org]
+            live = Customer.is_deleted == "N"
+        else:
+            # Drive the query from the changed IDs by primary key; otherwise
+            # SQLite tends to pick the is_deleted or a compared column's index
+            # and scan most of the organization
+            changed = select(Customer.id).where(and_(in_org, Customer.updated_at > since))
+            universe = [Customer.id.in_(changed)]
+            live = self._unindexed(Customer.is_deleted) == "N"
+
+        if compiled.fully_compiled and self.dialect in SUPPORTED_DIALECTS:
+            diff = await self._reconcile_in_sql(
+                segment.id, universe, live, compiled.where, incremental=since is not None
+            )
+        else:
+            diff = await self._reconcile_in_python(segment.id, universe, live, compiled)
+
+        count = await self.db.scalar(
+            select(func.count(SegmentMembership.id)).where(
+                and_(
+                    SegmentMembership.segment_id == segment.id,
+                    SegmentMembership.left_at.is_(None)
+                )
+            )
+        )
+        return count or 0, diff
+
+    async def _reconcile_in_sql(
+        self,
+        segment_id: str,
+        universe: List[ColumnElement],
+        live: ColumnElement,
+        where: ColumnElement,
+        incremental: bool = False
+    ) -> SegmentDiff:
+        """Diff and write memberships entirely inside the database."""
+        now = datetime.utcnow()
+        matching = select(Customer.id).where(and_(*universe, live, where))
+        in_universe = select(Customer.id).where(and_(*universe))
+
+        leave_filter = [
+            SegmentMembership.segment_id == segment_id,
+            SegmentMembership.left_at.is_(None),
+            SegmentMembership.customer_id.not_in(matching),
+        ]
+        if incremental:
+            leave_filter.append(SegmentMembership.customer_id.in_(in_universe))
+        left = await self.db.execute(
+            update(SegmentMembership).where(and_(*leave_filter)).values(left_at=now, left_reason=self.LEFT_REASON, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+        rejoined = await self.db.execute(
+            update(SegmentMembership).where(
+                and_(
+                    SegmentMembership.segment_id == segment_id,
+                    SegmentMembership.left_at.is_not(None),
+                    SegmentMembership.customer_id.in_(matching)
+                )
+            ).values(
+                left_at=None, left_reason=None, joined_at=now,
+                joined_reason=self.JOINED_REASON, updated_at=now
+            ).execution_options(synchronize_session=False)
+        )
+
+        already_member = exists().where(
+            and_(
+                SegmentMembership.segment_id == segment_id,
+                SegmentMembership.customer_id == Customer.id
+            )
+        )
+        joins = select(
+            self._generated_id(),
+            literal(segment_id),
+            Customer.id,
+            literal(now, DateTime),
+            literal(self.JOINED_REASON),
+            literal(now, DateTime),
+            literal(now, DateTime),
+        ).where(
+            and_(*universe, live, where, not_(already_member))
+        )
+        joined = await self.db.execute(
+            insert(SegmentMembership).from_select(
+                ["id", "segment_id", "customer_id", "joined_at", "joined_reason",
+                 "created_at", "updated_at"],
+                joins
+            )
+        )
+
+        return SegmentDiff(
+            joined=joined.rowcount or 0,
+            rejoined=rejoined.rowcount or 0,
+            left=left.rowcount or 0,
+        )
+
+    async def _reconcile_in_python(
+        self,
+        segment_id: str,
+        universe: List[ColumnElement],
+        live: ColumnElement,
+        compiled: CompiledCriteria
+    ) -> SegmentDiff:
+        """Evaluate residual conditions in Python, then diff with sets."""
+        # Customers that should be members
+        target: Set[str] = set()
+        evaluated = 0
+        # Rows expose columns as attributes, which is all the evaluator
+        # needs; loading only referenced columns avoids ORM hydration
+        columns = Customer.__table__.columns
+        referenced = {c.get("field", "").split(".")[0] for c in compiled.residual}
+        selected = [Customer.id] + [columns[name] for name in sorted(referenced) if name in columns and name != "id"]
+        result = await self.db.stream(
+            select(*selected).where(and_(*universe, live, compiled.where))
+            .execution_options(yield_per=CHUNK_SIZE)
+        )
+        async for customers in result.partitions():
+            for customer in customers:
+                checks = (self.evaluate_condition(customer, c) for c in compiled.residual)
+                if (all(checks) if compiled.residual_operator == "and" else any(checks)):
+                    target.add(customer.id)
+            evaluated += len(customers)
+
+        # Current memberships within the universe
+        result = await self.db.execute(
+            select(SegmentMembership.customer_id, SegmentMembership.left_at).where(
+                and_(
+                    SegmentMembership.segment_id == segment_id,
+                    SegmentMembership.customer_id.in_(select(Customer.id).where(and_(*universe)))
+                )
+            )
+        )
+        active, inactive = set(), set()
+        for customer_id, left_at in result.all():
+            (inactive if left_at else active).add(customer_id)
+
+        joins = target - active - inactive
+        rejoins = target & inactive
+        leaves = active - target
+
+        now = datetime.utcnow()
+        for chunk in _chunks(sorted(leaves)):
+            await self.db.execute(
+                update(SegmentMembership).where(
+                    and_(
+                        SegmentMembership.segment_id == segment_id,
+                        SegmentMembership.customer_id.in_(chunk)
+                    )
+                ).values(left_at=now, left_reason=self.LEFT_REASON, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        for chunk in _chunks(sorted(rejoins)):
+            await self.db.execute(
+                update(SegmentMembership).where(
+                    and_(
+                        SegmentMembership.segment_id == segment_id,
+                        SegmentMembership.customer_id.in_(chunk)
+                    )
+                ).values(
+                    left_at=None, left_reason=None, joined_at=now,
+                    joined_reason=self.JOINED_REASON, updated_at=now
+                ).execution_options(synchronize_session=False)
+            )
+        for chunk in _chunks(sorted(joins)):
+            await self.db.execute(insert(SegmentMembership), [
+                {
+                    "segment_id": segment_id,
+                    "customer_id": customer_id,
+                    "joined_at": now,
+                    "joined_reason": self.JOINED_REASON,
+                }
+                for customer_id in chunk
+            ])
+
+        return SegmentDiff(
+            joined=len(joins), rejoined=len(rejoins), left=len(leaves), evaluated=evaluated
+        )
+
+    def _unindexed(self, column) -> ColumnElement:
+        """Wrap a column so SQLite's planner cannot choose an index on it."""
+        if self.dialect == "sqlite":
+            return column.op("||")("")
+        return column
+
+    def _generated_id(self) -> ColumnElement:
+        """SQL expression producing a 12-char hex ID like `generate_id`."""
+        if self.dialect == "sqlite":
+            return func.lower(func.hex(func.randomblob(6)))
+        return func.substr(func.md5(func.concat(func.random(), Customer.id)), 1, 12)
+
+
+def _chunks(items: List[str], size: int = CHUNK_SIZE) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
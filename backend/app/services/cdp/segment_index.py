@@ -0,0 +1,172 @@
+"""
+In-memory predicate index for real-time segment membership.
+
+For each organization, holds the active dynamic segments together with the
+field paths their criteria read (e.g. "traits.plan", "engagement_score"),
+inverted into field -> segments. Event processing snapshots those fields
+before and after a profile update and re-evaluates only the segments whose
+inputs changed (see `ProfileEnricher.apply_realtime_segments`).
+
+Indexes are built lazily from the database and invalidated when a segment
+is created, edited or deleted through the API. Other worker processes pick
+up edits when their copy expires (`cdp_segment_index_ttl_seconds`).
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import get_settings
+from ...models.customer_segment import CustomerSegment, SegmentStatus, SegmentType
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class IndexedSegment:
+    """A segment's criteria and the fields it depends on."""
+    id: str
+    criteria: Dict[str, Any]
+    fields: FrozenSet[str]
+
+
+@dataclass
+class OrgSegmentIndex:
+    """Predicate index for one organization."""
+    organization_id: str
+    segments: Dict[str, IndexedSegment] = field(default_factory=dict)
+    by_field: Dict[str, Set[str]] = field(default_factory=dict)
+    built_at: float = field(default_factory=time.monotonic)
+
+    @classmethod
+    def build(cls, organization_id: str, segments: Iterable[CustomerSegment]) -> "OrgSegmentIndex":
+        """Build the index from segment rows."""
+        index = cls(organization_id=organization_id)
+        for segment in segments:
+            conditions = (segment.criteria or {}).get("conditions", [])
+            if not conditions:
+                continue  # Empty criteria never match
+            fields = frozenset(c.get("field", "") for c in conditions)
+            index.segments[segment.id] = IndexedSegment(segment.id, segment.criteria, fields)
+            for field_path in fields:
+                index.by_field.setdefault(field_path, set()).add(segment.id)
+        return index
+
+    @property
+    def fields(self) -> List[str]:
+        """All field paths referenced by any indexed segment."""
+        return list(self.by_field)
+
+    def affected_segments(
+        self,
+        before: Dict[str, Any],
+        after: Dict[str, Any]
+    ) -> List[IndexedSegment]:
+        """Segments depending on at least one field whose value changed.
+
+        Args:
+            before: Field path -> value prior to the update.
+            after: Field path -> value after the update.
+
+        Returns:
+            Segments to re-evaluate.
+        """
+        segment_ids: Set[str] = set()
+        for field_path, segment_ids_for_field in self.by_field.items():
+            if before.get(field_path) != after.get(field_path):
+                segment_ids |= segment_ids_for_field
+        return [self.segments[segment_id] for segment_id in segment_ids]
+
+
+class SegmentPredicateIndex:
+    """
+    Process-wide cache of per-organization segment predicate indexes.
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        """Initialize the index cache.
+
+        Args:
+            ttl_seconds: Maximum age of an organization's index before it is
+                rebuilt from the database (0 rebuilds on every lookup).
+        """
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[str, OrgSegmentIndex] = {}
+        # Bumped on invalidation so a build racing an edit is not cached
+        self._generations: Dict[str, int] = {}
+        self._builds = 0
+
+    async def get(self, db: AsyncSession, organization_id: str) -> OrgSegmentIndex:
+        """Get the organization's index, building it if missing or stale.
+
+        Args:
+            db: Session used to load segments when (re)building.
+            organization_id: Organization ID.
+
+        Returns:
+            The organization's predicate index.
+        """
+        index = self._indexes.get(organization_id)
+        if index is not None and time.monotonic() - index.built_at < self.ttl_seconds:
+            return index
+
+        generation = self._generations.get(organization_id, 0)
+        result = await db.execute(
+            select(CustomerSegment).where(
+                and_(
+                    CustomerSegment.organization_id == organization_id,
+                    CustomerSegment.is_deleted == "N",
+                    CustomerSegment.is_dynamic.is_(True),
+                    CustomerSegment.segment_type == SegmentType.DYNAMIC,
+                    CustomerSegment.status.in_([SegmentStatus.ACTIVE, SegmentStatus.COMPUTING])
+                )
+            )
+        )
+        index = OrgSegmentIndex.build(organization_id, result.scalars().all())
+        self._builds += 1
+
+        if self._generations.get(organization_id, 0) == generation:
+            self._indexes[organization_id] = index
+        logger.debug(
+            f"Built segment index for org {organization_id}: "
+            f"{len(index.segments)} segments over {len(index.by_field)} fields"
+        )
+        return index
+
+    def invalidate(self, organization_id: str):
+        """Drop an organization's index after a segment change."""
+        self._generations[organization_id] = self._generations.get(organization_id, 0) + 1
+        self._indexes.pop(organization_id, None)
+
+    def clear(self):
+        """Drop all indexes."""
+        for organization_id in list(self._indexes):
+            self.invalidate(organization_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Index cache statistics."""
+        return {
+            "organizations": len(self._indexes),
+            "segments": sum(len(index.segments) for index in self._indexes.values()),
+            "builds": self._builds,
+        }
+
+
+# Global index instance
+_segment_index: Optional[SegmentPredicateIndex] = None
+
+
+def get_segment_index() -> Optional[SegmentPredicateIndex]:
+    """Get the process-wide segment index (None if real-time segments are disabled)."""
+    global _segment_index
+    settings = get_settings()
+    if not settings.cdp_realtime_segments_enabled:
+        return None
+    if _segment_index is None:
+        _segment_index = SegmentPredicateIndex(
+            ttl_seconds=settings.cdp_segment_index_ttl_seconds,
+        )
+    return _segment_index
@@ -0,0 +1,336 @@
+"""
+Batch computed-trait engine for the Customer Data Platform.
+
+Recomputes engagement score, lifetime value, churn risk, recency, frequency
+and monetary value for every customer of an organization. Events are
+aggregated in SQL (one GROUP BY customer_id query per chunk, with windowed
+counts, distinct active days and event types, and purchase sums), scored
+with NumPy, and written back with one bulk UPDATE per chunk.
+
+Scores use the same formulas as the per-customer calculators on
+`ProfileEnricher` (`calculate_engagement_score`, `calculate_ltv`, ...).
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import JSON, Date, and_, bindparam, case, cast, func, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.customer import Customer
+from ...models.customer_event import CustomerEvent, EventType
+
+logger = logging.getLogger(__name__)
+
+# Activity window used by engagement and churn scoring
+WINDOW_DAYS = 90
+SHORT_WINDOW_DAYS = 30
+
+# Days reported as recency for customers without any events
+NO_ACTIVITY_DAYS = 999
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+@dataclass
+class TraitAggregates:
+    """Per-customer event aggregates for one chunk, aligned to `customer_ids`."""
+    customer_ids: List[str]
+    events_90d: np.ndarray
+    events_30d: np.ndarray
+    active_days_90d: np.ndarray
+    event_types_90d: np.ndarray
+    days_since_last_90d: np.ndarray
+    days_since_last: np.ndarray
+    purchase_count: np.ndarray
+    purchase_total: np.ndarray
+
+
+@dataclass
+class TraitScores:
+    """Vectorized trait scores for one chunk."""
+    engagement_score: np.ndarray
+    lifetime_value: np.ndarray
+    churn_risk: np.ndarray
+    recency_days: np.ndarray
+    frequency_90d: np.ndarray
+    frequency_30d: np.ndarray
+    monetary_value: np.ndarray
+
+
+@dataclass
+class TraitRecomputeResult:
+    """Outcome of a batch recomputation."""
+    organization_id: str
+    customers: int = 0
+    chunks: int = 0
+    elapsed_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "organization_id": self.organization_id,
+            "customers": self.customers,
+            "chunks": self.chunks,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "customers_per_second": round(self.customers / self.elapsed_seconds, 1) if self.elapsed_seconds else None,
+        }
+
+
+def score_traits(aggregates: TraitAggregates) -> TraitScores:
+    """Score a chunk of customers.
+
+    Args:
+        aggregates: Event aggregates for the chunk.
+
+    Returns:
+        Trait scores aligned to `aggregates.customer_ids`.
+    """
+    active = aggregates.events_90d > 0
+
+    # Engagement (0-100): recency, frequency, diversity, consistency
+    recency_score = np.maximum(0, 30 - aggregates.days_since_last_90d) / 30
+    frequency_score = np.minimum(aggregates.events_90d / 50, 1.0)
+    diversity_score = np.minimum(aggregates.event_types_90d / 10, 1.0)
+    consistency_score = np.minimum(aggregates.active_days_90d / 30, 1.0)
+    engagement = (
+        recency_score * 0.35 +
+        frequency_score * 0.25 +
+        diversity_score * 0.20 +
+        consistency_score * 0.20
+    ) * 100
+    engagement = np.where(active, np.round(engagement, 2), 0.0)
+
+    # Lifetime value: realized purchases plus an engagement-weighted projection
+    total = aggregates.purchase_total
+    ltv = np.where(
+        aggregates.purchase_count > 0,
+        np.round(total + (engagement / 100) * total * 0.5, 2),
+        0.0
+    )
+
+    # Churn risk (0-1)
+    recency_risk = np.minimum(aggregates.days_since_last_90d / 60, 1.0)
+    frequency_risk = np.maximum(0, 1 - aggregates.events_90d / 20)
+    engagement_risk = np.maximum(0, 1 - engagement / 50)
+    risk = recency_risk * 0.5 + frequency_risk * 0.25 + engagement_risk * 0.25
+    churn = np.where(active, np.round(np.minimum(risk, 1.0), 2), 0.9)
+
+    return TraitScores(
+        engagement_score=engagement,
+        lifetime_value=ltv,
+        churn_risk=churn,
+        recency_days=aggregates.days_since_last,
+        frequency_90d=aggregates.events_90d,
+        frequency_30d=aggregates.events_30d,
+        monetary_value=np.round(total, 2),
+    )
+
+
+class ComputedTraitEngine:
+    """
+    Set-based computed trait recomputation.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize the engine.
+
+        Args:
+            db: SQLAlchemy async session for database operations.
+        """
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    async def recompute_organization(
+        self,
+        organization_id: str,
+        chunk_size: int = 5000,
+        progress: Optional[ProgressCallback] = None
+    ) -> TraitRecomputeResult:
+        """Recompute computed traits for every live customer of an organization.
+
+        Each chunk is committed separately, so a failure part-way keeps the
+        chunks already written.
+
+        Args:
+            organization_id: Organization ID.
+            chunk_size: Customers per aggregate query and bulk UPDATE.
+            progress: Optional async callback receiving (customers done, total).
+
+        Returns:
+            Recomputation statistics.
+        """
+        started = time.perf_counter()
+        result = TraitRecomputeResult(organization_id=organization_id)
+
+        live = and_(Customer.organization_id == organization_id, Customer.is_deleted == "N")
+        total = await self.db.scalar(select(func.count(Customer.id)).where(live)) or 0
+
+        last_id = ""
+        while True:
+            ids_result = await self.db.execute(
+                select(Customer.id).where(and_(live, Customer.id > last_id))
+                .order_by(Customer.id).limit(chunk_size)
+            )
+            customer_ids = list(ids_result.scalars().all())
+            if not customer_ids:
+                break
+
+            await self.recompute_customers(customer_ids)
+            await self.db.commit()
+
+            result.customers += len(customer_ids)
+            result.chunks += 1
+            last_id = customer_ids[-1]
+            if progress:
+                await progress(result.customers, max(total, result.customers))
+
+        result.elapsed_seconds = time.perf_counter() - started
+        logger.info(
+            f"Recomputed traits for {result.customers} customers of org {organization_id} "
+            f"in {result.chunks} chunks ({result.elapsed_seconds:.1f}s)"
+        )
+        return result
+
+    async def recompute_customers(
+        self,
+        customer_ids: List[str],
+        now: Optional[datetime] = None
+    ) -> TraitScores:
+        """Recompute and write computed traits for a set of customers.
+
+        Does not commit.
+
+        Args:
+            customer_ids: Customer IDs (one chunk).
+            now: Reference time (defaults to utcnow).
+
+        Returns:
+            The written scores, aligned to `customer_ids`.
+        """
+        now = now or datetime.utcnow()
+        aggregates = await self.aggregate(customer_ids, now)
+        scores = score_traits(aggregates)
+        await self._write(customer_ids, scores, now)
+        return scores
+
+    async def aggregate(self, customer_ids: List[str], now: datetime) -> TraitAggregates:
+        """Aggregate events for a chunk of customers with one GROUP BY query."""
+        since = now - timedelta(days=WINDOW_DAYS)
+        since_short = now - timedelta(days=SHORT_WINDOW_DAYS)
+        ts = CustomerEvent.timestamp
+        in_window = ts >= since
+        is_purchase = CustomerEvent.event_type == EventType.PURCHASE
+        purchase_value = func.coalesce(
+            CustomerEvent.properties["total"].as_float(),
+            CustomerEvent.properties["value"].as_float(),
+            0.0
+        )
+
+        query = select(
+            CustomerEvent.customer_id,
+            func.count(case((in_window, 1))),
+            func.count(case((ts >= since_short, 1))),
+            func.count(func.distinct(case((in_window, self._day(ts))))),
+            func.count(func.distinct(case((in_window, CustomerEvent.event_type)))),
+            func.max(case((in_window, ts))),
+            func.max(ts),
+            func.count(case((is_purchase, 1))),
+            func.sum(case((is_purchase, purchase_value), else_=0.0)),
+        ).where(
+            CustomerEvent.customer_id.in_(customer_ids)
+        ).group_by(CustomerEvent.customer_id)
+
+        size = len(customer_ids)
+        position = {customer_id: i for i, customer_id in enumerate(customer_ids)}
+        counts = np.zeros((5, size), dtype=np.float64)
+        purchase_total = np.zeros(size, dtype=np.float64)
+        days_since_last_90d = np.zeros(size, dtype=np.float64)
+        days_since_last = np.full(size, NO_ACTIVITY_DAYS, dtype=np.float64)
+
+        for row in (await self.db.execute(query)).all():
+            i = position[row[0]]
+            counts[:, i] = (row[1], row[2], row[3], row[4], row[7])
+            purchase_total[i] = row[8] or 0.0
+            if row[5] is not None:
+                days_since_last_90d[i] = (now - row[5]).days
+            if row[6] is not None:
+                days_since_last[i] = (now - row[6]).days
+
+        return TraitAggregates(
+            customer_ids=customer_ids,
+            events_90d=counts[0],
+            events_30d=counts[1],
+            active_days_90d=counts[2],
+            event_types_90d=counts[3],
+            days_since_last_90d=days_since_last_90d,
+            days_since_last=days_since_last,
+            purchase_count=counts[4],
+            purchase_total=purchase_total,
+        )
+
+    async def _write(self, customer_ids: List[str], scores: TraitScores, now: datetime):
+        """Bulk UPDATE promoted columns by primary key, merging computed_traits in SQL.
+
+        The new traits are patched into the stored JSON by the database, so
+        keys written concurrently by ingestion or enrichment survive.
+        """
+        computed_at = now.isoformat()
+        columns = {
+            "engagement_score": scores.engagement_score.tolist(),
+            "ltv": scores.lifetime_value.tolist(),
+            "churn_risk": scores.churn_risk.tolist(),
+            "recency_days": scores.recency_days.astype(int).tolist(),
+            "frequency_90d": scores.frequency_90d.astype(int).tolist(),
+            "frequency_30d": scores.frequency_30d.astype(int).tolist(),
+            "monetary_value": scores.monetary_value.tolist(),
+        }
+
+        rows = []
+        for i, customer_id in enumerate(customer_ids):
+            traits = {name: values[i] for name, values in columns.items()}
+            rows.append({
+                "customer_id": customer_id,
+                "new_engagement_score": traits["engagement_score"],
+                "new_lifetime_value": traits["ltv"],
+                "new_churn_risk": traits["churn_risk"],
+                "new_recency_days": traits["recency_days"],
+                "new_frequency_score": traits["frequency_90d"],
+                "new_monetary_value": traits["monetary_value"],
+                "traits_patch": {**traits, "last_computed_at": computed_at},
+            })
+
+        table = Customer.__table__
+        statement = update(table).where(
+            table.c.id == bindparam("customer_id")
+        ).values(
+            engagement_score=bindparam("new_engagement_score"),
+            lifetime_value=bindparam("new_lifetime_value"),
+            churn_risk=bindparam("new_churn_risk"),
+            recency_days=bindparam("new_recency_days"),
+            frequency_score=bindparam("new_frequency_score"),
+            monetary_value=bindparam("new_monetary_value"),
+            computed_traits=self._merge_json(
+                table.c.computed_traits, bindparam("traits_patch", type_=JSON)
+            ),
+        )
+        await self.db.execute(statement, rows)
+
+    def _merge_json(self, column, patch):
+        """Shallow-merge a JSON object into a JSON column, patch keys winning."""
+        if self.dialect == "sqlite":
+            return func.json_patch(func.coalesce(column, "{}"), patch)
+        return cast(
+            cast(func.coalesce(column, cast("{}", JSON)), JSONB).op("||")(cast(patch, JSONB)),
+            JSON
+        )
+
+    def _day(self, column):
+        """Truncate a timestamp to its calendar day."""
+        if self.dialect == "sqlite":
+            return func.date(column)
+        return cast(column, Date)
@@ -19,6 +19,7 @@ from app.models.integration_mapping import IntegrationMapping, ConflictStrategy
 from app.models.customer import Customer
 from app.models.customer_identity import CustomerIdentity, IdentityType, IdentitySource
 from app.models.customer_event import CustomerEvent, EventType
+from app.services.cdp.identity_cache import IdentityCache, get_identity_cache
 
 from .salesforce_client import SalesforceClient
 from .hubspot_client import HubSpotClient
@@ -479,7 +480,7 @@ class CRMSyncService:
                     else:
                         # Create new
                         if direction in ("bidirectional", "to_cdp"):
-                            self._create_customer_from_crm(
+                            await self._create_customer_from_crm(
                                 integration.organization_id, mapped_data, "salesforce"
                             )
                             result.records_created += 1
@@ -544,7 +545,7 @@ class CRMSyncService:
                                 result.records_updated += 1
                         else:
                             if direction in ("bidirectional", "to_cdp"):
-                                self._create_customer_from_crm(
+                                await self._create_customer_from_crm(
                                     integration.organization_id, mapped_data, "hubspot"
                                 )
                                 result.records_created += 1
@@ -601,7 +602,7 @@ class CRMSyncService:
                     
                     if not existing:
                         # Create as prospect
-                        self._create_customer_from_crm(
+                        await self._create_customer_from_crm(
                             integration.organization_id,
                             mapped_data,
                             "salesforce",
@@ -656,7 +657,7 @@ class CRMSyncService:
                             )
                             
                             if not existing:
-                                self._create_customer_from_crm(
+                                await self._create_customer_from_crm(
                                     integration.organization_id,
                                     mapped_data,
                                     "hubspot",
@@ -813,7 +814,7 @@ class CRMSyncService:
             Customer.traits.contains({"email": email.lower()})
         ).first()
     
-    def _create_customer_from_crm(
+    async def _create_customer_from_crm(
         self,
         organization_id: str,
         data: Dict[str, Any],
@@ -852,8 +853,32 @@ class CRMSyncService:
             self.db.add(identity)
         
         self.db.commit()
+        await self._invalidate_identity_cache(customer)
         return customer
     
+    async def _invalidate_identity_cache(self, customer: Customer):
+        """Drop cached misses for the identifiers of a customer created by sync."""
+        identity_cache = get_identity_cache()
+        if identity_cache is None:
+            return
+        
+        identifiers = [
+            (id_type, id_value)
+            for id_type, id_value in (customer.external_ids or {}).items()
+            if id_type and id_value
+        ]
+        traits = customer.traits or {}
+        if traits.get("email"):
+            identifiers.append(("email", traits["email"].lower().strip()))
+        phone = "".join(c for c in str(traits.get("phone") or "") if c.isdigit())
+        if phone:
+            identifiers.append(("phone", phone))
+        
+        await identity_cache.invalidate_keys([
+            IdentityCache.make_key(customer.organization_id, id_type, id_value)
+            for id_type, id_value in identifiers
+        ])
+    
     def _update_customer_from_crm(
         self,
         customer: Customer,
@@ -0,0 +1,252 @@
+"""
+Content-addressed storage for trained model artifacts.
+
+Estimators and large numeric tables are written once to
+`<model_artifact_dir>/<sha256[:2]>/<sha256>.pkl`. The database row keeps
+only a small reference:
+
+    {"key": "ab/ab12....pkl", "sha256": "ab12...", "size_bytes": 123, "format": "pickle5-oob"}
+
+The file is a pickle (protocol 5) whose NumPy buffers are stored out of
+band, each 64-byte aligned after the pickle stream:
+
+    MAGIC | header length (u64) | JSON header | pickle stream | buffers...
+
+Loading memory-maps the file and hands the buffers to `pickle.loads`
+without copying, so arrays are read-only views of the page cache that
+worker processes on one host share. (joblib's memory-mapping wraps every
+array separately, which made a 100-tree ensemble load ~5x slower than a
+plain unpickle; out-of-band buffers cost about the same as one.) Objects
+that copy their arrays on unpickling, such as scikit-learn tree nodes,
+are not shared but still skip the base64 decode.
+
+With `model_artifact_s3` enabled, artifacts are also uploaded to the S3
+bucket through `StorageService`; a host that lacks a local copy downloads
+it into the local directory on first load and verifies its checksum.
+"""
+import hashlib
+import json
+import logging
+import mmap as mmap_module
+import os
+import pickle
+import struct
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set
+
+from ..core.config import get_settings
+
+if TYPE_CHECKING:
+    from .storage import StorageService
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = "pickle5-oob"
+ARTIFACT_SUFFIX = "pkl"
+S3_PREFIX = "model-artifacts"
+MAGIC = b"MDLART01"
+BUFFER_ALIGNMENT = 64
+
+
+class ArtifactNotFoundError(ValueError):
+    """Raised when an artifact is neither on disk nor in object storage."""
+
+
+class ArtifactChecksumError(ValueError):
+    """Raised when an artifact's content does not match its recorded checksum."""
+
+
+def is_artifact_ref(value: Any) -> bool:
+    """Whether a stored value is an artifact reference."""
+    return isinstance(value, dict) and "key" in value and "sha256" in value
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_artifact(f, obj: Any):
+    """Serialize an object to an open binary file in the artifact format."""
+    buffers: List[pickle.PickleBuffer] = []
+    stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    layout, position = [], len(stream)
+    for raw in raws:
+        position += -position % BUFFER_ALIGNMENT
+        layout.append([position, raw.nbytes])
+        position += raw.nbytes
+    header = json.dumps({"pickle": len(stream), "buffers": layout}).encode()
+    # Offsets above are relative to the pickle stream, which is aligned too
+    prefix = len(MAGIC) + 8 + len(header)
+    padding = -prefix % BUFFER_ALIGNMENT
+
+    f.write(MAGIC)
+    f.write(struct.pack("<Q", len(header) + padding))
+    f.write(header + b" " * padding)
+    f.write(stream)
+    written = len(stream)
+    for (offset, _), raw in zip(layout, raws):
+        f.write(b"\0" * (offset - written))
+        f.write(raw)
+        written = offset + raw.nbytes
+
+
+def read_artifact(path: str, mmap: bool = True) -> Any:
+    """Load an object written by `write_artifact`.
+
+    With `mmap`, out-of-band buffers are read-only views of a shared memory
+    map of the file; otherwise they are private, writable copies.
+    """
+    with open(path, "rb") as f:
+        if mmap:
+            data = memoryview(mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ))
+        else:
+            data = memoryview(bytearray(f.read()))
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a model artifact")
+
+    header_length, = struct.unpack("<Q", data[len(MAGIC):len(MAGIC) + 8])
+    start = len(MAGIC) + 8 + header_length
+    header = json.loads(bytes(data[len(MAGIC) + 8:start]))
+    return pickle.loads(
+        data[start:start + header["pickle"]],
+        buffers=[data[start + offset:start + offset + size] for offset, size in header["buffers"]],
+    )
+
+
+class ModelArtifactStore:
+    """
+    Writes and memory-maps model artifacts by content hash.
+
+    Methods are synchronous (file and S3 I/O); call them from a worker
+    thread on the request path.
+    """
+
+    def __init__(self, directory: str, storage: Optional["StorageService"] = None):
+        """Initialize the store.
+
+        Args:
+            directory: Local artifact directory.
+            storage: Optional S3 storage every artifact is also uploaded to.
+        """
+        self.directory = directory
+        self.storage = storage
+        os.makedirs(directory, exist_ok=True)
+        # Keys whose checksum was verified by this process
+        self._verified: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        """Local path of an artifact key."""
+        return os.path.join(self.directory, key)
+
+    def save(self, obj: Any) -> Dict[str, Any]:
+        """Write an object as an artifact.
+
+        Identical content maps to the same file, so saving it again is a
+        no-op apart from the serialization.
+
+        Returns:
+            The artifact reference to store on the model row.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            with open(tmp_path, "wb") as f:
+                write_artifact(f, obj)
+            sha256 = _file_sha256(tmp_path)
+            size_bytes = os.path.getsize(tmp_path)
+            key = f"{sha256[:2]}/{sha256}.{ARTIFACT_SUFFIX}"
+            path = self.path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._verified.add(key)
+        if self.storage is not None:
+            with open(path, "rb") as f:
+                if not self.storage.put_object_bytes(f"{S3_PREFIX}/{key}", f.read()):
+                    raise IOError(f"Could not upload model artifact {key}")
+
+        return {"key": key, "sha256": sha256, "size_bytes": size_bytes, "format": ARTIFACT_FORMAT}
+
+    def load(self, ref: Dict[str, Any], mmap: bool = True) -> Any:
+        """Load an artifact, memory-mapping its arrays unless `mmap` is False.
+
+        Raises:
+            ArtifactNotFoundError: If the artifact cannot be found.
+            ArtifactChecksumError: If the file does not match the reference.
+        """
+        key = ref["key"]
+        path = self.path(key)
+        if not os.path.exists(path):
+            self._download(ref)
+        with self._lock:
+            verified = key in self._verified
+        if not verified:
+            if _file_sha256(path) != ref["sha256"]:
+                raise ArtifactChecksumError(f"Model artifact {key} does not match its checksum")
+            with self._lock:
+                self._verified.add(key)
+        return read_artifact(path, mmap=mmap)
+
+    def _download(self, ref: Dict[str, Any]):
+        """Fetch an artifact missing locally from object storage."""
+        key = ref["key"]
+        content = self.storage.get_object_bytes(f"{S3_PREFIX}/{key}") if self.storage is not None else None
+        if content is None:
+            raise ArtifactNotFoundError(f"Model artifact {key} not found")
+        if hashlib.sha256(content).hexdigest() != ref["sha256"]:
+            raise ArtifactChecksumError(f"Downloaded model artifact {key} does not match its checksum")
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._verified.add(key)
+        logger.info(f"Downloaded model artifact {key} ({len(content)} bytes)")
+
+
+# Global instance
+_artifact_store: Optional[ModelArtifactStore] = None
+
+
+def get_model_artifact_store() -> ModelArtifactStore:
+    """Get the process-wide model artifact store."""
+    global _artifact_store
+    if _artifact_store is None:
+        settings = get_settings()
+        storage = None
+        if settings.model_artifact_s3:
+            # Imported here: boto3 is only needed when S3 is enabled
+            from .storage import get_storage_service
+            storage = get_storage_service()
+            if storage is None and settings.aws_access_key_id and settings.s3_bucket_name:
+                storage = get_storage_service(
+                    aws_access_key_id=settings.aws_access_key_id,
+                    aws_secret_access_key=settings.aws_secret_access_key or '',
+                    bucket_name=settings.s3_bucket_name,
+                    region=settings.aws_region or 'us-east-1',
+                    endpoint_url=settings.s3_endpoint_url,
+                    cdn_domain=settings.cdn_domain
+                )
+            if storage is None:
+                logger.warning("model_artifact_s3 is set but S3 is not configured; storing artifacts locally only")
+        _artifact_store = ModelArtifactStore(settings.model_artifact_dir, storage=storage)
+    return _artifact_store
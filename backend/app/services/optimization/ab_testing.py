@@ -3,11 +3,12 @@ A/B Testing Engine.
 
 Provides comprehensive A/B testing capabilities including:
 - Experiment creation and management
-- User assignment with consistent hashing
-- Statistical significance testing
+- User assignment with consistent hashing, served from an in-memory
+  snapshot of running experiments (see `experiment_assignment`)
+- Statistical significance testing from running per-variant totals, with
+  always-valid sequential tests (see `experiment_stats`)
 - Auto-winner selection
 """
-import hashlib
 import logging
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
@@ -17,12 +18,18 @@ from uuid import UUID
 import numpy as np
 from scipy import stats
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, func
+from sqlalchemy import select, and_, case, update
 
 from ...models.experiment import Experiment, ExperimentStatus, ExperimentType
 from ...models.experiment_variant import ExperimentVariant
 from ...models.experiment_assignment import ExperimentAssignment
 from ...models.experiment_result import ExperimentResult
+from .bandit_counters import get_bandit_counters
+from .bucketing import allocate_buckets, from_ranges, target_counts, to_ranges
+from .experiment_assignment import (
+    AssignmentResult, current_allocation, get_assignment_service, ordered_variants,
+)
+from .experiment_stats import ExperimentStatsStore, MetricSummary, mixture_variance, msprt
 
 logger = logging.getLogger(__name__)
 
@@ -37,16 +44,6 @@ class VariantConfig:
     description: Optional[str] = None
 
 
-@dataclass
-class AssignmentResult:
-    """Result of user assignment."""
-    variant_id: str
-    variant_name: str
-    is_control: bool
-    configuration: Dict[str, Any]
-    assignment_id: str
-
-
 class ABTestingEngine:
     """
     A/B testing engine for running controlled experiments.
@@ -82,6 +79,7 @@ class ABTestingEngine:
         description: Optional[str] = None,
         secondary_metrics: Optional[List[str]] = None,
         auto_winner_selection: bool = False,
+        layer: Optional[str] = None,
     ) -> Experiment:
         """
         Create a new A/B test experiment.
@@ -103,6 +101,8 @@ class ABTestingEngine:
             description: Optional description
             secondary_metrics: Additional metrics to track
             auto_winner_selection: Auto-select winner when significant
+            layer: Optional layer; running experiments in the same layer
+                never share a user
             
         Returns:
             Created Experiment instance
@@ -144,6 +144,7 @@ class ABTestingEngine:
             campaign_id=campaign_id,
             created_by=created_by,
             auto_winner_selection=auto_winner_selection,
+            layer=layer,
         )
         
         self.db.add(experiment)
@@ -190,9 +191,11 @@ class ABTestingEngine:
         
         experiment.status = ExperimentStatus.RUNNING
         experiment.start_date = datetime.utcnow()
+        await self._allocate_buckets(experiment)
         
         await self.db.commit()
         await self.db.refresh(experiment)
+        await get_assignment_service().refresh_experiment(self.db, experiment_id)
         
         logger.info(f"Started experiment {experiment_id}")
         return experiment
@@ -239,6 +242,8 @@ class ABTestingEngine:
         
         await self.db.commit()
         await self.db.refresh(experiment)
+        await get_assignment_service().refresh_experiment(self.db, experiment_id)
+        get_bandit_counters().forget(experiment_id)
         
         logger.info(f"Stopped experiment {experiment_id}, winner: {winner_variant_id}")
         return experiment
@@ -260,6 +265,8 @@ class ABTestingEngine:
         
         await self.db.commit()
         await self.db.refresh(experiment)
+        await get_assignment_service().refresh_experiment(self.db, experiment_id)
+        get_bandit_counters().forget(experiment_id)
         
         logger.info(f"Paused experiment {experiment_id}")
         return experiment
@@ -272,11 +279,12 @@ class ABTestingEngine:
         user_id: Optional[str] = None,
         anonymous_id: Optional[str] = None,
         context: Optional[Dict] = None
-    ) -> AssignmentResult:
+    ) -> Optional[AssignmentResult]:
         """
         Assign a user to a variant using consistent hashing.
         
-        Returns the same variant if user already assigned.
+        Served from the in-memory experiment snapshot; the assignment row
+        is written by the next exposure flush.
         
         Args:
             experiment_id: Experiment ID
@@ -285,79 +293,37 @@ class ABTestingEngine:
             context: Assignment context (device, location, etc.)
             
         Returns:
-            AssignmentResult with variant details
+            AssignmentResult with variant details, or None if the user is
+            outside the experiment's traffic (or in another experiment of its layer)
         """
-        if not user_id and not anonymous_id:
-            raise ValueError("Either user_id or anonymous_id must be provided")
-        
-        # Check for existing assignment
-        existing = await self._get_existing_assignment(
-            experiment_id, user_id, anonymous_id
-        )
-        
-        if existing:
-            variant = await self.db.get(ExperimentVariant, existing.variant_id)
-            return AssignmentResult(
-                variant_id=variant.id,
-                variant_name=variant.name,
-                is_control=variant.is_control,
-                configuration=variant.configuration,
-                assignment_id=existing.id
-            )
-        
-        # Get experiment and variants
-        result = await self.db.execute(
-            select(Experiment).where(
-                and_(
-                    Experiment.id == experiment_id,
-                    Experiment.status == ExperimentStatus.RUNNING
-                )
-            )
-        )
-        experiment = result.scalar_one_or_none()
-        
-        if not experiment:
-            raise ValueError(f"Experiment {experiment_id} not found or not running")
-        
-        # Get variants
-        result = await self.db.execute(
-            select(ExperimentVariant)
-            .where(ExperimentVariant.experiment_id == experiment_id)
-            .order_by(ExperimentVariant.traffic_percentage.desc())
-        )
-        variants = result.scalars().all()
-        
-        if not variants:
-            raise ValueError(f"No variants found for experiment {experiment_id}")
-        
-        # Use consistent hashing to assign
-        assignment_key = user_id or anonymous_id
-        variant = self._consistent_hash_assignment(assignment_key, experiment_id, variants)
-        
-        # Create assignment record
-        assignment = ExperimentAssignment(
-            experiment_id=experiment_id,
-            variant_id=variant.id,
-            user_id=user_id,
-            anonymous_id=anonymous_id,
-            context=context or {},
-            first_exposed_at=datetime.utcnow()
+        return await get_assignment_service().assign(
+            self.db, experiment_id, user_id, anonymous_id, context
         )
+    
+    async def assign_many(
+        self,
+        experiment_ids: List[str],
+        user_id: Optional[str] = None,
+        anonymous_id: Optional[str] = None,
+        context: Optional[Dict] = None
+    ) -> Dict[str, Optional[AssignmentResult]]:
+        """
+        Assign a user to several experiments at once (e.g. for server-side rendering).
         
-        self.db.add(assignment)
-        
-        # Update variant stats
-        variant.total_assignments += 1
+        Experiments that are not running are left out of the result;
+        experiments the user is not enrolled in map to None.
         
-        await self.db.commit()
-        await self.db.refresh(assignment)
-        
-        return AssignmentResult(
-            variant_id=variant.id,
-            variant_name=variant.name,
-            is_control=variant.is_control,
-            configuration=variant.configuration,
-            assignment_id=assignment.id
+        Args:
+            experiment_ids: Experiment IDs
+            user_id: Logged-in user ID (optional)
+            anonymous_id: Anonymous visitor ID (optional)
+            context: Assignment context (device, location, etc.)
+            
+        Returns:
+            Dict mapping experiment_id -> AssignmentResult (or None)
+        """
+        return await get_assignment_service().assign_many(
+            self.db, experiment_ids, user_id, anonymous_id, context
         )
     
     async def _get_existing_assignment(
@@ -388,34 +354,6 @@ class ABTestingEngine:
         
         return result.scalar_one_or_none()
     
-    def _consistent_hash_assignment(
-        self,
-        user_id: str,
-        experiment_id: str,
-        variants: List[ExperimentVariant]
-    ) -> ExperimentVariant:
-        """
-        Deterministic assignment using consistent hashing.
-        
-        This ensures the same user always gets the same variant
-        for a given experiment.
-        """
-        # Create hash from user_id + experiment_id
-        hash_input = f"{user_id}:{experiment_id}"
-        hash_value = int(hashlib.md5(hash_input.encode()).hexdigest(), 16)
-        
-        # Map hash to variant based on traffic percentages
-        hash_normalized = (hash_value % 10000) / 100.0  # 0.0 to 100.0
-        
-        cumulative = 0.0
-        for variant in variants:
-            cumulative += variant.traffic_percentage
-            if hash_normalized <= cumulative:
-                return variant
-        
-        # Fallback to last variant (shouldn't happen with proper percentages)
-        return variants[-1]
-    
     # === Traffic Allocation ===
     
     async def allocate_traffic(
@@ -426,6 +364,10 @@ class ABTestingEngine:
         """
         Adjust traffic allocation between variants.
         
+        Only the buckets the new split needs change variant, and visitors
+        already assigned in them keep their variant; the new split applies
+        to new visitors.
+        
         Args:
             experiment_id: Experiment ID
             allocations: Dict mapping variant_id -> percentage
@@ -438,6 +380,10 @@ class ABTestingEngine:
         if abs(total - 100.0) > 0.01:
             raise ValueError(f"Allocations must sum to 100%, got {total}%")
         
+        experiment = await self.db.get(Experiment, experiment_id)
+        if not experiment:
+            raise ValueError(f"Experiment {experiment_id} not found")
+        
         result = await self.db.execute(
             select(ExperimentVariant).where(
                 ExperimentVariant.experiment_id == experiment_id
@@ -447,36 +393,145 @@ class ABTestingEngine:
         
         variant_map = {v.id: v for v in variants}
         
-        for variant_id, percentage in allocations.items():
+        for variant_id in allocations:
             if variant_id not in variant_map:
                 raise ValueError(f"Variant {variant_id} not found in experiment")
-            
+        
+        # Visitors keep their buckets unless the new split needs them moved
+        if experiment.status in (ExperimentStatus.RUNNING, ExperimentStatus.PAUSED):
+            ordered = ordered_variants(variants)
+            for variant, buckets in zip(ordered, current_allocation(experiment, ordered)):
+                variant.buckets = to_ranges(buckets)
+        
+        for variant_id, percentage in allocations.items():
             variant_map[variant_id].traffic_percentage = percentage
         
+        if experiment.status in (ExperimentStatus.RUNNING, ExperimentStatus.PAUSED):
+            await self._allocate_buckets(experiment, variants)
+        
         await self.db.commit()
         
         for variant in variants:
             await self.db.refresh(variant)
+        await get_assignment_service().refresh_experiment(self.db, experiment_id)
         
         logger.info(f"Updated traffic allocation for experiment {experiment_id}")
         return variants
     
+    async def ramp_experiment(self, experiment_id: str, traffic_allocation: float) -> Experiment:
+        """
+        Change the share of traffic enrolled in an experiment.
+        
+        Ramping up only enrolls new visitors; ramping down un-enrolls the
+        most recently added ones. Nobody already enrolled changes variant,
+        also when ramped down and back up.
+        
+        Args:
+            experiment_id: Experiment ID
+            traffic_allocation: Share of traffic to enroll (0.0 to 1.0)
+            
+        Returns:
+            Updated Experiment instance
+        """
+        if not 0.0 <= traffic_allocation <= 1.0:
+            raise ValueError(f"Traffic allocation must be between 0 and 1, got {traffic_allocation}")
+        
+        experiment = await self.db.get(Experiment, experiment_id)
+        if not experiment:
+            raise ValueError(f"Experiment {experiment_id} not found")
+        
+        if experiment.status in (ExperimentStatus.RUNNING, ExperimentStatus.PAUSED):
+            result = await self.db.execute(
+                select(ExperimentVariant).where(ExperimentVariant.experiment_id == experiment_id)
+            )
+            variants = ordered_variants(result.scalars().all())
+            for variant, buckets in zip(variants, current_allocation(experiment, variants)):
+                variant.buckets = to_ranges(buckets)
+            experiment.traffic_allocation = traffic_allocation
+            await self._allocate_buckets(experiment, variants)
+        else:
+            experiment.traffic_allocation = traffic_allocation
+        
+        await self.db.commit()
+        await self.db.refresh(experiment)
+        await get_assignment_service().refresh_experiment(self.db, experiment_id)
+        
+        logger.info(f"Ramped experiment {experiment_id} to {traffic_allocation:.2%} of traffic")
+        return experiment
+    
+    async def _allocate_buckets(
+        self,
+        experiment: Experiment,
+        variants: Optional[List[ExperimentVariant]] = None
+    ):
+        """
+        Store each variant's buckets for the experiment's traffic and split.
+        
+        Existing allocations are changed with the fewest moves; buckets held
+        by other running or paused experiments in the same layer are left alone.
+        Buckets a variant of a running or paused experiment gives up are
+        recorded as released, so visitors already assigned in them keep
+        their variant.
+        """
+        if variants is None:
+            result = await self.db.execute(
+                select(ExperimentVariant).where(ExperimentVariant.experiment_id == experiment.id)
+            )
+            variants = result.scalars().all()
+        ordered = ordered_variants(variants)
+        
+        reserved = set()
+        if experiment.layer:
+            result = await self.db.execute(
+                select(ExperimentVariant.buckets)
+                .join(Experiment, Experiment.id == ExperimentVariant.experiment_id)
+                .where(
+                    and_(
+                        Experiment.layer == experiment.layer,
+                        Experiment.id != experiment.id,
+                        Experiment.status.in_([ExperimentStatus.RUNNING, ExperimentStatus.PAUSED])
+                    )
+                )
+            )
+            for ranges in result.scalars():
+                reserved.update(from_ranges(ranges))
+        
+        current = [from_ranges(v.buckets) for v in ordered]
+        allocation = allocate_buckets(
+            current,
+            target_counts(experiment.traffic_allocation, [v.traffic_percentage for v in ordered]),
+            reserved,
+        )
+        released = set()
+        for variant, before, buckets in zip(ordered, current, allocation):
+            released.update(set(before) - set(buckets))
+            variant.buckets = to_ranges(buckets)
+        if released and experiment.status in (ExperimentStatus.RUNNING, ExperimentStatus.PAUSED):
+            released.update(from_ranges(experiment.released_buckets))
+            experiment.released_buckets = to_ranges(sorted(released))
+    
     # === Statistical Analysis ===
     
     async def calculate_results(
         self,
         experiment_id: str,
-        metric_name: Optional[str] = None
+        metric_name: Optional[str] = None,
+        persist: bool = True,
     ) -> Dict[str, ExperimentResult]:
         """
         Calculate statistical results for all variants.
         
-        Uses chi-square test for conversion rates,
-        t-test for continuous metrics.
+        Reads each variant's running totals (see `experiment_stats`), so the
+        cost is O(variants) regardless of the number of assignments.
+        Significance comes from the mSPRT, whose always-valid p-value may be
+        checked after every conversion; the fixed-horizon chi-square
+        (conversion rates) or Welch t-test (continuous metrics) p-value is
+        kept in `additional_metrics`.
         
         Args:
             experiment_id: Experiment ID
             metric_name: Specific metric to calculate (default: experiment's primary_metric)
+            persist: Store the results as a new ExperimentResult snapshot
             
         Returns:
             Dict mapping variant_id -> ExperimentResult
@@ -492,97 +547,107 @@ class ABTestingEngine:
         
         metric = metric_name or experiment.primary_metric
         
-        # Get control variant
+        exposures = get_assignment_service().exposures
+        if exposures.pending(experiment_id):
+            # Count buffered assignments too
+            await exposures.flush(self.db)
+        
         result = await self.db.execute(
-            select(ExperimentVariant).where(
-                and_(
-                    ExperimentVariant.experiment_id == experiment_id,
-                    ExperimentVariant.is_control == True
-                )
-            )
+            select(ExperimentVariant)
+            .where(ExperimentVariant.experiment_id == experiment_id)
+            .execution_options(populate_existing=True)
         )
-        control = result.scalar_one_or_none()
+        variants = result.scalars().all()
         
+        control = next((v for v in variants if v.is_control), None)
         if not control:
             raise ValueError("No control variant found")
         
-        # Get all variants with assignment counts
-        result = await self.db.execute(
-            select(ExperimentVariant).where(
-                ExperimentVariant.experiment_id == experiment_id
-            )
-        )
-        variants = result.scalars().all()
+        summaries = await ExperimentStatsStore(self.db).summaries(experiment_id, metric, variants)
+        control_summary = summaries[control.id]
+        alpha = 1 - experiment.confidence_level
+        tau_squared = mixture_variance(control_summary, experiment.minimum_detectable_effect)
+        now = datetime.utcnow()
         
-        # Calculate metrics for each variant
         results = {}
-        
         for variant in variants:
-            # Get assignment stats
-            stats_result = await self.db.execute(
-                select(
-                    func.count(ExperimentAssignment.id).label('total'),
-                    func.sum(func.cast(ExperimentAssignment.converted_at.isnot(None), Integer)).label('conversions')
-                ).where(ExperimentAssignment.variant_id == variant.id)
-            )
-            row = stats_result.one()
-            total = row.total or 0
-            conversions = row.conversions or 0
-            
-            conversion_rate = conversions / total if total > 0 else 0.0
-            
-            # Create or update result
+            summary = summaries[variant.id]
             result = ExperimentResult(
                 experiment_id=experiment_id,
                 variant_id=variant.id,
                 metric_name=metric,
-                sample_size=total,
-                conversions=conversions,
-                metric_value=conversion_rate,
-                calculated_at=datetime.utcnow()
+                sample_size=summary.sample_size,
+                conversions=summary.conversions,
+                metric_value=summary.mean,
+                metric_sum=None if summary.binary else summary.value_sum,
+                metric_sum_squares=None if summary.binary else summary.value_sum_squares,
+                confidence_level=experiment.confidence_level,
+                is_statistically_significant=False,
+                additional_metrics={},
+                calculated_at=now,
             )
-            
-            self.db.add(result)
             results[variant.id] = result
-        
-        await self.db.flush()
-        
-        # Calculate comparisons to control
-        control_result = results.get(control.id)
-        if control_result and control_result.sample_size > 0:
-            control_rate = control_result.metric_value
             
-            for variant_id, result in results.items():
-                if variant_id == control.id:
-                    result.lift_percentage = 0.0
-                    result.lift_absolute = 0.0
-                    continue
-                
-                if result.sample_size > 0:
-                    variant_rate = result.metric_value
-                    result.lift_absolute = variant_rate - control_rate
-                    result.lift_percentage = (variant_rate - control_rate) / control_rate if control_rate > 0 else 0.0
-                    
-                    # Calculate statistical significance
-                    is_sig, p_value, ci = self._check_statistical_significance(
-                        control_result.conversions,
-                        control_result.sample_size,
-                        result.conversions,
-                        result.sample_size,
-                        experiment.confidence_level
-                    )
-                    
-                    result.p_value = p_value
-                    result.is_statistically_significant = is_sig
-                    result.confidence_interval_lower = ci[0] if ci else None
-                    result.confidence_interval_upper = ci[1] if ci else None
-                    result.statistical_test = "chi_square"
-        
-        await self.db.commit()
+            if variant.id == control.id:
+                result.lift_percentage = 0.0
+                result.lift_absolute = 0.0
+                continue
+            if summary.sample_size == 0 or control_summary.sample_size == 0:
+                continue
+            
+            control_value = control_summary.mean
+            result.lift_absolute = summary.mean - control_value
+            result.lift_percentage = result.lift_absolute / control_value if control_value > 0 else 0.0
+            
+            # Fixed-horizon test, valid only at a pre-planned sample size
+            if summary.binary:
+                _, fixed_p_value, _ = self._check_statistical_significance(
+                    control_summary.conversions,
+                    control_summary.sample_size,
+                    summary.conversions,
+                    summary.sample_size,
+                    experiment.confidence_level
+                )
+                fixed_test = "chi_square"
+            else:
+                fixed_p_value, result.cohens_d = self._check_mean_difference(control_summary, summary)
+                fixed_test = "t_test"
+            result.additional_metrics = {
+                "fixed_horizon_test": fixed_test,
+                "fixed_horizon_p_value": fixed_p_value,
+            }
+            
+            # Sequential test, valid at every look
+            sequential = msprt(control_summary, summary, tau_squared, alpha)
+            if sequential:
+                result.p_value = sequential.p_value
+                result.is_statistically_significant = sequential.p_value <= alpha
+                result.confidence_interval_lower, result.confidence_interval_upper = sequential.interval
+                result.statistical_test = "msprt"
+                result.additional_metrics["mixture_variance"] = sequential.mixture_variance
+        
+        if persist:
+            self.db.add_all(results.values())
+            await self.db.commit()
         
         logger.info(f"Calculated results for experiment {experiment_id}")
         return results
     
+    async def rebuild_statistics(self, experiment_id: str) -> int:
+        """
+        Recompute an experiment's running metric totals from its assignments.
+        
+        Needed once for experiments that were running before totals were
+        kept; scans the experiment's assignments.
+        
+        Returns:
+            Number of metric totals written
+        """
+        exposures = get_assignment_service().exposures
+        if exposures.pending(experiment_id):
+            await exposures.flush(self.db)
+        return await ExperimentStatsStore(self.db).rebuild(experiment_id)
+    
     def _calculate_sample_size(
         self,
         baseline_rate: float,
@@ -676,6 +741,41 @@ class ABTestingEngine:
         
         return is_significant, p_value, (ci_lower, ci_upper)
     
+    def _check_mean_difference(
+        self,
+        control: MetricSummary,
+        variant: MetricSummary
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Welch's t-test and Cohen's d for a continuous metric.
+        
+        Args:
+            control: Control metric totals
+            variant: Variant metric totals
+            
+        Returns:
+            Tuple of (p_value, cohens_d); None where undefined
+        """
+        if control.sample_size < 2 or variant.sample_size < 2:
+            return None, None
+        
+        control_sd = np.sqrt(control.variance)
+        variant_sd = np.sqrt(variant.variance)
+        if control_sd == 0 and variant_sd == 0:
+            return None, None
+        
+        _, p_value = stats.ttest_ind_from_stats(
+            variant.mean, variant_sd, variant.sample_size,
+            control.mean, control_sd, control.sample_size,
+            equal_var=False
+        )
+        
+        pooled_sd = np.sqrt(
+            ((control.sample_size - 1) * control.variance + (variant.sample_size - 1) * variant.variance)
+            / (control.sample_size + variant.sample_size - 2)
+        )
+        return float(p_value), float((variant.mean - control.mean) / pooled_sd)
+    
     # === Auto-Winner Selection ===
     
     async def check_auto_winner(
@@ -687,6 +787,11 @@ class ABTestingEngine:
         """
         Automatically check if a winner can be declared.
         
+        Uses the always-valid mSPRT p-values from running totals, so the
+        check can run every minute without inflating false positives or
+        scanning assignments. The significance level is split (Bonferroni)
+        across the variants compared to control. Results are not stored.
+        
         Args:
             experiment_id: Experiment ID
             min_confidence: Minimum confidence level
@@ -705,7 +810,7 @@ class ABTestingEngine:
             return None
         
         # Calculate latest results
-        results = await self.calculate_results(experiment_id)
+        results = await self.calculate_results(experiment_id, persist=False)
         
         # Get control
         result = await self.db.execute(
@@ -725,6 +830,8 @@ class ABTestingEngine:
         if not control_result:
             return None
         
+        alpha = (1 - min_confidence) / max(len(results) - 1, 1)
+        
         # Check each variant
         for variant_id, result in results.items():
             if variant_id == control.id:
@@ -733,7 +840,7 @@ class ABTestingEngine:
             # Check criteria
             if (result.is_statistically_significant and 
                 result.p_value is not None and 
-                result.p_value <= (1 - min_confidence) and
+                result.p_value <= alpha and
                 result.lift_percentage is not None and
                 result.lift_percentage >= min_lift):
                 
@@ -775,6 +882,14 @@ class ABTestingEngine:
             experiment_id, user_id, anonymous_id
         )
         
+        exposures = get_assignment_service().exposures
+        if not assignment and exposures.pending(experiment_id):
+            # The assignment may still be buffered
+            await exposures.flush(self.db)
+            assignment = await self._get_existing_assignment(
+                experiment_id, user_id, anonymous_id
+            )
+        
         if not assignment:
             return False
         
@@ -784,11 +899,26 @@ class ABTestingEngine:
         
         assignment.mark_converted(conversion_value)
         
-        # Update variant stats
-        variant = await self.db.get(ExperimentVariant, assignment.variant_id)
-        if variant:
-            variant.total_conversions += 1
-            variant.update_conversion_rate()
+        # Update variant and metric totals with atomic increments, so
+        # concurrent conversions are not lost
+        variants = ExperimentVariant.__table__
+        await self.db.execute(
+            update(variants)
+            .where(variants.c.id == assignment.variant_id)
+            .values(
+                total_conversions=variants.c.total_conversions + 1,
+                conversion_rate=case(
+                    (variants.c.total_assignments > 0,
+                     (variants.c.total_conversions + 1) / variants.c.total_assignments),
+                    else_=None,
+                ),
+            )
+        )
+        metric_name = (conversion_value or {}).get("metric_name")
+        if metric_name:
+            await ExperimentStatsStore(self.db).record_conversion(
+                experiment_id, assignment.variant_id, metric_name, conversion_value.get("metric_value")
+            )
         
         await self.db.commit()
         
@@ -0,0 +1,505 @@
+"""
+Write-coalescing counters for multi-armed bandits.
+
+Bandit decisions read per-variant successes, failures and pulls from
+`BanditCounterStore` instead of the database, and record pulls and rewards
+there as in-memory deltas. A background task (`start`) writes the deltas
+every `bandit_counter_flush_interval_seconds` with one executemany of
+`UPDATE experiment_variants SET x = x + :delta`, then reloads the totals,
+which picks up other workers' flushes and experiments stopped elsewhere.
+Request handlers only touch the database to load an experiment the first
+time it is seen, so a recommendation never waits on a write and concurrent
+requests never contend on the variant rows.
+
+With `bandit_counters_redis_url` set, workers also share their deltas
+through Redis every `bandit_counter_sync_interval_seconds`: each variant
+has a hash of totals, seeded from the database when an experiment is
+loaded, which every worker increments and reads back. The database stays
+the durable copy; Redis only shortens how long a worker's deltas take to
+reach the others.
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ...core.config import get_settings
+from ...models.experiment import Experiment, ExperimentStatus, ExperimentType
+from ...models.experiment_variant import ExperimentVariant
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("successes", "failures", "pulls")
+
+# Increment a variant's totals only if they are seeded; a missing hash
+# (Redis restarted or evicted it) is re-seeded by the next sync instead.
+_INCREMENT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'successes', ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'failures', ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'pulls', ARGV[3])
+return 1
+"""
+
+_FLUSH_STATEMENT = (
+    update(ExperimentVariant.__table__)
+    .where(ExperimentVariant.__table__.c.id == bindparam("variant_id"))
+    .values(
+        bandit_successes=ExperimentVariant.__table__.c.bandit_successes + bindparam("successes_delta"),
+        bandit_failures=ExperimentVariant.__table__.c.bandit_failures + bindparam("failures_delta"),
+        bandit_pulls=ExperimentVariant.__table__.c.bandit_pulls + bindparam("pulls_delta"),
+    )
+)
+
+
+@dataclass
+class ArmCounts:
+    """A variant's bandit counters as seen by this process."""
+    variant_id: str
+    experiment_id: str
+    name: str
+    traffic_percentage: float
+    is_control: bool
+    successes: int = 0
+    failures: int = 0
+    pulls: int = 0
+
+
+def _add(deltas: Dict[str, List[int]], variant_id: str, successes: int, failures: int, pulls: int):
+    delta = deltas.get(variant_id)
+    if delta is None:
+        deltas[variant_id] = [successes, failures, pulls]
+    else:
+        delta[0] += successes
+        delta[1] += failures
+        delta[2] += pulls
+
+
+def _merge(target: Dict[str, List[int]], deltas: Dict[str, List[int]]):
+    for variant_id, (successes, failures, pulls) in deltas.items():
+        _add(target, variant_id, successes, failures, pulls)
+
+
+class BanditCounterStore:
+    """
+    In-memory bandit counters with periodic delta flushes to the database.
+    """
+
+    REDIS_PREFIX = "bandit:counters"
+
+    def __init__(
+        self,
+        flush_interval_seconds: float = 2.0,
+        sync_interval_seconds: float = 0.25,
+        redis_url: Optional[str] = None
+    ):
+        """Initialize the store.
+
+        Args:
+            flush_interval_seconds: Time between database flushes by the
+                background task.
+            sync_interval_seconds: Time between Redis syncs (with Redis only).
+            redis_url: Optional Redis URL for sharing deltas across workers.
+        """
+        self.flush_interval_seconds = flush_interval_seconds
+        self.sync_interval_seconds = sync_interval_seconds
+
+        self._arms: Dict[str, ArmCounts] = {}
+        # Running bandit experiment -> its variant IDs
+        self._experiments: Dict[str, Tuple[str, ...]] = {}
+        # Deltas not yet written to the database / not yet pushed to Redis
+        self._pending: Dict[str, List[int]] = {}
+        self._unshared: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+        self._redis = None
+        self._increment = None
+        if redis_url:
+            if REDIS_AVAILABLE:
+                self._redis = aioredis.from_url(redis_url, decode_responses=True)
+                self._increment = self._redis.register_script(_INCREMENT_SCRIPT)
+            else:
+                logger.warning("redis package not installed; bandit counters are per-worker")
+
+        self._session_factory: Optional[async_sessionmaker] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._counters = {
+            "pulls": 0,
+            "rewards": 0,
+            "loads": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "syncs": 0,
+        }
+
+    # ============== Reads ==============
+
+    async def arms(self, db: AsyncSession, experiment_id: str) -> List[ArmCounts]:
+        """Counters of a running bandit experiment's variants.
+
+        Loads the experiment on first use; afterwards this does no I/O.
+
+        Raises:
+            ValueError: If the experiment is not a running bandit or has no variants.
+        """
+        variant_ids = self._experiments.get(experiment_id)
+        if variant_ids is None:
+            variant_ids = await self.load(db, experiment_id)
+        arms = self._arms
+        return [arms[variant_id] for variant_id in variant_ids]
+
+    def get(self, variant_id: str) -> Optional[ArmCounts]:
+        """Counters of a tracked variant, if any."""
+        return self._arms.get(variant_id)
+
+    def counts(self, variant: ExperimentVariant) -> Tuple[int, int, int]:
+        """Current (successes, failures, pulls) of a variant row, including unflushed deltas."""
+        arm = self._arms.get(variant.id)
+        if arm is not None:
+            return arm.successes, arm.failures, arm.pulls
+        delta = self._pending.get(variant.id, (0, 0, 0))
+        return (
+            variant.bandit_successes + delta[0],
+            variant.bandit_failures + delta[1],
+            variant.bandit_pulls + delta[2],
+        )
+
+    async def load(self, db: AsyncSession, experiment_id: str) -> Tuple[str, ...]:
+        """Load a running bandit experiment's variants and totals."""
+        experiment = (await db.execute(
+            select(Experiment.id).where(
+                Experiment.id == experiment_id,
+                Experiment.experiment_type == ExperimentType.BANDIT,
+                Experiment.status == ExperimentStatus.RUNNING,
+            )
+        )).scalar_one_or_none()
+        if experiment is None:
+            raise ValueError(f"Bandit experiment {experiment_id} not found or not running")
+
+        variants = (await db.execute(
+            select(ExperimentVariant)
+            .where(ExperimentVariant.experiment_id == experiment_id)
+            .order_by(ExperimentVariant.id)
+        )).scalars().all()
+        if not variants:
+            raise ValueError(f"No variants found for experiment {experiment_id}")
+
+        for variant in variants:
+            self.track(variant)
+        variant_ids = tuple(variant.id for variant in variants)
+        self._experiments[experiment_id] = variant_ids
+        self._counters["loads"] += 1
+
+        if self._redis is not None:
+            await self._seed(variants)
+            await self.sync()
+        return variant_ids
+
+    def track(self, variant: ExperimentVariant) -> ArmCounts:
+        """Start tracking a variant from its row; totals include unflushed deltas."""
+        with self._lock:
+            delta = self._pending.get(variant.id, (0, 0, 0))
+            arm = ArmCounts(
+                variant_id=variant.id,
+                experiment_id=variant.experiment_id,
+                name=variant.name,
+                traffic_percentage=variant.traffic_percentage,
+                is_control=variant.is_control,
+                successes=variant.bandit_successes + delta[0],
+                failures=variant.bandit_failures + delta[1],
+                pulls=variant.bandit_pulls + delta[2],
+            )
+            self._arms[variant.id] = arm
+        return arm
+
+    def forget(self, experiment_id: str):
+        """Stop serving an experiment from memory; its unflushed deltas are kept."""
+        variant_ids = self._experiments.pop(experiment_id, ())
+        for variant_id in variant_ids:
+            self._arms.pop(variant_id, None)
+
+    # ============== Writes ==============
+
+    def record_pull(self, variant_id: str) -> ArmCounts:
+        """Count a recommendation of a tracked variant."""
+        return self._record(variant_id, 0, 0, 1)
+
+    def record_reward(self, variant_id: str, reward: float) -> ArmCounts:
+        """Count a reward (> 0 is a success) for a tracked variant."""
+        self._counters["rewards"] += 1
+        return self._record(variant_id, 1, 0, 0) if reward > 0 else self._record(variant_id, 0, 1, 0)
+
+    def _record(self, variant_id: str, successes: int, failures: int, pulls: int) -> ArmCounts:
+        with self._lock:
+            arm = self._arms[variant_id]
+            arm.successes += successes
+            arm.failures += failures
+            arm.pulls += pulls
+            _add(self._pending, variant_id, successes, failures, pulls)
+            if self._redis is not None:
+                _add(self._unshared, variant_id, successes, failures, pulls)
+        self._counters["pulls"] += pulls
+        return arm
+
+    async def reset(self, experiment_id: str, variant_ids: Iterable[str]):
+        """Zero an experiment's counters after its rows were reset, dropping unflushed deltas."""
+        variant_ids = list(variant_ids)
+        with self._lock:
+            for variant_id in variant_ids:
+                self._pending.pop(variant_id, None)
+                self._unshared.pop(variant_id, None)
+                arm = self._arms.get(variant_id)
+                if arm is not None:
+                    arm.successes = arm.failures = arm.pulls = 0
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for variant_id in variant_ids:
+                    pipe.hset(self._redis_key(variant_id), mapping=dict.fromkeys(FIELDS, 0))
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to reset bandit counters for {experiment_id} in Redis: {e}")
+
+    # ============== Database Flush ==============
+
+    def due(self) -> bool:
+        """Whether buffered deltas should be written now."""
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval_seconds
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write buffered deltas with one executemany UPDATE and commit.
+
+        Returns:
+            Number of variants updated.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            await db.execute(
+                _FLUSH_STATEMENT,
+                [
+                    {
+                        "variant_id": variant_id,
+                        "successes_delta": successes,
+                        "failures_delta": failures,
+                        "pulls_delta": pulls,
+                    }
+                    for variant_id, (successes, failures, pulls) in pending.items()
+                ],
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                _merge(self._pending, pending)
+            raise
+        self._counters["flushes"] += 1
+        return len(pending)
+
+    async def refresh(self, db: AsyncSession):
+        """Reload totals of tracked variants and drop experiments no longer running.
+
+        With Redis the totals come from `sync` instead.
+        """
+        experiment_ids = list(self._experiments)
+        if experiment_ids:
+            running = set((await db.execute(
+                select(Experiment.id).where(
+                    Experiment.id.in_(experiment_ids),
+                    Experiment.experiment_type == ExperimentType.BANDIT,
+                    Experiment.status == ExperimentStatus.RUNNING,
+                )
+            )).scalars())
+            for experiment_id in experiment_ids:
+                if experiment_id not in running:
+                    self.forget(experiment_id)
+
+        if self._redis is not None or not self._arms:
+            return
+        rows = (await db.execute(
+            select(
+                ExperimentVariant.id,
+                ExperimentVariant.bandit_successes,
+                ExperimentVariant.bandit_failures,
+                ExperimentVariant.bandit_pulls,
+            ).where(ExperimentVariant.id.in_(list(self._arms)))
+        )).all()
+        with self._lock:
+            for variant_id, successes, failures, pulls in rows:
+                arm = self._arms.get(variant_id)
+                if arm is None:
+                    continue
+                delta = self._pending.get(variant_id, (0, 0, 0))
+                arm.successes = successes + delta[0]
+                arm.failures = failures + delta[1]
+                arm.pulls = pulls + delta[2]
+
+    # ============== Redis Sync ==============
+
+    def _redis_key(self, variant_id: str) -> str:
+        return f"{self.REDIS_PREFIX}:{variant_id}"
+
+    async def _seed(self, variants: Iterable[ExperimentVariant]):
+        """Create missing Redis totals from database rows."""
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for variant in variants:
+                key = self._redis_key(variant.id)
+                pipe.hsetnx(key, "successes", variant.bandit_successes)
+                pipe.hsetnx(key, "failures", variant.bandit_failures)
+                pipe.hsetnx(key, "pulls", variant.bandit_pulls)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to seed bandit counters in Redis: {e}")
+
+    async def sync(self) -> int:
+        """Push this worker's deltas to Redis and read back every worker's totals.
+
+        Returns:
+            Number of variants synced (0 without Redis or on error).
+        """
+        if self._redis is None:
+            return 0
+        with self._lock:
+            unshared, self._unshared = self._unshared, {}
+            variant_ids = list(self._arms)
+
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for variant_id, delta in unshared.items():
+                await self._increment(keys=[self._redis_key(variant_id)], args=delta, client=pipe)
+            for variant_id in variant_ids:
+                pipe.hgetall(self._redis_key(variant_id))
+            results = await pipe.execute()
+        except Exception as e:
+            with self._lock:
+                _merge(self._unshared, unshared)
+            logger.warning(f"Failed to sync bandit counters with Redis: {e}")
+            return 0
+
+        applied = results[:len(unshared)]
+        totals = results[len(unshared):]
+        seeds = []
+        with self._lock:
+            # Deltas to variants whose hash was missing wait for the re-seed
+            for (variant_id, delta), ok in zip(unshared.items(), applied):
+                if not ok:
+                    _add(self._unshared, variant_id, *delta)
+            for variant_id, values in zip(variant_ids, totals):
+                arm = self._arms.get(variant_id)
+                if arm is None:
+                    continue
+                delta = self._unshared.get(variant_id, (0, 0, 0))
+                if not values:
+                    # Seed from this worker's totals, minus what it has yet to push
+                    seeds.append((variant_id, arm.successes - delta[0], arm.failures - delta[1],
+                                  arm.pulls - delta[2]))
+                    continue
+                arm.successes = int(values.get("successes", 0)) + delta[0]
+                arm.failures = int(values.get("failures", 0)) + delta[1]
+                arm.pulls = int(values.get("pulls", 0)) + delta[2]
+
+        if seeds:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for variant_id, successes, failures, pulls in seeds:
+                    key = self._redis_key(variant_id)
+                    pipe.hsetnx(key, "successes", successes)
+                    pipe.hsetnx(key, "failures", failures)
+                    pipe.hsetnx(key, "pulls", pulls)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to re-seed bandit counters in Redis: {e}")
+        self._counters["syncs"] += 1
+        return len(variant_ids)
+
+    # ============== Background Task ==============
+
+    async def start(self, session_factory: async_sessionmaker):
+        """Start the background flush (and Redis sync) task."""
+        if self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run(), name="bandit-counter-flush")
+
+    async def stop(self):
+        """Stop the background task and write what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.sync()
+        if self._session_factory is not None and self._pending:
+            async with self._session_factory() as session:
+                await self.flush(session)
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _run(self):
+        interval = self.flush_interval_seconds
+        if self._redis is not None:
+            interval = min(interval, self.sync_interval_seconds)
+        while True:
+            await asyncio.sleep(interval)
+            await self.sync()
+            if time.monotonic() - self._last_flush < self.flush_interval_seconds:
+                continue
+            try:
+                async with self._session_factory() as session:
+                    await self.flush(session)
+                    await self.refresh(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["flush_errors"] += 1
+                logger.warning(f"Failed to flush bandit counters: {e}")
+
+    # ============== Metrics ==============
+
+    def stats(self) -> Dict[str, Any]:
+        """Tracked experiments and variants, deltas pending and throughput counters."""
+        return {
+            **self._counters,
+            "experiments": len(self._experiments),
+            "variants": len(self._arms),
+            "pending_variants": len(self._pending),
+            "redis_enabled": self._redis is not None,
+            "running": self._task is not None,
+        }
+
+
+# Global counter store
+_bandit_counters: Optional[BanditCounterStore] = None
+
+
+def get_bandit_counters() -> BanditCounterStore:
+    """Get the process-wide bandit counter store."""
+    global _bandit_counters
+    if _bandit_counters is None:
+        settings = get_settings()
+        _bandit_counters = BanditCounterStore(
+            flush_interval_seconds=settings.bandit_counter_flush_interval_seconds,
+            sync_interval_seconds=settings.bandit_counter_sync_interval_seconds,
+            redis_url=settings.bandit_counters_redis_url,
+        )
+    return _bandit_counters
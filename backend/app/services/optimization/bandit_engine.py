@@ -5,8 +5,12 @@ Implements various bandit algorithms for continuous optimization:
 - Thompson Sampling (Bayesian approach)
 - Upper Confidence Bound (UCB1)
 - Epsilon-Greedy
+- Contextual LinUCB and linear Thompson sampling (see `contextual_bandit`)
 
 Bandits balance exploration vs exploitation for optimal performance.
+
+Counters are served and updated in memory by `BanditCounterStore`, which
+writes them back to the variant rows in the background.
 """
 import logging
 import random
@@ -17,10 +21,11 @@ from datetime import datetime
 import numpy as np
 from scipy import stats
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, update
 
-from ...models.experiment import Experiment, ExperimentStatus, ExperimentType
 from ...models.experiment_variant import ExperimentVariant
+from .bandit_counters import ArmCounts, get_bandit_counters
+from .contextual_bandit import ALGORITHMS as CONTEXTUAL_ALGORITHMS, context_vector, get_contextual_bandits
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +40,18 @@ class BanditVariant:
     pulls: int
     traffic_percentage: float
 
+    @classmethod
+    def from_counts(cls, arm: ArmCounts) -> "BanditVariant":
+        """Snapshot a variant's in-memory counters."""
+        return cls(
+            variant_id=arm.variant_id,
+            name=arm.name,
+            successes=arm.successes,
+            failures=arm.failures,
+            pulls=arm.pulls,
+            traffic_percentage=arm.traffic_percentage,
+        )
+
 
 @dataclass
 class BanditRecommendation:
@@ -233,44 +250,8 @@ class BanditEngine:
         Returns:
             BanditRecommendation with selected variant
         """
-        # Get experiment
-        result = await self.db.execute(
-            select(Experiment).where(
-                and_(
-                    Experiment.id == experiment_id,
-                    Experiment.experiment_type == ExperimentType.BANDIT,
-                    Experiment.status == ExperimentStatus.RUNNING
-                )
-            )
-        )
-        experiment = result.scalar_one_or_none()
-        
-        if not experiment:
-            raise ValueError(f"Bandit experiment {experiment_id} not found or not running")
-        
-        # Get variants
-        result = await self.db.execute(
-            select(ExperimentVariant).where(
-                ExperimentVariant.experiment_id == experiment_id
-            )
-        )
-        db_variants = result.scalars().all()
-        
-        if not db_variants:
-            raise ValueError(f"No variants found for experiment {experiment_id}")
-        
-        # Convert to bandit variants
-        variants = [
-            BanditVariant(
-                variant_id=v.id,
-                name=v.name,
-                successes=v.bandit_successes,
-                failures=v.bandit_failures,
-                pulls=v.bandit_pulls,
-                traffic_percentage=v.traffic_percentage
-            )
-            for v in db_variants
-        ]
+        counters = get_bandit_counters()
+        variants = [BanditVariant.from_counts(arm) for arm in await counters.arms(self.db, experiment_id)]
         
         # Calculate total pulls
         total_pulls = sum(v.pulls for v in variants)
@@ -287,18 +268,14 @@ class BanditEngine:
         else:
             raise ValueError(f"Unknown algorithm: {algorithm}")
         
-        # Get selected variant details
-        selected_variant = next(v for v in db_variants if v.id == selected_id)
-        
-        # Update pull count
-        selected_variant.bandit_pulls += 1
-        await self.db.commit()
+        # Update pull count (written to the database in the background)
+        selected_variant = counters.record_pull(selected_id)
         
         # Calculate confidence
-        if selected_variant.bandit_pulls > 0:
-            estimated_rate = selected_variant.bandit_successes / selected_variant.bandit_pulls
+        if selected_variant.pulls > 0:
+            estimated_rate = selected_variant.successes / selected_variant.pulls
             # Confidence based on number of samples (more samples = higher confidence)
-            confidence = min(selected_variant.bandit_pulls / 1000, 1.0)
+            confidence = min(selected_variant.pulls / 1000, 1.0)
         else:
             estimated_rate = 0.5
             confidence = 0.0
@@ -315,40 +292,44 @@ class BanditEngine:
         self,
         variant_id: str,
         reward: float
-    ) -> ExperimentVariant:
+    ) -> BanditVariant:
         """
         Update bandit with new observation.
         
+        The observation is counted in memory; the database is only read
+        the first time a variant is seen by this process.
+        
         Args:
             variant_id: Variant ID
             reward: Reward value (0.0 to 1.0, or binary 0/1)
             
         Returns:
-            Updated variant
+            Updated variant counters
         """
-        variant = await self.db.get(ExperimentVariant, variant_id)
-        
-        if not variant:
-            raise ValueError(f"Variant {variant_id} not found")
-        
-        # Update bandit parameters
-        if reward > 0:
-            variant.bandit_successes += 1
-        else:
-            variant.bandit_failures += 1
-        
-        await self.db.commit()
-        await self.db.refresh(variant)
+        counters = get_bandit_counters()
+        await self._track(variant_id)
+        arm = counters.record_reward(variant_id, reward)
         
         logger.info(f"Updated variant {variant_id}: reward={reward}, "
-                   f"successes={variant.bandit_successes}, failures={variant.bandit_failures}")
+                   f"successes={arm.successes}, failures={arm.failures}")
         
-        return variant
+        return BanditVariant.from_counts(arm)
+    
+    async def _track(self, variant_id: str) -> ArmCounts:
+        """In-memory counters of a variant, loading the variant on first use."""
+        counters = get_bandit_counters()
+        arm = counters.get(variant_id)
+        if arm is None:
+            variant = await self.db.get(ExperimentVariant, variant_id)
+            if not variant:
+                raise ValueError(f"Variant {variant_id} not found")
+            arm = counters.track(variant)
+        return arm
     
     async def batch_update_performance(
         self,
         updates: List[Dict[str, Any]]
-    ) -> List[ExperimentVariant]:
+    ) -> List[BanditVariant]:
         """
         Batch update multiple variants.
         
@@ -356,19 +337,96 @@ class BanditEngine:
             updates: List of dicts with 'variant_id' and 'reward'
             
         Returns:
-            List of updated variants
+            List of updated variant counters
         """
         updated = []
         
-        for update in updates:
+        for variant_update in updates:
             variant = await self.update_variant_performance(
-                update['variant_id'],
-                update['reward']
+                variant_update['variant_id'],
+                variant_update['reward']
             )
             updated.append(variant)
         
         return updated
     
+    # === Contextual Bandits ===
+    
+    async def get_contextual_recommendation(
+        self,
+        experiment_id: str,
+        context: Dict[str, Any],
+        audience: Optional[Dict[str, Any]] = None,
+        algorithm: str = "linucb",
+        alpha: float = 1.0
+    ) -> BanditRecommendation:
+        """
+        Get recommended variant for a request's context.
+        
+        Args:
+            experiment_id: Bandit experiment ID
+            context: Request context (hour, day_of_week, device, channel)
+            audience: Optional audience data (size, demographics, interests, behaviors)
+            algorithm: linucb or linear_thompson
+            alpha: Exploration weight of LinUCB
+            
+        Returns:
+            BanditRecommendation with selected variant; the estimated
+            conversion rate is the arm's predicted reward for this context
+        """
+        if algorithm not in CONTEXTUAL_ALGORITHMS:
+            raise ValueError(f"Unknown contextual algorithm: {algorithm}")
+        
+        counters = get_bandit_counters()
+        arms = await counters.arms(self.db, experiment_id)
+        store = get_contextual_bandits()
+        bandit = await store.bandit(self.db, experiment_id, [arm.variant_id for arm in arms])
+        
+        x = context_vector(context, audience)
+        if algorithm == "linucb":
+            index, predicted = bandit.linucb(x, alpha)
+        else:
+            index, predicted = bandit.thompson(x)
+        store.record_decision()
+        
+        selected_variant = counters.record_pull(bandit.variant_ids[index])
+        
+        return BanditRecommendation(
+            variant_id=selected_variant.variant_id,
+            variant_name=selected_variant.name,
+            algorithm=algorithm,
+            confidence=min(int(bandit.updates[index]) / 1000, 1.0),
+            estimated_conversion_rate=min(max(predicted, 0.0), 1.0)
+        )
+    
+    async def update_contextual_performance(
+        self,
+        variant_id: str,
+        reward: float,
+        context: Dict[str, Any],
+        audience: Optional[Dict[str, Any]] = None
+    ) -> BanditVariant:
+        """
+        Update a contextual bandit with the reward of a recommendation.
+        
+        Args:
+            variant_id: Variant ID
+            reward: Reward value (0.0 to 1.0, or binary 0/1)
+            context: Context the recommendation was made for
+            audience: Audience data the recommendation was made for
+            
+        Returns:
+            Updated variant counters
+        """
+        counters = get_bandit_counters()
+        arm = await self._track(variant_id)
+        arms = await counters.arms(self.db, arm.experiment_id)
+        store = get_contextual_bandits()
+        bandit = await store.bandit(self.db, arm.experiment_id, [a.variant_id for a in arms])
+        store.update(bandit, variant_id, context_vector(context, audience), reward)
+        
+        return BanditVariant.from_counts(counters.record_reward(variant_id, reward))
+    
     # === Utility Methods ===
     
     async def get_variant_stats(
@@ -390,11 +448,13 @@ class BanditEngine:
             )
         )
         variants = result.scalars().all()
+        counters = get_bandit_counters()
         
         stats = {}
         for variant in variants:
-            total = variant.bandit_successes + variant.bandit_failures
-            conversion_rate = variant.bandit_successes / total if total > 0 else 0.0
+            successes, failures, pulls = counters.counts(variant)
+            total = successes + failures
+            conversion_rate = successes / total if total > 0 else 0.0
             
             # Calculate confidence interval for conversion rate
             if total > 0:
@@ -408,9 +468,9 @@ class BanditEngine:
             
             stats[variant.id] = {
                 "name": variant.name,
-                "successes": variant.bandit_successes,
-                "failures": variant.bandit_failures,
-                "pulls": variant.bandit_pulls,
+                "successes": successes,
+                "failures": failures,
+                "pulls": pulls,
                 "conversion_rate": conversion_rate,
                 "confidence_interval": (ci_lower, ci_upper),
                 "is_control": variant.is_control,
@@ -432,19 +492,24 @@ class BanditEngine:
         Returns:
             List of reset variants
         """
+        # Counters and checkpoints are written with bulk statements, so
+        # loaded rows may be stale; reset in SQL and reload them
+        await self.db.execute(
+            update(ExperimentVariant)
+            .where(ExperimentVariant.experiment_id == experiment_id)
+            .values(bandit_successes=0, bandit_failures=0, bandit_pulls=0, contextual_state=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
         result = await self.db.execute(
             select(ExperimentVariant).where(
                 ExperimentVariant.experiment_id == experiment_id
-            )
+            ).execution_options(populate_existing=True)
         )
         variants = result.scalars().all()
         
-        for variant in variants:
-            variant.bandit_successes = 0
-            variant.bandit_failures = 0
-            variant.bandit_pulls = 0
-        
-        await self.db.commit()
+        await get_bandit_counters().reset(experiment_id, [v.id for v in variants])
+        get_contextual_bandits().reset(experiment_id)
         
         logger.info(f"Reset bandit experiment {experiment_id}")
         return variants
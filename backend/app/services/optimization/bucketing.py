@@ -0,0 +1,164 @@
+"""
+Deterministic bucketing for experiment assignment.
+
+A visitor is hashed once per request (`visitor_hash`, two CRC-32s over
+the ID) and placed in one of `BUCKETS` buckets of a bucket space
+(`bucket`: the visitor hash XOR the space's 64-bit salt, a murmur3-style
+finalizer, then a multiply-shift range reduction). An experiment uses its
+own ID as salt; experiments in a layer share the layer's space and own
+disjoint buckets of it, so a visitor is in at most one of them.
+
+Variants own explicit buckets, stored as ranges on the variant row, and
+`allocate_buckets` changes an allocation with the fewest moves: variants
+above their new share give up their highest buckets, variants below it
+take the lowest free ones. Ramping an experiment's traffic up therefore
+only adds visitors, and re-splitting traffic only moves the visitors the
+new split requires. Per experiment, the allocation is compiled into a
+bucket -> variant lookup table.
+
+Experiments that were already running before allocations were stored keep
+the md5 bucketing they started with (`legacy_bucket`, and
+`legacy_allocation` for the split-only variant choice), so their visitors
+are not re-bucketed.
+"""
+import bisect
+import hashlib
+import itertools
+import zlib
+from typing import Iterable, List, Optional, Sequence, Set
+
+# Buckets per space; traffic resolves to 0.01%
+BUCKETS = 10000
+
+# Lookup table value of buckets outside the experiment
+NO_VARIANT = 255
+
+# Experiment.bucketing of experiments hashed with `legacy_bucket`
+LEGACY_BUCKETING = "md5"
+
+_MASK64 = (1 << 64) - 1
+
+
+def visitor_hash(key: str) -> int:
+    """64-bit hash of a visitor ID, computed once and reused for every space."""
+    data = key.encode()
+    return zlib.crc32(data) << 32 | zlib.crc32(data[::-1])
+
+
+def salt_hash(salt: str) -> int:
+    """64-bit salt of a bucket space (experiment ID or layer name)."""
+    return int.from_bytes(hashlib.blake2b(salt.encode(), digest_size=8).digest(), "little")
+
+
+def bucket(visitor: int, salt: int) -> int:
+    """A visitor's bucket in [0, BUCKETS) of the space with `salt`."""
+    x = visitor ^ salt
+    x ^= x >> 33
+    x = x * 0xFF51AFD7ED558CCD & _MASK64
+    x ^= x >> 33
+    return x * BUCKETS >> 64
+
+
+def legacy_bucket(key: str, experiment_id: str) -> int:
+    """A visitor's bucket in an experiment that uses `LEGACY_BUCKETING`."""
+    return int(hashlib.md5(f"{key}:{experiment_id}".encode()).hexdigest(), 16) % BUCKETS
+
+
+def legacy_allocation(percentages: Sequence[float]) -> List[List[int]]:
+    """Buckets per variant as assigned before allocations were stored.
+
+    Bucket `b` goes to the first variant whose cumulative percentage reaches
+    `b / 100` (the last variant if none does); traffic allocation was not
+    applied.
+    """
+    bounds = list(itertools.accumulate(percentages))
+    allocation: List[List[int]] = [[] for _ in bounds]
+    if allocation:
+        for b in range(BUCKETS):
+            index = bisect.bisect_left(bounds, b / (BUCKETS / 100))
+            allocation[min(index, len(bounds) - 1)].append(b)
+    return allocation
+
+
+def target_counts(traffic_allocation: float, percentages: Sequence[float]) -> List[int]:
+    """Buckets per variant for a traffic allocation (0-1) and split (percent).
+
+    Rounds by largest remainder so the counts add up exactly.
+    """
+    total = round(max(0.0, min(traffic_allocation, 1.0)) * BUCKETS)
+    weight = sum(percentages)
+    if weight <= 0:
+        return [0] * len(percentages)
+    exact = [total * p / weight for p in percentages]
+    counts = [int(e) for e in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda i: (counts[i] - exact[i], i))
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def allocate_buckets(
+    current: Sequence[Sequence[int]],
+    targets: Sequence[int],
+    reserved: Iterable[int] = ()
+) -> List[List[int]]:
+    """Reallocate buckets to variants with the fewest moves.
+
+    Args:
+        current: Buckets each variant owns now (empty for a new experiment).
+        targets: Buckets each variant should own.
+        reserved: Buckets owned by other experiments in the same layer.
+
+    Returns:
+        Sorted buckets per variant.
+
+    Raises:
+        ValueError: If there are not enough free buckets.
+    """
+    reserved = set(reserved)
+    kept = [sorted(b for b in buckets if b not in reserved)[:target] for buckets, target in zip(current, targets)]
+    taken: Set[int] = set(reserved)
+    for buckets in kept:
+        taken.update(buckets)
+
+    needed = sum(target - len(buckets) for buckets, target in zip(kept, targets))
+    free = [b for b in range(BUCKETS) if b not in taken]
+    if needed > len(free):
+        raise ValueError(
+            f"Not enough free traffic: {needed} buckets needed, {len(free)} available in the layer"
+        )
+
+    position = 0
+    allocation = []
+    for buckets, target in zip(kept, targets):
+        extra = target - len(buckets)
+        allocation.append(sorted(buckets + free[position:position + extra]))
+        position += extra
+    return allocation
+
+
+def to_ranges(buckets: Iterable[int]) -> List[List[int]]:
+    """Compress sorted buckets into [start, end) ranges."""
+    ranges: List[List[int]] = []
+    for b in buckets:
+        if ranges and ranges[-1][1] == b:
+            ranges[-1][1] = b + 1
+        else:
+            ranges.append([b, b + 1])
+    return ranges
+
+
+def from_ranges(ranges: Optional[Iterable[Sequence[int]]]) -> List[int]:
+    """Expand [start, end) ranges into buckets."""
+    return [b for start, end in ranges or () for b in range(start, end)]
+
+
+def lookup_table(allocation: Sequence[Iterable[int]]) -> bytes:
+    """Bucket -> variant index table (`NO_VARIANT` where unallocated)."""
+    if len(allocation) >= NO_VARIANT:
+        raise ValueError(f"At most {NO_VARIANT - 1} variants are supported")
+    table = bytearray([NO_VARIANT]) * BUCKETS
+    for index, buckets in enumerate(allocation):
+        for b in buckets:
+            table[b] = index
+    return bytes(table)
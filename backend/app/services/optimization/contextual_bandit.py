@@ -0,0 +1,392 @@
+"""
+Contextual (linear) bandits.
+
+Each variant of a contextual bandit experiment keeps a ridge regression of
+reward on the request's context: `A = λI + Σ x xᵀ` and `b = Σ r x`. The
+state is held in NumPy, stacked over arms, so a decision scores every arm
+with one batched matrix-vector product:
+
+- LinUCB picks the arm maximizing `θ·x + α √(xᵀ A⁻¹ x)`.
+- Linear Thompson sampling draws each arm's predicted reward from
+  `N(θ·x, v² xᵀ A⁻¹ x)`, the marginal of the posterior over `θ`, which
+  avoids sampling a d-dimensional vector per arm.
+
+Rewards update `A⁻¹` with a Sherman-Morrison rank-1 update, O(d²). The
+context vector is built from `PredictivePerformanceModel`'s audience and
+context extractors, scaled to roughly [0, 1], plus an intercept.
+
+`ContextualBanditStore` checkpoints the state into
+`ExperimentVariant.contextual_state` every
+`bandit_contextual_checkpoint_interval_seconds` from a background task.
+Each worker writes the statistics it gathered since its last checkpoint
+on top of the stored ones (under a row lock), so workers learning in
+parallel do not overwrite each other.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ...core.config import get_settings
+from ...models.experiment import Experiment, ExperimentStatus, ExperimentType
+from ...models.experiment_variant import ExperimentVariant
+from .predictive_modeling import PredictivePerformanceModel
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("linucb", "linear_thompson")
+
+# Extracted feature -> divisor bringing it to roughly [0, 1]
+FEATURE_SCALES: Dict[str, float] = {
+    "audience_size_log": 20.0,
+    "age_range_width": 50.0,
+    "gender_targeting": 1.0,
+    "interest_count": 10.0,
+    "interest_diversity": 1.0,
+    "behavior_count": 10.0,
+    "hour": 24.0,
+    "is_business_hours": 1.0,
+    "is_evening": 1.0,
+    "is_weekend": 1.0,
+    "is_mobile": 1.0,
+    "is_tablet": 1.0,
+    "is_desktop": 1.0,
+    "is_social": 1.0,
+    "is_search": 1.0,
+    "is_display": 1.0,
+}
+FEATURE_NAMES: Tuple[str, ...] = ("intercept",) + tuple(FEATURE_SCALES)
+DIMENSION = len(FEATURE_NAMES)
+
+_SCALES = np.array(list(FEATURE_SCALES.values()))
+_rng = np.random.default_rng()
+
+# Observations buffered per experiment before they are folded into the
+# checkpoint statistics in one vectorized step
+FOLD_BATCH = 1024
+# The extractors do not use the database
+_extractors = PredictivePerformanceModel(db_session=None)
+
+
+def context_vector(context: Optional[Dict[str, Any]], audience: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """Feature vector of a request: intercept, then scaled audience and context features."""
+    features = _extractors.extract_audience_features(audience or {})
+    features.update(_extractors.extract_context_features(context or {}))
+    x = np.empty(DIMENSION)
+    x[0] = 1.0
+    x[1:] = np.fromiter((features[name] for name in FEATURE_SCALES), float, DIMENSION - 1) / _SCALES
+    return x
+
+
+class LinearBandit:
+    """
+    Per-arm ridge regression state of one experiment, stacked over arms.
+    """
+
+    def __init__(self, variant_ids: Sequence[str], dimension: int = DIMENSION, regularization: float = 1.0):
+        """Initialize arms with the prior `A = regularization * I`, `b = 0`."""
+        arms = len(variant_ids)
+        self.variant_ids = tuple(variant_ids)
+        self.index = {variant_id: i for i, variant_id in enumerate(self.variant_ids)}
+        self.regularization = regularization
+        self.a_inv = np.tile(np.eye(dimension) / regularization, (arms, 1, 1))
+        self.b = np.zeros((arms, dimension))
+        self.theta = np.zeros((arms, dimension))
+        self.updates = np.zeros(arms, dtype=np.int64)
+        # Statistics since the last checkpoint: recent (arm, x, reward)
+        # observations, folded into the delta arrays in batches
+        self.observations: List[Tuple[int, np.ndarray, float]] = []
+        self.delta_a = np.zeros((arms, dimension, dimension))
+        self.delta_b = np.zeros((arms, dimension))
+        self.delta_updates = np.zeros(arms, dtype=np.int64)
+
+    # ============== Decisions ==============
+
+    def predict(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Predicted reward and its variance factor `xᵀ A⁻¹ x` for every arm."""
+        return self.theta @ x, np.maximum(self.a_inv @ x @ x, 0.0)
+
+    def linucb(self, x: np.ndarray, alpha: float = 1.0) -> Tuple[int, float]:
+        """Arm with the highest upper confidence bound, and its predicted reward."""
+        mean, variance = self.predict(x)
+        arm = int((mean + alpha * np.sqrt(variance)).argmax())
+        return arm, float(mean[arm])
+
+    def thompson(self, x: np.ndarray, scale: float = 0.25, rng: Optional[np.random.Generator] = None) -> Tuple[int, float]:
+        """Arm with the highest sampled reward, and its predicted reward."""
+        mean, variance = self.predict(x)
+        noise = (rng or _rng).standard_normal(len(mean))
+        arm = int((mean + scale * np.sqrt(variance) * noise).argmax())
+        return arm, float(mean[arm])
+
+    # ============== Updates ==============
+
+    def update(self, arm: int, x: np.ndarray, reward: float):
+        """Add an observation to an arm (Sherman-Morrison, O(d²))."""
+        a_inv = self.a_inv[arm]
+        theta = self.theta[arm]
+        a_inv_x = a_inv @ x
+        gain = a_inv_x / (1.0 + a_inv_x @ x)
+        error = reward - theta @ x
+        a_inv -= gain[:, None] * a_inv_x
+        theta += gain * error
+        self.b[arm] += reward * x
+        self.updates[arm] += 1
+        self.observations.append((arm, x, reward))
+        if len(self.observations) >= FOLD_BATCH:
+            self._fold()
+
+    def _fold(self):
+        """Add buffered observations to the delta statistics (`Σ x xᵀ`, `Σ r x`, counts)."""
+        observations, self.observations = self.observations, []
+        if not observations:
+            return
+        index = np.fromiter((o[0] for o in observations), np.int64, len(observations))
+        xs = np.array([o[1] for o in observations])
+        rewards = np.fromiter((o[2] for o in observations), float, len(observations))
+        for arm in np.unique(index):
+            selected = index == arm
+            self.delta_a[arm] += xs[selected].T @ xs[selected]
+            self.delta_b[arm] += rewards[selected] @ xs[selected]
+        self.delta_updates += np.bincount(index, minlength=len(self.delta_updates))
+
+    @property
+    def pending(self) -> int:
+        """Observations not checkpointed yet."""
+        return int(self.delta_updates.sum()) + len(self.observations)
+
+    def take_deltas(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return and clear the statistics gathered since the last checkpoint."""
+        self._fold()
+        deltas = self.delta_a, self.delta_b, self.delta_updates
+        self.delta_a = np.zeros_like(self.delta_a)
+        self.delta_b = np.zeros_like(self.delta_b)
+        self.delta_updates = np.zeros_like(self.delta_updates)
+        return deltas
+
+    def restore_deltas(self, deltas: Tuple[np.ndarray, np.ndarray, np.ndarray]):
+        """Put back deltas of a failed checkpoint."""
+        self.delta_a += deltas[0]
+        self.delta_b += deltas[1]
+        self.delta_updates += deltas[2]
+
+    def reload(self, stored: Dict[int, Tuple[np.ndarray, np.ndarray, int]]):
+        """Set arms from stored statistics plus what was gathered since the last checkpoint."""
+        self._fold()
+        for arm, (a, b, updates) in stored.items():
+            self.a_inv[arm] = np.linalg.inv(a + self.delta_a[arm])
+            self.b[arm] = b + self.delta_b[arm]
+            self.theta[arm] = self.a_inv[arm] @ self.b[arm]
+            self.updates[arm] = updates + self.delta_updates[arm]
+
+    def prior(self) -> np.ndarray:
+        """`A` of an arm without observations."""
+        return np.eye(self.b.shape[1]) * self.regularization
+
+    # ============== Serialization ==============
+
+    @staticmethod
+    def decode(state: Optional[Dict[str, Any]]) -> Optional[Tuple[np.ndarray, np.ndarray, int]]:
+        """Stored (A, b, updates) of an arm, or None if absent or built on other features."""
+        if not state or state.get("features") != list(FEATURE_NAMES):
+            return None
+        return np.array(state["a"], dtype=float), np.array(state["b"], dtype=float), int(state["updates"])
+
+    @staticmethod
+    def encode(a: np.ndarray, b: np.ndarray, updates: int) -> Dict[str, Any]:
+        """JSON state of an arm."""
+        return {"features": list(FEATURE_NAMES), "a": a.tolist(), "b": b.tolist(), "updates": int(updates)}
+
+
+class ContextualBanditStore:
+    """
+    Process-wide linear bandit state with periodic checkpoints to the database.
+    """
+
+    def __init__(self, checkpoint_interval_seconds: float = 30.0, regularization: float = 1.0):
+        """Initialize the store.
+
+        Args:
+            checkpoint_interval_seconds: Time between checkpoints by the
+                background task.
+            regularization: Ridge penalty λ of new arms.
+        """
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.regularization = regularization
+        self._bandits: Dict[str, LinearBandit] = {}
+        self._lock = threading.Lock()
+        self._session_factory: Optional[async_sessionmaker] = None
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"decisions": 0, "updates": 0, "loads": 0, "checkpoints": 0, "checkpoint_errors": 0}
+
+    async def bandit(self, db: AsyncSession, experiment_id: str, variant_ids: Sequence[str]) -> LinearBandit:
+        """An experiment's linear bandit, loaded from its checkpoint on first use."""
+        bandit = self._bandits.get(experiment_id)
+        if bandit is not None and bandit.variant_ids == tuple(variant_ids):
+            return bandit
+
+        bandit = LinearBandit(variant_ids, regularization=self.regularization)
+        result = await db.execute(
+            select(ExperimentVariant.id, ExperimentVariant.contextual_state)
+            .where(ExperimentVariant.id.in_(list(variant_ids)))
+        )
+        stored = {}
+        for variant_id, state in result.all():
+            decoded = LinearBandit.decode(state)
+            if decoded is not None:
+                stored[bandit.index[variant_id]] = decoded
+        bandit.reload(stored)
+        self._bandits[experiment_id] = bandit
+        self._counters["loads"] += 1
+        return bandit
+
+    def record_decision(self):
+        """Count a contextual decision."""
+        self._counters["decisions"] += 1
+
+    def update(self, bandit: LinearBandit, variant_id: str, x: np.ndarray, reward: float):
+        """Add an observation to an arm."""
+        with self._lock:
+            bandit.update(bandit.index[variant_id], x, reward)
+        self._counters["updates"] += 1
+
+    def reset(self, experiment_id: str):
+        """Discard an experiment's state after its checkpoints were cleared."""
+        with self._lock:
+            self._bandits.pop(experiment_id, None)
+
+    # ============== Checkpoints ==============
+
+    async def checkpoint(self, db: AsyncSession) -> int:
+        """Add each experiment's new statistics to the stored ones and commit.
+
+        Stored rows are locked while they are merged (on databases that
+        support it), and every arm is reloaded from the merged statistics,
+        which picks up other workers' checkpoints.
+
+        Returns:
+            Number of variants written.
+        """
+        taken = []
+        with self._lock:
+            for bandit in self._bandits.values():
+                if bandit.pending:
+                    taken.append((bandit, bandit.take_deltas()))
+        if not taken:
+            return 0
+
+        try:
+            variant_ids = [variant_id for bandit, _ in taken for variant_id in bandit.variant_ids]
+            stored = dict((await db.execute(
+                select(ExperimentVariant.id, ExperimentVariant.contextual_state)
+                .where(ExperimentVariant.id.in_(variant_ids))
+                .with_for_update()
+            )).all())
+
+            rows = []
+            merged = []
+            for bandit, (delta_a, delta_b, counts) in taken:
+                states = {}
+                for arm, variant_id in enumerate(bandit.variant_ids):
+                    previous = LinearBandit.decode(stored.get(variant_id))
+                    a, b, updates = previous or (bandit.prior(), np.zeros(bandit.b.shape[1]), 0)
+                    states[arm] = (a + delta_a[arm], b + delta_b[arm], updates + int(counts[arm]))
+                    if counts[arm] or previous is None:
+                        rows.append({"variant_id": variant_id, "state": LinearBandit.encode(*states[arm])})
+                merged.append((bandit, states))
+            table = ExperimentVariant.__table__
+            await db.execute(
+                update(table).where(table.c.id == bindparam("variant_id")).values(contextual_state=bindparam("state")),
+                rows,
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Put the statistics back so the next checkpoint retries them
+            with self._lock:
+                for bandit, deltas in taken:
+                    bandit.restore_deltas(deltas)
+            raise
+
+        with self._lock:
+            for bandit, states in merged:
+                bandit.reload(states)
+        self._counters["checkpoints"] += 1
+        return len(rows)
+
+    async def drop_stopped(self, db: AsyncSession):
+        """Forget experiments that are no longer running bandits (after their checkpoint)."""
+        if not self._bandits:
+            return
+        running = set((await db.execute(
+            select(Experiment.id).where(
+                Experiment.id.in_(list(self._bandits)),
+                Experiment.experiment_type == ExperimentType.BANDIT,
+                Experiment.status == ExperimentStatus.RUNNING,
+            )
+        )).scalars())
+        with self._lock:
+            for experiment_id in list(self._bandits):
+                if experiment_id not in running and not self._bandits[experiment_id].pending:
+                    del self._bandits[experiment_id]
+
+    # ============== Background Task ==============
+
+    async def start(self, session_factory: async_sessionmaker):
+        """Start the background checkpoint task."""
+        if self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run(), name="contextual-bandit-checkpoint")
+
+    async def stop(self):
+        """Stop the background task and checkpoint what has not been written."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session_factory is not None:
+            async with self._session_factory() as session:
+                await self.checkpoint(session)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_interval_seconds)
+            try:
+                async with self._session_factory() as session:
+                    await self.checkpoint(session)
+                    await self.drop_stopped(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["checkpoint_errors"] += 1
+                logger.warning(f"Failed to checkpoint contextual bandits: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Experiments held, pending observations and throughput counters."""
+        return {
+            **self._counters,
+            "experiments": len(self._bandits),
+            "pending_updates": sum(b.pending for b in self._bandits.values()),
+            "dimension": DIMENSION,
+            "running": self._task is not None,
+        }
+
+
+# Global store
+_contextual_bandits: Optional[ContextualBanditStore] = None
+
+
+def get_contextual_bandits() -> ContextualBanditStore:
+    """Get the process-wide contextual bandit store."""
+    global _contextual_bandits
+    if _contextual_bandits is None:
+        settings = get_settings()
+        _contextual_bandits = ContextualBanditStore(
+            checkpoint_interval_seconds=settings.bandit_contextual_checkpoint_interval_seconds,
+        )
+    return _contextual_bandits
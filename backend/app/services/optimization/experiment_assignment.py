@@ -0,0 +1,573 @@
+"""
+In-memory experiment assignment.
+
+Assignment is a pure function of the visitor and the experiment's bucket
+allocation (see `bucketing`), so it is served from a versioned snapshot of
+running experiments instead of the database:
+
+- `AssignmentSnapshot` holds every running experiment with its bucket ->
+  variant lookup table. The engine reloads an experiment when it is
+  started, stopped, paused, ramped or re-allocated; other processes pick
+  the change up when their snapshot is older than
+  `experiment_snapshot_ttl_seconds`.
+- Exposures are buffered in `ExposureBuffer` and written as one bulk
+  insert, followed by one `total_assignments` increment per variant.
+  Assignment IDs are derived from the experiment and visitor, so a visitor
+  exposed again (in this or another process) maps to the same row and the
+  insert skips it.
+
+Visitors whose bucket the experiment does not own (traffic not ramped to
+them, or taken by another experiment in its layer) are not enrolled.
+
+Assignments are sticky. Buckets a variant gave up while the experiment ran
+(re-split, or ramped down and back up) are recorded as released; a visitor
+in a released bucket is served the variant of their existing assignment
+(from a bounded per-process cache, the exposure buffer or one primary-key
+query per request), so conversions are tracked against the variant the
+visitor saw. Legacy experiments treat every bucket as released, since
+their assignments predate stored allocations.
+Experiments marked with `LEGACY_BUCKETING` place visitors with
+`legacy_bucket` instead of the shared visitor hash.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.config import get_settings
+from ...models.experiment import Experiment, ExperimentStatus
+from ...models.experiment_assignment import ExperimentAssignment
+from ...models.experiment_variant import ExperimentVariant
+from .bucketing import (
+    LEGACY_BUCKETING, NO_VARIANT, allocate_buckets, bucket, from_ranges, legacy_allocation, legacy_bucket,
+    lookup_table, salt_hash, target_counts, visitor_hash,
+)
+
+logger = logging.getLogger(__name__)
+
+_ASSIGNMENT_NAMESPACE = uuid.UUID("5b1f0c0e-8a44-4a53-9d0e-2f6a4c1e7b90")
+
+
+def assignment_id(experiment_id: str, user_id: Optional[str], anonymous_id: Optional[str]) -> str:
+    """Stable ID of a visitor's assignment row in an experiment."""
+    visitor = f"user:{user_id}" if user_id else f"anonymous:{anonymous_id}"
+    return uuid.uuid5(_ASSIGNMENT_NAMESPACE, f"{experiment_id}:{visitor}").hex[:12]
+
+
+def ordered_variants(variants: Iterable[ExperimentVariant]) -> List[ExperimentVariant]:
+    """Variants in allocation order: largest share first, then by ID."""
+    return sorted(variants, key=lambda v: (-v.traffic_percentage, v.id))
+
+
+def current_allocation(experiment: Experiment, variants: Sequence[ExperimentVariant]) -> List[List[int]]:
+    """Buckets each variant owns.
+
+    Experiments started before allocations were stored keep the split-only
+    allocation they were assigned with; other variants without stored
+    buckets get theirs computed from the traffic split, the same way in
+    every process.
+    """
+    if all(v.buckets is not None for v in variants):
+        return [from_ranges(v.buckets) for v in variants]
+    if experiment.bucketing == LEGACY_BUCKETING:
+        return legacy_allocation([v.traffic_percentage for v in variants])
+    return allocate_buckets(
+        [[] for _ in variants],
+        target_counts(experiment.traffic_allocation, [v.traffic_percentage for v in variants]),
+    )
+
+
+def space_salt(experiment: Experiment) -> str:
+    """Salt of the bucket space an experiment draws from."""
+    return f"layer:{experiment.layer}" if experiment.layer else experiment.id
+
+
+@dataclass
+class AssignmentResult:
+    """Result of user assignment."""
+    variant_id: str
+    variant_name: str
+    is_control: bool
+    configuration: Dict[str, Any]
+    assignment_id: str
+
+
+@dataclass(frozen=True)
+class VariantSnapshot:
+    """A variant as served by the assignment snapshot."""
+    id: str
+    name: str
+    is_control: bool
+    configuration: Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class ExperimentSnapshot:
+    """A running experiment's variants and bucket -> variant lookup table."""
+    id: str
+    organization_id: str
+    layer: Optional[str]
+    salt: int
+    variants: Tuple[VariantSnapshot, ...]
+    table: bytes
+    legacy: bool = False
+    released: FrozenSet[int] = frozenset()
+
+    @classmethod
+    def build(cls, experiment: Experiment, variants: Iterable[ExperimentVariant]) -> "ExperimentSnapshot":
+        """Snapshot an experiment and compile its bucket allocation."""
+        ordered = ordered_variants(variants)
+        return cls(
+            id=experiment.id,
+            organization_id=experiment.organization_id,
+            layer=experiment.layer,
+            salt=salt_hash(space_salt(experiment)),
+            variants=tuple(
+                VariantSnapshot(id=v.id, name=v.name, is_control=v.is_control, configuration=v.configuration)
+                for v in ordered
+            ),
+            table=lookup_table(current_allocation(experiment, ordered)),
+            legacy=experiment.bucketing == LEGACY_BUCKETING,
+            released=frozenset(from_ranges(experiment.released_buckets)),
+        )
+
+    def bucket_for(self, visitor: int, key: str) -> int:
+        """A visitor's bucket (by `visitor_hash` and ID)."""
+        return legacy_bucket(key, self.id) if self.legacy else bucket(visitor, self.salt)
+
+    def variant_at(self, b: int) -> Optional[VariantSnapshot]:
+        """The variant owning a bucket, or None if it is not enrolled."""
+        index = self.table[b]
+        return None if index == NO_VARIANT else self.variants[index]
+
+    def variant_for(self, visitor: int, key: str) -> Optional[VariantSnapshot]:
+        """The variant of a visitor's bucket, or None if not enrolled."""
+        return self.variant_at(self.bucket_for(visitor, key))
+
+    def is_sticky(self, b: int) -> bool:
+        """Whether visitors in a bucket may be assigned to another variant."""
+        return self.legacy or b in self.released
+
+    def variant(self, variant_id: str) -> Optional[VariantSnapshot]:
+        return next((v for v in self.variants if v.id == variant_id), None)
+
+
+@dataclass(frozen=True)
+class AssignmentSnapshot:
+    """Immutable view of all running experiments."""
+    version: int
+    experiments: Dict[str, ExperimentSnapshot]
+    loaded_at: float
+
+
+@dataclass
+class Exposure:
+    """A buffered assignment row."""
+    id: str
+    experiment_id: str
+    variant_id: str
+    user_id: Optional[str]
+    anonymous_id: Optional[str]
+    context: Dict[str, Any]
+    exposed_at: datetime = field(default_factory=datetime.utcnow)
+
+    def row(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "experiment_id": self.experiment_id,
+            "variant_id": self.variant_id,
+            "user_id": self.user_id,
+            "anonymous_id": self.anonymous_id,
+            "context": self.context,
+            "assigned_at": self.exposed_at,
+            "first_exposed_at": self.exposed_at,
+        }
+
+
+class ExposureBuffer:
+    """
+    Buffers new assignment rows between bulk inserts.
+    """
+
+    def __init__(self, flush_interval_seconds: float = 5.0, max_pending: int = 10000, chunk_size: int = 1000):
+        """Initialize the buffer.
+
+        Args:
+            flush_interval_seconds: Minimum time between flushes (0 flushes
+                on every assignment).
+            max_pending: Rows that make a flush due regardless of the interval.
+            chunk_size: Rows per INSERT statement.
+        """
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self._pending: Dict[str, Exposure] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, exposure: Exposure):
+        """Buffer an exposure; repeats of a buffered one keep the first."""
+        with self._lock:
+            self._pending.setdefault(exposure.id, exposure)
+
+    def variant_of(self, exposure_id: str) -> Optional[str]:
+        """Variant of a buffered exposure, if there is one."""
+        exposure = self._pending.get(exposure_id)
+        return exposure.variant_id if exposure is not None else None
+
+    def due(self) -> bool:
+        """Whether buffered rows should be written now."""
+        return bool(self._pending) and (
+            len(self._pending) >= self.max_pending
+            or time.monotonic() - self._last_flush >= self.flush_interval_seconds
+        )
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Insert buffered rows that do not exist yet, bump variant counters and commit.
+
+        Returns:
+            Number of new assignment rows.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            rows = [exposure.row() for exposure in pending.values()]
+            counts: Dict[str, int] = {}
+            for start in range(0, len(rows), self.chunk_size):
+                for variant_id in await self._insert_new(db, rows[start:start + self.chunk_size]):
+                    counts[variant_id] = counts.get(variant_id, 0) + 1
+            for variant_id, count in counts.items():
+                await db.execute(
+                    update(ExperimentVariant)
+                    .where(ExperimentVariant.id == variant_id)
+                    .values(total_assignments=ExperimentVariant.total_assignments + count)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Put the rows back so the next flush retries them
+            for exposure in pending.values():
+                self.record(exposure)
+            raise
+        return sum(counts.values())
+
+    async def _insert_new(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> List[str]:
+        """Insert rows, skipping visitors already assigned. Returns inserted variant IDs."""
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            # executemany with RETURNING: rows are batched into a cached statement
+            result = await db.execute(
+                dialect_insert(ExperimentAssignment)
+                .on_conflict_do_nothing()
+                .returning(ExperimentAssignment.variant_id),
+                rows,
+            )
+            return list(result.scalars())
+
+        # Other dialects: look up existing rows, then insert the rest
+        existing = set()
+        for column, key in ((ExperimentAssignment.user_id, "user_id"),
+                            (ExperimentAssignment.anonymous_id, "anonymous_id")):
+            keyed = [(row["experiment_id"], row[key]) for row in rows if row[key]]
+            if not keyed:
+                continue
+            result = await db.execute(
+                select(ExperimentAssignment.experiment_id, column).where(and_(
+                    ExperimentAssignment.experiment_id.in_({experiment_id for experiment_id, _ in keyed}),
+                    column.in_({value for _, value in keyed}),
+                ))
+            )
+            existing.update((key, experiment_id, value) for experiment_id, value in result.all())
+        new_rows = [
+            row for row in rows
+            if ("user_id", row["experiment_id"], row["user_id"]) not in existing
+            and ("anonymous_id", row["experiment_id"], row["anonymous_id"]) not in existing
+        ]
+        if new_rows:
+            await db.execute(insert(ExperimentAssignment), new_rows)
+        return [row["variant_id"] for row in new_rows]
+
+    async def flush_if_due(self, db: AsyncSession) -> int:
+        """Flush when due; failures are logged, not raised."""
+        if not self.due():
+            return 0
+        try:
+            return await self.flush(db)
+        except Exception as e:
+            logger.warning(f"Failed to flush experiment exposures: {e}")
+            return 0
+
+    def pending(self, experiment_id: Optional[str] = None) -> int:
+        """Exposures buffered but not yet written, optionally for one experiment."""
+        with self._lock:
+            if experiment_id is None:
+                return len(self._pending)
+            return sum(1 for exposure in self._pending.values() if exposure.experiment_id == experiment_id)
+
+
+class ExperimentAssignmentService:
+    """
+    Assigns visitors to variants from an in-memory snapshot of running experiments.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30.0,
+        exposures: Optional[ExposureBuffer] = None,
+        sticky_cache_size: int = 100000
+    ):
+        """Initialize the service.
+
+        Args:
+            ttl_seconds: Age after which the snapshot is reloaded from the
+                database.
+            exposures: Buffer new assignment rows are written through.
+            sticky_cache_size: Assignments in released buckets remembered,
+                least recently used first out.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.exposures = exposures or ExposureBuffer()
+        self.sticky_cache_size = sticky_cache_size
+        # Assignment ID -> variant ID served in a released bucket
+        self._sticky: "OrderedDict[str, str]" = OrderedDict()
+        self._snapshot = AssignmentSnapshot(version=0, experiments={}, loaded_at=float("-inf"))
+        self._refresh_lock = asyncio.Lock()
+        # Experiments looked up individually since the last full reload
+        self._checked: Set[str] = set()
+        self._assignments = 0
+
+    @property
+    def snapshot(self) -> AssignmentSnapshot:
+        """The current snapshot."""
+        return self._snapshot
+
+    def _publish(self, experiments: Dict[str, ExperimentSnapshot], loaded_at: Optional[float] = None):
+        self._snapshot = AssignmentSnapshot(
+            version=self._snapshot.version + 1,
+            experiments=experiments,
+            loaded_at=self._snapshot.loaded_at if loaded_at is None else loaded_at,
+        )
+
+    async def refresh(self, db: AsyncSession) -> AssignmentSnapshot:
+        """Reload every running experiment (two queries)."""
+        async with self._refresh_lock:
+            loaded_at = time.monotonic()
+            experiments = (await db.execute(
+                select(Experiment).where(Experiment.status == ExperimentStatus.RUNNING)
+            )).scalars().all()
+            variants: Dict[str, List[ExperimentVariant]] = {}
+            if experiments:
+                result = await db.execute(
+                    select(ExperimentVariant)
+                    .where(ExperimentVariant.experiment_id.in_([e.id for e in experiments]))
+                )
+                for variant in result.scalars():
+                    variants.setdefault(variant.experiment_id, []).append(variant)
+            self._checked.clear()
+            self._publish(
+                {
+                    experiment.id: ExperimentSnapshot.build(experiment, variants[experiment.id])
+                    for experiment in experiments if variants.get(experiment.id)
+                },
+                loaded_at=loaded_at,
+            )
+            return self._snapshot
+
+    async def refresh_experiment(self, db: AsyncSession, experiment_id: str) -> Optional[ExperimentSnapshot]:
+        """Reload one experiment, dropping it from the snapshot unless it is running."""
+        experiment = await db.get(Experiment, experiment_id)
+        snapshot = None
+        if experiment is not None and experiment.status == ExperimentStatus.RUNNING:
+            result = await db.execute(
+                select(ExperimentVariant).where(ExperimentVariant.experiment_id == experiment_id)
+            )
+            variants = result.scalars().all()
+            if variants:
+                snapshot = ExperimentSnapshot.build(experiment, variants)
+
+        experiments = dict(self._snapshot.experiments)
+        if snapshot is None:
+            experiments.pop(experiment_id, None)
+        else:
+            experiments[experiment_id] = snapshot
+        self._publish(experiments)
+        return snapshot
+
+    async def _current(self, db: AsyncSession) -> AssignmentSnapshot:
+        snapshot = self._snapshot
+        if time.monotonic() - snapshot.loaded_at >= self.ttl_seconds:
+            if self._refresh_lock.locked() and snapshot.version > 0:
+                # Another request is reloading; serve the previous snapshot
+                return snapshot
+            snapshot = await self.refresh(db)
+        return snapshot
+
+    async def assign(
+        self,
+        db: AsyncSession,
+        experiment_id: str,
+        user_id: Optional[str] = None,
+        anonymous_id: Optional[str] = None,
+        context: Optional[Dict] = None
+    ) -> Optional[AssignmentResult]:
+        """Assign a visitor to a variant of a running experiment.
+
+        Returns:
+            The assignment, or None if the visitor is not enrolled.
+
+        Raises:
+            ValueError: If no visitor ID is given or the experiment is not running.
+        """
+        results = await self.assign_many(db, [experiment_id], user_id, anonymous_id, context)
+        if experiment_id not in results:
+            raise ValueError(f"Experiment {experiment_id} not found or not running")
+        return results[experiment_id]
+
+    async def assign_many(
+        self,
+        db: AsyncSession,
+        experiment_ids: Iterable[str],
+        user_id: Optional[str] = None,
+        anonymous_id: Optional[str] = None,
+        context: Optional[Dict] = None
+    ) -> Dict[str, Optional[AssignmentResult]]:
+        """Assign a visitor to several experiments at once.
+
+        Experiments that are not running are left out of the result;
+        experiments the visitor is not enrolled in map to None.
+        Experiments missing from the snapshot (started by another process)
+        are looked up once until the next full reload.
+
+        Returns:
+            Dict mapping experiment_id -> AssignmentResult (or None)
+        """
+        if not user_id and not anonymous_id:
+            raise ValueError("Either user_id or anonymous_id must be provided")
+
+        experiment_ids = list(experiment_ids)
+        snapshot = await self._current(db)
+        for experiment_id in experiment_ids:
+            if experiment_id not in snapshot.experiments and experiment_id not in self._checked:
+                self._checked.add(experiment_id)
+                await self.refresh_experiment(db, experiment_id)
+        snapshot = self._snapshot
+
+        key = user_id or anonymous_id
+        visitor = visitor_hash(key)
+        served: Dict[str, Tuple[ExperimentSnapshot, Optional[VariantSnapshot]]] = {}
+        sticky: Dict[str, ExperimentSnapshot] = {}
+        for experiment_id in experiment_ids:
+            experiment = snapshot.experiments.get(experiment_id)
+            if experiment is None:
+                continue
+            b = experiment.bucket_for(visitor, key)
+            variant = experiment.variant_at(b)
+            served[experiment_id] = (experiment, variant)
+            if variant is not None and experiment.is_sticky(b):
+                sticky[assignment_id(experiment_id, user_id, anonymous_id)] = experiment
+        if sticky:
+            for exposure_id, variant_id in (await self._assigned_variants(db, list(sticky))).items():
+                experiment = sticky[exposure_id]
+                variant = experiment.variant(variant_id)
+                if variant is not None:
+                    served[experiment.id] = (experiment, variant)
+
+        results = {}
+        enrolled = 0
+        for experiment_id, (experiment, variant) in served.items():
+            if variant is None:
+                results[experiment_id] = None
+                continue
+            exposure = Exposure(
+                id=assignment_id(experiment_id, user_id, anonymous_id),
+                experiment_id=experiment_id,
+                variant_id=variant.id,
+                user_id=user_id,
+                anonymous_id=anonymous_id,
+                context=context or {},
+            )
+            self.exposures.record(exposure)
+            if exposure.id in sticky:
+                self._remember(exposure.id, variant.id)
+            results[experiment_id] = AssignmentResult(
+                variant_id=variant.id,
+                variant_name=variant.name,
+                is_control=variant.is_control,
+                configuration=variant.configuration,
+                assignment_id=exposure.id,
+            )
+            enrolled += 1
+        self._assignments += enrolled
+
+        await self.exposures.flush_if_due(db)
+        return results
+
+    async def _assigned_variants(self, db: AsyncSession, exposure_ids: List[str]) -> Dict[str, str]:
+        """Variants of existing assignments: remembered, buffered or stored."""
+        found = {}
+        missing = []
+        for exposure_id in exposure_ids:
+            variant_id = self._sticky.get(exposure_id) or self.exposures.variant_of(exposure_id)
+            if variant_id is None:
+                missing.append(exposure_id)
+            else:
+                found[exposure_id] = variant_id
+        if missing:
+            result = await db.execute(
+                select(ExperimentAssignment.id, ExperimentAssignment.variant_id)
+                .where(ExperimentAssignment.id.in_(missing))
+            )
+            found.update(result.tuples().all())
+        return found
+
+    def _remember(self, exposure_id: str, variant_id: str):
+        self._sticky[exposure_id] = variant_id
+        self._sticky.move_to_end(exposure_id)
+        while len(self._sticky) > self.sticky_cache_size:
+            self._sticky.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot version and size, assignments served and exposures pending."""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version,
+            "experiments": len(snapshot.experiments),
+            "age_seconds": time.monotonic() - snapshot.loaded_at,
+            "assignments": self._assignments,
+            "pending_exposures": self.exposures.pending(),
+        }
+
+
+# Global instance
+_assignment_service: Optional[ExperimentAssignmentService] = None
+
+
+def get_assignment_service() -> ExperimentAssignmentService:
+    """Get the process-wide experiment assignment service."""
+    global _assignment_service
+    if _assignment_service is None:
+        settings = get_settings()
+        _assignment_service = ExperimentAssignmentService(
+            ttl_seconds=settings.experiment_snapshot_ttl_seconds,
+            exposures=ExposureBuffer(
+                flush_interval_seconds=settings.experiment_exposure_flush_interval_seconds,
+                max_pending=settings.experiment_exposure_buffer_max,
+            ),
+            sticky_cache_size=settings.experiment_sticky_cache_size,
+        )
+    return _assignment_service
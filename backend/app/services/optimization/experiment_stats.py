@@ -0,0 +1,301 @@
+"""
+Streaming experiment statistics and sequential tests.
+
+`track_conversion` adds each conversion to running totals per (variant,
+metric) in `ExperimentMetric`: conversions, and the count, sum and sum of
+squares of the reported metric values. Together with the variants'
+`total_assignments` that is all a result needs, so results cost
+O(variants) however many assignments an experiment has.
+
+Significance uses the mixture sequential probability ratio test (mSPRT,
+Johari et al., "Always Valid Inference"). With a normal mixture N(0, τ²)
+over the difference θ between variant and control means, and V the
+variance of the observed difference θ̂,
+
+    Λ = sqrt(V / (V + τ²)) · exp(τ² θ̂² / (2 V (V + τ²)))
+
+is a martingale under θ = 0, so P(Λ ever reaches 1/α) ≤ α and
+p = min(1, 1/Λ) stays valid however often it is checked. The confidence
+interval is the matching confidence sequence: the θ where Λ < 1/α.
+"""
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.experiment_assignment import ExperimentAssignment
+from ...models.experiment_metric import ExperimentMetric
+from ...models.experiment_variant import ExperimentVariant
+
+logger = logging.getLogger(__name__)
+
+TOTALS = ("conversions", "value_count", "value_sum", "value_sum_squares")
+
+_VARIANT_TOTALS = (
+    update(ExperimentVariant.__table__)
+    .where(ExperimentVariant.__table__.c.id == bindparam("variant_id"))
+    .values(
+        total_assignments=bindparam("total_assignments"),
+        total_conversions=bindparam("total_conversions"),
+        conversion_rate=bindparam("conversion_rate"),
+    )
+)
+
+
+@dataclass
+class MetricSummary:
+    """Sufficient statistics of one variant for one metric."""
+    sample_size: int
+    conversions: int
+    value_count: int = 0
+    value_sum: float = 0.0
+    value_sum_squares: float = 0.0
+
+    @property
+    def binary(self) -> bool:
+        """Whether the metric is a conversion rate: no values reported, or every value was 1."""
+        return self.value_count == 0 or (
+            self.value_sum == self.value_count and self.value_sum_squares == self.value_count
+        )
+
+    @property
+    def mean(self) -> float:
+        """Conversion rate, or metric value per assignment (assignments without a value count as 0)."""
+        if not self.sample_size:
+            return 0.0
+        return (self.conversions if self.binary else self.value_sum) / self.sample_size
+
+    @property
+    def variance(self) -> float:
+        """Per-assignment variance of the metric."""
+        n = self.sample_size
+        if n < 2:
+            return 0.0
+        if self.binary:
+            return self.mean * (1 - self.mean)
+        return max(self.value_sum_squares - self.value_sum ** 2 / n, 0.0) / (n - 1)
+
+
+@dataclass
+class SequentialTest:
+    """mSPRT of a variant against control."""
+    difference: float
+    p_value: float
+    interval: Tuple[float, float]
+    mixture_variance: float
+
+
+def mixture_variance(control: MetricSummary, minimum_detectable_effect: float) -> float:
+    """τ² centred on the effects worth detecting: the MDE in units of the control mean.
+
+    Falls back to units of the control's standard deviation when its mean is 0.
+    """
+    scale = abs(control.mean) or math.sqrt(control.variance)
+    return (minimum_detectable_effect * scale) ** 2
+
+
+def msprt(
+    control: MetricSummary,
+    variant: MetricSummary,
+    tau_squared: float,
+    alpha: float = 0.05,
+) -> Optional[SequentialTest]:
+    """Always-valid p-value and confidence sequence for the difference in means.
+
+    Returns None while the difference has no variance to test against
+    (fewer than two samples per arm, or no spread in either arm).
+    """
+    if control.sample_size < 2 or variant.sample_size < 2 or tau_squared <= 0:
+        return None
+    v = control.variance / control.sample_size + variant.variance / variant.sample_size
+    if v <= 0:
+        return None
+
+    difference = variant.mean - control.mean
+    log_likelihood_ratio = (
+        0.5 * math.log(v / (v + tau_squared))
+        + tau_squared * difference ** 2 / (2 * v * (v + tau_squared))
+    )
+    p_value = min(1.0, math.exp(-log_likelihood_ratio))
+    half_width = math.sqrt(
+        v * (v + tau_squared) / tau_squared
+        * (2 * math.log(1 / alpha) + math.log((v + tau_squared) / v))
+    )
+    return SequentialTest(
+        difference=difference,
+        p_value=p_value,
+        interval=(difference - half_width, difference + half_width),
+        mixture_variance=tau_squared,
+    )
+
+
+def _metric_value(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    return float(value)
+
+
+class ExperimentStatsStore:
+    """
+    Maintains and reads per-variant metric totals.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize with database session."""
+        self.db = db
+        self.dialect = db.get_bind().dialect.name
+
+    # ============== Maintenance ==============
+
+    async def record_conversion(
+        self,
+        experiment_id: str,
+        variant_id: str,
+        metric_name: str,
+        metric_value: Any = None,
+    ) -> None:
+        """Add one conversion (and its value, if numeric) to the metric's totals. Does not commit."""
+        value = _metric_value(metric_value)
+        deltas = {
+            "conversions": 1,
+            "value_count": 0 if value is None else 1,
+            "value_sum": value or 0.0,
+            "value_sum_squares": (value or 0.0) ** 2,
+        }
+        if self.dialect in ("postgresql", "sqlite"):
+            await self._upsert(experiment_id, variant_id, metric_name, deltas)
+            return
+
+        metrics = ExperimentMetric.__table__
+        result = await self.db.execute(
+            update(metrics)
+            .where(and_(metrics.c.variant_id == variant_id, metrics.c.metric_name == metric_name))
+            .values(updated_at=datetime.utcnow(), **{name: metrics.c[name] + delta for name, delta in deltas.items()})
+        )
+        if result.rowcount == 0:
+            await self.db.execute(insert(ExperimentMetric).values(
+                experiment_id=experiment_id, variant_id=variant_id, metric_name=metric_name, **deltas
+            ))
+
+    async def _upsert(self, experiment_id: str, variant_id: str, metric_name: str, deltas: Dict[str, Any]) -> None:
+        """INSERT ... ON CONFLICT (variant, metric) DO UPDATE SET total = total + excluded."""
+        metrics = ExperimentMetric.__table__
+        dialect_insert = postgresql.insert if self.dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(ExperimentMetric).values(
+            experiment_id=experiment_id, variant_id=variant_id, metric_name=metric_name, **deltas
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["variant_id", "metric_name"],
+            set_={
+                **{name: metrics.c[name] + stmt.excluded[name] for name in TOTALS},
+                "updated_at": datetime.utcnow(),
+            },
+        )
+        await self.db.execute(stmt)
+
+    async def rebuild(self, experiment_id: str) -> int:
+        """Recompute the experiment's metric and variant totals from its assignments.
+
+        For experiments that were running before metric totals existed. Scans
+        the experiment's assignments once and commits.
+
+        Returns:
+            Number of metric rows written.
+        """
+        variant_ids = list((await self.db.execute(
+            select(ExperimentVariant.id).where(ExperimentVariant.experiment_id == experiment_id)
+        )).scalars())
+        assignments = dict.fromkeys(variant_ids, 0)
+        assignments.update((await self.db.execute(
+            select(ExperimentAssignment.variant_id, func.count(ExperimentAssignment.id))
+            .where(ExperimentAssignment.experiment_id == experiment_id)
+            .group_by(ExperimentAssignment.variant_id)
+        )).all())
+
+        conversions = dict.fromkeys(variant_ids, 0)
+        totals: Dict[Tuple[str, str], List[Any]] = {}
+        result = await self.db.stream(
+            select(ExperimentAssignment.variant_id, ExperimentAssignment.conversion_value)
+            .where(and_(
+                ExperimentAssignment.experiment_id == experiment_id,
+                ExperimentAssignment.converted_at.isnot(None),
+            ))
+            .execution_options(yield_per=5000)
+        )
+        async for variant_id, conversion_value in result:
+            conversions[variant_id] = conversions.get(variant_id, 0) + 1
+            metric_name = (conversion_value or {}).get("metric_name")
+            if not metric_name:
+                continue
+            row = totals.setdefault((variant_id, metric_name), [0, 0, 0.0, 0.0])
+            row[0] += 1
+            value = _metric_value(conversion_value.get("metric_value"))
+            if value is not None:
+                row[1] += 1
+                row[2] += value
+                row[3] += value * value
+
+        await self.db.execute(delete(ExperimentMetric).where(ExperimentMetric.experiment_id == experiment_id))
+        if totals:
+            await self.db.execute(insert(ExperimentMetric), [
+                {"experiment_id": experiment_id, "variant_id": variant_id, "metric_name": metric_name,
+                 **dict(zip(TOTALS, row))}
+                for (variant_id, metric_name), row in totals.items()
+            ])
+        if variant_ids:
+            await self.db.execute(_VARIANT_TOTALS, [
+                {
+                    "variant_id": variant_id,
+                    "total_assignments": assignments[variant_id],
+                    "total_conversions": conversions[variant_id],
+                    "conversion_rate": (
+                        conversions[variant_id] / assignments[variant_id] if assignments[variant_id] else None
+                    ),
+                }
+                for variant_id in variant_ids
+            ])
+        await self.db.commit()
+
+        logger.info(f"Rebuilt {len(totals)} metric totals for experiment {experiment_id}")
+        return len(totals)
+
+    # ============== Reads ==============
+
+    async def summaries(
+        self,
+        experiment_id: str,
+        metric_name: str,
+        variants: List[ExperimentVariant],
+    ) -> Dict[str, MetricSummary]:
+        """One summary per variant from its assignment count and metric totals.
+
+        When no conversion was tracked under the metric (e.g. the primary
+        metric of experiments that track conversions under other names), the
+        variants' overall conversion counts are used, as a conversion rate.
+        """
+        rows = {
+            row.variant_id: row
+            for row in (await self.db.execute(
+                select(ExperimentMetric).where(and_(
+                    ExperimentMetric.experiment_id == experiment_id,
+                    ExperimentMetric.metric_name == metric_name,
+                ))
+                .execution_options(populate_existing=True)
+            )).scalars()
+        }
+        summaries = {}
+        for variant in variants:
+            row = rows.get(variant.id)
+            summaries[variant.id] = MetricSummary(
+                sample_size=variant.total_assignments,
+                conversions=row.conversions if row else (0 if rows else variant.total_conversions),
+                value_count=row.value_count if row else 0,
+                value_sum=row.value_sum if row else 0.0,
+                value_sum_squares=row.value_sum_squares if row else 0.0,
+            )
+        return summaries
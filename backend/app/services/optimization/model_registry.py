@@ -0,0 +1,352 @@
+"""
+In-memory registry of deserialized predictive models.
+
+`PredictiveModel.model_parameters["artifact"]` references the estimator
+in the model artifact store (rows trained before that hold a base64 pickle
+in `"serialized_model"`). Loading a 100-tree ensemble costs far more than
+scoring one row with it, so the registry
+keeps estimators deserialized, keyed by (model_id, model_version) and
+checked against `last_trained_at`. Entries are evicted least recently used
+once their combined pickled size exceeds `predictive_model_cache_bytes`.
+
+Per-prediction counters (`total_predictions`, `last_prediction_at`) are
+buffered in `PredictionStatsBuffer` and written with one UPDATE per model
+when the flush interval has passed, instead of a commit per prediction.
+Counts still buffered when a process dies are lost; they are usage
+statistics, not billing data.
+"""
+import asyncio
+import base64
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from ...core.config import get_settings
+from ...models.predictive_model import PredictiveModel
+from ..model_artifacts import get_model_artifact_store, is_artifact_ref
+
+logger = logging.getLogger(__name__)
+
+RegistryKey = Tuple[str, str]
+
+
+def deserialize_model(model_parameters: Optional[Dict[str, Any]]) -> Tuple[Any, int]:
+    """Load a stored estimator from its artifact or inline pickle.
+
+    Returns:
+        The estimator and its serialized size in bytes.
+    """
+    model_parameters = model_parameters or {}
+    ref = model_parameters.get('artifact')
+    if is_artifact_ref(ref):
+        return get_model_artifact_store().load(ref), ref['size_bytes']
+    if 'serialized_model' not in model_parameters:
+        raise ValueError("Model parameters missing serialized model")
+    model_bytes = base64.b64decode(model_parameters['serialized_model'])
+    return pickle.loads(model_bytes), len(model_bytes)
+
+
+@dataclass
+class LoadedModel:
+    """A deserialized estimator and the metadata prediction needs."""
+    model_id: str
+    model_version: str
+    estimator: Any
+    feature_columns: List[str]
+    feature_importance: Dict[str, float] = field(default_factory=dict)
+    model_algorithm: Optional[str] = None
+    trained_at: Optional[datetime] = None
+    size_bytes: int = 0
+
+    @property
+    def key(self) -> RegistryKey:
+        return (self.model_id, self.model_version)
+
+
+class ModelRegistry:
+    """
+    LRU of deserialized estimators bounded by total size.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        """Initialize the registry.
+
+        Args:
+            max_bytes: Combined serialized size of the estimators kept in memory.
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[RegistryKey, LoadedModel]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Loads in progress, so concurrent misses deserialize once
+        self._loading: Dict[RegistryKey, asyncio.Future] = {}
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # ============== Lookup ==============
+
+    async def load(self, db: AsyncSession, model_id: str) -> LoadedModel:
+        """Get a model's estimator, deserializing it on first use.
+
+        Only the model's version columns are read on a hit; the serialized
+        estimator is fetched on a miss.
+
+        Raises:
+            ValueError: If the model does not exist or has no estimator.
+        """
+        row = (await db.execute(
+            select(PredictiveModel.model_version, PredictiveModel.last_trained_at)
+            .where(PredictiveModel.id == model_id)
+        )).one_or_none()
+        if row is None:
+            raise ValueError(f"Model {model_id} not found")
+
+        key = (model_id, row.model_version)
+        entry = self.get(key, row.last_trained_at)
+        if entry is not None:
+            return entry
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            record = await db.get(PredictiveModel, model_id)
+            if record is None:
+                raise ValueError(f"Model {model_id} not found")
+            entry = await asyncio.to_thread(load_record, record)
+            self.put(entry)
+            future.set_result(entry)
+            return entry
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an unawaited failure is not logged as lost
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+
+    def get(self, key: RegistryKey, trained_at: Optional[datetime] = None) -> Optional[LoadedModel]:
+        """Get a loaded model if it is current, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.trained_at != trained_at:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def put(self, entry: LoadedModel):
+        """Add a loaded model, evicting least recently used ones over the size budget."""
+        with self._lock:
+            previous = self._entries.pop(entry.key, None)
+            if previous is not None:
+                self._bytes -= previous.size_bytes
+            self._entries[entry.key] = entry
+            self._bytes += entry.size_bytes
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size_bytes
+                self._counters["evictions"] += 1
+
+    def discard(self, model_id: str):
+        """Drop every version of a model."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == model_id]:
+                self._bytes -= self._entries.pop(key).size_bytes
+
+    def clear(self):
+        """Drop all models."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # ============== Warm-up ==============
+
+    async def warm(self, session_factory: async_sessionmaker) -> int:
+        """Deserialize every active model, most recently trained first.
+
+        Returns:
+            Number of models loaded.
+        """
+        async with session_factory() as session:
+            records = (await session.execute(
+                select(PredictiveModel)
+                .where(PredictiveModel.is_active == True)  # noqa: E712
+                .order_by(PredictiveModel.last_trained_at.desc())
+            )).scalars().all()
+
+        loaded = 0
+        for record in records:
+            try:
+                entry = await asyncio.to_thread(load_record, record)
+            except Exception as e:
+                logger.warning(f"Could not preload predictive model {record.id}: {e}")
+                continue
+            if self._bytes + entry.size_bytes > self.max_bytes:
+                break
+            self.put(entry)
+            loaded += 1
+        logger.info(f"Preloaded {loaded} predictive model(s)")
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """Registry statistics."""
+        return {"models": len(self._entries), "bytes": self._bytes, **self._counters}
+
+
+def load_record(record: PredictiveModel) -> LoadedModel:
+    """Deserialize a model row's estimator."""
+    estimator, size_bytes = deserialize_model(record.model_parameters)
+    return LoadedModel(
+        model_id=record.id,
+        model_version=record.model_version,
+        estimator=estimator,
+        feature_columns=list(record.feature_columns or []),
+        feature_importance=record.feature_importance or {},
+        model_algorithm=record.model_algorithm,
+        trained_at=record.last_trained_at,
+        size_bytes=size_bytes,
+    )
+
+
+class PredictionStatsBuffer:
+    """
+    Buffers per-model prediction counters between database writes.
+    """
+
+    def __init__(self, flush_interval_seconds: float = 10.0):
+        """Initialize the buffer.
+
+        Args:
+            flush_interval_seconds: Minimum time between flushes (0 flushes
+                on every prediction).
+        """
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._session_factory: Optional[async_sessionmaker] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, model_id: str, count: int = 1, at: Optional[datetime] = None):
+        """Count predictions made with a model."""
+        at = at or datetime.utcnow()
+        with self._lock:
+            previous, _ = self._pending.get(model_id, (0, at))
+            self._pending[model_id] = (previous + count, at)
+
+    def due(self) -> bool:
+        """Whether buffered counts should be written now."""
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval_seconds
+
+    async def flush(self, db: AsyncSession) -> int:
+        """Write buffered counts with one UPDATE per model and commit.
+
+        Returns:
+            Number of predictions written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            for model_id, (count, at) in pending.items():
+                await db.execute(
+                    update(PredictiveModel)
+                    .where(PredictiveModel.id == model_id)
+                    .values(
+                        total_predictions=PredictiveModel.total_predictions + count,
+                        last_prediction_at=at,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Put the counts back so the next flush retries them
+            for model_id, (count, at) in pending.items():
+                self.record(model_id, count, at)
+            raise
+        return sum(count for count, _ in pending.values())
+
+    async def flush_if_due(self, db: AsyncSession) -> int:
+        """Flush when the interval has passed; failures are logged, not raised."""
+        if not self.due():
+            return 0
+        try:
+            return await self.flush(db)
+        except Exception as e:
+            logger.warning(f"Failed to flush prediction counters: {e}")
+            return 0
+
+    def pending(self) -> int:
+        """Predictions counted but not yet written."""
+        return sum(count for count, _ in self._pending.values())
+
+    async def start(self, session_factory: async_sessionmaker):
+        """Start the background flush, so counts of idle models are written too."""
+        if self._task is not None:
+            return
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run(), name="prediction-stats-flush")
+
+    async def stop(self):
+        """Stop the background flush and write what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._session_factory is not None and self._pending:
+            async with self._session_factory() as session:
+                await self.flush(session)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds or 1.0)
+            try:
+                async with self._session_factory() as session:
+                    await self.flush_if_due(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to flush prediction counters: {e}")
+
+
+# Global instances
+_model_registry: Optional[ModelRegistry] = None
+_stats_buffer: Optional[PredictionStatsBuffer] = None
+
+
+def get_model_registry() -> Optional[ModelRegistry]:
+    """Get the process-wide model registry (None if disabled)."""
+    global _model_registry
+    settings = get_settings()
+    if settings.predictive_model_cache_bytes <= 0:
+        return None
+    if _model_registry is None:
+        _model_registry = ModelRegistry(max_bytes=settings.predictive_model_cache_bytes)
+    return _model_registry
+
+
+def get_prediction_stats_buffer() -> PredictionStatsBuffer:
+    """Get the process-wide prediction counter buffer."""
+    global _stats_buffer
+    if _stats_buffer is None:
+        _stats_buffer = PredictionStatsBuffer(
+            flush_interval_seconds=get_settings().predictive_stats_flush_interval_seconds,
+        )
+    return _stats_buffer
@@ -4,10 +4,15 @@ Predictive Performance Modeling.
 Provides ML-based performance prediction for campaigns before launch,
 including CTR prediction, conversion rate prediction, and overall
 campaign performance forecasting.
+
+Training runs in `predictive_training` (histogram gradient boosting by
+default, incremental retraining, process pool). Trained estimators are
+written to the model artifact store; they are served from the in-memory
+`ModelRegistry` and prediction counters are buffered (see `model_registry`).
 """
+import asyncio
 import logging
-import pickle
-import base64
+import time
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from datetime import datetime
@@ -15,15 +20,21 @@ from enum import Enum
 
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor, RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score, mean_squared_error, r2_score
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 
+from ...core.config import get_settings
 from ...models.predictive_model import PredictiveModel, PredictiveModelType, PredictiveModelStatus
 from ...models.campaign import Campaign
 from ...models.asset import Asset
+from ..model_artifacts import get_model_artifact_store
+from .predictive_training import (
+    DEFAULT_CLASSIFIER, DEFAULT_REGRESSOR, INCREMENTAL_PARAMS, TrainingOutcome, build_feature_matrix,
+    evaluate_estimator, init_depth, run_training, training_params,
+)
+from .model_registry import (
+    LoadedModel, deserialize_model, get_model_registry, get_prediction_stats_buffer, load_record,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -266,7 +277,7 @@ targeting, and budget allocation.
         """
         Train CTR prediction model.
         
-        Uses gradient boosting for binary classification (click/no-click).
+        Uses histogram gradient boosting for binary classification (click/no-click).
         
         Args:
             organization_id: Organization ID
@@ -280,7 +291,7 @@ targeting, and budget allocation.
             organization_id=organization_id,
             model_type=PredictiveModelType.CTR_PREDICTION,
             training_data=training_data,
-            model_algorithm="gradient_boosting_classifier",
+            model_algorithm=DEFAULT_CLASSIFIER,
             model_name=model_name or f"CTR Model {datetime.utcnow().strftime('%Y-%m-%d')}"
         )
     
@@ -305,7 +316,7 @@ targeting, and budget allocation.
             organization_id=organization_id,
             model_type=PredictiveModelType.CONVERSION_PREDICTION,
             training_data=training_data,
-            model_algorithm="gradient_boosting_classifier",
+            model_algorithm=DEFAULT_CLASSIFIER,
             model_name=model_name or f"Conversion Model {datetime.utcnow().strftime('%Y-%m-%d')}"
         )
     
@@ -318,7 +329,7 @@ targeting, and budget allocation.
         """
         Train revenue prediction model.
         
-        Uses gradient boosting regressor for continuous revenue prediction.
+        Uses a histogram gradient boosting regressor for continuous revenue prediction.
         
         Args:
             organization_id: Organization ID
@@ -332,7 +343,7 @@ targeting, and budget allocation.
             organization_id=organization_id,
             model_type=PredictiveModelType.REVENUE_PREDICTION,
             training_data=training_data,
-            model_algorithm="gradient_boosting_regressor",
+            model_algorithm=DEFAULT_REGRESSOR,
             model_name=model_name or f"Revenue Model {datetime.utcnow().strftime('%Y-%m-%d')}"
         )
     
@@ -363,46 +374,16 @@ targeting, and budget allocation.
             raise ValueError(f"Insufficient training data: {len(training_data)} samples (min 100)")
         
         # Prepare data
-        feature_keys = list(training_data[0].features.keys())
-        X = np.array([[example.features.get(k, 0) for k in feature_keys] 
-                      for example in training_data])
-        y = np.array([example.target for example in training_data])
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-        
-        # Create model
-        default_params = {
-            'n_estimators': 100,
-            'max_depth': 6,
-            'learning_rate': 0.1,
-            'random_state': 42
-        }
-        params = {**default_params, **(hyperparameters or {})}
-        
-        if model_algorithm == "gradient_boosting_classifier":
-            model = GradientBoostingClassifier(**params)
-        elif model_algorithm == "gradient_boosting_regressor":
-            model = GradientBoostingRegressor(**params)
-        elif model_algorithm == "random_forest":
-            model = RandomForestClassifier(**params)
-        else:
-            raise ValueError(f"Unknown algorithm: {model_algorithm}")
-        
-        # Train
-        model.fit(X_train, y_train)
+        start = time.perf_counter()
+        X, y, feature_keys = build_feature_matrix(training_data)
+        feature_matrix_seconds = time.perf_counter() - start
+        params = training_params(model_algorithm, hyperparameters)
         
-        # Evaluate
-        evaluation = self._evaluate_model(model, X_test, y_test, model_algorithm)
+        # Split, fit and evaluate in the training pool
+        outcome = await run_training(model_algorithm, params, X, y)
         
-        # Get feature importance
-        importance = dict(zip(feature_keys, model.feature_importances_))
-        
-        # Serialize model
-        model_bytes = pickle.dumps(model)
-        model_b64 = base64.b64encode(model_bytes).decode('utf-8')
+        # Store the estimator out of row; the model keeps a reference
+        artifact = await asyncio.to_thread(get_model_artifact_store().save, outcome.estimator)
         
         # Create model record
         predictive_model = PredictiveModel(
@@ -412,20 +393,11 @@ targeting, and budget allocation.
             status=PredictiveModelStatus.ACTIVE,
             feature_columns=feature_keys,
             target_column="ctr" if model_type == PredictiveModelType.CTR_PREDICTION else "conversion",
-            model_parameters={'serialized_model': model_b64},
+            model_parameters={'artifact': artifact},
             model_algorithm=model_algorithm,
-            training_metrics={
-                'accuracy': evaluation.accuracy,
-                'precision': evaluation.precision,
-                'recall': evaluation.recall,
-                'f1_score': evaluation.f1_score
-            },
-            validation_metrics={
-                'auc_roc': evaluation.auc_roc,
-                'rmse': evaluation.rmse,
-                'r2_score': evaluation.r2_score
-            },
-            feature_importance=importance,
+            training_metrics=self._training_metrics(outcome, feature_matrix_seconds),
+            validation_metrics=self._validation_metrics(outcome),
+            feature_importance=dict(zip(feature_keys, outcome.feature_importance)),
             training_data_count=len(training_data),
             last_trained_at=datetime.utcnow(),
             hyperparameters=params,
@@ -436,10 +408,127 @@ targeting, and budget allocation.
         await self.db.commit()
         await self.db.refresh(predictive_model)
         
-        logger.info(f"Trained {model_type.value} model: {model_name} (ID: {predictive_model.id})")
+        logger.info(
+            f"Trained {model_type.value} model: {model_name} (ID: {predictive_model.id}) "
+            f"on {outcome.training_rows} rows in {outcome.training_seconds:.2f}s"
+        )
         
         return predictive_model
     
+    async def retrain_model(
+        self,
+        model_id: str,
+        new_training_data: List[TrainingExample],
+        incremental: bool = True,
+        hyperparameters: Optional[Dict[str, Any]] = None
+    ) -> PredictiveModel:
+        """
+        Retrain a model on newly arrived data, in place.
+        
+        Incremental retraining fits new boosting stages on the new rows,
+        starting from the current estimator's predictions; otherwise the
+        model is refit from scratch, so `new_training_data` must then be the
+        model's full training history. Either way the model keeps its ID
+        and feature columns and gets a new minor version.
+        
+        Each incremental update nests the previous estimator one level
+        deeper; once `predictive_max_incremental_updates` are stacked the
+        model must be refit with `incremental=False`.
+        
+        Args:
+            model_id: PredictiveModel ID
+            new_training_data: Examples collected since the last training
+                when incremental, otherwise every example to train on
+            incremental: Continue from the current estimator
+            hyperparameters: Optional overrides (stage parameters when incremental)
+            
+        Returns:
+            The retrained PredictiveModel
+            
+        Raises:
+            ValueError: If the model is missing, there is too little data,
+                or no more incremental updates may be stacked
+        """
+        model_record = await self.db.get(PredictiveModel, model_id)
+        if not model_record:
+            raise ValueError(f"Model {model_id} not found")
+        if len(new_training_data) < 100:
+            raise ValueError(f"Insufficient training data: {len(new_training_data)} samples (min 100)")
+        
+        start = time.perf_counter()
+        X, y, _ = build_feature_matrix(new_training_data, model_record.feature_columns)
+        feature_matrix_seconds = time.perf_counter() - start
+        
+        if incremental:
+            previous = (await self._load_model(model_id)).estimator
+            max_updates = get_settings().predictive_max_incremental_updates
+            if init_depth(previous) >= max_updates:
+                raise ValueError(
+                    f"Model {model_id} already stacks {max_updates} incremental updates; "
+                    f"retrain it with incremental=False on its full training history"
+                )
+            params = {**INCREMENTAL_PARAMS, **(hyperparameters or {})}
+            outcome = await run_training(model_record.model_algorithm, params, X, y, previous=previous)
+            updates = model_record.training_metrics.get('incremental_updates', 0) + 1
+            training_data_count = model_record.training_data_count + len(new_training_data)
+        else:
+            params = training_params(model_record.model_algorithm, hyperparameters or model_record.hyperparameters)
+            outcome = await run_training(model_record.model_algorithm, params, X, y)
+            updates = 0
+            training_data_count = len(new_training_data)
+            model_record.hyperparameters = params
+        
+        artifact = await asyncio.to_thread(get_model_artifact_store().save, outcome.estimator)
+        
+        major, minor, *_ = (model_record.model_version or "1.0.0").split(".") + ["0", "0"]
+        model_record.model_version = f"{major}.{int(minor) + 1}.0"
+        model_record.model_parameters = {'artifact': artifact}
+        model_record.training_metrics = {
+            **self._training_metrics(outcome, feature_matrix_seconds),
+            'incremental_updates': updates,
+        }
+        model_record.validation_metrics = self._validation_metrics(outcome)
+        model_record.feature_importance = dict(zip(model_record.feature_columns, outcome.feature_importance))
+        model_record.training_data_count = training_data_count
+        model_record.last_trained_at = datetime.utcnow()
+        model_record.status = PredictiveModelStatus.ACTIVE
+        model_record.is_active = True
+        
+        await self.db.commit()
+        await self.db.refresh(model_record)
+        
+        registry = get_model_registry()
+        if registry is not None:
+            registry.discard(model_id)
+        
+        logger.info(
+            f"Retrained model {model_id} ({'incremental' if incremental else 'full'}) "
+            f"on {outcome.training_rows} rows in {outcome.training_seconds:.2f}s"
+        )
+        return model_record
+    
+    def _training_metrics(self, outcome: TrainingOutcome, feature_matrix_seconds: float) -> Dict[str, Any]:
+        """Training-set size, held-out classification scores and timings."""
+        return {
+            'accuracy': outcome.metrics['accuracy'],
+            'precision': outcome.metrics['precision'],
+            'recall': outcome.metrics['recall'],
+            'f1_score': outcome.metrics['f1_score'],
+            'training_rows': outcome.training_rows,
+            'training_seconds': outcome.training_seconds,
+            'rows_per_second': outcome.rows_per_second,
+            'feature_matrix_seconds': feature_matrix_seconds,
+            'init_depth': init_depth(outcome.estimator),
+            **outcome.timings,
+        }
+    
+    def _validation_metrics(self, outcome: TrainingOutcome) -> Dict[str, Any]:
+        return {
+            'auc_roc': outcome.metrics['auc_roc'],
+            'rmse': outcome.metrics['rmse'],
+            'r2_score': outcome.metrics['r2_score']
+        }
+    
     def _evaluate_model(
         self,
         model,
@@ -448,34 +537,7 @@ targeting, and budget allocation.
         algorithm: str
     ) -> ModelEvaluation:
         """Evaluate model performance."""
-        predictions = model.predict(X_test)
-        
-        if "classifier" in algorithm:
-            # Classification metrics
-            pred_proba = model.predict_proba(X_test)[:, 1] if hasattr(model, 'predict_proba') else None
-            
-            return ModelEvaluation(
-                accuracy=accuracy_score(y_test, predictions),
-                precision=precision_score(y_test, predictions, zero_division=0),
-                recall=recall_score(y_test, predictions, zero_division=0),
-                f1_score=f1_score(y_test, predictions, zero_division=0),
-                auc_roc=roc_auc_score(y_test, pred_proba) if pred_proba is not None else None,
-                rmse=None,
-                r2_score=None,
-                test_size=len(y_test)
-            )
-        else:
-            # Regression metrics
-            return ModelEvaluation(
-                accuracy=0.0,
-                precision=0.0,
-                recall=0.0,
-                f1_score=0.0,
-                auc_roc=None,
-                rmse=np.sqrt(mean_squared_error(y_test, predictions)),
-                r2_score=r2_score(y_test, predictions),
-                test_size=len(y_test)
-            )
+        return ModelEvaluation(**evaluate_estimator(model, X_test, y_test))
     
     # === Prediction ===
     
@@ -498,42 +560,48 @@ targeting, and budget allocation.
         Returns:
             PredictionResult with predicted CTR
         """
-        # Get model
-        model_record = await self.db.get(PredictiveModel, model_id)
-        if not model_record:
-            raise ValueError(f"Model {model_id} not found")
-        
-        # Deserialize model
-        model = self._deserialize_model(model_record.model_parameters)
-        
-        # Extract features
-        features = self.extract_features(creative, audience, context)
-        feature_vector = np.array([features.get(k, 0) for k in model_record.feature_columns])
-        
-        # Predict
-        if hasattr(model, 'predict_proba'):
-            prediction = model.predict_proba([feature_vector])[0][1]
-        else:
-            prediction = model.predict([feature_vector])[0]
+        results = await self.predict_many(model_id, [creative], audience, context)
+        return results[0]
+    
+    async def predict_many(
+        self,
+        model_id: str,
+        creatives: List[Dict[str, Any]],
+        audience: Optional[Dict[str, Any]] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> List[PredictionResult]:
+        """
+        Predict CTR for several creatives with one estimator call.
         
-        # Calculate confidence interval (simplified)
-        confidence = 0.8  # Could be calculated from model uncertainty
+        Args:
+            model_id: PredictiveModel ID
+            creatives: Creative asset data, one per prediction
+            audience: Audience targeting data shared by all creatives
+            context: Context data shared by all creatives
+            
+        Returns:
+            PredictionResult per creative, in order
+        """
+        loaded = await self._load_model(model_id)
+        rows = [
+            self.extract_features(creative, audience or {}, context or {})
+            for creative in creatives
+        ]
+        predictions = self._score(loaded, rows)
+        await self._record_predictions(model_id, len(rows))
+        
+        # Confidence interval is a fixed band (could use model uncertainty)
         ci_width = 0.05
-        ci_lower = max(0, prediction - ci_width)
-        ci_upper = min(1, prediction + ci_width)
-        
-        # Update prediction stats
-        model_record.total_predictions += 1
-        model_record.last_prediction_at = datetime.utcnow()
-        await self.db.commit()
-        
-        return PredictionResult(
-            predicted_value=float(prediction),
-            confidence_interval=(ci_lower, ci_upper),
-            confidence_score=confidence,
-            feature_importance=model_record.feature_importance,
-            model_version=model_record.model_version
-        )
+        return [
+            PredictionResult(
+                predicted_value=float(prediction),
+                confidence_interval=(max(0, prediction - ci_width), min(1, prediction + ci_width)),
+                confidence_score=0.8,
+                feature_importance=loaded.feature_importance,
+                model_version=loaded.model_version
+            )
+            for prediction in predictions
+        ]
     
     async def predict_conversion_rate(
         self,
@@ -552,40 +620,54 @@ targeting, and budget allocation.
         Returns:
             PredictionResult with predicted conversion rate
         """
-        # Similar to predict_ctr but for conversion
-        model_record = await self.db.get(PredictiveModel, model_id)
-        if not model_record:
-            raise ValueError(f"Model {model_id} not found")
-        
-        model = self._deserialize_model(model_record.model_parameters)
+        loaded = await self._load_model(model_id)
         
         # Extract features (simplified)
         features = {
             **self.extract_creative_features(landing_page),
             **self.extract_audience_features(audience)
         }
-        feature_vector = np.array([features.get(k, 0) for k in model_record.feature_columns])
-        
-        if hasattr(model, 'predict_proba'):
-            prediction = model.predict_proba([feature_vector])[0][1]
-        else:
-            prediction = model.predict([feature_vector])[0]
+        prediction = self._score(loaded, [features])[0]
+        await self._record_predictions(model_id, 1)
         
         confidence = 0.75
         ci_width = 0.03
         
-        model_record.total_predictions += 1
-        model_record.last_prediction_at = datetime.utcnow()
-        await self.db.commit()
-        
         return PredictionResult(
             predicted_value=float(prediction),
             confidence_interval=(max(0, prediction - ci_width), min(1, prediction + ci_width)),
             confidence_score=confidence,
-            feature_importance=model_record.feature_importance,
-            model_version=model_record.model_version
+            feature_importance=loaded.feature_importance,
+            model_version=loaded.model_version
         )
     
+    async def _load_model(self, model_id: str) -> LoadedModel:
+        """Get a model's deserialized estimator, from the registry when enabled."""
+        registry = get_model_registry()
+        if registry is not None:
+            return await registry.load(self.db, model_id)
+        
+        model_record = await self.db.get(PredictiveModel, model_id)
+        if not model_record:
+            raise ValueError(f"Model {model_id} not found")
+        return load_record(model_record)
+    
+    def _score(self, loaded: LoadedModel, rows: List[Dict[str, float]]) -> np.ndarray:
+        """Score feature dicts as one matrix."""
+        X = np.array(
+            [[features.get(k, 0) for k in loaded.feature_columns] for features in rows],
+            dtype=float
+        ).reshape(len(rows), len(loaded.feature_columns))
+        if hasattr(loaded.estimator, 'predict_proba'):
+            return loaded.estimator.predict_proba(X)[:, 1]
+        return loaded.estimator.predict(X)
+    
+    async def _record_predictions(self, model_id: str, count: int):
+        """Buffer prediction counters, writing them once the flush interval passed."""
+        buffer = get_prediction_stats_buffer()
+        buffer.record(model_id, count)
+        await buffer.flush_if_due(self.db)
+    
     async def predict_campaign_performance(
         self,
         campaign_config: Dict[str, Any],
@@ -612,23 +694,19 @@ targeting, and budget allocation.
         if not creatives:
             raise ValueError("No creatives provided for prediction")
         
-        # Predict CTR for each creative
-        ctr_predictions = []
-        for creative in creatives:
-            if ctr_model_id:
-                try:
-                    result = await self.predict_ctr(
-                        ctr_model_id,
-                        creative,
-                        audience,
-                        campaign_config.get('context', {})
-                    )
-                    ctr_predictions.append(result.predicted_value)
-                except Exception as e:
-                    logger.warning(f"CTR prediction failed: {e}")
-                    ctr_predictions.append(0.02)  # Default
-            else:
-                ctr_predictions.append(0.02)  # Default industry average
+        # Predict CTR for all creatives at once
+        ctr_predictions = [0.02] * len(creatives)  # Default industry average
+        if ctr_model_id:
+            try:
+                results = await self.predict_many(
+                    ctr_model_id,
+                    creatives,
+                    audience,
+                    campaign_config.get('context', {})
+                )
+                ctr_predictions = [result.predicted_value for result in results]
+            except Exception as e:
+                logger.warning(f"CTR prediction failed: {e}")
         
         avg_ctr = np.mean(ctr_predictions)
         
@@ -704,12 +782,7 @@ targeting, and budget allocation.
     
     def _deserialize_model(self, model_parameters: Dict[str, Any]):
         """Deserialize model from storage."""
-        if 'serialized_model' not in model_parameters:
-            raise ValueError("Model parameters missing serialized model")
-        
-        model_b64 = model_parameters['serialized_model']
-        model_bytes = base64.b64decode(model_b64)
-        return pickle.loads(model_bytes)
+        return deserialize_model(model_parameters)[0]
     
     # === Model Management ===
     
@@ -728,18 +801,14 @@ targeting, and budget allocation.
         Returns:
             ModelEvaluation metrics
         """
-        model_record = await self.db.get(PredictiveModel, model_id)
-        if not model_record:
-            raise ValueError(f"Model {model_id} not found")
-        
-        model = self._deserialize_model(model_record.model_parameters)
+        loaded = await self._load_model(model_id)
         
         # Prepare test data
-        X = np.array([[example.features.get(k, 0) for k in model_record.feature_columns] 
+        X = np.array([[example.features.get(k, 0) for k in loaded.feature_columns] 
                       for example in test_data])
         y = np.array([example.target for example in test_data])
         
-        return self._evaluate_model(model, X, y, model_record.model_algorithm)
+        return self._evaluate_model(loaded.estimator, X, y, loaded.model_algorithm)
     
     async def retrain_if_needed(
         self,
@@ -764,18 +833,21 @@ targeting, and budget allocation.
         
         # Check if retraining needed
         primary_metric = model_record.get_primary_metric()
-        if primary_metric and primary_metric >= accuracy_threshold:
+        if primary_metric is not None and primary_metric >= accuracy_threshold:
             logger.info(f"Model {model_id} performance ({primary_metric:.3f}) above threshold, no retraining needed")
             return None
         
-        logger.info(f"Model {model_id} performance ({primary_metric:.3f}) below threshold, retraining...")
+        logger.info(f"Model {model_id} performance ({primary_metric}) below threshold, retraining...")
+        
+        metrics = model_record.training_metrics
+        stacked = metrics.get('init_depth', metrics.get('incremental_updates', 0))
+        if new_training_data and stacked < get_settings().predictive_max_incremental_updates:
+            return await self.retrain_model(model_id, new_training_data, incremental=True)
         
-        # In production, would fetch historical data and combine with new data
-        # For now, just mark as needing retraining
+        # Without new data there is nothing to continue from, and a model at
+        # the incremental limit needs its full history; retrain separately
         model_record.status = PredictiveModelStatus.DEPRECATED
         await self.db.commit()
-        
-        # Return None - actual retraining would be done separately
         return None
     
     async def list_models(
@@ -818,6 +890,10 @@ targeting, and budget allocation.
         model.status = PredictiveModelStatus.DEPRECATED
         
         await self.db.commit()
+        
+        registry = get_model_registry()
+        if registry is not None:
+            registry.discard(model_id)
         await self.db.refresh(model)
         
         return model
\ No newline at end of file
@@ -0,0 +1,273 @@
+"""
+Training pipeline for predictive performance models.
+
+- Feature matrices are built column by column from `TrainingExample`
+  objects straight into a preallocated float32 array.
+- New models default to histogram-based gradient boosting
+  (`HistGradientBoosting*`): features are binned once and trees are grown
+  on histograms across all cores, so fits on 100k+ rows take seconds
+  instead of minutes.
+- Incremental retraining fits only the newly arrived rows. New boosting
+  stages start from the previous estimator's predictions
+  (`init=FrozenEstimator(previous)`), so earlier data still counts without
+  being kept. Each update nests the previous estimator one level deeper, so
+  after `predictive_max_incremental_updates` of them the model has to be
+  refit from its full training history. `HistGradientBoosting*`'s own `warm_start` is not used: it
+  re-bins each `fit`'s data, which would route the new rows through the
+  earlier trees with different bin edges.
+- Fits run in a process pool (`predictive_training_workers`) so the event
+  loop is never blocked. Inside daemonic processes (Celery prefork
+  workers), which cannot start children, they run in a thread.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.base import is_classifier
+from sklearn.ensemble import (
+    GradientBoostingClassifier, GradientBoostingRegressor, HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor, RandomForestClassifier,
+)
+from sklearn.frozen import FrozenEstimator
+from sklearn.inspection import permutation_importance
+from sklearn.metrics import (
+    accuracy_score, f1_score, mean_squared_error, precision_score, r2_score, recall_score, roc_auc_score,
+)
+from sklearn.model_selection import train_test_split
+
+from ...core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLASSIFIER = "hist_gradient_boosting_classifier"
+DEFAULT_REGRESSOR = "hist_gradient_boosting_regressor"
+
+ALGORITHMS = {
+    "hist_gradient_boosting_classifier": HistGradientBoostingClassifier,
+    "hist_gradient_boosting_regressor": HistGradientBoostingRegressor,
+    "gradient_boosting_classifier": GradientBoostingClassifier,
+    "gradient_boosting_regressor": GradientBoostingRegressor,
+    "random_forest": RandomForestClassifier,
+}
+
+_BOOSTING_DEFAULTS = {'max_depth': 6, 'learning_rate': 0.1, 'random_state': 42}
+DEFAULT_PARAMS = {
+    "hist_gradient_boosting_classifier": {'max_iter': 100, **_BOOSTING_DEFAULTS},
+    "hist_gradient_boosting_regressor": {'max_iter': 100, **_BOOSTING_DEFAULTS},
+    "gradient_boosting_classifier": {'n_estimators': 100, **_BOOSTING_DEFAULTS},
+    "gradient_boosting_regressor": {'n_estimators': 100, **_BOOSTING_DEFAULTS},
+    "random_forest": {'n_estimators': 100, 'max_depth': 6, 'random_state': 42},
+}
+
+# Stages added per incremental update: shallow and subsampled, since these
+# are exact-split trees rather than histogram ones
+INCREMENTAL_PARAMS = {
+    'n_estimators': 25, 'max_depth': 3, 'learning_rate': 0.1, 'subsample': 0.5, 'random_state': 42,
+}
+
+# Held-out rows used for permutation importance
+IMPORTANCE_SAMPLE = 2000
+
+
+@dataclass
+class TrainingOutcome:
+    """A fitted estimator with its held-out metrics and timings."""
+    estimator: Any
+    metrics: Dict[str, Optional[float]]
+    feature_importance: List[float]
+    training_rows: int
+    training_seconds: float
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.training_rows / self.training_seconds if self.training_seconds > 0 else 0.0
+
+
+def build_feature_matrix(
+    examples: Iterable[Any],
+    feature_keys: Optional[Sequence[str]] = None
+) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Build the (rows, features) float32 matrix and target vector.
+
+    Args:
+        examples: `TrainingExample`s, or batches (lists) of them.
+        feature_keys: Column order; defaults to the first example's keys.
+
+    Returns:
+        X, y and the feature keys. Missing features are 0.
+    """
+    rows = [
+        example
+        for item in examples
+        for example in (item if isinstance(item, (list, tuple)) else (item,))
+    ]
+    keys = list(feature_keys) if feature_keys is not None else list(rows[0].features) if rows else []
+
+    X = np.empty((len(rows), len(keys)), dtype=np.float32)
+    feature_dicts = [example.features for example in rows]
+    for column, key in enumerate(keys):
+        X[:, column] = np.fromiter(
+            (features.get(key, 0) for features in feature_dicts), dtype=np.float32, count=len(rows)
+        )
+    y = np.fromiter((example.target for example in rows), dtype=np.float64, count=len(rows))
+    return X, y, keys
+
+
+def training_params(algorithm: str, hyperparameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Default parameters for an algorithm merged with overrides.
+
+    `n_estimators` is accepted for the histogram estimators as `max_iter`.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
+    overrides = dict(hyperparameters or {})
+    if algorithm.startswith("hist_") and 'n_estimators' in overrides:
+        overrides.setdefault('max_iter', overrides.pop('n_estimators'))
+    return {**DEFAULT_PARAMS[algorithm], **overrides}
+
+
+def evaluate_estimator(model: Any, X_test: np.ndarray, y_test: np.ndarray) -> Dict[str, Optional[float]]:
+    """Held-out metrics: classification scores, or RMSE and R^2."""
+    predictions = model.predict(X_test)
+    if is_classifier(model):
+        pred_proba = model.predict_proba(X_test)[:, 1] if hasattr(model, 'predict_proba') else None
+        return {
+            'accuracy': float(accuracy_score(y_test, predictions)),
+            'precision': float(precision_score(y_test, predictions, zero_division=0)),
+            'recall': float(recall_score(y_test, predictions, zero_division=0)),
+            'f1_score': float(f1_score(y_test, predictions, zero_division=0)),
+            'auc_roc': (
+                float(roc_auc_score(y_test, pred_proba))
+                if pred_proba is not None and len(np.unique(y_test)) > 1 else None
+            ),
+            'rmse': None,
+            'r2_score': None,
+            'test_size': len(y_test),
+        }
+    return {
+        'accuracy': 0.0,
+        'precision': 0.0,
+        'recall': 0.0,
+        'f1_score': 0.0,
+        'auc_roc': None,
+        'rmse': float(np.sqrt(mean_squared_error(y_test, predictions))),
+        'r2_score': float(r2_score(y_test, predictions)),
+        'test_size': len(y_test),
+    }
+
+
+def feature_importances(model: Any, X_test: np.ndarray, y_test: np.ndarray) -> np.ndarray:
+    """Normalized feature importances.
+
+    Uses the estimator's impurity importances when it has them and is not
+    stacked on an earlier model; otherwise permutation importance on (a
+    sample of) the held-out rows.
+    """
+    if hasattr(model, 'feature_importances_') and getattr(model, 'init', None) in (None, 'zero'):
+        importance = np.asarray(model.feature_importances_, dtype=float)
+    else:
+        sample = slice(0, min(len(X_test), IMPORTANCE_SAMPLE))
+        result = permutation_importance(
+            model, X_test[sample], y_test[sample], n_repeats=3, random_state=42
+        )
+        importance = np.clip(result.importances_mean, 0, None)
+    total = importance.sum()
+    return importance / total if total > 0 else importance
+
+
+def init_depth(estimator: Any) -> int:
+    """Number of incremental updates stacked under `estimator`."""
+    depth = 0
+    while isinstance(getattr(estimator, 'init', None), FrozenEstimator):
+        estimator = estimator.init.estimator
+        depth += 1
+    return depth
+
+
+def fit_model(
+    algorithm: str,
+    params: Dict[str, Any],
+    X: np.ndarray,
+    y: np.ndarray,
+    previous: Any = None,
+    test_size: float = 0.2
+) -> TrainingOutcome:
+    """Split, fit and evaluate one model. Runs in the training pool.
+
+    Args:
+        algorithm: Key of `ALGORITHMS`; ignored when `previous` is given.
+        params: Estimator parameters.
+        X: Feature matrix.
+        y: Targets.
+        previous: Estimator to continue from. New gradient boosting stages
+            are fitted on `X` starting from its predictions.
+        test_size: Held-out fraction for metrics.
+    """
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+
+    if previous is not None:
+        estimator_class = GradientBoostingClassifier if is_classifier(previous) else GradientBoostingRegressor
+        model = estimator_class(init=FrozenEstimator(previous), **params)
+    else:
+        model = ALGORITHMS[algorithm](**params)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    training_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    metrics = evaluate_estimator(model, X_test, y_test)
+    importance = feature_importances(model, X_test, y_test)
+    evaluation_seconds = time.perf_counter() - start
+
+    return TrainingOutcome(
+        estimator=model,
+        metrics=metrics,
+        feature_importance=importance.tolist(),
+        training_rows=len(y_train),
+        training_seconds=training_seconds,
+        timings={'evaluation_seconds': evaluation_seconds},
+    )
+
+
+# ============== Process pool ==============
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_training_executor() -> Optional[ProcessPoolExecutor]:
+    """Get the process-wide training pool (None trains in a thread)."""
+    global _executor
+    workers = get_settings().predictive_training_workers
+    if workers <= 0 or multiprocessing.current_process().daemon:
+        return None
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def shutdown_training_executor():
+    """Stop the training pool, waiting for running fits."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+async def run_training(*args, **kwargs) -> TrainingOutcome:
+    """Run `fit_model` off the event loop."""
+    executor = get_training_executor()
+    if executor is None:
+        return await asyncio.to_thread(fit_model, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, _fit_model_call, args, kwargs)
+
+
+def _fit_model_call(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> TrainingOutcome:
+    return fit_model(*args, **kwargs)
@@ -17,7 +17,7 @@ from dataclasses import asdict
 from .state import CampaignState, CampaignPhase, Deliverable, Concept
 from .router import DepartmentRouter, Department
 from .composer import DeliverablesComposer
-from ..ai import OpenRouterService
+from ..ai import OpenRouterService, set_llm_tenant
 from ..convex_sync import get_convex_service, ConvexSyncService
 
 # Import intelligence layer for deep domain expertise
@@ -121,6 +121,8 @@ class OrchestratorBrain:
         # Store Convex ID in state for later use
         state.convex_campaign_id = convex_campaign_id
         self._states[campaign_id] = state
+        # Queue this campaign's LLM calls fairly alongside other organizations
+        set_llm_tenant(organization_id)
 
         # Sync status to Convex
         if convex_campaign_id:
@@ -202,6 +204,7 @@ class OrchestratorBrain:
         state = self._states.get(campaign_id)
         if not state:
             raise ValueError(f"Campaign {campaign_id} not found")
+        set_llm_tenant(state.organization_id)
 
         if state.phase != CampaignPhase.AWAITING_APPROVAL:
             raise ValueError(f"Campaign not awaiting approval, current phase: {state.phase}")
@@ -267,6 +270,7 @@ class OrchestratorBrain:
         state = self._states.get(campaign_id)
         if not state:
             raise ValueError(f"Campaign {campaign_id} not found")
+        set_llm_tenant(state.organization_id)
 
         # Find the deliverable
         deliverable = next(
@@ -343,6 +347,7 @@ class OrchestratorBrain:
         state = self._states.get(campaign_id)
         if not state:
             raise ValueError(f"Campaign {campaign_id} not found")
+        set_llm_tenant(state.organization_id)
 
         # If a deliverable is selected, treat as refinement
         if selected_deliverable_id:
@@ -592,7 +597,9 @@ class OrchestratorBrain:
         total_briefs = len(state.creative_briefs)
         completed = 0
 
-        for brief in state.creative_briefs:
+        async def produce(brief: Dict[str, Any]):
+            nonlocal completed
+
             # Get the production pipeline for this brief
             pipeline = self.router.get_production_pipeline(brief)
 
@@ -617,16 +624,6 @@ class OrchestratorBrain:
 
             # Compose into deliverable
             deliverable = await self._compose_deliverable(brief, outputs)
-            if deliverable:
-                state.add_deliverable(deliverable)
-
-                # Sync deliverable to Convex for real-time updates
-                if convex_campaign_id:
-                    await self._sync_deliverable_to_convex(deliverable, convex_campaign_id)
-
-                # Send update for each deliverable
-                if progress_callback:
-                    await progress_callback(state)
 
             completed += 1
             state.progress = completed / total_briefs
@@ -635,6 +632,38 @@ class OrchestratorBrain:
             if progress_callback:
                 await progress_callback(state)
 
+            return deliverable
+
+        # Briefs are independent: produce them concurrently (the LLM
+        # transport bounds how many calls are in flight); each brief's
+        # pipeline still runs in order, and deliverables keep brief order
+        results = await asyncio.gather(
+            *(produce(brief) for brief in state.creative_briefs), return_exceptions=True
+        )
+
+        failures = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Production of brief {index + 1}/{total_briefs} failed: {result}")
+                state.errors.append(f"Brief {index + 1}: {result}")
+                failures.append(result)
+                continue
+            if not result:
+                continue
+            state.add_deliverable(result)
+
+            # Sync deliverable to Convex for real-time updates
+            if convex_campaign_id:
+                await self._sync_deliverable_to_convex(result, convex_campaign_id)
+
+            # Send update for each deliverable
+            if progress_callback:
+                await progress_callback(state)
+
+        if failures and not state.deliverables:
+            # Nothing was produced: fail the campaign as a sequential run would
+            raise failures[0]
+
         state.status_message = f"Production complete! {len(state.deliverables)} deliverables ready."
 
     # === Helper Methods ===
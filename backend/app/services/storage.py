@@ -315,6 +315,55 @@ class StorageService:
         }
         return sizes.get(file_type, MAX_IMAGE_SIZE)
 
+    def put_object_bytes(
+        self,
+        key: str,
+        content: bytes,
+        content_type: str = 'application/octet-stream'
+    ) -> bool:
+        """
+        Store raw bytes under a fixed key, without upload validation.
+
+        Used for internal objects such as model artifacts. Synchronous.
+
+        Args:
+            key: S3 object key
+            content: Object bytes
+            content_type: MIME type
+
+        Returns:
+            True if stored successfully
+        """
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=content,
+                ContentType=content_type
+            )
+            return True
+        except ClientError:
+            return False
+
+    def get_object_bytes(self, key: str) -> Optional[bytes]:
+        """
+        Read an object's bytes. Synchronous.
+
+        Args:
+            key: S3 object key
+
+        Returns:
+            Object bytes or None if not found
+        """
+        try:
+            response = self.s3_client.get_object(
+                Bucket=self.bucket_name,
+                Key=key
+            )
+            return response['Body'].read()
+        except ClientError:
+            return None
+
     async def delete_file(self, key: str) -> bool:
         """
         Delete a file from S3.
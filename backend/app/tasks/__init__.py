@@ -34,6 +34,24 @@ try:
 except ImportError:
     CAMPAIGN_TASKS_AVAILABLE = False
 
+# Import CDP tasks
+try:
+    from .cdp_tasks import (
+        recompute_computed_traits_task,
+    )
+    CDP_TASKS_AVAILABLE = True
+except ImportError:
+    CDP_TASKS_AVAILABLE = False
+
+# Import analytics tasks
+try:
+    from .analytics_tasks import (
+        train_data_driven_attribution_task,
+    )
+    ANALYTICS_TASKS_AVAILABLE = True
+except ImportError:
+    ANALYTICS_TASKS_AVAILABLE = False
+
 __all__ = []
 
 if OPTIMIZATION_TASKS_AVAILABLE:
@@ -51,4 +69,14 @@ if CAMPAIGN_TASKS_AVAILABLE:
         "get_campaign_progress",
         "generate_copy_task",
         "generate_image_task",
-    ])
\ No newline at end of file
+    ])
+
+if CDP_TASKS_AVAILABLE:
+    __all__.extend([
+        "recompute_computed_traits_task",
+    ])
+
+if ANALYTICS_TASKS_AVAILABLE:
+    __all__.extend([
+        "train_data_driven_attribution_task",
+    ])
@@ -0,0 +1,72 @@
+"""
+Analytics tasks for Celery.
+
+This module contains Celery tasks for:
+- Training data-driven attribution models (Markov chain, Shapley value)
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from celery.exceptions import MaxRetriesExceededError
+
+from ..core.celery_app import celery_app
+from ..core.database import get_database_manager
+from ..models.attribution import AttributionModelType
+from ..services.analytics.data_driven_attribution import DATA_DRIVEN_MODEL_TYPES, DataDrivenAttributionTrainer
+from .campaign_tasks import _run_async
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def train_data_driven_attribution_task(
+    self,
+    organization_id: str,
+    lookback_days: int = 90,
+    model_types: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Train Markov-chain and Shapley-value channel weights for an organization.
+
+    The weights are stored in the organization's attribution model configs,
+    where per-conversion attribution looks them up.
+
+    Args:
+        organization_id: Organization ID.
+        lookback_days: Days of conversions and touchpoints to train on.
+        model_types: Model type values to train (defaults to both).
+    """
+    logger.info(f"Starting data-driven attribution training for org {organization_id}")
+
+    try:
+        result = _run_async(_train_data_driven_attribution_async(organization_id, lookback_days, model_types))
+        result["timestamp"] = datetime.utcnow().isoformat()
+        return result
+
+    except Exception as exc:
+        logger.error(f"Data-driven attribution training failed: {exc}", exc_info=True)
+        try:
+            raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+        except MaxRetriesExceededError:
+            return {
+                "organization_id": organization_id,
+                "status": "failed",
+                "error": str(exc),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+
+async def _train_data_driven_attribution_async(
+    organization_id: str,
+    lookback_days: int,
+    model_types: Optional[List[str]]
+) -> Dict[str, Any]:
+    """Run the trainer on a fresh session."""
+    types = [AttributionModelType(t) for t in model_types] if model_types else list(DATA_DRIVEN_MODEL_TYPES)
+
+    db = get_database_manager()
+    async with db.session() as session:
+        return await DataDrivenAttributionTrainer(session).train(
+            organization_id, lookback_days=lookback_days, model_types=types
+        )
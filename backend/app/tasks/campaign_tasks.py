@@ -22,11 +22,20 @@ from ..core.database import get_database_manager
 from ..repositories.campaign import CampaignRepository
 from ..repositories.knowledge_base import KnowledgeBaseRepository
 from ..models.deliverable import Deliverable
+from ..services.ai.llm_transport import close_llm_transport
 from ..services.campaigns import CampaignOrchestrator, CampaignPhase
 
 logger = logging.getLogger(__name__)
 
 
+async def _close_llm_transport_after(coro):
+    """Await a coroutine, then close the LLM transport bound to its event loop."""
+    try:
+        return await coro
+    finally:
+        await close_llm_transport()
+
+
 def _run_async(coro):
     """
     Run an async coroutine safely from sync context.
@@ -34,7 +43,10 @@ def _run_async(coro):
     Handles the case where an event loop may already be running
     (e.g., inside some Celery worker configurations or test environments).
     Falls back to creating a new event loop if asyncio.run() fails.
+    The loop is discarded afterwards, so the LLM transport created on it is
+    closed before it ends.
     """
+    coro = _close_llm_transport_after(coro)
     try:
         loop = asyncio.get_running_loop()
     except RuntimeError:
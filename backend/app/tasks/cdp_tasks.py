@@ -0,0 +1,69 @@
+"""
+Customer Data Platform tasks for Celery.
+
+This module contains Celery tasks for:
+- Batch recomputation of computed traits (engagement, LTV, churn, RFM)
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from celery.exceptions import MaxRetriesExceededError
+
+from ..core.celery_app import celery_app
+from ..core.database import get_database_manager
+from ..services.cdp.trait_engine import ComputedTraitEngine
+from .campaign_tasks import _run_async
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(bind=True, max_retries=3)
+def recompute_computed_traits_task(self, organization_id: str, chunk_size: int = 5000) -> Dict[str, Any]:
+    """
+    Recompute computed traits for every customer of an organization.
+
+    Reports chunked progress through the task state:
+    `PROGRESS` with meta {"done", "total", "progress"}.
+
+    Args:
+        organization_id: Organization ID.
+        chunk_size: Customers per aggregate query and bulk UPDATE.
+    """
+    logger.info(f"Starting computed trait recomputation for org {organization_id}")
+
+    try:
+        result = _run_async(_recompute_computed_traits_async(self, organization_id, chunk_size))
+        result["timestamp"] = datetime.utcnow().isoformat()
+        return result
+
+    except Exception as exc:
+        logger.error(f"Computed trait recomputation failed: {exc}", exc_info=True)
+        try:
+            raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+        except MaxRetriesExceededError:
+            return {
+                "organization_id": organization_id,
+                "status": "failed",
+                "error": str(exc),
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+
+async def _recompute_computed_traits_async(task, organization_id: str, chunk_size: int) -> Dict[str, Any]:
+    """Run the trait engine on a fresh session, reporting progress per chunk."""
+    async def progress(done: int, total: int):
+        task.update_state(state="PROGRESS", meta={
+            "organization_id": organization_id,
+            "done": done,
+            "total": total,
+            "progress": round(100 * done / total, 1) if total else 100.0,
+        })
+
+    db = get_database_manager()
+    async with db.session() as session:
+        result = await ComputedTraitEngine(session).recompute_organization(
+            organization_id, chunk_size=chunk_size, progress=progress
+        )
+
+    return {"status": "completed", **result.to_dict()}
@@ -86,11 +86,10 @@ def check_experiment_winner(self, experiment_id: str):
     
     try:
         # In production:
-        # 1. Get experiment
-        # 2. Check if auto_winner_selection is enabled
-        # 3. Calculate results
-        # 4. Check if winner meets criteria
-        # 5. Stop experiment if winner found
+        # 1. Get database session
+        # 2. ABTestingEngine.check_auto_winner(experiment_id), which reads
+        #    running totals and stops the experiment when its always-valid
+        #    p-value crosses the threshold
         
         logger.info(f"Winner check complete for experiment {experiment_id}")
         
@@ -284,7 +283,7 @@ celery_app.conf.beat_schedule = {
     },
     'check-experiment-winners': {
         'task': 'app.tasks.optimization_tasks.check_experiment_winner',
-        'schedule': 600.0,  # Every 10 minutes
+        'schedule': 60.0,  # Every minute; the sequential tests allow continuous monitoring
         'args': (),
     },
     'optimize-campaigns': {
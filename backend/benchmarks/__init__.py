@@ -0,0 +1,7 @@
+"""
+Performance benchmarks for backend services.
+
+Each module is a standalone script, e.g.:
+
+    python -m benchmarks.bench_event_batch --database-url sqlite://
+"""
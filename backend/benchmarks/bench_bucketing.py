@@ -0,0 +1,91 @@
+"""
+Microbenchmark experiment bucketing.
+
+Compares assignments per second of the previous bucketing (sort variants,
+md5 hex digest parsed as a 128-bit int, linear scan of cumulative shares)
+with the bucketing engine (visitor hash computed once, 64-bit mix per
+bucket space, precomputed bucket -> variant table), for one experiment and
+for a page that assigns every visitor to many experiments.
+
+    python -m benchmarks.bench_bucketing --visitors 200000
+    python -m benchmarks.bench_bucketing --variants 5 --experiments 50
+"""
+import argparse
+import hashlib
+from types import SimpleNamespace
+
+from app.services.optimization.bucketing import (
+    NO_VARIANT, allocate_buckets, bucket, lookup_table, salt_hash, target_counts, visitor_hash,
+)
+
+from .common import Timer
+
+
+def assign_previous(user_id: str, experiment_id: str, variants):
+    """The previous `_consistent_hash_assignment`, including the per-call variant sort."""
+    ordered = sorted(variants, key=lambda v: -v.traffic_percentage)
+    hash_value = int(hashlib.md5(f"{user_id}:{experiment_id}".encode()).hexdigest(), 16)
+    hash_normalized = (hash_value % 10000) / 100.0
+    cumulative = 0.0
+    for variant in ordered:
+        cumulative += variant.traffic_percentage
+        if hash_normalized <= cumulative:
+            return variant
+    return ordered[-1]
+
+
+def compile_experiment(experiment_id: str, variants):
+    table = lookup_table(allocate_buckets(
+        [[] for _ in variants], target_counts(1.0, [v.traffic_percentage for v in variants])
+    ))
+    return salt_hash(experiment_id), table
+
+
+def run(visitors: int, variants: int, experiments: int) -> None:
+    arms = [
+        SimpleNamespace(id=f"variant-{i}", traffic_percentage=100 / variants)
+        for i in range(variants)
+    ]
+    experiment_ids = [f"experiment-{i:04d}" for i in range(experiments)]
+    compiled = [compile_experiment(experiment_id, arms) for experiment_id in experiment_ids]
+    keys = [f"visitor-{i}" for i in range(visitors)]
+    salt, table = compiled[0]
+
+    with Timer() as previous:
+        for key in keys:
+            assign_previous(key, experiment_ids[0], arms)
+    with Timer() as current:
+        for key in keys:
+            index = table[bucket(visitor_hash(key), salt)]
+            arms[index] if index != NO_VARIANT else None
+    print(f"visitors={visitors} variants={variants}")
+    print(f"  one experiment: previous {visitors / previous.elapsed:,.0f}/s, "
+          f"bucketing engine {visitors / current.elapsed:,.0f}/s "
+          f"({current.elapsed / visitors * 1e9:.0f}ns each)")
+
+    pages = visitors // experiments
+    with Timer() as previous:
+        for key in keys[:pages]:
+            for experiment_id in experiment_ids:
+                assign_previous(key, experiment_id, arms)
+    with Timer() as current:
+        for key in keys[:pages]:
+            visitor = visitor_hash(key)
+            for salt, table in compiled:
+                table[bucket(visitor, salt)]
+    total = pages * experiments
+    print(f"  {experiments} experiments per visitor: previous {total / previous.elapsed:,.0f}/s, "
+          f"bucketing engine {total / current.elapsed:,.0f}/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--visitors", type=int, default=200000)
+    parser.add_argument("--variants", type=int, default=3)
+    parser.add_argument("--experiments", type=int, default=20)
+    args = parser.parse_args()
+    run(args.visitors, args.variants, args.experiments)
+
+
+if __name__ == "__main__":
+    main()
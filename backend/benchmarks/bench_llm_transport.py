@@ -0,0 +1,100 @@
+"""
+Benchmark LLM call throughput through the shared transport.
+
+Simulates a provider with fixed latency that accepts a bounded number of
+concurrent requests and answers 429 (with Retry-After) above it. Times a
+campaign-sized burst of calls with the previous fixed spacing (one call
+per `--interval` seconds behind a global lock) and with the adaptive
+limiter, and reports how many 429s the limiter caused and where its limit
+settled.
+
+    python -m benchmarks.bench_llm_transport --calls 30 --latency 0.5
+    python -m benchmarks.bench_llm_transport --provider-concurrency 4
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.services.ai import llm_transport, openrouter
+from app.services.ai.llm_transport import AdaptiveLimiter, LLMTransport
+from app.services.ai.openrouter import OpenRouterService
+
+from .common import Timer
+
+
+class Provider:
+    """Mock LLM endpoint with a latency and a concurrency cap."""
+
+    def __init__(self, latency: float, concurrency: int):
+        self.latency = latency
+        self.concurrency = concurrency
+        self.active = 0
+        self.rejected = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if self.active >= self.concurrency:
+            self.rejected += 1
+            return httpx.Response(429, headers={"Retry-After": str(self.latency / 2)})
+        self.active += 1
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+
+
+async def previous(provider: Provider, calls: int, interval: float) -> None:
+    """The previous path: a client per service, one call per interval behind a global lock."""
+    lock = asyncio.Lock()
+    last = [0.0]
+
+    async def call():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(provider)) as client:
+            async with lock:
+                wait = interval - (time.monotonic() - last[0])
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                last[0] = time.monotonic()
+            response = await client.post(openrouter.API_URL, json={})
+            response.raise_for_status()
+
+    await asyncio.gather(*(call() for _ in range(calls)))
+
+
+async def run(calls: int, latency: float, interval: float, provider_concurrency: int) -> None:
+    openrouter.RETRY_DELAY_BASE = latency / 2
+    provider = Provider(latency, provider_concurrency)
+    with Timer() as fixed:
+        await previous(provider, calls, interval)
+
+    provider = Provider(latency, provider_concurrency)
+    transport = LLMTransport(http2=False, limiter=AdaptiveLimiter(), http_transport=httpx.MockTransport(provider))
+    llm_transport._transport = transport
+    llm_transport._transport_loop = asyncio.get_running_loop()
+    services = [OpenRouterService(api_key="bench") for _ in range(6)]
+    with Timer() as adaptive:
+        await asyncio.gather(*(services[i % len(services)].complete(f"call {i}") for i in range(calls)))
+    stats = transport.stats()
+    await llm_transport.close_llm_transport()
+
+    print(f"calls={calls} latency={latency}s provider_concurrency={provider_concurrency}")
+    print(f"  previous (1 call per {interval}s): {fixed.elapsed:.2f}s")
+    print(f"  adaptive limiter: {adaptive.elapsed:.2f}s ({fixed.elapsed / adaptive.elapsed:.1f}x), "
+          f"429s={provider.rejected}, final limit={stats['limit']}, "
+          f"p50={stats['latency_p50_ms']}ms p95={stats['latency_p95_ms']}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--provider-concurrency", type=int, default=6)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.latency, args.interval, args.provider_concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Shared helpers for benchmark scripts.
+
+Benchmarks run against a throwaway database: SQLite in memory by default,
+or any PostgreSQL URL passed with --database-url.
+"""
+import argparse
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Generator, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import *  # noqa: F401, F403 - register all tables
+from app.models.base import Base
+from app.models.user import Organization
+from app.services import model_artifacts
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    """Create an argument parser with the common --database-url option."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--database-url",
+        default="sqlite://",
+        help="Database URL (sqlite:// for in-memory SQLite, or postgresql://...)",
+    )
+    return parser
+
+
+def _async_url(url: str) -> str:
+    """Map a sync database URL to its async driver equivalent."""
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+@asynccontextmanager
+async def benchmark_database(url: str) -> AsyncGenerator[Tuple[AsyncEngine, async_sessionmaker], None]:
+    """Create a fresh schema, yield an engine and session factory, then drop it."""
+    async_url = _async_url(url)
+    kwargs = {}
+    if async_url.startswith("sqlite"):
+        kwargs = {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+
+    engine = create_async_engine(async_url, **kwargs)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    try:
+        yield engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+@contextmanager
+def temporary_artifact_store() -> Generator[model_artifacts.ModelArtifactStore, None, None]:
+    """Point the process-wide model artifact store at a throwaway directory."""
+    previous = model_artifacts._artifact_store
+    with tempfile.TemporaryDirectory(prefix="bench-artifacts-") as directory:
+        model_artifacts._artifact_store = model_artifacts.ModelArtifactStore(directory)
+        try:
+            yield model_artifacts._artifact_store
+        finally:
+            model_artifacts._artifact_store = previous
+
+
+async def create_organization(session: AsyncSession, name: str = "Benchmark Org") -> str:
+    """Insert an organization row and return its ID."""
+    org = Organization(name=name, slug=name.lower().replace(" ", "-"))
+    session.add(org)
+    await session.commit()
+    return org.id
+
+
+class Timer:
+    """Context manager measuring wall-clock time in seconds."""
+
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.start
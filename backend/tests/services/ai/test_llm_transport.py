@@ -0,0 +1,196 @@
+"""
+Tests for the shared LLM transport and its adaptive concurrency limit.
+"""
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.services.ai import llm_transport, openrouter
+from app.services.ai.llm_transport import AdaptiveLimiter, LLMTransport, set_llm_tenant
+from app.services.ai.openrouter import OpenRouterService
+
+
+def completion(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+
+
+@pytest_asyncio.fixture
+async def install(monkeypatch):
+    """Install a transport whose requests are answered by `handler`."""
+    monkeypatch.setattr(openrouter, "RETRY_DELAY_BASE", 0.0)
+
+    def install_handler(handler, limiter=None):
+        transport = LLMTransport(http2=False, limiter=limiter, http_transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(llm_transport, "_transport", transport)
+        monkeypatch.setattr(llm_transport, "_transport_loop", asyncio.get_running_loop())
+        return transport
+
+    return install_handler
+
+
+class TestAdaptiveLimiter:
+    """Tests for AIMD limits and fair queuing."""
+
+    @pytest.mark.asyncio
+    async def test_waiting_tenants_are_served_round_robin(self):
+        """Test a tenant with a burst of queued calls does not starve a tenant with one."""
+        limiter = AdaptiveLimiter(initial=1)
+        await limiter.acquire("busy")
+        order = []
+
+        async def call(tenant, i):
+            await limiter.acquire(tenant)
+            order.append(f"{tenant}-{i}")
+            await asyncio.sleep(0)
+            limiter.release(latency=0.01)
+
+        tasks = [asyncio.create_task(call("busy", i)) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call("quiet", 0)))
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued_by_tenant"] == {"busy": 4, "quiet": 1}
+
+        limiter.release(latency=0.01)
+        await asyncio.gather(*tasks)
+        assert order.index("quiet-0") == 1
+        assert limiter.in_flight == 0 and limiter.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_limit_grows_under_load_and_halves_once_per_round_trip(self):
+        """Test additive increase while saturated and one multiplicative decrease per burst of overloads."""
+        limiter = AdaptiveLimiter(initial=4, maximum=8)
+        for _ in range(4):
+            await limiter.acquire()
+        for _ in range(4):
+            limiter.release(latency=0.5)
+            await limiter.acquire()
+        assert 4.9 < limiter.limit < 5.1
+
+        for _ in range(4):
+            limiter.release(overloaded=True)
+        assert 2.4 < limiter.limit < 2.6
+        assert limiter.stats()["overloads"] == 4
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_new_calls(self):
+        """Test a Retry-After pause holds queued calls until it expires, and cancelled waiters leave the queue."""
+        limiter = AdaptiveLimiter(initial=4)
+        await limiter.acquire()
+        limiter.release(overloaded=True, retry_after=0.1)
+
+        start = time.monotonic()
+        cancelled = asyncio.create_task(limiter.acquire("a"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        await limiter.acquire("b")
+        assert time.monotonic() - start >= 0.09
+        assert limiter.in_flight == 1 and limiter.queued == 0
+
+
+class TestTransport:
+    """Tests for OpenRouterService on the shared transport."""
+
+    @pytest.mark.asyncio
+    async def test_services_share_one_client_and_calls_overlap(self, install):
+        """Test calls from separate services reuse one client and run concurrently."""
+        async def handler(request):
+            await asyncio.sleep(0.05)
+            return completion(json.loads(request.content)["messages"][-1]["content"])
+
+        transport = install(handler, AdaptiveLimiter(initial=8))
+        services = [OpenRouterService(api_key="key") for _ in range(4)]
+
+        start = time.monotonic()
+        replies = await asyncio.gather(*(
+            services[i % 4].complete(f"prompt {i}") for i in range(16)
+        ))
+        elapsed = time.monotonic() - start
+
+        assert replies == [f"prompt {i}" for i in range(16)]
+        assert elapsed < 0.05 * 16 / 2
+        stats = transport.stats()
+        assert stats["completed"] == 16 and stats["in_flight"] == 0
+        assert stats["latency_p50_ms"] >= 45
+        await services[0].close()
+        assert not transport.client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_call_backs_off_and_retries(self, install):
+        """Test a 429 with Retry-After lowers the limit, pauses calls and is retried."""
+        responses = [httpx.Response(429, headers={"Retry-After": "0.05"}), completion("ok")]
+        tenants = []
+
+        def handler(request):
+            return responses.pop(0)
+
+        transport = install(handler, AdaptiveLimiter(initial=4))
+        original_acquire = transport.limiter.acquire
+
+        async def record_acquire(tenant=None):
+            tenants.append(tenant)
+            await original_acquire(tenant)
+
+        transport.limiter.acquire = record_acquire
+        set_llm_tenant("org-1")
+
+        start = time.monotonic()
+        assert await OpenRouterService(api_key="key").complete("hi") == "ok"
+        assert time.monotonic() - start >= 0.04
+        assert tenants == ["org-1", "org-1"]
+        stats = transport.stats()
+        assert stats["overloads"] == 1 and stats["completed"] == 1
+        assert stats["limit"] < 4
+
+    @pytest.mark.asyncio
+    async def test_stream_holds_slot_until_body_is_consumed(self, install):
+        """Test a streamed call keeps its slot while the body is read."""
+        async def body():
+            yield b"data: one\n\n"
+            await asyncio.sleep(0.1)
+            yield b"data: two\n\n"
+
+        transport = install(lambda request: httpx.Response(200, content=body()), AdaptiveLimiter(initial=1))
+
+        async with transport.stream("POST", "https://llm.test/v1/chat") as response:
+            chunks = [chunk async for chunk in response.aiter_bytes()]
+            assert transport.limiter.in_flight == 1
+
+        assert b"".join(chunks) == b"data: one\n\ndata: two\n\n"
+        stats = transport.stats()
+        assert stats["in_flight"] == 0 and stats["completed"] == 1
+        assert stats["latency_p50_ms"] < 100
+
+    def test_transport_is_closed_with_its_event_loop(self):
+        """Test each loop's transport is closed by close_llm_transport, and a replaced one on its loop."""
+        async def job():
+            transport = llm_transport.get_llm_transport()
+            await llm_transport.close_llm_transport()
+            return transport
+
+        closed = asyncio.run(job())
+        assert closed.client.is_closed and llm_transport._transport is None
+
+        async def open_transport():
+            return llm_transport.get_llm_transport()
+
+        loop = asyncio.new_event_loop()
+        try:
+            first = loop.run_until_complete(open_transport())
+            # A loop running in another thread still owns its transport
+            thread = threading.Thread(target=loop.run_forever)
+            thread.start()
+            second = asyncio.run(open_transport())
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.run_until_complete(asyncio.sleep(0))
+            assert first.client.is_closed and not second.client.is_closed
+        finally:
+            loop.close()
+            llm_transport._transport = None
+            llm_transport._transport_loop = None
@@ -0,0 +1,19 @@
+"""
+Shared fixtures for analytics service tests.
+
+Tests that exercise set-based queries use the in-memory SQLite ``db``
+fixture from ``tests/services/conftest.py``; the rest keep using a mocked
+session.
+"""
+import pytest_asyncio
+
+from app.models.user import Organization
+
+
+@pytest_asyncio.fixture
+async def organization_id(db):
+    """Create a test organization."""
+    org = Organization(name="Analytics Test Org", slug="analytics-test-org")
+    db.add(org)
+    await db.commit()
+    return org.id
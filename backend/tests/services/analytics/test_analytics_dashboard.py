@@ -29,23 +29,25 @@ class TestOverviewMetrics:
     @pytest.mark.asyncio
     async def test_get_overview_metrics(self, dashboard_service, mock_db):
         """Test getting overview metrics."""
-        # Mock revenue query
-        mock_revenue_result = MagicMock()
-        mock_revenue_result.scalar.side_effect = [10000.0, 8000.0]  # current, previous
-
-        # Mock conversions query
+        # Mock conversion totals (current, previous)
         mock_conv_result = MagicMock()
-        mock_conv_result.scalar.side_effect = [50, 40]  # current, previous
+        mock_conv_result.one.side_effect = [
+            MagicMock(count=50, value=10000.0),
+            MagicMock(count=40, value=8000.0),
+        ]
 
-        # Mock attributed revenue query
+        # Mock attributed revenue totals (current, previous)
         mock_attr_result = MagicMock()
-        mock_attr_result.scalar.side_effect = [8000.0, 6000.0]
+        mock_attr_result.all.side_effect = [
+            [MagicMock(attribution_count=150, attributed_value=8000.0, weight_sum=60.0)],
+            [MagicMock(attribution_count=100, attributed_value=6000.0, weight_sum=40.0)],
+        ]
 
         # Mock top channels query
         mock_channels_result = MagicMock()
         mock_channels_result.all.return_value = [
-            MagicMock(channel="google", total_attributed=5000.0, touchpoint_count=100, avg_weight=0.5),
-            MagicMock(channel="facebook", total_attributed=3000.0, touchpoint_count=50, avg_weight=0.3)
+            MagicMock(channel="google", attribution_count=100, attributed_value=5000.0, weight_sum=50.0),
+            MagicMock(channel="facebook", attribution_count=50, attributed_value=3000.0, weight_sum=15.0)
         ]
 
         # Mock campaigns query
@@ -53,8 +55,8 @@ class TestOverviewMetrics:
         mock_campaigns_result.scalar.return_value = 5
 
         mock_db.execute.side_effect = [
-            mock_revenue_result,
-            mock_revenue_result,
+            mock_conv_result,
+            mock_conv_result,
             mock_attr_result,
             mock_attr_result,
             mock_channels_result,
@@ -69,14 +71,17 @@ class TestOverviewMetrics:
         assert metrics["total_revenue"].value == 10000.0
         assert "total_conversions" in metrics
         assert "attributed_revenue" in metrics
+        assert metrics["total_conversions"].value == 50
+        assert metrics["attributed_revenue"].change_pct == pytest.approx(100 / 3)
         assert "top_channels" in metrics
-        assert len(metrics["top_channels"]) == 2
+        assert [c["channel"] for c in metrics["top_channels"]] == ["google", "facebook"]
+        assert metrics["top_channels"][0]["avg_weight"] == 0.5
 
     @pytest.mark.asyncio
-    async def test_get_total_revenue(self, dashboard_service, mock_db):
-        """Test getting total revenue metric."""
+    async def test_total_revenue_comparison(self, dashboard_service, mock_db):
+        """Test the revenue metric built from current and previous conversion totals."""
         mock_result = MagicMock()
-        mock_result.scalar.side_effect = [10000.0, 8000.0]
+        mock_result.one.side_effect = [MagicMock(count=50, value=10000.0), MagicMock(count=40, value=8000.0)]
         mock_db.execute.return_value = mock_result
 
         start_date = datetime.utcnow() - timedelta(days=30)
@@ -84,9 +89,9 @@ class TestOverviewMetrics:
         prev_start = start_date - timedelta(days=30)
         prev_end = start_date
 
-        metric = await dashboard_service._get_total_revenue(
-            "org1", start_date, end_date, prev_start, prev_end
-        )
+        _, revenue = await dashboard_service._conversion_totals("org1", start_date, end_date)
+        _, prev_revenue = await dashboard_service._conversion_totals("org1", prev_start, prev_end)
+        metric = dashboard_service._comparison_metric("Total Revenue", revenue, prev_revenue, "USD")
 
         assert isinstance(metric, DashboardMetric)
         assert metric.value == 10000.0
@@ -137,8 +142,10 @@ class TestAttributionReports:
         """Test comparing attribution models."""
         mock_result = MagicMock()
         mock_result.all.return_value = [
-            MagicMock(channel="google", total_attributed=5000.0),
-            MagicMock(channel="facebook", total_attributed=3000.0)
+            MagicMock(model_type=AttributionModelType.LINEAR, channel="google",
+                      attribution_count=10, attributed_value=5000.0, weight_sum=5.0),
+            MagicMock(model_type=AttributionModelType.LINEAR, channel="facebook",
+                      attribution_count=5, attributed_value=3000.0, weight_sum=2.0)
         ]
         mock_db.execute.return_value = mock_result
 
@@ -150,6 +157,9 @@ class TestAttributionReports:
         assert "first_touch" in comparison["models"]
         assert "last_touch" in comparison["models"]
         assert "linear" in comparison["models"]
+        assert comparison["models"]["linear"] == {"google": 5000.0, "facebook": 3000.0}
+        assert comparison["models"]["first_touch"] == {}
+        mock_db.execute.assert_awaited_once()
 
 
 class TestROIReports:
@@ -0,0 +1,88 @@
+"""
+Tests for the bulk attribution upsert writer.
+"""
+import pytest
+
+from sqlalchemy import func, select
+
+from app.models.attribution import Attribution, AttributionModelType, AttributionStatus
+from app.services.analytics.attribution_engine import AttributionResult
+from app.services.analytics.attribution_writer import AttributionWriter
+
+
+def _results(weights, model_type=AttributionModelType.LINEAR, conversion_id="conv1"):
+    return [
+        AttributionResult(
+            touchpoint_id=f"tp{i}",
+            conversion_event_id=conversion_id,
+            model_type=model_type,
+            weight=weight,
+            attributed_value=100.0 * weight,
+            position=i + 1,
+            total_touchpoints=len(weights),
+            hours_to_conversion=float(10 * (len(weights) - i)),
+            confidence_score=1.0,
+        )
+        for i, weight in enumerate(weights)
+    ]
+
+
+async def _rows(db):
+    result = await db.execute(
+        select(Attribution).order_by(Attribution.model_type, Attribution.touchpoint_id)
+    )
+    return result.scalars().all()
+
+
+class TestAttributionWriter:
+    """Tests for AttributionWriter."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("dialect", [None, "generic"])
+    async def test_insert_then_recalculate(self, db, organization_id, dialect):
+        """Test a rewrite updates rows in place and marks them recalculated."""
+        writer = AttributionWriter(db)
+        if dialect:
+            writer.dialect = dialect
+        organization_ids = {"conv1": organization_id}
+
+        written = await writer.write(
+            _results([0.5, 0.5]) + _results([1.0, 0.0], AttributionModelType.FIRST_TOUCH),
+            organization_ids
+        )
+        await db.commit()
+
+        assert written == 4
+        rows = await _rows(db)
+        assert [r.status for r in rows] == [AttributionStatus.CALCULATED] * 4
+        assert {r.organization_id for r in rows} == {organization_id}
+        ids = {(r.model_type, r.touchpoint_id): r.id for r in rows}
+
+        await writer.write(_results([0.25, 0.75]), organization_ids, model_parameters={"v": 2})
+        await db.commit()
+        db.expire_all()
+
+        rows = await _rows(db)
+        assert len(rows) == 4
+        assert {(r.model_type, r.touchpoint_id): r.id for r in rows} == ids
+        linear = [r for r in rows if r.model_type == AttributionModelType.LINEAR]
+        assert [r.weight for r in linear] == [0.25, 0.75]
+        assert [r.attributed_value for r in linear] == [25.0, 75.0]
+        assert all(r.status == AttributionStatus.RECALCULATED for r in linear)
+        assert all(r.model_parameters == {"v": 2} for r in linear)
+        first_touch = [r for r in rows if r.model_type == AttributionModelType.FIRST_TOUCH]
+        assert all(r.status == AttributionStatus.CALCULATED for r in first_touch)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_results_collapse(self, db, organization_id):
+        """Test repeated keys in one batch are written once, last result winning."""
+        writer = AttributionWriter(db, chunk_size=1)
+
+        written = await writer.write(
+            _results([0.5, 0.5]) + _results([0.1, 0.9]), {"conv1": organization_id}
+        )
+        await db.commit()
+
+        assert written == 2
+        assert await db.scalar(select(func.count(Attribution.id))) == 2
+        assert [r.weight for r in await _rows(db)] == [0.1, 0.9]
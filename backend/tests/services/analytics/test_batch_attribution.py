@@ -0,0 +1,199 @@
+"""
+Tests for vectorized batch attribution.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from sqlalchemy import select
+
+from app.models.attribution import Attribution, AttributionModelType
+from app.models.attribution_touchpoint import AttributionTouchpoint, TouchpointStatus, TouchpointType
+from app.models.conversion_event import ConversionEvent, ConversionStatus, ConversionType
+from app.services.analytics.attribution_engine import AttributionEngine
+from app.services.analytics.batch_attribution import (
+    TouchpointLayout, attribution_weights, channel_totals, load_touchpoint_layout,
+)
+
+CHANNELS = ["google", "email", "facebook", "direct"]
+
+
+def _journey(conversion_id, size, now, rng):
+    """Chronological touchpoints for one conversion."""
+    hours = np.sort(rng.uniform(0, 24 * 30, size))[::-1]
+    return [
+        AttributionTouchpoint(
+            id=f"{conversion_id}-{i}",
+            organization_id="org1",
+            touchpoint_type=TouchpointType.CUSTOM,
+            channel=CHANNELS[i % len(CHANNELS)],
+            touchpoint_timestamp=now - timedelta(hours=float(h)),
+            conversion_event_id=conversion_id,
+        )
+        for i, h in enumerate(hours)
+    ]
+
+
+def _layout(journeys, values, now):
+    """Lay out in-memory journeys the way load_touchpoint_layout does."""
+    touchpoints = [tp for journey in journeys for tp in journey]
+    channels = sorted({tp.channel for tp in touchpoints})
+    return TouchpointLayout(
+        conversion_ids=[journey[0].conversion_event_id for journey in journeys],
+        conversion_values=np.array(values, dtype=np.float64),
+        conversion_timestamps=np.array([now] * len(journeys), dtype="datetime64[us]").astype(np.int64),
+        offsets=np.concatenate(([0], np.cumsum([len(journey) for journey in journeys]))),
+        touchpoint_ids=[tp.id for tp in touchpoints],
+        timestamps=np.array(
+            [tp.touchpoint_timestamp for tp in touchpoints], dtype="datetime64[us]"
+        ).astype(np.int64),
+        channel_codes=np.array([channels.index(tp.channel) for tp in touchpoints]),
+        channels=channels,
+    )
+
+
+class TestAttributionWeights:
+    """Batch weights match the per-conversion model methods."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("model_type,params", [
+        (AttributionModelType.FIRST_TOUCH, {}),
+        (AttributionModelType.LAST_TOUCH, {}),
+        (AttributionModelType.LINEAR, {}),
+        (AttributionModelType.TIME_DECAY, {"half_life_days": 7.0}),
+        (AttributionModelType.TIME_DECAY, {"half_life_days": 2.5}),
+        (AttributionModelType.POSITION_BASED, {"first_touch_weight": 0.4, "last_touch_weight": 0.4}),
+        (AttributionModelType.POSITION_BASED, {"first_touch_weight": 0.5, "last_touch_weight": 0.3}),
+        (AttributionModelType.W_SHAPED, {}),
+    ])
+    async def test_matches_per_conversion_methods(self, model_type, params):
+        """Test every journey length gets the same weights, values and hours."""
+        rng = np.random.default_rng(8)
+        now = datetime(2026, 3, 1, 12, 0, 0)
+        journeys = [_journey(f"c{i}", size, now, rng) for i, size in enumerate([1, 2, 3, 4, 5, 7, 12] * 3)]
+        values = rng.uniform(10, 500, len(journeys)).round(2).tolist()
+
+        engine = AttributionEngine(AsyncMock())
+        batch = engine._layout_results(_layout(journeys, values, now), model_type, {
+            "half_life_days": 7.0, "first_touch_weight": 0.4, "last_touch_weight": 0.4, **params
+        })
+
+        calculate = {
+            AttributionModelType.FIRST_TOUCH: engine.calculate_first_touch_attribution,
+            AttributionModelType.LAST_TOUCH: engine.calculate_last_touch_attribution,
+            AttributionModelType.LINEAR: engine.calculate_linear_attribution,
+            AttributionModelType.TIME_DECAY: engine.calculate_time_decay_attribution,
+            AttributionModelType.POSITION_BASED: engine.calculate_position_based_attribution,
+            AttributionModelType.W_SHAPED: engine.calculate_w_shaped_attribution,
+        }[model_type]
+        expected = []
+        for journey, value in zip(journeys, values):
+            expected.extend(await calculate(journey, value, *params.values()))
+
+        assert len(batch) == len(expected)
+        for got, want in zip(batch, expected):
+            assert got.touchpoint_id == want.touchpoint_id
+            assert got.conversion_event_id == want.conversion_event_id
+            assert got.weight == pytest.approx(want.weight)
+            assert got.attributed_value == pytest.approx(want.attributed_value)
+            assert got.position == want.position
+            assert got.total_touchpoints == want.total_touchpoints
+            assert got.hours_to_conversion == pytest.approx(want.hours_to_conversion)
+
+    def test_unsupported_model_falls_back_to_linear(self):
+        """Test models without a vectorized form get linear weights."""
+        now = datetime(2026, 3, 1)
+        layout = _layout([_journey("c1", 4, now, np.random.default_rng(1))], [100.0], now)
+
+        weights = attribution_weights(layout, AttributionModelType.Z_SHAPED)
+
+        assert weights == pytest.approx([0.25] * 4)
+
+    def test_channel_totals(self):
+        """Test attributed value is summed per channel."""
+        now = datetime(2026, 3, 1)
+        layout = _layout([_journey("c1", 4, now, np.random.default_rng(1))], [100.0], now)
+
+        totals = channel_totals(layout, np.array([10.0, 20.0, 30.0, 40.0]))
+
+        assert totals == {"direct": 40.0, "email": 20.0, "facebook": 30.0, "google": 10.0}
+
+
+class TestBatchProcessing:
+    """Tests for loading and processing blocks of conversions."""
+
+    async def _seed(self, db, organization_id):
+        now = datetime.utcnow().replace(microsecond=0)
+
+        def touchpoint(customer_id, hours_ago, channel, **kwargs):
+            return AttributionTouchpoint(
+                organization_id=organization_id, customer_id=customer_id,
+                touchpoint_type=TouchpointType.CUSTOM, channel=channel,
+                touchpoint_timestamp=now - timedelta(hours=hours_ago), **kwargs
+            )
+
+        touchpoints = [
+            touchpoint("cust_a", 24 * 40, "google"),  # outside the 30-day window
+            touchpoint("cust_a", 72, "google"),
+            touchpoint("cust_a", 48, "email", status=TouchpointStatus.EXCLUDED),
+            touchpoint("cust_a", 24, "facebook"),
+            touchpoint("cust_a", -1, "direct"),  # after the conversion
+            touchpoint("cust_b", 5, "email"),
+        ]
+
+        def conversion(customer_id, value):
+            return ConversionEvent(
+                organization_id=organization_id, customer_id=customer_id,
+                conversion_type=ConversionType.PURCHASE, conversion_name="Purchase",
+                conversion_value=value, conversion_timestamp=now, lookback_window_days=30,
+            )
+
+        conversions = [conversion("cust_a", 200.0), conversion("cust_b", 50.0), conversion("cust_c", 10.0)]
+        db.add_all(touchpoints + conversions)
+        await db.commit()
+        return touchpoints, conversions
+
+    @pytest.mark.asyncio
+    async def test_load_touchpoint_layout(self, db, organization_id):
+        """Test one query selects each conversion's journey inside its window."""
+        touchpoints, conversions = await self._seed(db, organization_id)
+
+        layout = await load_touchpoint_layout(db, conversions)
+
+        assert layout.lengths.tolist() == [2, 1, 0]
+        assert layout.touchpoint_ids == [touchpoints[1].id, touchpoints[3].id, touchpoints[5].id]
+        assert [layout.channels[c] for c in layout.channel_codes] == ["google", "facebook", "email"]
+        assert layout.hours_to_conversion == pytest.approx([72.0, 24.0, 5.0])
+
+    @pytest.mark.asyncio
+    async def test_process_conversions_batch(self, db, organization_id):
+        """Test a block is attributed, stored and marked in one pass."""
+        touchpoints, conversions = await self._seed(db, organization_id)
+        engine = AttributionEngine(db)
+
+        processed = await engine.process_conversions_batch(
+            conversions, [AttributionModelType.FIRST_TOUCH, AttributionModelType.LINEAR]
+        )
+
+        assert processed == 2
+        assert [c.status for c in conversions] == [
+            ConversionStatus.ATTRIBUTED, ConversionStatus.ATTRIBUTED, ConversionStatus.EXCLUDED
+        ]
+        assert conversions[0].attributed_touchpoint_count == 2
+
+        rows = (await db.execute(
+            select(Attribution).order_by(Attribution.model_type, Attribution.touchpoint_position)
+        )).scalars().all()
+        stored = {(r.model_type, r.touchpoint_id): (r.weight, r.attributed_value) for r in rows}
+        assert len(rows) == 6
+        assert {r.organization_id for r in rows} == {organization_id}
+        assert stored[(AttributionModelType.FIRST_TOUCH, touchpoints[1].id)] == (1.0, 200.0)
+        assert stored[(AttributionModelType.FIRST_TOUCH, touchpoints[3].id)] == (0.0, 0.0)
+        assert stored[(AttributionModelType.LINEAR, touchpoints[3].id)] == (0.5, 100.0)
+        assert stored[(AttributionModelType.LINEAR, touchpoints[5].id)] == (1.0, 50.0)
+
+        await db.refresh(touchpoints[3])
+        assert touchpoints[3].position_in_journey == 2
+        assert touchpoints[3].conversion_event_id == conversions[0].id
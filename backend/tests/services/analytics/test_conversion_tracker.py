@@ -525,6 +525,7 @@ class TestUtilityMethods:
         mock_result = MagicMock()
         mock_result.scalar_one_or_none.return_value = mock_conversion
         mock_db.execute.return_value = mock_result
+        mock_db.get_bind = MagicMock()
 
         result = await conversion_tracker.update_conversion_value("conv1", 150.0)
 
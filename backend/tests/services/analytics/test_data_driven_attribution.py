@@ -0,0 +1,225 @@
+"""
+Tests for Markov-chain and Shapley-value attribution.
+"""
+from datetime import datetime, timedelta
+from itertools import combinations
+from math import factorial
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from sqlalchemy import select
+
+from app.models.attribution import Attribution, AttributionModelConfig, AttributionModelType
+from app.models.attribution_touchpoint import AttributionTouchpoint, TouchpointType
+from app.models.conversion_event import ConversionEvent, ConversionType
+from app.services.analytics.attribution_engine import AttributionEngine
+from app.services.analytics.batch_attribution import TouchpointLayout, channel_weight_split
+from app.services.analytics.data_driven_attribution import (
+    DataDrivenAttributionTrainer, PathTable, markov_channel_weights, shapley_channel_weights,
+)
+
+
+def _exact_shapley(converting):
+    """Shapley values by enumerating every coalition directly."""
+    channels = sorted({c for path in converting for c in path})
+    k = len(channels)
+
+    def value(coalition):
+        return sum(1 for path in converting if set(path) <= set(coalition))
+
+    phi = {}
+    for channel in channels:
+        others = [c for c in channels if c != channel]
+        phi[channel] = sum(
+            factorial(len(s)) * factorial(k - len(s) - 1) / factorial(k)
+            * (value(s + (channel,)) - value(s))
+            for size in range(k) for s in combinations(others, size)
+        )
+    total = sum(phi.values())
+    return {channel: v / total for channel, v in phi.items()}
+
+
+class TestPathTable:
+    """Tests for path compression."""
+
+    def test_from_paths_counts_outcomes(self):
+        """Test identical paths collapse into one row with outcome counts."""
+        table = PathTable.from_paths(
+            [("google", "email"), ("google", "email"), ("email",)],
+            [("google", "email"), ("facebook",), ()]
+        )
+
+        assert table.channels == ["email", "facebook", "google"]
+        paths = {
+            tuple(table.channels[c] for c in table.codes[a:b]): (conv, null)
+            for a, b, conv, null in zip(table.offsets[:-1], table.offsets[1:], table.conversions, table.nulls)
+        }
+        assert paths == {
+            ("google", "email"): (2, 1),
+            ("email",): (1, 0),
+            ("facebook",): (0, 1),
+        }
+
+
+class TestMarkovChain:
+    """Tests for removal-effect weights."""
+
+    def test_removal_effect_single_touch_paths(self):
+        """Test single-channel paths split credit by path share."""
+        table = PathTable.from_paths([("a",)] * 3 + [("b",)])
+
+        weights, probability = markov_channel_weights(table)
+
+        assert probability == pytest.approx(1.0)
+        assert weights["a"] == pytest.approx(0.75)
+        assert weights["b"] == pytest.approx(0.25)
+
+    def test_removal_effect_with_null_paths(self):
+        """Test a channel that only leads to null gets no credit."""
+        table = PathTable.from_paths([("a", "b"), ("b",)], [("c",), ("c",), ("a",)])
+
+        weights, probability = markov_channel_weights(table)
+
+        assert probability == pytest.approx(0.4)
+        assert weights["c"] == pytest.approx(0.0)
+        assert sum(weights.values()) == pytest.approx(1.0)
+        assert weights["b"] > weights["a"]
+
+
+class TestShapley:
+    """Tests for Shapley-value weights."""
+
+    def test_two_channel_game(self):
+        """Test the textbook two-player values."""
+        table = PathTable.from_paths([("a",)] * 3 + [("a", "b")] * 2 + [("b",)])
+
+        weights = shapley_channel_weights(table)
+
+        assert weights["a"] == pytest.approx(4 / 6)
+        assert weights["b"] == pytest.approx(2 / 6)
+
+    def test_matches_exact_enumeration(self):
+        """Test the coalition table matches brute-force Shapley values."""
+        rng = np.random.default_rng(10)
+        channels = ["a", "b", "c", "d", "e"]
+        converting = [
+            tuple(rng.choice(channels, size=rng.integers(1, 5)).tolist()) for _ in range(300)
+        ]
+
+        weights = shapley_channel_weights(PathTable.from_paths(converting))
+
+        expected = _exact_shapley(converting)
+        assert weights.keys() == expected.keys()
+        for channel in channels:
+            assert weights[channel] == pytest.approx(expected[channel])
+
+    def test_pools_channels_beyond_max(self):
+        """Test minor channels share one player's value."""
+        table = PathTable.from_paths([("a",)] * 5 + [("b",)] * 2 + [("c",)])
+
+        weights = shapley_channel_weights(table, max_channels=1)
+
+        assert weights["a"] == pytest.approx(5 / 8)
+        assert weights["b"] == pytest.approx(2 / 8)
+        assert weights["c"] == pytest.approx(1 / 8)
+
+
+class TestChannelWeightAttribution:
+    """Per-conversion lookups of trained channel weights."""
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_per_conversion(self):
+        """Test the vectorized split matches calculate_channel_weight_attribution."""
+        now = datetime(2026, 3, 1)
+        channel_weights = {"google": 0.5, "email": 0.3, "facebook": 0.2}
+        journeys = [
+            ["google", "email", "email", "facebook"],
+            ["email"],
+            ["direct", "direct"],
+            ["google", "direct", "google"],
+        ]
+        touchpoints = [
+            [
+                AttributionTouchpoint(
+                    id=f"c{i}-{j}", organization_id="org1", touchpoint_type=TouchpointType.CUSTOM,
+                    channel=channel, touchpoint_timestamp=now - timedelta(hours=10 * (len(journey) - j)),
+                    conversion_event_id=f"c{i}",
+                )
+                for j, channel in enumerate(journey)
+            ]
+            for i, journey in enumerate(journeys)
+        ]
+        flat = [tp for journey in touchpoints for tp in journey]
+        channels = sorted({tp.channel for tp in flat})
+        layout = TouchpointLayout(
+            conversion_ids=[f"c{i}" for i in range(len(journeys))],
+            conversion_values=np.full(len(journeys), 100.0),
+            conversion_timestamps=np.zeros(len(journeys), dtype=np.int64),
+            offsets=np.concatenate(([0], np.cumsum([len(j) for j in journeys]))),
+            touchpoint_ids=[tp.id for tp in flat],
+            timestamps=np.zeros(len(flat), dtype=np.int64),
+            channel_codes=np.array([channels.index(tp.channel) for tp in flat]),
+            channels=channels,
+        )
+
+        batch = channel_weight_split(layout, channel_weights)
+
+        engine = AttributionEngine(AsyncMock())
+        expected = []
+        for journey in touchpoints:
+            results = await engine.calculate_channel_weight_attribution(journey, 100.0, channel_weights)
+            expected.extend(r.weight for r in results)
+        assert batch == pytest.approx(expected)
+        assert expected[:4] == pytest.approx([0.5, 0.15, 0.15, 0.2])
+        assert expected[5:7] == pytest.approx([0.5, 0.5])  # no trained channel: linear
+        assert expected[7:] == pytest.approx([0.5, 0.0, 0.5])
+
+
+class TestTrainer:
+    """Tests for offline training and per-conversion use of its weights."""
+
+    @pytest.mark.asyncio
+    async def test_train_and_attribute(self, db, organization_id):
+        """Test trained weights are stored and applied by default."""
+        now = datetime.utcnow()
+        journeys = [("cust1", ["google", "email"], True), ("cust2", ["google"], True),
+                    ("cust3", ["facebook"], False), ("cust4", ["email", "facebook"], False)]
+        conversions = []
+        for customer_id, channels, converted in journeys:
+            for i, channel in enumerate(channels):
+                db.add(AttributionTouchpoint(
+                    organization_id=organization_id, customer_id=customer_id,
+                    touchpoint_type=TouchpointType.CUSTOM, channel=channel,
+                    touchpoint_timestamp=now - timedelta(days=5, hours=len(channels) - i),
+                ))
+            if converted:
+                conversions.append(ConversionEvent(
+                    organization_id=organization_id, customer_id=customer_id,
+                    conversion_type=ConversionType.PURCHASE, conversion_name="Purchase",
+                    conversion_value=100.0, conversion_timestamp=now - timedelta(days=5),
+                ))
+        db.add_all(conversions)
+        await db.commit()
+
+        result = await DataDrivenAttributionTrainer(db).train(organization_id, lookback_days=30, now=now)
+
+        assert result["status"] == "completed"
+        assert result["conversions"] == 2
+        assert result["non_converting_paths"] == 2
+        configs = (await db.execute(select(AttributionModelConfig))).scalars().all()
+        assert {c.model_type for c in configs} == {
+            AttributionModelType.MARKOV_CHAIN, AttributionModelType.SHAPLEY_VALUE
+        }
+        shapley = next(c for c in configs if c.model_type == AttributionModelType.SHAPLEY_VALUE)
+        assert shapley.parameters["channel_weights"]["google"] == pytest.approx(0.75)
+        assert shapley.parameters["channel_weights"]["facebook"] == pytest.approx(0.0)
+
+        engine = AttributionEngine(db)
+        assert await engine.process_conversions_batch(conversions) == 2
+
+        rows = (await db.execute(
+            select(Attribution).where(Attribution.model_type == AttributionModelType.SHAPLEY_VALUE)
+        )).scalars().all()
+        assert sorted(r.weight for r in rows) == pytest.approx([0.25, 0.75, 1.0])
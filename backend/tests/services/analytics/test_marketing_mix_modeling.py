@@ -10,6 +10,13 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from app.services.analytics.marketing_mix_modeling import (
     MarketingMixModelingService, MMMTrainingResult
 )
+from app.services.analytics.mmm_hyperparameters import (
+    HyperparameterSearch, SearchData, cv_rmse, matrix_cv_rmse, sweep_scores, time_series_folds,
+)
+from app.services.analytics.mmm_response_curves import (
+    ResponseCurves, build_response_curves, get_response_curve_cache,
+)
+from app.services.analytics.mmm_transforms import adstock_matrix, median_adstock, saturation_matrix
 from app.models.marketing_mix_model import (
     MarketingMixModel, MMMChannel, MMMChannelDaily, MMMModelStatus
 )
@@ -187,6 +194,132 @@ class TestSaturationTransformation:
         assert saturated[2] == pytest.approx(0.5, abs=0.01)
 
 
+class TestVectorizedKernels:
+    """Tests for the batched adstock/saturation kernels."""
+
+    @staticmethod
+    def _loop_adstock(spend, decay, peak_delay):
+        """Reference per-day adstock loop."""
+        adstocked = np.zeros_like(spend)
+        for i in range(len(spend)):
+            adstocked[i] = spend[i]
+            if i == 0:
+                continue
+            if peak_delay == 0:
+                adstocked[i] += decay * adstocked[i - 1]
+            else:
+                for j in range(1, min(peak_delay + 1, i + 1)):
+                    weight = ((j / peak_delay) ** peak_delay) * np.exp(peak_delay - j)
+                    adstocked[i] += decay * weight * spend[i - j]
+        return adstocked
+
+    def test_adstock_matrix_matches_loop(self):
+        """Test every channel matches the per-day loop for its parameters."""
+        rng = np.random.default_rng(0)
+        spend = rng.uniform(0, 1000, size=(60, 6))
+        decays = [0.0, 0.3, 0.3, 0.7, 0.5, 0.9]
+        peak_delays = [0, 0, 2, 0, 3, 1]
+
+        adstocked = adstock_matrix(spend, decays, peak_delays)
+
+        for column in range(spend.shape[1]):
+            expected = self._loop_adstock(spend[:, column], decays[column], peak_delays[column])
+            np.testing.assert_allclose(adstocked[:, column], expected)
+
+    def test_saturation_matrix_matches_per_channel(self, mmm_service):
+        """Test batched saturation matches apply_saturation per channel."""
+        rng = np.random.default_rng(1)
+        adstocked = rng.uniform(0, 1000, size=(30, 3))
+        shapes, k, half = ["hill", "logistic", "linear"], [2.0, 1.5, 1.0], [400.0, 500.0, None]
+
+        saturated = saturation_matrix(adstocked, shapes, k, half)
+
+        for column, shape in enumerate(shapes):
+            expected = mmm_service.apply_saturation(adstocked[:, column], shape, k[column], half[column])
+            np.testing.assert_allclose(saturated[:, column], expected)
+
+
+class TestHyperparameterSearch:
+    """Tests for cross-validated adstock/saturation search."""
+
+    @pytest.fixture
+    def search_data(self):
+        """Synthetic spend with known decays."""
+        rng = np.random.default_rng(7)
+        days = 240
+        spend = rng.gamma(2.0, 500.0, size=(days, 3))
+        adstocked = adstock_matrix(spend, [0.7, 0.1, 0.4])
+        saturated = saturation_matrix(adstocked, ["hill"] * 3, [1.0] * 3, median_adstock(adstocked))
+        target = 1000 + saturated @ np.array([3000.0, 1500.0, 2000.0]) + rng.normal(0, 50, days)
+        return SearchData(
+            spend=spend, target=target, controls=np.arange(days, dtype=float)[:, None],
+            peak_delays=np.zeros(3, dtype=int), shapes=["hill"] * 3, folds=time_series_folds(days, 4),
+        )
+
+    def test_matrix_cv_rmse_matches_ridge(self, search_data):
+        """Test the closed-form folds match StandardScaler + Ridge refits."""
+        from sklearn.linear_model import Ridge
+        from sklearn.preprocessing import StandardScaler
+
+        X = np.random.default_rng(3).normal(size=(len(search_data.target), 4))
+        y = search_data.target
+        errors = []
+        for train_end, test_end in search_data.folds:
+            scaler = StandardScaler().fit(X[:train_end])
+            ridge = Ridge(alpha=1.0).fit(scaler.transform(X[:train_end]), y[:train_end])
+            errors.append(y[train_end:test_end] - ridge.predict(scaler.transform(X[train_end:test_end])))
+
+        expected = np.sqrt(np.mean(np.concatenate(errors) ** 2))
+        assert matrix_cv_rmse(X, y, search_data.folds, 1.0) == pytest.approx(expected)
+
+    def test_sweep_scores_match_full_candidates(self, search_data):
+        """Test single-channel sweeps score like full candidates."""
+        best = np.vstack([np.full(3, 0.3), np.ones(3), np.ones(3)])
+        combinations = [(0.0, 1.0, 1.0), (0.7, 2.0, 0.5)]
+
+        scores = sweep_scores(search_data, best, 1, combinations)
+
+        for combination, score in zip(combinations, scores):
+            candidate = best.copy()
+            candidate[:, 1] = combination
+            assert score == pytest.approx(cv_rmse(search_data, candidate))
+
+    @pytest.mark.parametrize("method", ["grid", "random"])
+    def test_search_improves_cv_error(self, search_data, method):
+        """Test the search never ends worse than its starting point."""
+        initial = np.vstack([np.full(3, 0.3), np.full(3, 2.0), np.ones(3)])
+
+        result = HyperparameterSearch(search_data, method=method, n_trials=50, workers=1).run(initial)
+
+        assert result.cv_rmse < result.baseline_cv_rmse
+        assert result.trials > 0
+        assert len(result.half_spend) == 3
+
+    def test_grid_search_recovers_decay(self, search_data):
+        """Test grid search finds the strongest carryover channel."""
+        initial = np.vstack([np.full(3, 0.3), np.ones(3), np.ones(3)])
+
+        result = HyperparameterSearch(search_data, method="grid", workers=1).run(initial)
+
+        assert result.decay[0] == pytest.approx(0.7, abs=0.1)
+        assert result.decay[1] <= 0.3
+
+    def test_process_pool_matches_in_process(self, search_data):
+        """Test scoring in worker processes gives the in-process result."""
+        initial = np.vstack([np.full(3, 0.3), np.ones(3), np.ones(3)])
+
+        local = HyperparameterSearch(search_data, method="random", n_trials=20, workers=1).run(initial)
+        pooled = HyperparameterSearch(search_data, method="random", n_trials=20, workers=2).run(initial)
+
+        assert pooled.cv_rmse == pytest.approx(local.cv_rmse)
+        np.testing.assert_array_equal(pooled.decay, local.decay)
+
+    def test_unknown_method(self, search_data):
+        """Test an unknown method is rejected."""
+        with pytest.raises(ValueError, match="Unknown search method"):
+            HyperparameterSearch(search_data, method="bayesian")
+
+
 class TestFeatureTransformation:
     """Tests for feature transformation pipeline."""
 
@@ -244,6 +377,51 @@ class TestModelTraining:
         assert result.mape >= 0
         assert "channels" in result.coefficients
 
+    @pytest.mark.asyncio
+    async def test_train_model_with_hyperparameter_search(
+        self, mmm_service, sample_model, sample_training_data, mock_db
+    ):
+        """Test training searches and stores adstock/saturation parameters."""
+        sample_model.model_config = {
+            **sample_model.model_config,
+            "hyperparameter_search": {"method": "random", "n_trials": 20, "workers": 1},
+        }
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = sample_model
+        mock_db.execute.return_value = mock_result
+
+        with patch.object(mmm_service, '_load_training_data', return_value=sample_training_data):
+            await mmm_service.train_model("model1")
+
+        summary = sample_model.diagnostics["hyperparameter_search"]
+        assert summary["method"] == "random"
+        assert summary["cv_rmse"] <= summary["baseline_cv_rmse"]
+        assert sample_model.performance_metrics["cv_rmse"] == pytest.approx(summary["cv_rmse"])
+        assert sample_model.adstock_params["paid_search"]["peak_delay"] == 0
+        assert sample_model.saturation_params["paid_search"]["half_spend"] > 0
+
+    @pytest.mark.asyncio
+    async def test_train_model_tabulates_response_curves(
+        self, mmm_service, sample_model, sample_training_data, mock_db
+    ):
+        """Test training stores a response curve per channel."""
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = sample_model
+        mock_db.execute.return_value = mock_result
+
+        with patch.object(mmm_service, '_load_training_data', return_value=sample_training_data):
+            await mmm_service.train_model("model1")
+
+        assert "artifact" in sample_model.response_curves
+        curves = mmm_service.get_response_curves(sample_model)
+        assert curves.channels == ["paid_search", "paid_social", "display"]
+        assert curves.daily_spend[0, -1] >= sample_training_data["paid_search"].max()
+        assert np.all(curves.daily_return[:, 0] == 0)
+        channels = sample_model.model_coefficients["channels"]
+        assert channels["paid_search"]["mroi"] == pytest.approx(
+            curves.marginal_roi(sample_training_data[curves.channels].mean().to_numpy(), 1)[0]
+        )
+
     @pytest.mark.asyncio
     async def test_train_model_not_found(self, mmm_service, mock_db):
         """Test training with non-existent model."""
@@ -345,6 +523,117 @@ class TestPrediction:
 class TestBudgetOptimization:
     """Tests for budget optimization."""
 
+    @pytest.fixture
+    def trained_model(self, sample_model):
+        """Sample model with tabulated response curves."""
+        sample_model.id = "model1"
+        sample_model.status = MMMModelStatus.TRAINED
+        sample_model.trained_at = datetime(2024, 4, 1)
+        sample_model.response_curves = build_response_curves(
+            ["paid_search", "paid_social", "display"],
+            max_daily_spend=[5000.0, 3000.0, 1500.0],
+            decays=[0.3, 0.4, 0.5],
+            peak_delays=[0, 0, 1],
+            shapes=["hill", "hill", "hill"],
+            k=[1.0, 1.0, 1.0],
+            half_spend=[4000.0, 2000.0, 1000.0],
+            coefficients=[20000.0, 9000.0, 3000.0],
+        ).to_dict()
+        get_response_curve_cache().clear()
+        return sample_model
+
+    @pytest.mark.asyncio
+    async def test_optimize_budget_on_response_curves(self, mmm_service, trained_model, mock_db):
+        """Test the optimizer allocates over the model's curves and beats the current mix."""
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = trained_model
+        mock_db.execute.return_value = mock_result
+
+        with patch.object(mmm_service, '_get_current_allocation', return_value={
+            "paid_search": {"spend": 10000},
+            "paid_social": {"spend": 10000},
+            "display": {"spend": 80000}
+        }):
+            result = await mmm_service.optimize_budget(model_id="model1", total_budget=100000)
+
+        assert result.optimization_algorithm == "marginal_roi"
+        spend = sum(item["spend"] for item in result.optimized_allocation.values())
+        assert spend == pytest.approx(100000)
+        assert result.improvement_pct > 0
+        assert result.current_allocation["display"]["predicted_return"] > 0
+        mock_db.add.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_optimize_budget_group_limits_use_slsqp(self, mmm_service, trained_model, mock_db):
+        """Test group constraints switch to SLSQP and a preview is not saved."""
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = trained_model
+        mock_db.execute.return_value = mock_result
+        mock_db.add = MagicMock()
+
+        constraints = {"group_spend": [{"channels": ["paid_social", "display"], "max": 20000}]}
+        with patch.object(mmm_service, '_get_current_allocation', return_value={}):
+            result = await mmm_service.optimize_budget(
+                model_id="model1", total_budget=100000, constraints=constraints, persist=False
+            )
+
+        allocation = result.optimized_allocation
+        assert result.optimization_algorithm == "slsqp"
+        assert allocation["paid_social"]["spend"] + allocation["display"]["spend"] <= 20000 + 1e-3
+        mock_db.add.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_optimize_budget_builds_missing_curves(
+        self, mmm_service, trained_model, sample_training_data, mock_db
+    ):
+        """Test models trained before response curves get them tabulated and saved on first use."""
+        trained_model.response_curves = None
+        trained_model.model_coefficients = {"intercept": 10000.0, "channels": {
+            "paid_search": {"coefficient": 20000.0},
+            "paid_social": {"coefficient": 9000.0},
+            "display": {"coefficient": 3000.0},
+        }}
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = trained_model
+        mock_db.execute.return_value = mock_result
+
+        with patch.object(mmm_service, '_load_training_data', return_value=sample_training_data) as load, \
+                patch.object(mmm_service, '_get_current_allocation', return_value={}):
+            result = await mmm_service.optimize_budget(model_id="model1", total_budget=100000, persist=False)
+            await mmm_service.optimize_budget(model_id="model1", total_budget=50000, persist=False)
+
+        assert load.await_count == 1
+        assert trained_model.response_curves["channels"]
+        curves = mmm_service.get_response_curves(trained_model)
+        expected = mmm_service._build_response_curves(
+            trained_model, sample_training_data, curves.channels, np.array([20000.0, 9000.0, 3000.0])
+        )
+        np.testing.assert_allclose(curves.daily_return, expected.daily_return)
+        assert sum(item["spend"] for item in result.optimized_allocation.values()) == pytest.approx(100000)
+
+    @pytest.mark.asyncio
+    async def test_missing_curves_refit_without_stored_coefficients(
+        self, mmm_service, trained_model, sample_training_data, mock_db
+    ):
+        """Test curves are recovered from a refit when no channel coefficients were stored."""
+        trained_model.response_curves = None
+        trained_model.model_coefficients = {"intercept": 0.0, "channels": {}}
+
+        with patch.object(mmm_service, '_load_training_data', return_value=sample_training_data):
+            curves = await mmm_service._ensure_response_curves(trained_model)
+
+        assert curves.channels == ["paid_search", "paid_social", "display"]
+        assert np.all(curves.daily_return[:, -1] > 0)
+
+    def test_response_curves_are_cached(self, mmm_service, trained_model):
+        """Test parsed curves are reused for the same trained model version."""
+        first = mmm_service.get_response_curves(trained_model)
+        second = mmm_service.get_response_curves(trained_model)
+
+        assert first is second
+        trained_model.trained_at = datetime(2024, 5, 1)
+        assert mmm_service.get_response_curves(trained_model) is not first
+
     @pytest.mark.asyncio
     async def test_optimize_budget(self, mmm_service, sample_model, mock_db):
         """Test budget optimization."""
@@ -400,6 +689,82 @@ class TestBudgetOptimization:
         assert paid_search_spend <= 60000
 
 
+class TestResponseCurves:
+    """Tests for tabulated response curves and curve-based allocation."""
+
+    @pytest.fixture
+    def curves(self):
+        """Two concave channels with different returns and saturation points."""
+        return build_response_curves(
+            ["search", "social"],
+            max_daily_spend=[1000.0, 1000.0],
+            decays=[0.3, 0.0],
+            peak_delays=[0, 0],
+            shapes=["hill", "hill"],
+            k=[1.0, 1.0],
+            half_spend=[800.0, 300.0],
+            coefficients=[5000.0, 2000.0],
+        )
+
+    def test_curve_starts_at_zero_and_saturates(self, curves):
+        """Test returns are zero at zero spend and have diminishing marginal ROI."""
+        assert np.all(curves.daily_return[:, 0] == 0)
+        assert np.all(np.diff(curves.daily_return, axis=1) >= 0)
+        assert np.all(np.diff(curves.marginal, axis=1) <= 1e-9)
+
+    def test_allocate_matches_brute_force(self, curves):
+        """Test greedy marginal-ROI allocation finds the best split."""
+        budget, days = 30000.0, 30
+        spend = curves.allocate(budget, days)
+
+        splits = np.linspace(0, budget, 3001)
+        brute = max(curves.evaluate(np.array([x, budget - x]), days).sum() for x in splits)
+
+        assert spend.sum() == pytest.approx(budget)
+        assert curves.evaluate(spend, days).sum() >= brute - 1e-6 * brute
+
+    def test_allocate_respects_bounds(self, curves):
+        """Test per-channel minimum and maximum spend."""
+        spend = curves.allocate(30000.0, 30, lower=np.array([0.0, 20000.0]), upper=np.array([8000.0, np.inf]))
+
+        assert spend[0] <= 8000.0
+        assert spend[1] >= 20000.0
+        assert spend.sum() == pytest.approx(30000.0)
+
+    def test_allocate_rejects_infeasible_bounds(self, curves):
+        """Test minimums above the budget are rejected."""
+        with pytest.raises(ValueError, match="Minimum channel spend"):
+            curves.allocate(1000.0, 30, lower=np.array([800.0, 800.0]))
+
+    def test_s_curve_is_funded_past_its_threshold(self):
+        """Test the concave envelope lets an S-shaped channel be funded."""
+        curves = build_response_curves(
+            ["s_curve"], [1000.0], [0.0], [0], ["hill"], [3.0], [500.0], [1000.0]
+        )
+        breaks, slopes = curves.envelopes[0]
+
+        assert np.all(np.diff(slopes) <= 1e-12)
+        assert curves.allocate(15000.0, 30)[0] == pytest.approx(15000.0)
+
+    def test_optimize_respects_group_limits(self, curves):
+        """Test SLSQP honours spend limits on channel groups."""
+        spend, info = curves.optimize(30000.0, 30, groups=[{"channels": ["social"], "min": 25000.0}])
+
+        assert spend[1] >= 25000.0 - 1e-3
+        assert spend.sum() == pytest.approx(30000.0)
+        assert info["success"]
+
+    def test_round_trip_and_subset(self, curves):
+        """Test serialization and reordering with unknown channels."""
+        restored = ResponseCurves.from_dict(curves.to_dict())
+        np.testing.assert_allclose(restored.daily_return, curves.daily_return)
+
+        subset = restored.subset(["social", "unknown"])
+        np.testing.assert_allclose(subset.daily_return[0], curves.daily_return[1])
+        assert subset.evaluate(np.array([0.0, 5000.0]), 30)[1] == 0
+        assert subset.allocate(1000.0, 30)[0] == pytest.approx(1000.0)
+
+
 class TestReporting:
     """Tests for reporting functionality."""
 
@@ -0,0 +1,113 @@
+"""
+Tests for the columnar MMM daily data loader.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from app.models.marketing_mix_model import MarketingMixModel, MMMChannel, MMMChannelDaily, MMMChannelType
+from app.services.analytics.marketing_mix_modeling import MarketingMixModelingService
+from app.services.analytics.mmm_data import MMMDataLoader, get_mmm_data_cache
+
+START = date(2024, 1, 1)
+
+
+@pytest_asyncio.fixture
+async def model(db, organization_id):
+    """A model with two channels and five days of data (one day missing for display)."""
+    model = MarketingMixModel(
+        organization_id=organization_id, name="MMM", target_variable="revenue", model_config={}
+    )
+    search = MMMChannel(channel_type=MMMChannelType.PAID_SEARCH, channel_name="paid_search")
+    display = MMMChannel(channel_type=MMMChannelType.DISPLAY, channel_name="display")
+    model.channels = [search, display]
+    db.add(model)
+    await db.flush()
+
+    for day in range(5):
+        db.add(MMMChannelDaily(
+            model_id=model.id, channel_id=search.id, date=START + timedelta(days=day),
+            spend=100.0 * (day + 1), target_value=1000.0 + day
+        ))
+        if day != 2:
+            db.add(MMMChannelDaily(
+                model_id=model.id, channel_id=display.id, date=START + timedelta(days=day),
+                spend=10.0 * (day + 1), target_value=1000.0 + day
+            ))
+    await db.commit()
+    get_mmm_data_cache().clear()
+    return model
+
+
+class TestMMMDataLoader:
+    """Tests for MMMDataLoader."""
+
+    @pytest.mark.asyncio
+    async def test_pivots_rows_into_matrix(self, db, model):
+        """Test one row per date with a spend column per channel."""
+        matrix = await MMMDataLoader(db, partition_size=2).query(model)
+
+        assert matrix.channels == ["paid_search", "display"]
+        assert list(matrix.dates) == [np.datetime64(START + timedelta(days=d)) for d in range(5)]
+        np.testing.assert_array_equal(matrix.spend[:, 0], [100, 200, 300, 400, 500])
+        np.testing.assert_array_equal(matrix.spend[:, 1], [10, 20, 0, 40, 50])
+        np.testing.assert_array_equal(matrix.target, [1000, 1001, 1002, 1003, 1004])
+
+    @pytest.mark.asyncio
+    async def test_training_frame(self, db, model):
+        """Test the service's training frame has date, channel and target columns."""
+        df = await MarketingMixModelingService(db)._load_training_data(model)
+
+        assert list(df.columns) == ["date", "paid_search", "display", "revenue"]
+        assert len(df) == 5
+        assert df["display"].sum() == 120
+
+    @pytest.mark.asyncio
+    async def test_current_allocation_uses_latest_period(self, db, model):
+        """Test current allocation sums spend over the latest days only."""
+        allocation = await MarketingMixModelingService(db)._get_current_allocation(model, period_days=2)
+
+        assert allocation["paid_search"]["spend"] == 900
+        assert allocation["display"]["spend"] == 90
+
+    @pytest.mark.asyncio
+    async def test_cache_invalidated_by_new_rows(self, db, model):
+        """Test a committed daily row invalidates the cached matrix."""
+        loader = MMMDataLoader(db)
+        first = await loader.load(model)
+        assert await loader.load(model) is first
+        assert not first.spend.flags.writeable
+
+        db.add(MMMChannelDaily(
+            model_id=model.id, channel_id=model.channels[0].id, date=START + timedelta(days=5), spend=600.0
+        ))
+        await db.commit()
+
+        reloaded = await loader.load(model)
+        assert reloaded is not first
+        assert len(reloaded) == 6
+
+    @pytest.mark.asyncio
+    async def test_rolled_back_rows_keep_cache(self, db, model):
+        """Test a rolled-back write does not invalidate the matrix."""
+        cache = get_mmm_data_cache()
+        await MMMDataLoader(db).load(model)
+        invalidations = cache.stats()["invalidations"]
+
+        db.add(MMMChannelDaily(
+            model_id=model.id, channel_id=model.channels[0].id, date=START + timedelta(days=5), spend=600.0
+        ))
+        await db.flush()
+        await db.rollback()
+
+        assert cache.stats()["invalidations"] == invalidations
+        assert cache.stats()["models"] == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_model_raises(self, db, model):
+        """Test training without daily rows reports missing data."""
+        model.id = "no-data"
+        with pytest.raises(ValueError, match="No training data"):
+            await MarketingMixModelingService(db)._load_training_data(model)
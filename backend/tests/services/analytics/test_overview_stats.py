@@ -0,0 +1,118 @@
+"""
+Tests for the organization overview statistics service.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.asset import Asset, AssetStatus, AssetType
+from app.models.campaign import Campaign
+from app.models.scheduled_post import ScheduledPost
+from app.models.task import Task
+from app.models.user import Organization
+from app.services.analytics.overview_stats import OverviewStatsService
+
+NOW = datetime(2026, 3, 10, 12)
+
+
+async def _seed(db, organization_id):
+    campaigns = [
+        Campaign(organization_id=organization_id, name=f"Campaign {i}", status=status,
+                 created_at=NOW - timedelta(days=age))
+        for i, (status, age) in enumerate([("draft", 1), ("completed", 10), ("completed", 40), ("active", 3)])
+    ]
+    db.add_all(campaigns)
+    await db.flush()
+
+    db.add_all([
+        Asset(campaign_id=campaigns[0].id, name="Email", asset_type=AssetType.EMAIL_CAMPAIGN,
+              status=AssetStatus.DRAFT, created_by="user1", created_at=NOW - timedelta(days=2)),
+        Asset(campaign_id=campaigns[1].id, name="Post", asset_type=AssetType.SOCIAL_POST,
+              status=AssetStatus.APPROVED, created_by="user1", created_at=NOW - timedelta(days=20)),
+        Task(organization_id=organization_id, title="Late", status="todo", priority="high",
+             due_date=NOW - timedelta(days=1)),
+        Task(organization_id=organization_id, title="Done", status="completed", priority="high",
+             due_date=NOW - timedelta(days=1)),
+        Task(organization_id=organization_id, title="Later", status="in_progress", priority="low",
+             due_date=NOW + timedelta(days=1)),
+        ScheduledPost(organization_id=organization_id, title="A", content="a", platform="twitter",
+                      status="published", scheduled_at=NOW - timedelta(days=2),
+                      published_at=NOW - timedelta(days=2)),
+        ScheduledPost(organization_id=organization_id, title="B", content="b", platform="linkedin",
+                      status="scheduled", scheduled_at=NOW + timedelta(days=2)),
+    ])
+    await db.commit()
+    return campaigns
+
+
+class TestOverviewStats:
+    """Tests for aggregate overview statistics."""
+
+    @pytest.mark.asyncio
+    async def test_compute(self, db, organization_id):
+        """Test grouped counts match the seeded rows."""
+        await _seed(db, organization_id)
+
+        stats = await OverviewStatsService(db).compute(organization_id, now=NOW)
+
+        assert stats["campaigns"] == {
+            "total": 4,
+            "by_status": {"draft": 1, "completed": 2, "active": 1},
+            "created_this_week": 2,
+            "created_this_month": 3,
+            "completion_rate": 50.0,
+        }
+        assert stats["assets"] == {
+            "total": 2,
+            "by_type": {AssetType.EMAIL_CAMPAIGN.value: 1, AssetType.SOCIAL_POST.value: 1},
+            "by_status": {AssetStatus.DRAFT.value: 1, AssetStatus.APPROVED.value: 1},
+            "created_this_week": 1,
+        }
+        assert stats["tasks"]["overdue_count"] == 1
+        assert stats["tasks"]["high_priority_count"] == 2
+        assert stats["tasks"]["completion_rate"] == pytest.approx(100 / 3)
+        assert stats["scheduled_posts"]["by_platform"] == {"twitter": 1, "linkedin": 1}
+        assert stats["scheduled_posts"]["published_this_week"] == 1
+        assert stats["scheduled_posts"]["scheduled_this_week"] == 2
+        assert [a["title"] for a in stats["recent_activity"][:3]] == ["Campaign 0", "Email", "Campaign 3"]
+
+    @pytest.mark.asyncio
+    async def test_scoped_to_organization(self, db, organization_id):
+        """Test another organization's rows are not counted."""
+        other = Organization(name="Other Org", slug="other-org")
+        db.add(other)
+        await db.commit()
+        await _seed(db, other.id)
+
+        stats = await OverviewStatsService(db).compute(organization_id, now=NOW)
+
+        assert stats["campaigns"]["total"] == 0
+        assert stats["assets"]["total"] == 0
+        assert stats["recent_activity"] == []
+
+    @pytest.mark.asyncio
+    async def test_cache_invalidated_on_commit(self, db, organization_id):
+        """Test snapshots are reused until a counted entity is written."""
+        campaigns = await _seed(db, organization_id)
+        campaign_id = campaigns[0].id
+        service = OverviewStatsService(db)
+
+        first = await service.get_overview(organization_id)
+        assert await service.get_overview(organization_id) is first
+
+        db.add(Asset(campaign_id=campaign_id, name="Banner", asset_type=AssetType.DISPLAY_AD,
+                     created_by="user1"))
+        await db.commit()
+        second = await service.get_overview(organization_id)
+        assert second["assets"]["total"] == 3
+
+        # Rolled-back writes do not invalidate
+        db.add(Task(organization_id=organization_id, title="Discarded"))
+        await db.flush()
+        await db.rollback()
+        assert await service.get_overview(organization_id) is second
+
+        campaign = await db.get(Campaign, campaign_id)
+        campaign.status = "completed"
+        await db.commit()
+        assert (await service.get_overview(organization_id))["campaigns"]["by_status"]["completed"] == 3
@@ -0,0 +1,88 @@
+"""
+Tests for concurrent query fan-out.
+"""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.analytics.query_fanout import QueryFanout
+
+
+class _FakeSession:
+    """Stands in for a pooled session; records concurrent use."""
+
+    active = 0
+    peak = 0
+
+    def __init__(self):
+        self.closed = False
+
+    async def run(self, value, delay=0.01):
+        _FakeSession.active += 1
+        _FakeSession.peak = max(_FakeSession.peak, _FakeSession.active)
+        try:
+            await asyncio.sleep(delay)
+            return value
+        finally:
+            _FakeSession.active -= 1
+
+    async def close(self):
+        self.closed = True
+
+
+def _concurrent_fanout(width):
+    """A fan-out forced onto its concurrent path with fake pooled sessions."""
+    fanout = QueryFanout(AsyncMock(), width=width)
+    fanout.concurrent = True
+    fanout._session_factory = _FakeSession
+    _FakeSession.active = _FakeSession.peak = 0
+    return fanout
+
+
+class TestQueryFanout:
+    """Tests for QueryFanout."""
+
+    @pytest.mark.asyncio
+    async def test_sequential_on_request_session(self, db):
+        """Test SQLite sessions run queries in order on the request session."""
+        seen = []
+
+        async def query(session, value):
+            seen.append(session)
+            return value
+
+        async with QueryFanout(db, width=4) as fanout:
+            assert not fanout.concurrent
+            results = await fanout.gather(lambda s: query(s, 1), lambda s: query(s, 2))
+
+        assert results == [1, 2]
+        assert seen == [db, db]
+
+    @pytest.mark.asyncio
+    async def test_width_bounds_open_sessions(self):
+        """Test results keep their order and at most `width` sessions are used."""
+        fanout = _concurrent_fanout(width=3)
+
+        results = await fanout.gather(*(lambda s, i=i: s.run(i) for i in range(10)))
+
+        assert results == list(range(10))
+        assert _FakeSession.peak == 3
+        assert len(fanout._sessions) == 3
+        sessions = list(fanout._sessions)
+        await fanout.close()
+        assert all(session.closed for session in sessions)
+
+    @pytest.mark.asyncio
+    async def test_failure_waits_for_running_queries(self):
+        """Test the first error is raised only after every query finished."""
+        fanout = _concurrent_fanout(width=2)
+
+        async def fail(session):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            await fanout.gather(fail, lambda s: s.run("slow", delay=0.05))
+
+        assert _FakeSession.active == 0
+        await fanout.close()
@@ -0,0 +1,236 @@
+"""
+Tests for analytics rollups and dashboard query routing.
+"""
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import select
+
+from app.models.analytics_rollup import AnalyticsRollup
+from app.models.attribution import Attribution, AttributionModelType
+from app.models.attribution_touchpoint import AttributionTouchpoint, TouchpointType
+from app.models.conversion_event import ConversionEvent, ConversionStatus, ConversionType
+from app.services.analytics.analytics_dashboard import AnalyticsDashboardService
+from app.services.analytics.attribution_engine import AttributionEngine
+from app.services.analytics.conversion_tracker import ConversionTracker
+from app.services.analytics.rollups import MEASURES, RollupDeltas, RollupStore, plan_range
+
+CHANNELS = ["google", "email", "facebook"]
+
+
+async def _rollups(db):
+    """Non-empty rollup rows keyed by bucket and dimensions."""
+    rows = (await db.execute(select(AnalyticsRollup))).scalars().all()
+    return {
+        (r.granularity, r.bucket, r.channel, r.campaign_id, r.model_type): tuple(getattr(r, m) for m in MEASURES)
+        for r in rows
+        if r.conversion_count or r.attribution_count
+    }
+
+
+def _assert_same_rollups(got, want):
+    assert got.keys() == want.keys()
+    for key in want:
+        assert got[key] == pytest.approx(want[key]), key
+
+
+class TestPlanRange:
+    """Tests for splitting ranges between rollups and raw rows."""
+
+    def test_days_hours_and_edges(self):
+        """Test whole days, whole hours and sub-hour edges are separated."""
+        plan = plan_range(datetime(2026, 3, 6, 7, 23), datetime(2026, 3, 9, 15, 41))
+
+        assert plan.buckets == [
+            ("day", datetime(2026, 3, 7), datetime(2026, 3, 9)),
+            ("hour", datetime(2026, 3, 6, 8), datetime(2026, 3, 7)),
+            ("hour", datetime(2026, 3, 9), datetime(2026, 3, 9, 15)),
+        ]
+        assert plan.raw == [
+            (datetime(2026, 3, 6, 7, 23), datetime(2026, 3, 6, 8), False),
+            (datetime(2026, 3, 9, 15), datetime(2026, 3, 9, 15, 41), True),
+        ]
+
+    def test_short_range_is_raw(self):
+        """Test a range inside one hour never touches rollups."""
+        start, end = datetime(2026, 3, 6, 7, 5), datetime(2026, 3, 6, 7, 55)
+
+        plan = plan_range(start, end)
+
+        assert plan.buckets == []
+        assert plan.raw == [(start, end, True)]
+
+    def test_exclusive_aligned_end(self):
+        """Test an exclusive end on a bucket boundary needs no raw tail."""
+        plan = plan_range(datetime(2026, 3, 6, 22), datetime(2026, 3, 7, 2), inclusive=False)
+
+        assert plan.buckets == [("hour", datetime(2026, 3, 6, 22), datetime(2026, 3, 7, 2))]
+        assert plan.raw == []
+
+
+class TestRollupDeltas:
+    """Tests for delta accumulation."""
+
+    def test_signed_deltas_cancel(self):
+        """Test a removed attribution cancels out, leaving the conversion rows."""
+        deltas = RollupDeltas()
+        at = datetime(2026, 3, 6, 7, 23)
+
+        deltas.add_attribution("org1", at, "google", None, AttributionModelType.LINEAR, 50.0, 0.5)
+        deltas.add_conversion("org1", at, 100.0)
+        deltas.add_attribution("org1", at, "google", None, AttributionModelType.LINEAR, 50.0, 0.5, sign=-1)
+
+        rows = deltas.rows()
+        assert [(r["granularity"], r["bucket"]) for r in rows] == [
+            ("hour", datetime(2026, 3, 6, 7)), ("day", datetime(2026, 3, 6))
+        ]
+        assert all(r["conversion_count"] == 1 and r["model_type"] == "" for r in rows)
+
+
+class TestRollupMaintenance:
+    """Rollups kept by the attribution and conversion paths match a rebuild."""
+
+    async def _seed(self, db, organization_id):
+        now = datetime.utcnow().replace(microsecond=0)
+        touchpoints, conversions = [], []
+        for i in range(6):
+            customer_id = f"cust{i}"
+            for j, channel in enumerate(CHANNELS[:1 + i % 3]):
+                touchpoints.append(AttributionTouchpoint(
+                    organization_id=organization_id, customer_id=customer_id,
+                    touchpoint_type=TouchpointType.CUSTOM, channel=channel,
+                    campaign_id=None, touchpoint_timestamp=now - timedelta(days=3, hours=j),
+                ))
+            conversions.append(ConversionEvent(
+                organization_id=organization_id, customer_id=customer_id,
+                conversion_type=ConversionType.PURCHASE, conversion_name="Purchase",
+                conversion_value=10.0 * (i + 1), conversion_timestamp=now - timedelta(days=i % 3, minutes=7),
+            ))
+        db.add_all(touchpoints + conversions)
+        await db.commit()
+        return conversions
+
+    async def _rebuilt(self, db, organization_id):
+        incremental = await _rollups(db)
+        await RollupStore(db).rebuild(organization_id)
+        return incremental, await _rollups(db)
+
+    @pytest.mark.asyncio
+    async def test_attribution_keeps_rollups_current(self, db, organization_id):
+        """Test attributing, re-attributing and revaluing keep rollups exact."""
+        conversions = await self._seed(db, organization_id)
+        engine = AttributionEngine(db)
+        model_types = [AttributionModelType.FIRST_TOUCH, AttributionModelType.LINEAR]
+
+        await engine.process_conversions_batch(conversions, model_types)
+        incremental, rebuilt = await self._rebuilt(db, organization_id)
+        _assert_same_rollups(incremental, rebuilt)
+        day_rows = [v for k, v in incremental.items() if k[0] == "day" and k[4] == ""]
+        assert sum(v[0] for v in day_rows) == 6
+
+        # Re-attribution replaces rows instead of adding to them
+        await engine.process_conversions_batch(conversions, model_types)
+        incremental, rebuilt = await self._rebuilt(db, organization_id)
+        _assert_same_rollups(incremental, rebuilt)
+
+        # A revalued conversion leaves the rollups until re-attributed
+        await ConversionTracker(db).update_conversion_value(conversions[0].id, 500.0)
+        incremental, rebuilt = await self._rebuilt(db, organization_id)
+        _assert_same_rollups(incremental, rebuilt)
+
+        await engine.process_conversions_batch([conversions[0]], model_types)
+        incremental, rebuilt = await self._rebuilt(db, organization_id)
+        _assert_same_rollups(incremental, rebuilt)
+        assert sum(v[1] for k, v in incremental.items() if k[0] == "day" and k[4] == "") == pytest.approx(700.0)
+
+
+class TestQueryRouting:
+    """Dashboard answers from rollups match raw-row answers."""
+
+    async def _seed(self, db, organization_id):
+        rng = random.Random(11)
+        origin = datetime(2026, 3, 5)
+        conversions, touchpoints = [], []
+        for i in range(60):
+            at = origin + timedelta(minutes=rng.randrange(6 * 24 * 60))
+            conversions.append(ConversionEvent(
+                organization_id=organization_id, customer_id=None,
+                conversion_type=ConversionType.PURCHASE, conversion_name="Purchase",
+                conversion_value=float(rng.randrange(10, 500)), conversion_timestamp=at,
+                status=ConversionStatus.ATTRIBUTED if i % 5 else ConversionStatus.PENDING,
+            ))
+            touchpoints.append([
+                AttributionTouchpoint(
+                    organization_id=organization_id, touchpoint_type=TouchpointType.CUSTOM,
+                    channel=rng.choice(CHANNELS), touchpoint_timestamp=at - timedelta(hours=j + 1),
+                )
+                for j in range(2)
+            ])
+        db.add_all(conversions + [tp for journey in touchpoints for tp in journey])
+        await db.flush()
+
+        for conversion, journey in zip(conversions, touchpoints):
+            calculated_at = conversion.conversion_timestamp + timedelta(minutes=rng.randrange(600))
+            for model_type, weights in (
+                (AttributionModelType.FIRST_TOUCH, (1.0, 0.0)),
+                (AttributionModelType.LINEAR, (0.5, 0.5)),
+            ):
+                for touchpoint, weight in zip(journey, weights):
+                    db.add(Attribution(
+                        organization_id=organization_id, conversion_event_id=conversion.id,
+                        touchpoint_id=touchpoint.id, model_type=model_type, weight=weight,
+                        attributed_value=weight * conversion.conversion_value, calculated_at=calculated_at,
+                    ))
+        await db.commit()
+        await RollupStore(db).rebuild(organization_id)
+        return conversions
+
+    @pytest.mark.asyncio
+    async def test_routed_metrics_match_raw(self, db, organization_id):
+        """Test overview, comparison and channel totals are unchanged by routing."""
+        await self._seed(db, organization_id)
+        start, end = datetime(2026, 3, 6, 7, 23), datetime(2026, 3, 9, 15, 41)
+        raw = AnalyticsDashboardService(db, use_rollups=False)
+        routed = AnalyticsDashboardService(db, use_rollups=True)
+
+        want = await raw.get_overview_metrics(organization_id, start, end)
+        got = await routed.get_overview_metrics(organization_id, start, end)
+        for name in ("total_revenue", "total_conversions", "attributed_revenue"):
+            assert got[name].value == pytest.approx(want[name].value)
+            assert got[name].previous_value == pytest.approx(want[name].previous_value)
+        assert [c["channel"] for c in got["top_channels"]] == [c["channel"] for c in want["top_channels"]]
+        for got_channel, want_channel in zip(got["top_channels"], want["top_channels"]):
+            assert got_channel["touchpoint_count"] == want_channel["touchpoint_count"]
+            assert got_channel["attributed_revenue"] == pytest.approx(want_channel["attributed_revenue"])
+            assert got_channel["avg_weight"] == pytest.approx(want_channel["avg_weight"])
+
+        want = await raw.get_attribution_comparison(organization_id, start, end)
+        got = await routed.get_attribution_comparison(organization_id, start, end)
+        assert got["models"].keys() == want["models"].keys()
+        for model_type, channels in want["models"].items():
+            assert got["models"][model_type] == pytest.approx(channels)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("granularity", ["hour", "day"])
+    async def test_time_series_from_rollups(self, db, organization_id, granularity):
+        """Test each bucket of a routed series sums the conversions inside the range."""
+        conversions = await self._seed(db, organization_id)
+        start, end = datetime(2026, 3, 6, 7, 23), datetime(2026, 3, 9, 15, 41)
+
+        series = await AnalyticsDashboardService(db, use_rollups=True).get_time_series(
+            organization_id, "revenue", granularity, start, end
+        )
+
+        expected = defaultdict(float)
+        for conversion in conversions:
+            at = conversion.conversion_timestamp
+            if conversion.status == ConversionStatus.ATTRIBUTED and start <= at <= end:
+                bucket = at.replace(minute=0, second=0, microsecond=0)
+                if granularity == "day":
+                    bucket = bucket.replace(hour=0)
+                expected[bucket] += conversion.conversion_value
+        assert [p.timestamp for p in series] == sorted(expected)
+        assert [p.value for p in series] == pytest.approx([expected[b] for b in sorted(expected)])
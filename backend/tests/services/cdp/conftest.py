@@ -0,0 +1,17 @@
+"""
+Shared fixtures for CDP service tests.
+
+The ``db`` fixture comes from ``tests/services/conftest.py``.
+"""
+import pytest_asyncio
+
+from app.models.user import Organization
+
+
+@pytest_asyncio.fixture
+async def organization_id(db):
+    """Create a test organization."""
+    org = Organization(name="CDP Test Org", slug="cdp-test-org")
+    db.add(org)
+    await db.commit()
+    return org.id
@@ -0,0 +1,158 @@
+"""
+Tests for Event Processor batch ingestion.
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from app.models.customer import Customer
+from app.models.customer_event import CustomerEvent
+from app.models.customer_identity import CustomerIdentity, IdentityType
+from app.services.cdp.event_processor import EventProcessor
+
+
+async def _seed_customers(db, organization_id):
+    """Create one customer per resolution strategy."""
+    by_anon = Customer(organization_id=organization_id, anonymous_id="anon_known")
+    by_email = Customer(organization_id=organization_id)
+    by_external = Customer(organization_id=organization_id, external_ids={"crm_id": "crm-42"})
+    db.add_all([by_anon, by_email, by_external])
+    await db.flush()
+    db.add(CustomerIdentity(
+        customer_id=by_email.id,
+        identity_type=IdentityType.EMAIL,
+        identity_value="known@example.com",
+    ))
+    await db.commit()
+    return by_anon, by_email, by_external
+
+
+def _sample_events(by_email_id):
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    return [
+        {"event_name": "Page View", "timestamp": base.isoformat(),
+         "anonymous_id": "anon_known",
+         "context": {"page": {"url": "https://example.com/a"}}},
+        {"event_name": "Order Completed", "timestamp": (base + timedelta(minutes=1)).isoformat(),
+         "email": "KNOWN@example.com ", "properties": {"total": 50, "traits": {"plan": "pro"}}},
+        {"event_name": "Click", "timestamp": (base + timedelta(minutes=2)).isoformat(),
+         "external_ids": {"crm_id": "crm-42"}},
+        {"event_name": "Page View", "timestamp": (base + timedelta(minutes=3)).isoformat(),
+         "anonymous_id": "anon_known",
+         "context": {"page": {"url": "https://example.com/b"}}},
+        {"event_name": "Sign Up", "timestamp": (base + timedelta(minutes=4)).isoformat(),
+         "customer_id": by_email_id},
+        {"event_name": "Page View", "timestamp": (base + timedelta(minutes=5)).isoformat(),
+         "anonymous_id": "anon_stranger"},
+        {"timestamp": base.isoformat()},
+        {"event_name": "Bad Props", "timestamp": base.isoformat(), "properties": "oops"},
+    ]
+
+
+class TestBulkBatchProcessing:
+    """Tests for the single-transaction bulk path of process_batch."""
+
+    @pytest.mark.asyncio
+    async def test_bulk_resolves_identities(self, db, organization_id):
+        """Test bulk mode resolves every supported identifier type."""
+        by_anon, by_email, by_external = await _seed_customers(db, organization_id)
+        processor = EventProcessor(db)
+
+        results = await processor.process_batch(_sample_events(by_email.id), organization_id)
+
+        assert results["processed"] == 6
+        assert results["customers_resolved"] == 5
+        assert results["failed"] == 2
+
+        rows = (await db.execute(
+            select(CustomerEvent).order_by(CustomerEvent.timestamp, CustomerEvent.event_name)
+        )).scalars().all()
+        by_name = {(e.event_name, e.anonymous_id, e.customer_id) for e in rows}
+        assert ("Order Completed", None, by_email.id) in by_name
+        assert ("Click", None, by_external.id) in by_name
+        assert ("Sign Up", None, by_email.id) in by_name
+        assert ("Page View", "anon_stranger", None) in by_name
+        assert sum(1 for e in rows if e.customer_id == by_anon.id) == 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_reports_errors_like_sequential(self, db, organization_id):
+        """Test per-event errors keep the same index/error/event_name shape."""
+        _, by_email, _ = await _seed_customers(db, organization_id)
+        processor = EventProcessor(db)
+
+        bulk = await processor.process_batch(_sample_events(by_email.id), organization_id)
+        sequential = await processor.process_batch(
+            _sample_events(by_email.id), organization_id, bulk=False
+        )
+
+        assert bulk["errors"] == sequential["errors"]
+        assert [e["index"] for e in bulk["errors"]] == [6, 7]
+        assert bulk["errors"][0]["error"].startswith("Event validation failed")
+
+    @pytest.mark.asyncio
+    async def test_bulk_profile_updates_match_sequential(self, db, organization_id):
+        """Test bulk mode folds profile and computed trait updates identically."""
+        by_anon, by_email, by_external = await _seed_customers(db, organization_id)
+        processor = EventProcessor(db)
+        ids = [by_anon.id, by_email.id, by_external.id]
+
+        await processor.process_batch(_sample_events(by_email.id), organization_id, bulk=False)
+        customers = (await db.execute(select(Customer).where(Customer.id.in_(ids)))).scalars().all()
+        sequential = {
+            c.id: (c.traits, c.computed_traits, c.first_seen_at, c.last_seen_at) for c in customers
+        }
+
+        # Reset profiles and replay the same batch through the bulk path
+        for customer in customers:
+            customer.traits = {}
+            customer.computed_traits = {}
+            customer.first_seen_at = None
+            customer.last_seen_at = None
+        await db.commit()
+
+        await processor.process_batch(_sample_events(by_email.id), organization_id)
+        customers = (await db.execute(select(Customer).where(Customer.id.in_(ids)))).scalars().all()
+
+        for customer in customers:
+            traits, computed, first_seen, last_seen = sequential[customer.id]
+            assert customer.traits == traits
+            assert customer.first_seen_at == first_seen
+            assert customer.last_seen_at == last_seen
+            computed = dict(computed)
+            bulk_computed = dict(customer.computed_traits)
+            assert sorted(computed.pop("unique_pages_viewed", [])) == \
+                sorted(bulk_computed.pop("unique_pages_viewed", []))
+            assert bulk_computed == computed
+
+        anon = next(c for c in customers if c.id == by_anon.id)
+        assert anon.computed_traits["page_view_count"] == 2
+        email = next(c for c in customers if c.id == by_email.id)
+        assert email.computed_traits["purchase_count"] == 1
+        assert email.traits["plan"] == "pro"
+
+    @pytest.mark.asyncio
+    async def test_bulk_uses_one_commit(self, db, organization_id, monkeypatch):
+        """Test the whole batch is committed once."""
+        await _seed_customers(db, organization_id)
+        processor = EventProcessor(db)
+        commits = []
+        original_commit = db.commit
+
+        async def counting_commit():
+            commits.append(1)
+            await original_commit()
+
+        monkeypatch.setattr(db, "commit", counting_commit)
+
+        events = [
+            {"event_name": "Page View", "timestamp": datetime.utcnow().isoformat(),
+             "anonymous_id": "anon_known"}
+            for _ in range(25)
+        ]
+        results = await processor.process_batch(events, organization_id)
+
+        assert results["processed"] == 25
+        assert len(commits) == 1
+        count = (await db.execute(select(func.count(CustomerEvent.id)))).scalar()
+        assert count == 25
@@ -0,0 +1,227 @@
+"""
+Tests for the durable event spool and ingestion queue.
+"""
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.models.customer_event import CustomerEvent
+from app.services.cdp.event_ingestion import EventIngestionService
+from app.services.cdp.event_spool import (
+    EventSpool, IngestionQueue, SpoolFullError, SpoolLockedError, open_orphaned_spools, open_spool
+)
+
+
+def _event(name="Page View"):
+    return {"event_name": name, "timestamp": datetime.utcnow().isoformat(), "anonymous_id": "anon_1"}
+
+
+@pytest.fixture
+def spool(tmp_path):
+    """Create a spool in a temporary directory."""
+    return EventSpool(
+        directory=str(tmp_path),
+        max_bytes=1024 * 1024,
+        segment_bytes=64 * 1024,
+        seal_interval_seconds=0,
+        fsync=False,
+    )
+
+
+class TestEventSpool:
+    """Tests for the append-only segment log."""
+
+    def test_append_and_drain(self, spool):
+        """Test appended events are readable from a sealed segment and removed when acked."""
+        spool.append([("org1", _event()), ("org1", _event("Click"))])
+        assert spool.stats()["queue_depth"] == 2
+
+        assert spool.seal_if_stale()
+        seq = spool.claim_segment()
+        records = spool.read_pending(seq)
+
+        assert [r.event["event_name"] for r in records] == ["Page View", "Click"]
+        assert records[0].organization_id == "org1"
+
+        spool.ack(seq, len(records))
+        assert spool.stats()["queue_depth"] == 0
+        assert spool.claim_segment() is None
+
+    def test_backpressure_when_full(self, tmp_path):
+        """Test append raises SpoolFullError beyond max_bytes."""
+        spool = EventSpool(str(tmp_path), max_bytes=300, segment_bytes=10_000, fsync=False)
+        spool.append([("org1", _event())])
+
+        with pytest.raises(SpoolFullError):
+            spool.append([("org1", _event()) for _ in range(10)])
+
+    def test_recovery_replays_unacked_records(self, tmp_path):
+        """Test a reopened spool resumes from the last checkpoint."""
+        spool = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        spool.append([("org1", _event(f"E{i}")) for i in range(5)])
+        spool.seal_if_stale(max_age_seconds=0)
+        seq = spool.claim_segment()
+        spool.ack(seq, 2)
+        spool.close()  # simulate a crash before the remaining records were processed
+
+        reopened = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        assert reopened.stats()["queue_depth"] == 3
+
+        seq = reopened.claim_segment()
+        assert [r.event["event_name"] for r in reopened.read_pending(seq)] == ["E2", "E3", "E4"]
+
+    def test_recovery_skips_torn_write(self, tmp_path):
+        """Test a partially written trailing record is ignored on recovery."""
+        spool = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        spool.append([("org1", _event())])
+        path = spool._active.path
+        spool.close()
+        with open(path, "ab") as f:
+            f.write(b'{"org":"org1","ts":1.0,"ev')
+
+        reopened = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        assert reopened.stats()["queue_depth"] == 1
+
+    def test_batched_reads_resume_from_checkpoint_offset(self, tmp_path):
+        """Test records are read in batches from the checkpointed byte offset, across restarts."""
+        spool = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        spool.append([("org1", _event(f"E{i}")) for i in range(5)])
+        spool.seal_if_stale(max_age_seconds=0)
+        seq = spool.claim_segment()
+
+        batch = spool.read_pending(seq, limit=2)
+        assert [r.event["event_name"] for r in batch] == ["E0", "E1"]
+        spool.ack(seq, len(batch), offset=batch[-1].offset)
+        assert [r.event["event_name"] for r in spool.read_pending(seq, limit=2)] == ["E2", "E3"]
+        spool.close()
+
+        reopened = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        seq = reopened.claim_segment()
+        assert reopened._segments[seq].acked_offset == batch[-1].offset
+        assert [r.event["event_name"] for r in reopened.read_pending(seq)] == ["E2", "E3", "E4"]
+
+    def test_concurrent_appends_share_fsyncs(self, tmp_path, monkeypatch):
+        """Test appends waiting on an fsync in progress are made durable by a single next fsync."""
+        fsyncs = []
+        real_fsync = os.fsync
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.05)
+            real_fsync(fd)
+
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+        spool = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=True)
+        threads = [
+            threading.Thread(target=spool.append, args=([("org1", _event(f"E{i}"))],))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert spool.stats()["queue_depth"] == 8
+        assert spool._synced == 8
+        assert len(fsyncs) < 8
+
+    def test_each_process_owns_a_spool_slot(self, tmp_path):
+        """Test a spool directory is locked and a second process spools into the next slot."""
+        first = open_spool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        with pytest.raises(SpoolLockedError):
+            EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+
+        second = open_spool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        assert first.directory == str(tmp_path)
+        assert second.directory == str(tmp_path / "slot-1")
+
+        first.close()
+        assert open_spool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False).directory == str(tmp_path)
+
+    def test_orphaned_slots_are_claimed(self, tmp_path):
+        """Test slots left with events by a vanished process are locked for replay, live ones skipped."""
+        options = dict(max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        stale = EventSpool(str(tmp_path / "slot-3"), **options)
+        stale.append([("org1", _event())])
+        stale.close()
+        live = EventSpool(str(tmp_path / "slot-1"), **options)
+        live.append([("org1", _event())])
+
+        own = open_spool(str(tmp_path), **options)
+        orphans = open_orphaned_spools(str(tmp_path), own, **options)
+
+        assert [o.directory for o in orphans] == [str(tmp_path / "slot-3")]
+        assert orphans[0].stats()["queue_depth"] == 1
+        with pytest.raises(SpoolLockedError):
+            EventSpool(str(tmp_path / "slot-3"), **options)
+
+    def test_segment_rotation(self, tmp_path):
+        """Test the active segment is sealed once it reaches segment_bytes."""
+        spool = EventSpool(str(tmp_path), max_bytes=1024 * 1024, segment_bytes=200, fsync=False)
+        for _ in range(4):
+            spool.append([("org1", _event())])
+
+        assert spool.stats()["segments"] >= 2
+        assert spool.claim_segment() is not None
+
+
+class TestIngestionQueue:
+    """Tests for draining the spool into the database."""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_and_drain(self, db, organization_id, spool):
+        """Test queued events land in customer_events after draining."""
+        session_factory = async_sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False)
+        queue = IngestionQueue(spool, session_factory, workers=1, batch_size=2)
+
+        service = EventIngestionService(db)
+        ack = await service.enqueue_batch_http(
+            [_event(), _event("Click"), {"event_name": "No Timestamp"}],
+            {"X-Organization-ID": organization_id},
+            queue=queue,
+        )
+
+        assert ack["queued"] == 2
+        assert ack["failed"] == 1
+        assert ack["errors"][0]["index"] == 2
+
+        await queue.drain()
+
+        count = (await db.execute(select(func.count(CustomerEvent.id)))).scalar()
+        assert count == 2
+        metrics = queue.metrics()
+        assert metrics["queue_depth"] == 0
+        assert metrics["processed"] == 2
+        assert metrics["accepted"] == 2
+
+    @pytest.mark.asyncio
+    async def test_orphaned_slot_is_replayed_and_released(self, db, organization_id, tmp_path):
+        """Test events stranded in a higher slot are ingested at startup."""
+        options = dict(max_bytes=1024 * 1024, segment_bytes=64 * 1024, fsync=False)
+        stale = EventSpool(str(tmp_path / "slot-2"), **options)
+        stale.append([(organization_id, _event()), (organization_id, _event("Click"))])
+        stale.close()
+
+        own = open_spool(str(tmp_path), **options)
+        orphans = open_orphaned_spools(str(tmp_path), own, **options)
+        session_factory = async_sessionmaker(db.bind, class_=AsyncSession, expire_on_commit=False)
+        queue = IngestionQueue(own, session_factory, workers=1, poll_interval_seconds=0.01, orphans=orphans)
+
+        await queue.start()
+        deadline = time.monotonic() + 5
+        while queue.orphans and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await queue.stop(drain=False)
+
+        count = (await db.execute(select(func.count(CustomerEvent.id)))).scalar()
+        assert count == 2
+        assert queue.metrics()["processed"] == 2
+        # Released: the slot can be locked again and has nothing left
+        assert EventSpool(str(tmp_path / "slot-2"), **options).stats()["queue_depth"] == 0
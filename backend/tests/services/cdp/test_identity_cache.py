@@ -0,0 +1,148 @@
+"""
+Tests for the identity resolution cache.
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from app.models.customer import Customer
+from app.services.cdp.client_sdk import ClientSDK
+from app.services.cdp.identity_cache import IdentityCache, NO_CUSTOMER
+from app.services.cdp.identity_resolver import IdentityResolver
+
+
+@pytest.fixture
+def cache():
+    """Create a local-only cache."""
+    return IdentityCache(max_size=100, ttl_seconds=60, negative_ttl_seconds=60)
+
+
+class TestIdentityCache:
+    """Tests for the local LRU/TTL tier."""
+
+    @pytest.mark.asyncio
+    async def test_hit_miss_and_negative_entries(self, cache):
+        """Test lookups report hits, cached misses and misses."""
+        await cache.set("org1", "email", "a@example.com", "cust1")
+        await cache.set("org1", "anonymous_id", "anon_1", None)
+
+        assert await cache.get("org1", "email", "a@example.com") == "cust1"
+        assert await cache.get("org1", "anonymous_id", "anon_1") == NO_CUSTOMER
+        assert await cache.get("org2", "email", "a@example.com") is None
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["negative_hits"] == 1
+        assert stats["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Test the least recently used entry is evicted at capacity."""
+        cache = IdentityCache(max_size=2, ttl_seconds=60)
+        await cache.set("org1", "email", "a", "c1")
+        await cache.set("org1", "email", "b", "c2")
+        await cache.get("org1", "email", "a")
+        await cache.set("org1", "email", "c", "c3")
+
+        assert await cache.get("org1", "email", "b") is None
+        assert await cache.get("org1", "email", "a") == "c1"
+        assert cache.stats()["evictions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self, cache):
+        """Test entries expire after their TTL."""
+        with patch("app.services.cdp.identity_cache.time.monotonic", return_value=1000.0):
+            await cache.set("org1", "email", "a", "c1")
+        with patch("app.services.cdp.identity_cache.time.monotonic", return_value=1061.0):
+            assert await cache.get("org1", "email", "a") is None
+
+    @pytest.mark.asyncio
+    async def test_invalidate_customer(self, cache):
+        """Test every identifier of a customer is dropped."""
+        await cache.set("org1", "email", "a", "c1")
+        await cache.set("org1", "phone", "555", "c1")
+        await cache.set("org1", "email", "b", "c2")
+
+        await cache.invalidate_customer("c1")
+
+        assert await cache.get("org1", "email", "a") is None
+        assert await cache.get("org1", "phone", "555") is None
+        assert await cache.get("org1", "email", "b") == "c2"
+
+
+class TestResolverCaching:
+    """Tests for cache use and invalidation in identity resolution."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_visitor_served_from_cache(self, db, organization_id, cache):
+        """Test a repeat lookup skips the database."""
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1")
+        db.add(customer)
+        await db.commit()
+
+        resolver = IdentityResolver(db, cache=cache)
+        first, _ = await resolver.resolve_identity_from_event({"anonymous_id": "anon_1"}, organization_id)
+
+        with patch.object(resolver, "match_by_anonymous_id", side_effect=AssertionError("queried")):
+            second, _ = await resolver.resolve_identity_from_event({"anonymous_id": "anon_1"}, organization_id)
+            bulk = await resolver.resolve_identities_bulk([{"anonymous_id": "anon_1"}], organization_id)
+
+        assert first.id == second.id == bulk[0][0].id == customer.id
+        assert cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_merge_invalidates_secondary(self, db, organization_id, cache):
+        """Test identifiers of a merged-away profile resolve to the survivor."""
+        primary = Customer(organization_id=organization_id)
+        secondary = Customer(organization_id=organization_id, anonymous_id="anon_2")
+        db.add_all([primary, secondary])
+        await db.commit()
+
+        resolver = IdentityResolver(db, cache=cache)
+        resolved, _ = await resolver.resolve_identity_from_event({"anonymous_id": "anon_2"}, organization_id)
+        assert resolved.id == secondary.id
+
+        await resolver.link_identity(secondary.id, "email", "merged@example.com")
+        await resolver.merge_profiles(primary.id, secondary.id)
+
+        resolved, _ = await resolver.resolve_identity_from_event(
+            {"email": "merged@example.com", "anonymous_id": "anon_2"}, organization_id
+        )
+        assert resolved.id == primary.id
+        assert cache.stats()["invalidations"] >= 1
+
+    @pytest.mark.asyncio
+    async def test_link_identity_clears_cached_miss(self, db, organization_id, cache):
+        """Test linking an identifier replaces a cached 'no customer' entry."""
+        customer = Customer(organization_id=organization_id)
+        db.add(customer)
+        await db.commit()
+
+        resolver = IdentityResolver(db, cache=cache)
+        resolved, _ = await resolver.resolve_identity_from_event({"email": "new@example.com"}, organization_id)
+        assert resolved is None
+
+        await resolver.link_identity(customer.id, "email", "new@example.com")
+        resolved, _ = await resolver.resolve_identity_from_event({"email": "new@example.com"}, organization_id)
+        assert resolved.id == customer.id
+
+        await resolver.unlink_identity(customer.id, "email", "new@example.com")
+        resolved, _ = await resolver.resolve_identity_from_event({"email": "new@example.com"}, organization_id)
+        assert resolved is None
+
+    @pytest.mark.asyncio
+    async def test_alias_clears_cached_anonymous_miss(self, db, organization_id, cache):
+        """Test aliasing makes a previously unknown anonymous ID resolvable."""
+        customer = Customer(organization_id=organization_id, first_seen_at=datetime.utcnow())
+        db.add(customer)
+        await db.commit()
+
+        resolver = IdentityResolver(db, cache=cache)
+        resolved, _ = await resolver.resolve_identity_from_event({"anonymous_id": "anon_3"}, organization_id)
+        assert resolved is None
+
+        with patch("app.services.cdp.client_sdk.get_identity_cache", return_value=cache):
+            await ClientSDK(db).alias_anonymous_id("anon_3", customer.id, organization_id)
+
+        resolved, _ = await resolver.resolve_identity_from_event({"anonymous_id": "anon_3"}, organization_id)
+        assert resolved.id == customer.id
@@ -0,0 +1,167 @@
+"""
+Tests for the blocking-key candidate index and fuzzy matching.
+"""
+import pytest
+
+from sqlalchemy import select
+
+from app.models.customer import Customer
+from app.models.customer_match_key import CustomerMatchKey
+from app.services.cdp.identity_resolver import IdentityResolver
+from app.services.cdp.match_index import build_match_keys, normalize_company, rebuild_match_keys, soundex
+
+
+async def _keys(db, customer_id):
+    result = await db.execute(
+        select(CustomerMatchKey.key_type, CustomerMatchKey.key_value).where(
+            CustomerMatchKey.customer_id == customer_id
+        )
+    )
+    return set(result.all())
+
+
+class TestMatchKeys:
+    """Tests for blocking key derivation."""
+
+    def test_soundex(self):
+        """Test Soundex codes for common spelling variants."""
+        assert soundex("Robert") == soundex("Rupert") == "R163"
+        assert soundex("Ashcraft") == "A261"
+        assert soundex("Jon") == soundex("John") == "J500"
+        assert soundex("123") == ""
+
+    def test_build_match_keys(self):
+        """Test keys derived from email, phone, names and company."""
+        keys = build_match_keys(
+            {"first_name": "John", "last_name": "Smith", "company": "Acme, Inc.",
+             "phone": "+1 (555) 123-4567"},
+            {"email": "John.Smith+news@Acme.com"},
+        )
+
+        assert ("email", "john.smith+news@acme.com") in keys
+        assert ("email_local", "john.smith") in keys
+        assert ("email_domain", "acme.com") in keys
+        assert ("phone", "5551234567") in keys
+        assert ("name", "J500S530") in keys
+        assert ("company", "acme") in keys
+
+    def test_freemail_domain_not_indexed(self):
+        """Test freemail domains are not used as a blocking key."""
+        keys = build_match_keys({"email": "someone@gmail.com"})
+        assert not any(key_type == "email_domain" for key_type, _ in keys)
+
+    def test_normalize_company(self):
+        """Test legal suffixes and punctuation are stripped."""
+        assert normalize_company("Acme Corp.") == normalize_company("ACME") == "acme"
+
+
+class TestMatchIndexMaintenance:
+    """Tests for keeping customer_match_keys in sync with customer writes."""
+
+    @pytest.mark.asyncio
+    async def test_keys_follow_customer_writes(self, db, organization_id):
+        """Test keys are written on insert, rewritten on update and dropped on delete."""
+        customer = Customer(organization_id=organization_id, traits={"first_name": "Ann", "last_name": "Lee"})
+        db.add(customer)
+        await db.commit()
+        assert ("name", "A500L000") in await _keys(db, customer.id)
+
+        customer.traits = {**customer.traits, "company": "Globex"}
+        await db.commit()
+        assert ("company", "globex") in await _keys(db, customer.id)
+
+        customer.soft_delete()
+        await db.commit()
+        assert await _keys(db, customer.id) == set()
+
+    @pytest.mark.asyncio
+    async def test_rebuild(self, db, organization_id):
+        """Test rebuild indexes every live customer of the organization."""
+        customers = [
+            Customer(organization_id=organization_id, traits={"email": f"user{i}@example.com"})
+            for i in range(3)
+        ]
+        db.add_all(customers)
+        await db.commit()
+
+        indexed = await IdentityResolver(db).rebuild_match_index(organization_id)
+
+        assert indexed == 3
+        assert ("email", "user1@example.com") in await _keys(db, customers[1].id)
+
+    @pytest.mark.asyncio
+    async def test_rebuild_keeps_index_complete_between_batches(self, db, organization_id, monkeypatch):
+        """Test each batch is swapped in its own transaction and stale keys are dropped."""
+        customers = [
+            Customer(organization_id=organization_id, traits={"email": f"user{i}@example.com"})
+            for i in range(4)
+        ]
+        db.add_all(customers)
+        await db.commit()
+        customers.sort(key=lambda c: c.id)
+        db.add(CustomerMatchKey(
+            organization_id=organization_id, customer_id=customers[3].id,
+            key_type="email", key_value="stale@example.com",
+        ))
+        await db.commit()
+
+        seen_during_rebuild = []
+        commit = db.commit
+
+        async def record_commit():
+            await commit()
+            seen_during_rebuild.append(bool(await _keys(db, customers[3].id)))
+
+        monkeypatch.setattr(db, "commit", record_commit)
+        assert await rebuild_match_keys(db, organization_id, batch_size=1) == 4
+
+        assert all(seen_during_rebuild)
+        assert await _keys(db, customers[3].id) == build_match_keys(customers[3].traits)
+
+
+class TestFuzzyMatch:
+    """Tests for index-backed fuzzy matching."""
+
+    @pytest.mark.asyncio
+    async def test_finds_spelling_variant(self, db, organization_id):
+        """Test a misspelled name at the same company is found via phonetic keys."""
+        target = Customer(
+            organization_id=organization_id,
+            traits={"first_name": "Jonathan", "last_name": "Smith", "company": "Acme Inc"},
+        )
+        other = Customer(
+            organization_id=organization_id,
+            traits={"first_name": "Maria", "last_name": "Garcia", "company": "Globex"},
+        )
+        db.add_all([target, other])
+        await db.commit()
+
+        matches = await IdentityResolver(db).fuzzy_match(
+            {"first_name": "Jonathon", "last_name": "Smyth", "company": "ACME Inc"},
+            organization_id,
+        )
+
+        assert [m.customer.id for m in matches] == [target.id]
+        assert "company" in matches[0].matched_fields
+
+    @pytest.mark.asyncio
+    async def test_vectorized_scoring(self, db):
+        """Test batch scoring applies per-field thresholds and weights."""
+        resolver = IdentityResolver(db)
+        query = {"email": "jane@acme.com", "phone": "555-123-4567", "first_name": "Jane", "last_name": "Doe"}
+        candidates = [
+            {"email": "jane@acme.com", "first_name": "Janet", "last_name": "Doe"},
+            {"phone": "5551234568", "first_name": "Jane", "company": "Acme"},
+            {"first_name": "Bob"},
+            {},
+        ]
+
+        confidences, matched_fields, details = resolver._score_trait_dicts(candidates, query)
+
+        first_name_similarity = resolver._string_similarity("janet", "jane")
+        assert confidences[0] == pytest.approx((0.4 * 1.0 + 0.1 * first_name_similarity + 0.1 * 1.0) / 0.6)
+        assert matched_fields[0] == ["email", "first_name", "last_name"]
+        assert confidences[1] == pytest.approx((0.3 * 0.9 + 0.1 * 1.0) / 0.4)
+        assert details[1]["phone_similarity"] == pytest.approx(0.9)
+        assert confidences[2] == 0.0 and matched_fields[2] == []
+        assert confidences[3] == 0.0
@@ -0,0 +1,207 @@
+"""
+Tests for set-based segment computation.
+"""
+from datetime import timedelta
+
+import pytest
+
+from sqlalchemy import and_, select, update
+
+from app.models.customer import Customer
+from app.models.customer_segment import CustomerSegment
+from app.models.segment_membership import SegmentMembership
+from app.services.cdp.profile_enricher import ProfileEnricher
+from app.services.cdp.segment_engine import CriteriaCompiler
+
+PROFILES = [
+    {"traits": {"plan": "pro", "age": 34, "vip": True, "tags": ["beta", "b2b"], "address": {"city": "Berlin"}},
+     "engagement_score": 80.0},
+    {"traits": {"plan": "free", "age": 19.5, "vip": False, "tags": ["b2c"], "email": "a@gmail.com"},
+     "engagement_score": 10.0},
+    {"traits": {"plan": "Pro", "age": None, "nickname": "probe"}, "engagement_score": 55.0},
+    {"traits": {"age": "34", "tags": {"beta": 1}}, "engagement_score": 0.0},
+    {"traits": {}, "computed_traits": {"rfm": {"segment": "champions"}}, "lifetime_value": 500.0},
+]
+
+CONDITIONS = [
+    {"field": "traits.plan", "operator": "eq", "value": "pro"},
+    {"field": "traits.plan", "operator": "ne", "value": "pro"},
+    {"field": "traits.age", "operator": "eq", "value": 34},
+    {"field": "traits.age", "operator": "gte", "value": 20},
+    {"field": "traits.age", "operator": "lt", "value": 20},
+    {"field": "traits.age", "operator": "eq", "value": None},
+    {"field": "traits.vip", "operator": "eq", "value": True},
+    {"field": "traits.vip", "operator": "ne", "value": False},
+    {"field": "traits.tags", "operator": "contains", "value": "beta"},
+    {"field": "traits.plan", "operator": "contains", "value": "ro"},
+    {"field": "traits.nickname", "operator": "starts_with", "value": "pro"},
+    {"field": "traits.email", "operator": "ends_with", "value": "@gmail.com"},
+    {"field": "traits.address.city", "operator": "eq", "value": "Berlin"},
+    {"field": "traits.plan", "operator": "exists", "value": True},
+    {"field": "traits.plan", "operator": "exists", "value": False},
+    {"field": "computed_traits.rfm.segment", "operator": "eq", "value": "champions"},
+    {"field": "engagement_score", "operator": "gt", "value": 50},
+    {"field": "lifetime_value", "operator": "ne", "value": 0},
+    {"field": "traits.plan", "operator": "unknown", "value": "pro"},
+]
+
+
+async def _seed(db, organization_id, profiles=PROFILES):
+    customers = [Customer(organization_id=organization_id, **profile) for profile in profiles]
+    db.add_all(customers)
+    await db.commit()
+    return customers
+
+
+async def _segment(db, organization_id, criteria):
+    segment = CustomerSegment(organization_id=organization_id, name="Test", criteria=criteria)
+    db.add(segment)
+    await db.commit()
+    return segment
+
+
+async def _members(db, segment_id):
+    result = await db.execute(
+        select(SegmentMembership.customer_id).where(
+            and_(SegmentMembership.segment_id == segment_id, SegmentMembership.left_at.is_(None))
+        )
+    )
+    return set(result.scalars().all())
+
+
+class TestCriteriaCompiler:
+    """Tests for compiling criteria to SQL."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("condition", CONDITIONS, ids=lambda c: f"{c['field']}-{c['operator']}")
+    async def test_matches_python_evaluator(self, db, organization_id, condition):
+        """Test each compiled condition selects exactly the customers the Python evaluator accepts."""
+        customers = await _seed(db, organization_id)
+        enricher = ProfileEnricher(db)
+
+        def accepts(customer):
+            try:
+                return enricher._evaluate_condition(customer, condition)
+            except TypeError:
+                return False  # Mismatched types never match in SQL
+
+        expected = {c.id for c in customers if accepts(c)}
+
+        where = CriteriaCompiler("sqlite").compile_condition(condition)
+        result = await db.execute(
+            select(Customer.id).where(and_(Customer.organization_id == organization_id, where))
+        )
+
+        assert set(result.scalars().all()) == expected
+
+    def test_residual_conditions(self):
+        """Test conditions without an exact SQL form are left for Python."""
+        compiler = CriteriaCompiler("sqlite")
+        list_condition = {"field": "traits.tags", "operator": "eq", "value": ["beta"]}
+        plan_condition = {"field": "traits.plan", "operator": "eq", "value": "pro"}
+
+        compiled_and = compiler.compile({"conditions": [plan_condition, list_condition]})
+        compiled_or = compiler.compile({"conditions": [plan_condition, list_condition], "operator": "or"})
+
+        assert compiled_and.residual == [list_condition]
+        assert compiled_or.residual == [plan_condition, list_condition]
+        assert compiler.compile({"conditions": [plan_condition]}).fully_compiled
+
+
+class TestSegmentComputation:
+    """Tests for membership reconciliation."""
+
+    @pytest.mark.asyncio
+    async def test_joins_leaves_and_rejoins(self, db, organization_id):
+        """Test memberships follow criteria across recomputations."""
+        pro, free, *_ = await _seed(db, organization_id)
+        segment = await _segment(db, organization_id, {
+            "conditions": [{"field": "traits.plan", "operator": "eq", "value": "pro"}]
+        })
+        enricher = ProfileEnricher(db)
+
+        result = await enricher.compute_segment(segment.id)
+        assert result["success"] and result["customer_count"] == 1
+        assert await _members(db, segment.id) == {pro.id}
+
+        pro.traits = {**pro.traits, "plan": "free"}
+        free.traits = {**free.traits, "plan": "pro"}
+        await db.commit()
+        await enricher.compute_segment(segment.id)
+        assert await _members(db, segment.id) == {free.id}
+
+        pro.traits = {**pro.traits, "plan": "pro"}
+        await db.commit()
+        result = await enricher.compute_segment(segment.id)
+
+        assert await _members(db, segment.id) == {pro.id, free.id}
+        assert result["customer_count"] == 2
+        memberships = await db.execute(
+            select(SegmentMembership).where(SegmentMembership.segment_id == segment.id)
+        )
+        assert len(memberships.scalars().all()) == 2  # Rejoin reuses the row
+
+    @pytest.mark.asyncio
+    async def test_residual_criteria(self, db, organization_id):
+        """Test criteria with Python-only conditions compute the same membership."""
+        customers = await _seed(db, organization_id)
+        criteria = {
+            "operator": "or",
+            "conditions": [
+                {"field": "traits.tags", "operator": "eq", "value": ["b2c"]},
+                {"field": "engagement_score", "operator": "gt", "value": 50},
+            ],
+        }
+        segment = await _segment(db, organization_id, criteria)
+        enricher = ProfileEnricher(db)
+
+        await enricher.compute_segment(segment.id)
+
+        expected = {c.id for c in customers if await enricher._evaluate_segment_criteria(c, segment)}
+        assert await _members(db, segment.id) == expected
+        assert len(expected) == 3
+
+    @pytest.mark.asyncio
+    async def test_deleted_customers_leave(self, db, organization_id):
+        """Test soft-deleted customers are removed from segments."""
+        pro, *_ = await _seed(db, organization_id)
+        segment = await _segment(db, organization_id, {
+            "conditions": [{"field": "traits.plan", "operator": "eq", "value": "pro"}]
+        })
+        enricher = ProfileEnricher(db)
+        await enricher.compute_segment(segment.id)
+
+        pro.soft_delete()
+        await db.commit()
+        await enricher.compute_segment(segment.id, incremental=True)
+
+        assert await _members(db, segment.id) == set()
+
+    @pytest.mark.asyncio
+    async def test_incremental_only_reevaluates_changed_customers(self, db, organization_id):
+        """Test incremental computation ignores customers untouched since computed_at."""
+        pro, free, *_ = await _seed(db, organization_id)
+        segment = await _segment(db, organization_id, {
+            "conditions": [{"field": "traits.plan", "operator": "eq", "value": "pro"}]
+        })
+        enricher = ProfileEnricher(db)
+        await enricher.compute_segment(segment.id)
+
+        # Backdate both, then change one of them normally
+        past = segment.computed_at - timedelta(hours=1)
+        await db.execute(
+            update(Customer).where(Customer.id.in_([pro.id, free.id])).values(
+                traits={"plan": "free"}, updated_at=past
+            )
+        )
+        free.traits = {"plan": "pro"}
+        await db.commit()
+
+        result = await enricher.compute_segment(segment.id, incremental=True)
+
+        assert result["incremental"] is True
+        # pro's change predates computed_at, so incremental mode keeps it
+        assert await _members(db, segment.id) == {pro.id, free.id}
+
+        await enricher.compute_segment(segment.id)
+        assert await _members(db, segment.id) == {free.id}
@@ -0,0 +1,177 @@
+"""
+Tests for real-time segment membership on event ingest.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.sql import Insert
+
+from app.models.customer import Customer
+from app.models.customer_segment import CustomerSegment, SegmentStatus
+from app.models.segment_membership import SegmentMembership
+from app.services.cdp.event_processor import EventProcessor
+from app.services.cdp.segment_index import OrgSegmentIndex, SegmentPredicateIndex
+
+PRO_CRITERIA = {"conditions": [{"field": "traits.plan", "operator": "eq", "value": "pro"}]}
+BUYER_CRITERIA = {"conditions": [{"field": "computed_traits.purchase_count", "operator": "gte", "value": 2}]}
+
+
+def _event(name, minutes=0, **properties):
+    return {
+        "event_name": name,
+        "timestamp": (datetime(2026, 1, 1, 12, 0) + timedelta(minutes=minutes)).isoformat(),
+        "anonymous_id": "anon_1",
+        "properties": properties,
+    }
+
+
+async def _active_segments(db, customer_id):
+    result = await db.execute(
+        select(SegmentMembership.segment_id).where(
+            and_(SegmentMembership.customer_id == customer_id, SegmentMembership.left_at.is_(None))
+        )
+    )
+    return set(result.scalars().all())
+
+
+@pytest.fixture
+def processor(db):
+    processor = EventProcessor(db)
+    processor.segment_index = SegmentPredicateIndex(ttl_seconds=60)
+    return processor
+
+
+class TestOrgSegmentIndex:
+    """Tests for the field -> segment inversion."""
+
+    def test_affected_segments(self):
+        """Test only segments reading a changed field are returned."""
+        index = OrgSegmentIndex.build("org", [
+            CustomerSegment(id="pro", criteria=PRO_CRITERIA),
+            CustomerSegment(id="buyers", criteria=BUYER_CRITERIA),
+            CustomerSegment(id="empty", criteria={"conditions": []}),
+        ])
+
+        assert set(index.fields) == {"traits.plan", "computed_traits.purchase_count"}
+        affected = index.affected_segments(
+            {"traits.plan": "free", "computed_traits.purchase_count": 1},
+            {"traits.plan": "pro", "computed_traits.purchase_count": 1},
+        )
+        assert [segment.id for segment in affected] == ["pro"]
+
+
+class TestRealtimeSegments:
+    """Tests for membership updates from EventProcessor.enrich_profile."""
+
+    @pytest.mark.asyncio
+    async def test_membership_follows_events(self, db, organization_id, processor):
+        """Test customers join and leave segments as their traits change."""
+        pro = CustomerSegment(organization_id=organization_id, name="Pro", criteria=PRO_CRITERIA)
+        buyers = CustomerSegment(organization_id=organization_id, name="Buyers", criteria=BUYER_CRITERIA)
+        db.add_all([pro, buyers])
+        await db.commit()
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1")
+        db.add(customer)
+        await db.commit()
+
+        await processor.ingest_event(_event("Page View"), organization_id)
+        assert await _active_segments(db, customer.id) == set()
+
+        await processor.ingest_event(_event("Identify", 1, traits={"plan": "pro"}), organization_id)
+        await processor.ingest_event(_event("Order Completed", 2, total=10), organization_id)
+        assert await _active_segments(db, customer.id) == {pro.id}
+
+        await processor.ingest_event(_event("Order Completed", 3, total=10), organization_id)
+        assert await _active_segments(db, customer.id) == {pro.id, buyers.id}
+
+        await processor.ingest_event(_event("Identify", 4, traits={"plan": "free"}), organization_id)
+        assert await _active_segments(db, customer.id) == {buyers.id}
+
+        await db.refresh(pro)
+        await db.refresh(buyers)
+        assert (pro.customer_count, buyers.customer_count) == (0, 1)
+
+    @pytest.mark.asyncio
+    async def test_first_event_evaluates_all_segments(self, db, organization_id, processor):
+        """Test a customer's first event checks every segment, not just changed inputs."""
+        segment = CustomerSegment(organization_id=organization_id, name="Pro", criteria=PRO_CRITERIA)
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1", traits={"plan": "pro"})
+        db.add_all([segment, customer])
+        await db.commit()
+
+        await processor.ingest_event(_event("Page View"), organization_id)
+
+        assert await _active_segments(db, customer.id) == {segment.id}
+
+    @pytest.mark.asyncio
+    async def test_index_rebuilt_after_invalidation(self, db, organization_id, processor):
+        """Test segments created or paused after a build apply once the index is invalidated."""
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1")
+        db.add(customer)
+        await db.commit()
+        await processor.ingest_event(_event("Page View"), organization_id)
+
+        segment = CustomerSegment(organization_id=organization_id, name="Pro", criteria=PRO_CRITERIA)
+        db.add(segment)
+        await db.commit()
+
+        await processor.ingest_event(_event("Identify", 1, traits={"plan": "pro"}), organization_id)
+        assert await _active_segments(db, customer.id) == set()  # Cached index predates the segment
+
+        processor.segment_index.invalidate(organization_id)
+        await processor.ingest_event(_event("Identify", 2, traits={"plan": "pro", "seats": 3}), organization_id)
+        assert await _active_segments(db, customer.id) == set()  # plan did not change
+
+        await processor.ingest_event(_event("Identify", 3, traits={"plan": "free"}), organization_id)
+        await processor.ingest_event(_event("Identify", 4, traits={"plan": "pro"}), organization_id)
+        assert await _active_segments(db, customer.id) == {segment.id}
+
+        segment.status = SegmentStatus.PAUSED
+        await db.commit()
+        processor.segment_index.invalidate(organization_id)
+        await processor.ingest_event(_event("Identify", 5, traits={"plan": "free"}), organization_id)
+        assert await _active_segments(db, customer.id) == {segment.id}
+
+    @pytest.mark.asyncio
+    async def test_bulk_batch_updates_memberships(self, db, organization_id, processor):
+        """Test the bulk batch path applies real-time segments once per customer."""
+        segment = CustomerSegment(organization_id=organization_id, name="Pro", criteria=PRO_CRITERIA)
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1")
+        db.add_all([segment, customer])
+        await db.commit()
+
+        results = await processor.process_batch([
+            _event("Page View"),
+            _event("Identify", 1, traits={"plan": "pro"}),
+        ], organization_id)
+
+        assert results["processed"] == 2
+        assert await _active_segments(db, customer.id) == {segment.id}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_join_is_not_duplicated(self, db, organization_id, processor, monkeypatch):
+        """Test a membership inserted by a concurrent ingest between read and insert is skipped."""
+        segment = CustomerSegment(organization_id=organization_id, name="Pro", criteria=PRO_CRITERIA)
+        customer = Customer(organization_id=organization_id, anonymous_id="anon_1", traits={"plan": "pro"})
+        db.add_all([segment, customer])
+        await db.commit()
+
+        execute = db.execute
+
+        async def racing_execute(statement, *args, **kwargs):
+            if isinstance(statement, Insert) and statement.table.name == "segment_memberships":
+                await execute(insert(SegmentMembership).values(customer_id=customer.id, segment_id=segment.id))
+            return await execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db, "execute", racing_execute)
+        index = OrgSegmentIndex.build(organization_id, [segment])
+        changed = await processor.profile_enricher.apply_realtime_segments(index, [(customer, None)])
+        monkeypatch.setattr(db, "execute", execute)
+        await db.commit()
+
+        assert changed == {}
+        assert await db.scalar(
+            select(func.count(SegmentMembership.id)).where(SegmentMembership.customer_id == customer.id)
+        ) == 1
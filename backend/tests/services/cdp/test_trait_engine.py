@@ -0,0 +1,137 @@
+"""
+Tests for batch computed-trait recomputation.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from sqlalchemy import select, update
+from sqlalchemy.sql import Update
+
+from app.models.customer import Customer
+from app.models.customer_event import CustomerEvent, EventType
+from app.services.cdp.profile_enricher import ProfileEnricher
+from app.services.cdp.trait_engine import ComputedTraitEngine
+
+
+async def _seed(db, organization_id):
+    """Customers with varied activity: busy buyer, lapsed, inactive, no events."""
+    now = datetime.utcnow()
+    busy, lapsed, inactive, empty = customers = [
+        Customer(organization_id=organization_id, computed_traits={"total_events": 3}) for _ in range(4)
+    ]
+    db.add_all(customers)
+    await db.flush()
+
+    events = []
+    for day in range(0, 40, 2):
+        events.append(CustomerEvent(
+            organization_id=organization_id, customer_id=busy.id, event_name="Page View",
+            event_type=EventType.PAGE_VIEW, timestamp=now - timedelta(days=day, hours=1),
+        ))
+    for total in (120.5, 30):
+        events.append(CustomerEvent(
+            organization_id=organization_id, customer_id=busy.id, event_name="Order Completed",
+            event_type=EventType.PURCHASE, properties={"total": total}, timestamp=now - timedelta(days=3),
+        ))
+    events.append(CustomerEvent(
+        organization_id=organization_id, customer_id=lapsed.id, event_name="Order Completed",
+        event_type=EventType.PURCHASE, properties={"value": 15}, timestamp=now - timedelta(days=45),
+    ))
+    events.append(CustomerEvent(
+        organization_id=organization_id, customer_id=lapsed.id, event_name="Click",
+        event_type=EventType.CLICK, timestamp=now - timedelta(days=20),
+    ))
+    events.append(CustomerEvent(
+        organization_id=organization_id, customer_id=inactive.id, event_name="Order Completed",
+        event_type=EventType.PURCHASE, properties={"total": 99}, timestamp=now - timedelta(days=200),
+    ))
+    db.add_all(events)
+    await db.commit()
+    return customers
+
+
+class TestComputedTraitEngine:
+    """Tests for the set-based trait engine."""
+
+    @pytest.mark.asyncio
+    async def test_matches_per_customer_calculators(self, db, organization_id):
+        """Test batch scores equal the per-customer ProfileEnricher calculators."""
+        customers = await _seed(db, organization_id)
+        enricher = ProfileEnricher(db)
+        expected = {}
+        for customer in customers:
+            expected[customer.id] = {
+                "engagement_score": await enricher.calculate_engagement_score(customer.id),
+                "ltv": await enricher.calculate_ltv(customer.id),
+                "churn_risk": await enricher.calculate_churn_risk(customer.id),
+                "recency_days": await enricher.calculate_recency(customer.id),
+                "frequency_90d": await enricher.calculate_frequency(customer.id, 90),
+                "frequency_30d": await enricher.calculate_frequency(customer.id, 30),
+                "monetary_value": await enricher.calculate_monetary_value(customer.id),
+            }
+
+        result = await ComputedTraitEngine(db).recompute_organization(organization_id, chunk_size=3)
+
+        assert (result.customers, result.chunks) == (4, 2)
+        db.expire_all()
+        rows = await db.execute(select(Customer).where(Customer.organization_id == organization_id))
+        for customer in rows.scalars().all():
+            traits = customer.computed_traits
+            for name, value in expected[customer.id].items():
+                assert traits[name] == pytest.approx(value), name
+            assert traits["total_events"] == 3  # Existing keys are preserved
+            assert customer.engagement_score == pytest.approx(traits["engagement_score"])
+            assert customer.lifetime_value == pytest.approx(traits["ltv"])
+            assert customer.churn_risk == pytest.approx(traits["churn_risk"])
+            assert customer.monetary_value == pytest.approx(traits["monetary_value"])
+
+        busy = expected[customers[0].id]
+        assert busy["monetary_value"] == 150.5 and busy["engagement_score"] > 50
+
+    @pytest.mark.asyncio
+    async def test_progress_callback(self, db, organization_id):
+        """Test progress is reported once per chunk."""
+        await _seed(db, organization_id)
+        reports = []
+
+        async def progress(done, total):
+            reports.append((done, total))
+
+        await ComputedTraitEngine(db).recompute_organization(organization_id, chunk_size=2, progress=progress)
+
+        assert reports == [(2, 4), (4, 4)]
+
+    @pytest.mark.asyncio
+    async def test_update_all_computed_traits(self, db, organization_id):
+        """Test the single-customer entry point writes traits via the engine."""
+        busy, *_ = await _seed(db, organization_id)
+
+        await ProfileEnricher(db).update_all_computed_traits(busy.id)
+
+        await db.refresh(busy)
+        assert busy.computed_traits["frequency_90d"] == 22
+        assert "last_computed_at" in busy.computed_traits
+
+    @pytest.mark.asyncio
+    async def test_concurrent_computed_trait_writes_survive(self, db, organization_id, monkeypatch):
+        """Test keys written to computed_traits while a chunk is being scored are kept."""
+        busy, *_ = await _seed(db, organization_id)
+        execute = db.execute
+
+        async def write_during_recompute(statement, *args, **kwargs):
+            if isinstance(statement, Update):
+                # Another writer (e.g. enrichment) lands between scoring and the bulk write
+                await execute(update(Customer).where(Customer.id == busy.id).values(
+                    computed_traits={"total_events": 4, "favorite_category": "shoes"}
+                ))
+            return await execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db, "execute", write_during_recompute)
+        await ComputedTraitEngine(db).recompute_organization(organization_id)
+        monkeypatch.undo()
+
+        await db.refresh(busy)
+        assert busy.computed_traits["favorite_category"] == "shoes"
+        assert busy.computed_traits["total_events"] == 4
+        assert busy.computed_traits["frequency_90d"] == 22
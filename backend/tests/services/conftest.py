@@ -0,0 +1,41 @@
+"""
+Shared fixtures for service tests.
+
+Query-heavy services run against an in-memory SQLite database rather than
+a mocked session; trained model artifacts are written to a per-test
+directory.
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import *  # noqa: F401, F403
+from app.models.base import Base
+from app.services import model_artifacts
+
+
+@pytest_asyncio.fixture
+async def db():
+    """Create an in-memory SQLite session with all tables."""
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        yield session
+
+    await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def artifact_store(tmp_path, monkeypatch):
+    """Write model artifacts to a per-test directory."""
+    store = model_artifacts.ModelArtifactStore(str(tmp_path / "model_artifacts"))
+    monkeypatch.setattr(model_artifacts, "_artifact_store", store)
+    return store
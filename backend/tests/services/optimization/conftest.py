@@ -0,0 +1,18 @@
+"""
+Shared fixtures for optimization service tests.
+
+Tests run against the in-memory SQLite ``db`` fixture from
+``tests/services/conftest.py``.
+"""
+import pytest_asyncio
+
+from app.models.user import Organization
+
+
+@pytest_asyncio.fixture
+async def organization_id(db):
+    """Create a test organization."""
+    org = Organization(name="Optimization Test Org", slug="optimization-test-org")
+    db.add(org)
+    await db.commit()
+    return org.id
@@ -0,0 +1,146 @@
+"""
+Tests for in-memory bandit counters and their delta flushes.
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, update
+
+from app.models.experiment import Experiment, ExperimentStatus, ExperimentType
+from app.models.experiment_variant import ExperimentVariant
+from app.services.optimization import bandit_counters
+from app.services.optimization.bandit_counters import BanditCounterStore
+from app.services.optimization.bandit_engine import BanditEngine
+
+
+@pytest.fixture(autouse=True)
+def counters(monkeypatch):
+    """A fresh counter store that flushes only when asked."""
+    store = BanditCounterStore(flush_interval_seconds=3600)
+    monkeypatch.setattr(bandit_counters, "_bandit_counters", store)
+    return store
+
+
+@pytest_asyncio.fixture
+async def experiment(db, organization_id):
+    """A running bandit experiment with two variants."""
+    experiment = Experiment(
+        organization_id=organization_id,
+        name="Subject line bandit",
+        hypothesis="",
+        primary_metric="conversion_rate",
+        experiment_type=ExperimentType.BANDIT,
+        status=ExperimentStatus.RUNNING,
+    )
+    db.add(experiment)
+    await db.flush()
+    for name, successes in (("a", 10), ("b", 20)):
+        db.add(ExperimentVariant(
+            experiment_id=experiment.id, name=name, traffic_percentage=50, configuration={},
+            bandit_successes=successes, bandit_failures=80, bandit_pulls=100,
+        ))
+    await db.commit()
+    return experiment
+
+
+async def variant_rows(db, experiment_id):
+    result = await db.execute(
+        select(ExperimentVariant)
+        .where(ExperimentVariant.experiment_id == experiment_id)
+        .order_by(ExperimentVariant.name)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().all()
+
+
+class TestCounters:
+    """Tests for serving and flushing bandit counters."""
+
+    @pytest.mark.asyncio
+    async def test_recommendations_do_not_touch_the_database(self, db, experiment, counters, monkeypatch):
+        """Test decisions after the first load run without queries and are flushed as deltas."""
+        engine = BanditEngine(db)
+        await engine.get_recommendation(experiment.id)
+
+        async def no_queries(*args, **kwargs):
+            raise AssertionError("recommendation queried the database")
+
+        monkeypatch.setattr(db, "execute", no_queries)
+        monkeypatch.setattr(db, "commit", no_queries)
+        for algorithm in ("thompson_sampling", "ucb", "epsilon_greedy", "softmax"):
+            for _ in range(50):
+                await engine.get_recommendation(experiment.id, algorithm=algorithm)
+        monkeypatch.undo()
+
+        rows = await variant_rows(db, experiment.id)
+        assert sum(v.bandit_pulls for v in rows) == 200
+
+        assert await counters.flush(db) == 2
+        rows = await variant_rows(db, experiment.id)
+        assert sum(v.bandit_pulls for v in rows) == 401
+        assert counters.stats()["pending_variants"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rewards_coalesce_into_atomic_increments(self, db, experiment, counters):
+        """Test rewards are counted in memory and flushed as increments over concurrent writes."""
+        engine = BanditEngine(db)
+        a, b = await variant_rows(db, experiment.id)
+        await engine.batch_update_performance(
+            [{"variant_id": a.id, "reward": 1}] * 5 + [{"variant_id": b.id, "reward": 0}] * 3
+        )
+        counted = await engine.update_variant_performance(a.id, 0.0)
+        assert (counted.successes, counted.failures) == (15, 81)
+
+        # Another worker flushes in between; its increments must survive ours
+        await db.execute(
+            update(ExperimentVariant)
+            .where(ExperimentVariant.id == a.id)
+            .values(bandit_successes=ExperimentVariant.bandit_successes + 100)
+        )
+        await db.commit()
+        await counters.flush(db)
+
+        a, b = await variant_rows(db, experiment.id)
+        assert (a.bandit_successes, a.bandit_failures) == (115, 81)
+        assert (b.bandit_successes, b.bandit_failures) == (20, 83)
+
+        await counters.refresh(db)
+        assert counters.get(a.id).successes == 115
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_deltas(self, db, experiment, counters, monkeypatch):
+        """Test deltas survive a failed flush and are written by the next one."""
+        engine = BanditEngine(db)
+        experiment_id = experiment.id
+        a, _ = await variant_rows(db, experiment_id)
+        await engine.update_variant_performance(a.id, 1.0)
+
+        async def broken(*args, **kwargs):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(db, "execute", broken)
+        with pytest.raises(RuntimeError):
+            await counters.flush(db)
+        monkeypatch.undo()
+
+        assert await counters.flush(db) == 1
+        a, _ = await variant_rows(db, experiment_id)
+        assert a.bandit_successes == 11
+
+    @pytest.mark.asyncio
+    async def test_stopped_experiment_is_dropped_and_reset_clears_deltas(self, db, experiment, counters):
+        """Test refresh drops experiments no longer running and reset discards unflushed counts."""
+        engine = BanditEngine(db)
+        await engine.get_recommendation(experiment.id)
+        stats = await engine.get_variant_stats(experiment.id)
+        assert sum(s["pulls"] for s in stats.values()) == 201
+
+        await engine.reset_bandit(experiment.id)
+        await counters.flush(db)
+        assert all(v.bandit_pulls == 0 for v in await variant_rows(db, experiment.id))
+        assert all(s["pulls"] == 0 for s in (await engine.get_variant_stats(experiment.id)).values())
+
+        experiment.status = ExperimentStatus.COMPLETED
+        await db.commit()
+        await counters.refresh(db)
+        with pytest.raises(ValueError, match="not found or not running"):
+            await engine.get_recommendation(experiment.id)
@@ -0,0 +1,95 @@
+"""
+Tests for experiment bucketing.
+"""
+import hashlib
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from app.services.optimization.bucketing import (
+    BUCKETS, NO_VARIANT, allocate_buckets, bucket, from_ranges, legacy_allocation, legacy_bucket, lookup_table,
+    salt_hash, target_counts, to_ranges, visitor_hash,
+)
+
+
+class TestHashing:
+    """Tests for visitor hashing and buckets."""
+
+    def test_buckets_are_uniform_and_independent_across_salts(self):
+        """Test buckets spread evenly and are unrelated between experiments."""
+        visitors = [visitor_hash(f"visitor-{i}") for i in range(50000)]
+        first = np.array([bucket(v, salt_hash("exp-a")) for v in visitors])
+        second = np.array([bucket(v, salt_hash("exp-b")) for v in visitors])
+
+        assert first.min() >= 0 and first.max() < BUCKETS
+        assert stats.chisquare(np.bincount(first // 100, minlength=100)).pvalue > 0.001
+        table = np.histogram2d(first // 1000, second // 1000, bins=10)[0]
+        assert stats.chi2_contingency(table)[1] > 0.001
+
+    def test_hash_is_stable(self):
+        """Test the hash does not depend on the process."""
+        assert bucket(visitor_hash("visitor-1"), salt_hash("experiment-1")) == \
+            bucket(visitor_hash("visitor-1"), salt_hash("experiment-1"))
+        assert visitor_hash("visitor-1") != visitor_hash("visitor-2")
+
+
+class TestAllocation:
+    """Tests for bucket allocation."""
+
+    def test_target_counts_add_up(self):
+        """Test largest-remainder rounding hits the exact total."""
+        assert target_counts(1.0, [33.33, 33.33, 33.34]) == [3333, 3333, 3334]
+        assert sum(target_counts(0.37, [50, 30, 20])) == 3700
+        assert target_counts(0.0, [50, 50]) == [0, 0]
+
+    def test_ramp_up_keeps_existing_buckets(self):
+        """Test ramping traffic only adds buckets."""
+        small = allocate_buckets([[], []], target_counts(0.1, [50, 50]))
+        large = allocate_buckets(small, target_counts(0.5, [50, 50]))
+
+        for before, after in zip(small, large):
+            assert set(before) <= set(after)
+        assert [len(b) for b in large] == [2500, 2500]
+
+    def test_resplit_moves_only_the_difference(self):
+        """Test changing 50/50 to 60/40 moves 10% of buckets."""
+        even = allocate_buckets([[], []], target_counts(1.0, [50, 50]))
+        uneven = allocate_buckets(even, target_counts(1.0, [60, 40]))
+
+        moved = len(set(even[1]) - set(uneven[1]))
+        assert moved == 1000
+        assert set(even[0]) <= set(uneven[0])
+
+    def test_reserved_buckets_are_not_allocated(self):
+        """Test buckets held by other experiments in a layer stay out."""
+        reserved = set(range(0, BUCKETS, 2))
+        allocation = allocate_buckets([[], []], target_counts(0.5, [50, 50]), reserved)
+
+        assert not reserved & set(allocation[0] + allocation[1])
+        with pytest.raises(ValueError, match="Not enough free traffic"):
+            allocate_buckets([[], []], target_counts(0.6, [50, 50]), reserved)
+
+    def test_ranges_and_lookup_table(self):
+        """Test range compression round-trips and the table maps buckets to variants."""
+        buckets = [0, 1, 2, 5, 6, 9]
+        assert to_ranges(buckets) == [[0, 3], [5, 7], [9, 10]]
+        assert from_ranges(to_ranges(buckets)) == buckets
+
+        table = lookup_table([[0, 1], [2]])
+        assert table[0] == 0 and table[2] == 1 and table[3] == NO_VARIANT
+
+    def test_legacy_allocation_matches_split_assignment(self):
+        """Test legacy buckets map to the variants the md5 split assignment chose."""
+        percentages = [50, 30, 20]
+        table = lookup_table(legacy_allocation(percentages))
+
+        for i in range(2000):
+            key = f"visitor-{i}"
+            position = int(hashlib.md5(f"{key}:experiment-1".encode()).hexdigest(), 16) % 10000 / 100.0
+            expected = next(
+                (index for index, bound in enumerate(np.cumsum(percentages)) if position <= bound),
+                len(percentages) - 1,
+            )
+            assert table[legacy_bucket(key, "experiment-1")] == expected
+        assert [len(b) for b in legacy_allocation(percentages)] == [5001, 3000, 1999]
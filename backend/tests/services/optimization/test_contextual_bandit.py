@@ -0,0 +1,157 @@
+"""
+Tests for contextual (linear) bandits.
+"""
+import numpy as np
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from app.models.experiment import Experiment, ExperimentStatus, ExperimentType
+from app.models.experiment_variant import ExperimentVariant
+from app.services.optimization import bandit_counters, contextual_bandit
+from app.services.optimization.bandit_counters import BanditCounterStore
+from app.services.optimization.bandit_engine import BanditEngine
+from app.services.optimization.contextual_bandit import (
+    DIMENSION, ContextualBanditStore, LinearBandit, context_vector,
+)
+
+
+@pytest.fixture(autouse=True)
+def stores(monkeypatch):
+    """Fresh counter and contextual stores that write only when asked."""
+    counters = BanditCounterStore(flush_interval_seconds=3600)
+    contextual = ContextualBanditStore(checkpoint_interval_seconds=3600)
+    monkeypatch.setattr(bandit_counters, "_bandit_counters", counters)
+    monkeypatch.setattr(contextual_bandit, "_contextual_bandits", contextual)
+    return counters, contextual
+
+
+@pytest_asyncio.fixture
+async def experiment(db, organization_id):
+    """A running bandit experiment with a mobile-friendly and a desktop-friendly variant."""
+    experiment = Experiment(
+        organization_id=organization_id, name="Layout bandit", hypothesis="", primary_metric="conversion_rate",
+        experiment_type=ExperimentType.BANDIT, status=ExperimentStatus.RUNNING,
+    )
+    db.add(experiment)
+    await db.flush()
+    for name in ("compact", "wide"):
+        db.add(ExperimentVariant(experiment_id=experiment.id, name=name, traffic_percentage=50, configuration={}))
+    await db.commit()
+    return experiment
+
+
+def conversion_rate(variant_name: str, device: str) -> float:
+    best = {"mobile": "compact", "desktop": "wide"}[device]
+    return 0.3 if variant_name == best else 0.05
+
+
+class TestLinearBandit:
+    """Tests for the vectorized linear bandit state."""
+
+    def test_sherman_morrison_matches_ridge_regression(self, monkeypatch):
+        """Test rank-1 updates keep A⁻¹ and θ equal to the closed-form ridge solution."""
+        monkeypatch.setattr(contextual_bandit, "FOLD_BATCH", 64)
+        rng = np.random.default_rng(1)
+        bandit = LinearBandit(["a", "b", "c"], dimension=5)
+        xs = rng.random((200, 5))
+        arms = rng.integers(0, 3, 200)
+        rewards = rng.random(200)
+        for x, arm, reward in zip(xs, arms, rewards):
+            bandit.update(arm, x, reward)
+
+        for arm in range(3):
+            a = np.eye(5) + xs[arms == arm].T @ xs[arms == arm]
+            b = xs[arms == arm].T @ rewards[arms == arm]
+            np.testing.assert_allclose(bandit.a_inv[arm], np.linalg.inv(a), atol=1e-10)
+            np.testing.assert_allclose(bandit.theta[arm], np.linalg.solve(a, b), atol=1e-10)
+
+        x = rng.random(5)
+        mean, variance = bandit.predict(x)
+        np.testing.assert_allclose(variance, [x @ bandit.a_inv[k] @ x for k in range(3)])
+        np.testing.assert_allclose(mean, [bandit.theta[k] @ x for k in range(3)])
+
+        # Checkpoint statistics cover folded and still-buffered observations
+        delta_a, delta_b, counts = bandit.take_deltas()
+        assert counts.tolist() == np.bincount(arms, minlength=3).tolist()
+        np.testing.assert_allclose(delta_a[1], xs[arms == 1].T @ xs[arms == 1])
+        np.testing.assert_allclose(delta_b[1], xs[arms == 1].T @ rewards[arms == 1])
+        assert bandit.pending == 0
+
+    def test_context_vector(self):
+        """Test features come from the predictive model extractors, scaled, with an intercept."""
+        x = context_vector({"hour": 12, "device": "mobile", "channel": "google"}, {"interests": ["a", "b"]})
+        assert x.shape == (DIMENSION,)
+        assert x[0] == 1.0
+        assert 0.0 <= x.min() and x.max() <= 1.0
+        assert np.array_equal(context_vector({}), context_vector(None))
+
+
+class TestContextualEngine:
+    """Tests for contextual recommendations and checkpoints."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("algorithm", ["linucb", "linear_thompson"])
+    async def test_learns_best_variant_per_context(self, db, experiment, algorithm):
+        """Test the bandit learns a different best variant for mobile and desktop visitors."""
+        engine = BanditEngine(db)
+        rng = np.random.default_rng(3)
+        for i in range(1500):
+            context = {"device": "mobile" if i % 2 else "desktop", "hour": int(rng.integers(0, 24))}
+            recommendation = await engine.get_contextual_recommendation(
+                experiment.id, context, algorithm=algorithm, alpha=0.5
+            )
+            converted = rng.random() < conversion_rate(recommendation.variant_name, context["device"])
+            await engine.update_contextual_performance(recommendation.variant_id, float(converted), context)
+
+        for device, best in (("mobile", "compact"), ("desktop", "wide")):
+            picks = [
+                (await engine.get_contextual_recommendation(
+                    experiment.id, {"device": device, "hour": 12}, algorithm=algorithm, alpha=0.5
+                )).variant_name
+                for _ in range(100)
+            ]
+            assert picks.count(best) >= 80
+
+        stats = await engine.get_variant_stats(experiment.id)
+        assert sum(s["pulls"] for s in stats.values()) == 1700
+        with pytest.raises(ValueError, match="Unknown contextual algorithm"):
+            await engine.get_contextual_recommendation(experiment.id, {}, algorithm="exp3")
+
+    @pytest.mark.asyncio
+    async def test_checkpoints_merge_workers_and_reload(self, db, experiment, stores):
+        """Test checkpoints add each worker's statistics and a new process resumes from them."""
+        _, contextual = stores
+        engine = BanditEngine(db)
+        experiment_id = experiment.id
+        variants = (await db.execute(
+            select(ExperimentVariant).where(ExperimentVariant.experiment_id == experiment_id)
+            .order_by(ExperimentVariant.id)
+        )).scalars().all()
+        variant_ids = [v.id for v in variants]
+        mobile = {"device": "mobile"}
+
+        for _ in range(20):
+            await engine.update_contextual_performance(variant_ids[0], 1.0, mobile)
+        other = ContextualBanditStore()
+        other_bandit = await other.bandit(db, experiment_id, variant_ids)
+        for _ in range(10):
+            other.update(other_bandit, variant_ids[0], context_vector(mobile), 0.0)
+
+        assert await contextual.checkpoint(db) == 2
+        assert await other.checkpoint(db) == 1
+        assert await contextual.checkpoint(db) == 0
+
+        resumed = await ContextualBanditStore().bandit(db, experiment_id, variant_ids)
+        assert resumed.updates.tolist() == [30, 0]
+        x = context_vector(mobile)
+        assert resumed.predict(x)[0][0] == pytest.approx(20 / 31, abs=0.02)
+        # The first worker picks up the second worker's observations on its next checkpoint
+        await engine.update_contextual_performance(variant_ids[1], 0.0, mobile)
+        await contextual.checkpoint(db)
+        bandit = await contextual.bandit(db, experiment_id, variant_ids)
+        np.testing.assert_allclose(bandit.a_inv[0], resumed.a_inv[0])
+
+        await engine.reset_bandit(experiment_id)
+        reset = await ContextualBanditStore().bandit(db, experiment_id, variant_ids)
+        assert reset.updates.tolist() == [0, 0]
@@ -0,0 +1,276 @@
+"""
+Tests for in-memory experiment assignment and buffered exposures.
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+
+from app.models.experiment import Experiment, ExperimentStatus
+from app.models.experiment_assignment import ExperimentAssignment
+from app.models.experiment_variant import ExperimentVariant
+from app.services.optimization import experiment_assignment
+from app.services.optimization.ab_testing import ABTestingEngine, VariantConfig
+from app.services.optimization.bucketing import (
+    LEGACY_BUCKETING, legacy_allocation, legacy_bucket, lookup_table, visitor_hash,
+)
+from app.services.optimization.experiment_assignment import ExperimentAssignmentService, ExposureBuffer
+
+
+@pytest.fixture(autouse=True)
+def service(monkeypatch):
+    """A fresh assignment service whose exposures flush only when asked."""
+    service = ExperimentAssignmentService(exposures=ExposureBuffer(flush_interval_seconds=3600))
+    monkeypatch.setattr(experiment_assignment, "_assignment_service", service)
+    return service
+
+
+async def create_experiment(
+    engine: ABTestingEngine, organization_id: str, start: bool = True, **kwargs
+) -> Experiment:
+    experiment = await engine.create_experiment(
+        organization_id=organization_id,
+        name="Headline test",
+        hypothesis="A shorter headline converts better",
+        primary_metric="conversion_rate",
+        variants=[
+            VariantConfig(name="control", traffic_percentage=50, configuration={"headline": "A"}, is_control=True),
+            VariantConfig(name="short", traffic_percentage=30, configuration={"headline": "B"}),
+            VariantConfig(name="long", traffic_percentage=20, configuration={"headline": "C"}),
+        ],
+        **kwargs,
+    )
+    if start:
+        await engine.start_experiment(experiment.id)
+    return experiment
+
+
+async def assignment_count(db, experiment_id: str) -> int:
+    return await db.scalar(
+        select(func.count(ExperimentAssignment.id)).where(ExperimentAssignment.experiment_id == experiment_id)
+    )
+
+
+@pytest_asyncio.fixture
+async def engine(db):
+    return ABTestingEngine(db)
+
+
+class TestAssignment:
+    """Tests for snapshot-based assignment."""
+
+    @pytest.mark.asyncio
+    async def test_split_follows_traffic(self, db, engine, organization_id):
+        """Test visitors split by traffic share and nothing is written before a flush."""
+        experiment = await create_experiment(engine, organization_id)
+
+        counts = {}
+        for i in range(4000):
+            result = await engine.assign_user(experiment.id, anonymous_id=f"visitor-{i}")
+            again = await engine.assign_user(experiment.id, anonymous_id=f"visitor-{i}")
+            assert again.variant_id == result.variant_id
+            counts[result.variant_name] = counts.get(result.variant_name, 0) + 1
+
+        assert counts["control"] == pytest.approx(2000, rel=0.1)
+        assert counts["short"] == pytest.approx(1200, rel=0.1)
+        assert counts["long"] == pytest.approx(800, rel=0.1)
+        assert await assignment_count(db, experiment.id) == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_rows_once(self, db, engine, organization_id, service):
+        """Test buffered exposures are inserted once and counted per variant."""
+        experiment = await create_experiment(engine, organization_id)
+        first = [await engine.assign_user(experiment.id, anonymous_id=f"v{i}") for i in range(50)]
+
+        assert await service.exposures.flush(db) == 50
+        for i in range(50):
+            again = await engine.assign_user(experiment.id, anonymous_id=f"v{i}")
+            assert again.assignment_id == first[i].assignment_id
+        assert await service.exposures.flush(db) == 0
+
+        assert await assignment_count(db, experiment.id) == 50
+        total = await db.scalar(
+            select(func.sum(ExperimentVariant.total_assignments))
+            .where(ExperimentVariant.experiment_id == experiment.id)
+        )
+        assert total == 50
+
+    @pytest.mark.asyncio
+    async def test_lifecycle_refreshes_snapshot(self, engine, organization_id, service):
+        """Test starting, pausing and re-allocating update the snapshot."""
+        experiment = await create_experiment(engine, organization_id, start=False)
+        with pytest.raises(ValueError, match="not running"):
+            await engine.assign_user(experiment.id, user_id="u1")
+
+        await engine.start_experiment(experiment.id)
+        version = service.snapshot.version
+        variants = {v.name: v.id for v in service.snapshot.experiments[experiment.id].variants}
+        await engine.allocate_traffic(experiment.id, {
+            variants["control"]: 0, variants["short"]: 100, variants["long"]: 0,
+        })
+
+        assert service.snapshot.version > version
+        assert (await engine.assign_user(experiment.id, user_id="u1")).variant_name == "short"
+
+        await engine.pause_experiment(experiment.id)
+        with pytest.raises(ValueError, match="not running"):
+            await engine.assign_user(experiment.id, user_id="u1")
+
+    @pytest.mark.asyncio
+    async def test_assign_many_skips_experiments_not_running(self, engine, organization_id):
+        """Test batch assignment returns only running experiments."""
+        running = await create_experiment(engine, organization_id)
+        draft = await create_experiment(engine, organization_id, start=False)
+
+        results = await engine.assign_many([running.id, draft.id, "missing"], anonymous_id="visitor")
+
+        assert list(results) == [running.id]
+
+    @pytest.mark.asyncio
+    async def test_experiment_started_elsewhere_is_found(self, db, engine, organization_id, service):
+        """Test an experiment started by another process is looked up on first use."""
+        experiment = await create_experiment(engine, organization_id, start=False)
+        await service.refresh(db)
+        experiment.status = ExperimentStatus.RUNNING
+        await db.commit()
+
+        result = await engine.assign_user(experiment.id, anonymous_id="visitor")
+
+        assert result.variant_name in {"control", "short", "long"}
+
+    @pytest.mark.asyncio
+    async def test_conversion_flushes_buffered_assignment(self, db, engine, organization_id):
+        """Test a conversion for an unflushed assignment is still tracked."""
+        experiment = await create_experiment(engine, organization_id)
+        result = await engine.assign_user(experiment.id, anonymous_id="visitor")
+
+        assert await engine.track_conversion(experiment.id, anonymous_id="visitor")
+
+        variant = await db.get(ExperimentVariant, result.variant_id)
+        assert variant.total_assignments == 1
+        assert variant.total_conversions == 1
+
+
+class TestTrafficControl:
+    """Tests for layers, ramping and re-allocation."""
+
+    @pytest.mark.asyncio
+    async def test_layer_experiments_are_mutually_exclusive(self, engine, organization_id):
+        """Test a visitor is in at most one experiment of a layer."""
+        first = await create_experiment(engine, organization_id, layer="homepage", traffic_allocation=0.5)
+        second = await create_experiment(engine, organization_id, layer="homepage", traffic_allocation=0.5)
+        other = await create_experiment(engine, organization_id)
+
+        enrolled = {first.id: 0, second.id: 0, other.id: 0}
+        for i in range(2000):
+            results = await engine.assign_many([first.id, second.id, other.id], anonymous_id=f"v{i}")
+            assert results[first.id] is None or results[second.id] is None
+            for experiment_id, result in results.items():
+                enrolled[experiment_id] += result is not None
+
+        assert enrolled[first.id] == pytest.approx(1000, rel=0.1)
+        assert enrolled[first.id] + enrolled[second.id] == 2000
+        assert enrolled[other.id] == 2000
+
+    @pytest.mark.asyncio
+    async def test_full_layer_cannot_start_another_experiment(self, engine, organization_id):
+        """Test starting an experiment fails when its layer has no free traffic."""
+        await create_experiment(engine, organization_id, layer="checkout", traffic_allocation=0.8)
+        blocked = await create_experiment(
+            engine, organization_id, start=False, layer="checkout", traffic_allocation=0.3
+        )
+
+        with pytest.raises(ValueError, match="Not enough free traffic"):
+            await engine.start_experiment(blocked.id)
+
+    @pytest.mark.asyncio
+    async def test_ramp_keeps_enrolled_visitors(self, engine, organization_id):
+        """Test ramping up enrolls more visitors without moving enrolled ones."""
+        experiment = await create_experiment(engine, organization_id, traffic_allocation=0.2)
+        visitors = [f"v{i}" for i in range(2000)]
+        before = {v: await engine.assign_user(experiment.id, anonymous_id=v) for v in visitors}
+
+        await engine.ramp_experiment(experiment.id, 0.6)
+        after = {v: await engine.assign_user(experiment.id, anonymous_id=v) for v in visitors}
+
+        enrolled_before = [v for v in visitors if before[v] is not None]
+        assert len(enrolled_before) == pytest.approx(400, rel=0.15)
+        assert sum(r is not None for r in after.values()) == pytest.approx(1200, rel=0.1)
+        assert all(after[v].variant_id == before[v].variant_id for v in enrolled_before)
+
+    @pytest.mark.asyncio
+    async def test_reallocation_moves_only_new_visitors(self, db, engine, organization_id, service):
+        """Test shifting 10 points of traffic moves 10% of buckets but no assigned visitor."""
+        experiment = await create_experiment(engine, organization_id)
+        visitors = [f"v{i}" for i in range(3000)]
+        before = {v: (await engine.assign_user(experiment.id, anonymous_id=v)).variant_name for v in visitors}
+
+        variants = {v.name: v.id for v in service.snapshot.experiments[experiment.id].variants}
+        await engine.allocate_traffic(experiment.id, {
+            variants["control"]: 40, variants["short"]: 40, variants["long"]: 20,
+        })
+        snapshot = service.snapshot.experiments[experiment.id]
+        assert len(snapshot.released) == 1000
+
+        # Buffered, then stored in another process with nothing remembered
+        after = {v: (await engine.assign_user(experiment.id, anonymous_id=v)).variant_name for v in visitors}
+        assert after == before
+        await service.exposures.flush(db)
+        other = ExperimentAssignmentService(exposures=ExposureBuffer(flush_interval_seconds=3600))
+        for v in visitors:
+            assert (await other.assign(db, experiment.id, anonymous_id=v)).variant_name == before[v]
+
+        newcomers = [f"n{i}" for i in range(3000)]
+        moved = [
+            n for n in newcomers
+            if snapshot.bucket_for(visitor_hash(n), n) in snapshot.released
+        ]
+        assert len(moved) == pytest.approx(300, rel=0.25)
+        for n in moved:
+            assert (await engine.assign_user(experiment.id, anonymous_id=n)).variant_name == "short"
+
+    @pytest.mark.asyncio
+    async def test_conversion_counts_for_served_variant(self, db, engine, organization_id, service):
+        """Test a visitor whose bucket moved converts in the variant they were served."""
+        experiment = await create_experiment(engine, organization_id)
+        visitors = [f"v{i}" for i in range(300)]
+        before = {v: await engine.assign_user(experiment.id, anonymous_id=v) for v in visitors}
+        await service.exposures.flush(db)
+
+        variants = {v.name: v.id for v in service.snapshot.experiments[experiment.id].variants}
+        await engine.allocate_traffic(experiment.id, {
+            variants["control"]: 20, variants["short"]: 30, variants["long"]: 50,
+        })
+        service._sticky.clear()
+        snapshot = service.snapshot.experiments[experiment.id]
+        moved = next(v for v in visitors if snapshot.variant_for(visitor_hash(v), v).id != before[v].variant_id)
+
+        served = await engine.assign_user(experiment.id, anonymous_id=moved)
+        assert served.variant_id == before[moved].variant_id
+        assert await engine.track_conversion(experiment.id, anonymous_id=moved)
+        variant = await db.get(ExperimentVariant, served.variant_id)
+        await db.refresh(variant)
+        assert variant.total_conversions == 1
+
+    @pytest.mark.asyncio
+    async def test_legacy_experiment_keeps_md5_buckets(self, db, engine, organization_id, service):
+        """Test an experiment started before stored allocations keeps its md5 assignment, also when ramped."""
+        experiment = await create_experiment(engine, organization_id)
+        variants = (await db.execute(
+            select(ExperimentVariant).where(ExperimentVariant.experiment_id == experiment.id)
+        )).scalars().all()
+        for variant in variants:
+            variant.buckets = None
+        experiment.bucketing = LEGACY_BUCKETING
+        await db.commit()
+        await service.refresh(db)
+
+        names = [v.name for v in service.snapshot.experiments[experiment.id].variants]
+        table = lookup_table(legacy_allocation([50, 30, 20]))
+        visitors = [f"v{i}" for i in range(500)]
+        expected = {v: names[table[legacy_bucket(v, experiment.id)]] for v in visitors}
+
+        for v in visitors:
+            assert (await engine.assign_user(experiment.id, anonymous_id=v)).variant_name == expected[v]
+        await engine.ramp_experiment(experiment.id, 1.0)
+        for v in visitors:
+            assert (await engine.assign_user(experiment.id, anonymous_id=v)).variant_name == expected[v]
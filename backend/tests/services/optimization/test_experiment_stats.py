@@ -0,0 +1,175 @@
+"""
+Tests for running experiment statistics and sequential tests.
+"""
+import numpy as np
+import pytest
+import pytest_asyncio
+from scipy import stats
+from sqlalchemy import event, func, select
+
+from app.models.experiment import ExperimentStatus
+from app.models.experiment_metric import ExperimentMetric
+from app.models.experiment_result import ExperimentResult
+from app.models.experiment_variant import ExperimentVariant
+from app.services.optimization import experiment_assignment
+from app.services.optimization.ab_testing import ABTestingEngine, VariantConfig
+from app.services.optimization.experiment_assignment import ExperimentAssignmentService, ExposureBuffer
+from app.services.optimization.experiment_stats import MetricSummary, msprt
+
+
+@pytest.fixture(autouse=True)
+def service(monkeypatch):
+    """A fresh assignment service whose exposures flush only when asked."""
+    service = ExperimentAssignmentService(exposures=ExposureBuffer(flush_interval_seconds=3600))
+    monkeypatch.setattr(experiment_assignment, "_assignment_service", service)
+    return service
+
+
+@pytest_asyncio.fixture
+async def engine(db):
+    return ABTestingEngine(db)
+
+
+async def run_experiment(engine, organization_id, visitors, revenue, **kwargs):
+    """Start a two-variant experiment and track a conversion with `revenue(variant_name, i)` per visitor."""
+    experiment = await engine.create_experiment(
+        organization_id=organization_id,
+        name="Checkout test",
+        hypothesis="A one-page checkout sells more",
+        primary_metric="revenue",
+        variants=[
+            VariantConfig(name="control", traffic_percentage=50, configuration={}, is_control=True),
+            VariantConfig(name="one_page", traffic_percentage=50, configuration={}),
+        ],
+        **kwargs,
+    )
+    await engine.start_experiment(experiment.id)
+
+    values = {"control": [], "one_page": []}
+    for i in range(visitors):
+        assignment = await engine.assign_user(experiment.id, anonymous_id=f"visitor-{i}")
+        value = revenue(assignment.variant_name, i)
+        values[assignment.variant_name].append(value)
+        if value:
+            await engine.track_conversion(
+                experiment.id, anonymous_id=f"visitor-{i}",
+                conversion_value={"metric_name": "revenue", "metric_value": value},
+            )
+    return experiment, {name: np.array(v) for name, v in values.items()}
+
+
+def count_statements(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+class TestSequentialTest:
+    """Tests for the mSPRT."""
+
+    def test_continuous_monitoring_keeps_false_positives_below_alpha(self):
+        """Test A/A experiments checked every 100 visitors reject at most ~alpha, unlike a peeked chi-square."""
+        rng = np.random.default_rng(0)
+        runs, looks, step = 300, 40, 100
+        sequential_rejections = fixed_rejections = 0
+        for _ in range(runs):
+            control = np.cumsum(rng.random(looks * step) < 0.1)
+            variant = np.cumsum(rng.random(looks * step) < 0.1)
+            sequential = fixed = False
+            for n in range(step, looks * step + 1, step):
+                a = MetricSummary(sample_size=n, conversions=int(control[n - 1]))
+                b = MetricSummary(sample_size=n, conversions=int(variant[n - 1]))
+                test = msprt(a, b, tau_squared=(0.2 * a.mean) ** 2)
+                sequential |= test is not None and test.p_value <= 0.05
+                table = [[a.conversions, n - a.conversions], [b.conversions, n - b.conversions]]
+                fixed |= stats.chi2_contingency(table)[1] <= 0.05
+            sequential_rejections += sequential
+            fixed_rejections += fixed
+
+        assert sequential_rejections / runs <= 0.06
+        assert fixed_rejections / runs > 0.15
+
+    def test_detects_effect_and_covers_it(self):
+        """Test a real lift is detected and the confidence sequence covers the true difference."""
+        control = MetricSummary(sample_size=20000, conversions=2000)
+        variant = MetricSummary(sample_size=20000, conversions=2400)
+        test = msprt(control, variant, tau_squared=(0.2 * 0.1) ** 2)
+        assert test.p_value < 1e-6
+        assert test.interval[0] < 0.02 < test.interval[1]
+        assert test.interval[0] > 0
+
+        assert msprt(MetricSummary(1, 0), variant, 0.01) is None
+        assert msprt(MetricSummary(100, 0), MetricSummary(100, 0), 0.01) is None
+
+
+class TestExperimentResults:
+    """Tests for results from running totals."""
+
+    @pytest.mark.asyncio
+    async def test_results_match_assignment_scan_with_constant_queries(self, db, engine, organization_id, service):
+        """Test totals reproduce statistics over every assignment, read with a fixed number of queries."""
+        rng = np.random.default_rng(1)
+
+        def revenue(variant_name, i):
+            rate = 0.2 if variant_name == "one_page" else 0.1
+            return float(round(rng.gamma(2.0, 20.0), 2)) if rng.random() < rate else 0.0
+
+        experiment, values = await run_experiment(engine, organization_id, 600, revenue)
+        await service.exposures.flush(db)
+
+        statements = count_statements(db)
+        results = await engine.calculate_results(experiment.id)
+        assert [s.split()[0] for s in statements] == ["SELECT", "SELECT", "SELECT", "INSERT"]
+
+        names = dict((await db.execute(select(ExperimentVariant.id, ExperimentVariant.name))).all())
+        by_name = {names[variant_id]: r for variant_id, r in results.items()}
+        control, variant = by_name["control"], by_name["one_page"]
+        for name, result in by_name.items():
+            assert result.sample_size == len(values[name])
+            assert result.conversions == int((values[name] > 0).sum())
+            assert result.metric_value == pytest.approx(values[name].mean())
+            assert result.metric_sum_squares == pytest.approx((values[name] ** 2).sum())
+
+        welch = stats.ttest_ind(values["one_page"], values["control"], equal_var=False)
+        assert variant.additional_metrics["fixed_horizon_test"] == "t_test"
+        assert variant.additional_metrics["fixed_horizon_p_value"] == pytest.approx(welch.pvalue)
+        assert variant.statistical_test == "msprt"
+        assert variant.p_value >= variant.additional_metrics["fixed_horizon_p_value"]
+        assert control.lift_percentage == 0.0
+        assert await db.scalar(select(func.count(ExperimentResult.id))) == 2
+
+    @pytest.mark.asyncio
+    async def test_rebuild_matches_running_totals(self, db, engine, organization_id):
+        """Test recomputing totals from assignments gives the totals kept by track_conversion."""
+        experiment, _ = await run_experiment(
+            engine, organization_id, 200, lambda name, i: float(i % 7) if i % 3 == 0 else 0.0
+        )
+        metric_rows = select(ExperimentMetric).where(ExperimentMetric.experiment_id == experiment.id)
+        running = {row.variant_id: row.to_dict() for row in (await db.execute(metric_rows)).scalars()}
+
+        assert await engine.rebuild_statistics(experiment.id) == 2
+        rebuilt = {
+            row.variant_id: row.to_dict()
+            for row in (await db.execute(metric_rows.execution_options(populate_existing=True))).scalars()
+        }
+        assert rebuilt == running
+
+    @pytest.mark.asyncio
+    async def test_auto_winner_stops_experiment_without_storing_results(self, db, engine, organization_id):
+        """Test frequent winner checks stop a clearly better variant and leave no result rows."""
+        experiment, _ = await run_experiment(
+            engine, organization_id, 800,
+            lambda name, i: 1.0 if (name == "one_page" and i % 2 == 0) or i % 10 == 0 else 0.0,
+            auto_winner_selection=True, minimum_detectable_effect=0.5,
+        )
+
+        results = await engine.calculate_results(experiment.id, persist=False)
+        assert all(r.metric_value in (pytest.approx(0.1, abs=0.05), pytest.approx(0.55, abs=0.08))
+                   for r in results.values())
+        winner = await engine.check_auto_winner(experiment.id)
+
+        assert winner.name == "one_page"
+        await db.refresh(experiment)
+        assert experiment.status == ExperimentStatus.COMPLETED
+        assert experiment.winner_variant_id == winner.id
+        assert await db.scalar(select(func.count(ExperimentResult.id))) == 0
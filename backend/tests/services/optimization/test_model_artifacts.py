@@ -0,0 +1,132 @@
+"""
+Tests for out-of-row model artifact storage.
+"""
+import base64
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from app.models.predictive_model import PredictiveModel, PredictiveModelStatus, PredictiveModelType
+from app.services.model_artifacts import ArtifactChecksumError, ArtifactNotFoundError, ModelArtifactStore
+from app.services.optimization.model_registry import deserialize_model
+from app.services.optimization.predictive_modeling import PredictivePerformanceModel, TrainingExample
+
+
+class FakeObjectStorage:
+    """In-memory stand-in for StorageService's object methods."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object_bytes(self, key, content, content_type='application/octet-stream'):
+        self.objects[key] = content
+        return True
+
+    def get_object_bytes(self, key):
+        return self.objects.get(key)
+
+
+class TestModelArtifactStore:
+    """Tests for ModelArtifactStore."""
+
+    def test_save_is_content_addressed(self, artifact_store):
+        """Test identical content maps to one file and the reference carries its checksum."""
+        tables = {"daily_spend": np.linspace(0, 1, 64)}
+
+        ref = artifact_store.save(tables)
+        again = artifact_store.save({"daily_spend": np.linspace(0, 1, 64)})
+
+        assert again == ref
+        assert ref["key"] == f"{ref['sha256'][:2]}/{ref['sha256']}.pkl"
+        assert os.path.getsize(artifact_store.path(ref["key"])) == ref["size_bytes"]
+
+    def test_load_memory_maps_arrays(self, artifact_store):
+        """Test arrays are read-only views of the file unless copies are requested."""
+        ref = artifact_store.save({"values": np.arange(10000, dtype=float)})
+
+        mapped = artifact_store.load(ref)["values"]
+        copied = artifact_store.load(ref, mmap=False)["values"]
+
+        assert not mapped.flags.writeable
+        assert mapped.ctypes.data % 64 == 0
+        assert copied.flags.writeable
+        np.testing.assert_array_equal(mapped, np.arange(10000))
+        np.testing.assert_array_equal(copied, mapped)
+
+    def test_corrupt_artifact_raises(self, artifact_store):
+        """Test a file that no longer matches its checksum is rejected."""
+        ref = artifact_store.save({"values": np.ones(100)})
+        with open(artifact_store.path(ref["key"]), "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b"\x00" * 8)
+
+        with pytest.raises(ArtifactChecksumError):
+            ModelArtifactStore(artifact_store.directory).load(ref)
+
+    def test_missing_artifact_raises(self, artifact_store):
+        """Test an unknown reference without object storage is reported as missing."""
+        with pytest.raises(ArtifactNotFoundError):
+            artifact_store.load({"key": "00/missing.pkl", "sha256": "missing"})
+
+    def test_downloads_from_object_storage(self, tmp_path):
+        """Test a host without a local copy fetches and verifies it from S3."""
+        storage = FakeObjectStorage()
+        ref = ModelArtifactStore(str(tmp_path / "a"), storage=storage).save({"values": np.arange(5.0)})
+
+        other = ModelArtifactStore(str(tmp_path / "b"), storage=storage)
+        loaded = other.load(ref)
+
+        np.testing.assert_array_equal(loaded["values"], np.arange(5.0))
+        assert os.path.exists(other.path(ref["key"]))
+
+
+class TestPredictiveModelArtifacts:
+    """Tests for predictive models stored as artifacts."""
+
+    @pytest.mark.asyncio
+    async def test_trained_model_stores_reference_only(self, db, organization_id):
+        """Test training keeps only the artifact reference on the row."""
+        rng = np.random.default_rng(18)
+        examples = [
+            TrainingExample(features={"x": float(x), "y": float(y)}, target=float(x > y))
+            for x, y in rng.random((120, 2))
+        ]
+
+        model = await PredictivePerformanceModel(db)._train_model(
+            organization_id=organization_id,
+            model_type=PredictiveModelType.CTR_PREDICTION,
+            training_data=examples,
+            model_algorithm="gradient_boosting_classifier",
+            model_name="CTR",
+            hyperparameters={"n_estimators": 5, "max_depth": 2},
+        )
+
+        assert list(model.model_parameters) == ["artifact"]
+        estimator, size_bytes = deserialize_model(model.model_parameters)
+        assert size_bytes == model.model_parameters["artifact"]["size_bytes"]
+        assert estimator.predict_proba([[0.9, 0.1]])[0, 1] > 0.5
+
+    @pytest.mark.asyncio
+    async def test_inline_pickle_still_loads(self, db, organization_id):
+        """Test rows trained before artifact storage keep predicting."""
+        estimator = LogisticRegression().fit([[0.0], [1.0], [0.1], [0.9]], [0, 1, 0, 1])
+        record = PredictiveModel(
+            organization_id=organization_id,
+            name="Legacy",
+            model_type=PredictiveModelType.CTR_PREDICTION,
+            status=PredictiveModelStatus.ACTIVE,
+            feature_columns=["headline_length"],
+            target_column="ctr",
+            model_parameters={"serialized_model": base64.b64encode(pickle.dumps(estimator)).decode()},
+            model_algorithm="logistic_regression",
+            is_active=True,
+        )
+        db.add(record)
+        await db.commit()
+
+        result = await PredictivePerformanceModel(db).predict_ctr(record.id, {"headline": "Hi"}, {}, {})
+
+        assert 0 <= result.predicted_value <= 1
@@ -0,0 +1,211 @@
+"""
+Tests for the predictive model registry and buffered prediction counters.
+"""
+import asyncio
+import random
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models.predictive_model import PredictiveModel, PredictiveModelType
+from app.services.optimization import model_registry
+from app.services.optimization.model_registry import LoadedModel, ModelRegistry, PredictionStatsBuffer
+from app.services.optimization.predictive_modeling import PredictivePerformanceModel, TrainingExample
+
+CONTEXT = {"hour": 10, "device": "mobile", "channel": "facebook"}
+AUDIENCE = {"estimated_size": 50000, "interests": ["running"]}
+
+
+def make_creative(rng: random.Random) -> dict:
+    return {
+        "headline": "Save now! " * rng.randint(1, 4),
+        "cta": rng.choice(["Buy now", "Learn more", "Hurry, limited"]),
+        "visual": {"type": rng.choice(["image", "video"]), "brightness": rng.random()},
+    }
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A fresh process-wide registry and a buffer that only flushes on demand."""
+    registry = ModelRegistry(max_bytes=64 * 1024 * 1024)
+    monkeypatch.setattr(model_registry, "_model_registry", registry)
+    monkeypatch.setattr(model_registry, "_stats_buffer", PredictionStatsBuffer(flush_interval_seconds=3600))
+    return registry
+
+
+@pytest_asyncio.fixture
+async def ctr_model(db, organization_id, registry):
+    """A small trained CTR model."""
+    rng = random.Random(17)
+    service = PredictivePerformanceModel(db)
+    examples = []
+    for _ in range(120):
+        features = service.extract_features(make_creative(rng), AUDIENCE, CONTEXT)
+        target = float((features["has_video"] + (rng.random() < 0.1)) % 2)
+        examples.append(TrainingExample(features=features, target=target))
+    return await service._train_model(
+        organization_id=organization_id,
+        model_type=PredictiveModelType.CTR_PREDICTION,
+        training_data=examples,
+        model_algorithm="gradient_boosting_classifier",
+        model_name="CTR",
+        hyperparameters={"n_estimators": 10, "max_depth": 2},
+    )
+
+
+def loaded(model_id: str, size_bytes: int) -> LoadedModel:
+    return LoadedModel(model_id=model_id, model_version="1.0.0", estimator=None,
+                       feature_columns=[], size_bytes=size_bytes)
+
+
+class TestModelRegistry:
+    """Tests for ModelRegistry."""
+
+    @pytest.mark.asyncio
+    async def test_second_prediction_reuses_estimator(self, db, ctr_model, registry):
+        """Test the estimator is deserialized once and served from memory afterwards."""
+        service = PredictivePerformanceModel(db)
+        creative = make_creative(random.Random(1))
+
+        first = await service.predict_ctr(ctr_model.id, creative, AUDIENCE, CONTEXT)
+        second = await service.predict_ctr(ctr_model.id, creative, AUDIENCE, CONTEXT)
+
+        assert first.predicted_value == second.predicted_value
+        assert registry.stats()["misses"] == 1
+        assert registry.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retrained_model_reloads(self, db, ctr_model, registry):
+        """Test a changed training timestamp invalidates the loaded estimator."""
+        service = PredictivePerformanceModel(db)
+        first = await service._load_model(ctr_model.id)
+
+        ctr_model.last_trained_at = ctr_model.last_trained_at.replace(year=2030)
+        await db.commit()
+
+        assert await service._load_model(ctr_model.id) is not first
+
+    def test_evicts_least_recently_used_by_size(self):
+        """Test entries are evicted oldest first once over the byte budget."""
+        registry = ModelRegistry(max_bytes=100)
+        registry.put(loaded("a", 40))
+        registry.put(loaded("b", 40))
+        registry.get(("a", "1.0.0"))
+        registry.put(loaded("c", 40))
+
+        assert registry.get(("b", "1.0.0")) is None
+        assert registry.get(("a", "1.0.0")) is not None
+        assert registry.stats()["bytes"] == 80
+        assert registry.stats()["evictions"] == 1
+
+    def test_keeps_oversized_newest_entry(self):
+        """Test a model larger than the budget is still served."""
+        registry = ModelRegistry(max_bytes=10)
+        registry.put(loaded("a", 5))
+        registry.put(loaded("big", 50))
+
+        assert registry.stats()["models"] == 1
+        assert registry.get(("big", "1.0.0")) is not None
+
+    @pytest.mark.asyncio
+    async def test_deactivate_discards(self, db, ctr_model, registry):
+        """Test deactivating a model drops it from the registry."""
+        service = PredictivePerformanceModel(db)
+        await service._load_model(ctr_model.id)
+
+        await service.deactivate_model(ctr_model.id)
+
+        assert registry.stats()["models"] == 0
+
+    @pytest.mark.asyncio
+    async def test_missing_model_raises(self, db, registry):
+        """Test predicting with an unknown model raises."""
+        with pytest.raises(ValueError, match="not found"):
+            await PredictivePerformanceModel(db).predict_ctr("missing", {}, AUDIENCE, CONTEXT)
+
+
+class TestBatchPrediction:
+    """Tests for PredictivePerformanceModel.predict_many."""
+
+    @pytest.mark.asyncio
+    async def test_matches_single_predictions(self, db, ctr_model):
+        """Test one batch call returns the per-creative predictions in order."""
+        service = PredictivePerformanceModel(db)
+        rng = random.Random(2)
+        creatives = [make_creative(rng) for _ in range(8)]
+
+        batch = await service.predict_many(ctr_model.id, creatives, AUDIENCE, CONTEXT)
+        single = [await service.predict_ctr(ctr_model.id, c, AUDIENCE, CONTEXT) for c in creatives]
+
+        assert [r.predicted_value for r in batch] == pytest.approx([r.predicted_value for r in single])
+        assert all(r.model_version == ctr_model.model_version for r in batch)
+
+
+class TestPredictionStatsBuffer:
+    """Tests for buffered prediction counters."""
+
+    @pytest.mark.asyncio
+    async def test_counts_written_on_flush(self, db, ctr_model):
+        """Test predictions are counted in memory and written in one flush."""
+        service = PredictivePerformanceModel(db)
+        rng = random.Random(3)
+        await service.predict_many(ctr_model.id, [make_creative(rng) for _ in range(5)], AUDIENCE, CONTEXT)
+        await service.predict_ctr(ctr_model.id, make_creative(rng), AUDIENCE, CONTEXT)
+
+        buffer = model_registry.get_prediction_stats_buffer()
+        await db.refresh(ctr_model)
+        assert ctr_model.total_predictions == 0
+        assert buffer.pending() == 6
+
+        assert await buffer.flush(db) == 6
+        await db.refresh(ctr_model)
+        assert ctr_model.total_predictions == 6
+        assert ctr_model.last_prediction_at is not None
+        assert buffer.pending() == 0
+
+    @pytest.mark.asyncio
+    async def test_zero_interval_flushes_every_call(self, db, ctr_model, monkeypatch):
+        """Test a zero flush interval writes counts with each prediction."""
+        monkeypatch.setattr(model_registry, "_stats_buffer", PredictionStatsBuffer(flush_interval_seconds=0))
+
+        await PredictivePerformanceModel(db).predict_ctr(
+            ctr_model.id, make_creative(random.Random(4)), AUDIENCE, CONTEXT
+        )
+
+        record = await db.get(PredictiveModel, ctr_model.id, populate_existing=True)
+        assert record.total_predictions == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_rolls_back_and_keeps_counts(self, db, ctr_model, monkeypatch):
+        """Test a failed flush leaves the session usable and retries the counts."""
+        model_id = ctr_model.id
+        buffer = PredictionStatsBuffer(flush_interval_seconds=0)
+        buffer.record(model_id, 3)
+        original_commit = db.commit
+
+        async def failing_commit():
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(db, "commit", failing_commit)
+        assert await buffer.flush_if_due(db) == 0
+        monkeypatch.setattr(db, "commit", original_commit)
+
+        assert buffer.pending() == 3
+        assert await buffer.flush(db) == 3
+        record = await db.get(PredictiveModel, model_id, populate_existing=True)
+        assert record.total_predictions == 3
+
+    @pytest.mark.asyncio
+    async def test_background_flush_writes_idle_model_counts(self, db, ctr_model):
+        """Test counts are written without another prediction arriving."""
+        buffer = PredictionStatsBuffer(flush_interval_seconds=0.05)
+        buffer.record(ctr_model.id, 2)
+
+        await buffer.start(async_sessionmaker(db.bind, expire_on_commit=False))
+        await asyncio.sleep(0.2)
+        assert buffer.pending() == 0
+        await buffer.stop()
+
+        record = await db.get(PredictiveModel, ctr_model.id, populate_existing=True)
+        assert record.total_predictions == 2
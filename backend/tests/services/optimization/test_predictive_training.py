@@ -0,0 +1,142 @@
+"""
+Tests for the predictive model training pipeline.
+"""
+import numpy as np
+import pytest
+import pytest_asyncio
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+
+from app.core.config import get_settings
+from app.models.predictive_model import PredictiveModelStatus
+from app.services.optimization.model_registry import deserialize_model
+from app.services.optimization.predictive_modeling import PredictivePerformanceModel, TrainingExample
+from app.services.optimization.predictive_training import build_feature_matrix, training_params
+
+
+def make_examples(n: int, seed: int, shift: float = 0.0):
+    rng = np.random.default_rng(seed)
+    features = rng.random((n, 3))
+    noise = rng.normal(0, 0.2, n)
+    return [
+        TrainingExample(
+            features={"a": float(a), "b": float(b), "c": float(c)},
+            target=float(a + b * (1 + shift) + e > 1 + shift / 2),
+        )
+        for (a, b, c), e in zip(features, noise)
+    ]
+
+
+@pytest_asyncio.fixture
+async def ctr_model(db, organization_id):
+    """A CTR model trained with the default algorithm."""
+    return await PredictivePerformanceModel(db).train_ctr_model(organization_id, make_examples(400, 19))
+
+
+class TestFeatureMatrix:
+    """Tests for build_feature_matrix."""
+
+    def test_builds_float32_columns(self):
+        """Test columns follow the key order and missing features are 0."""
+        examples = [
+            TrainingExample(features={"a": 1.0, "b": 2.0}, target=1.0),
+            TrainingExample(features={"b": 3.0}, target=0.0),
+        ]
+
+        X, y, keys = build_feature_matrix([examples[:1], examples[1:]], ["b", "a"])
+
+        assert X.dtype == np.float32
+        assert keys == ["b", "a"]
+        np.testing.assert_array_equal(X, [[2.0, 1.0], [3.0, 0.0]])
+        np.testing.assert_array_equal(y, [1.0, 0.0])
+
+    def test_hist_params_accept_n_estimators(self):
+        """Test n_estimators maps to max_iter for histogram boosting."""
+        params = training_params("hist_gradient_boosting_classifier", {"n_estimators": 20})
+
+        assert params["max_iter"] == 20
+        assert "n_estimators" not in params
+        with pytest.raises(ValueError, match="Unknown algorithm"):
+            training_params("svm")
+
+
+class TestTraining:
+    """Tests for training and retraining."""
+
+    @pytest.mark.asyncio
+    async def test_default_is_histogram_boosting(self, ctr_model):
+        """Test new models use histogram boosting and record training throughput."""
+        estimator, _ = deserialize_model(ctr_model.model_parameters)
+
+        assert isinstance(estimator, HistGradientBoostingClassifier)
+        assert ctr_model.model_algorithm == "hist_gradient_boosting_classifier"
+        assert ctr_model.training_metrics["training_rows"] == 320
+        assert ctr_model.training_metrics["training_seconds"] > 0
+        assert ctr_model.training_metrics["rows_per_second"] > 0
+        assert ctr_model.validation_metrics["auc_roc"] > 0.8
+        assert set(ctr_model.feature_importance) == {"a", "b", "c"}
+        assert sum(ctr_model.feature_importance.values()) == pytest.approx(1.0)
+        assert ctr_model.feature_importance["c"] < ctr_model.feature_importance["a"]
+
+    @pytest.mark.asyncio
+    async def test_incremental_retrain_continues_previous_model(self, db, ctr_model):
+        """Test incremental retraining stacks new stages on the previous estimator."""
+        service = PredictivePerformanceModel(db)
+        new_data = make_examples(300, 20, shift=0.5)
+
+        model = await service.retrain_model(ctr_model.id, new_data)
+        estimator, _ = deserialize_model(model.model_parameters)
+
+        assert model.id == ctr_model.id
+        assert model.model_version == "1.1.0"
+        assert model.training_data_count == 700
+        assert model.training_metrics["incremental_updates"] == 1
+        assert model.training_metrics["init_depth"] == 1
+        assert isinstance(estimator, GradientBoostingClassifier)
+        assert isinstance(estimator.init.estimator, HistGradientBoostingClassifier)
+        result = await service.predict_many(model.id, [{}])
+        assert result[0].model_version == "1.1.0"
+
+    @pytest.mark.asyncio
+    async def test_incremental_updates_are_capped(self, db, ctr_model, monkeypatch):
+        """Test a model at the incremental limit must be refit in full."""
+        monkeypatch.setattr(get_settings(), "predictive_max_incremental_updates", 2)
+        service = PredictivePerformanceModel(db)
+        for seed in (23, 24):
+            await service.retrain_model(ctr_model.id, make_examples(200, seed))
+
+        with pytest.raises(ValueError, match="incremental=False"):
+            await service.retrain_model(ctr_model.id, make_examples(200, 25))
+        assert await service.retrain_if_needed(
+            ctr_model.id, make_examples(200, 25), accuracy_threshold=1.01
+        ) is None
+
+        model = await service.retrain_model(ctr_model.id, make_examples(600, 26), incremental=False)
+        assert model.training_metrics["init_depth"] == 0
+        assert model.training_data_count == 600
+
+    @pytest.mark.asyncio
+    async def test_full_retrain_replaces_model(self, db, ctr_model):
+        """Test a non-incremental retrain refits from scratch on the new rows."""
+        model = await PredictivePerformanceModel(db).retrain_model(
+            ctr_model.id, make_examples(200, 21), incremental=False
+        )
+        estimator, _ = deserialize_model(model.model_parameters)
+
+        assert isinstance(estimator, HistGradientBoostingClassifier)
+        assert model.training_data_count == 200
+        assert model.training_metrics["incremental_updates"] == 0
+
+    @pytest.mark.asyncio
+    async def test_retrain_if_needed_uses_new_data(self, db, ctr_model):
+        """Test a model below threshold is retrained incrementally when data arrived."""
+        service = PredictivePerformanceModel(db)
+
+        assert await service.retrain_if_needed(ctr_model.id, make_examples(200, 22)) is None
+
+        retrained = await service.retrain_if_needed(
+            ctr_model.id, make_examples(200, 22), accuracy_threshold=1.01
+        )
+        assert retrained.model_version == "1.1.0"
+
+        assert await service.retrain_if_needed(ctr_model.id, accuracy_threshold=1.01) is None
+        assert retrained.status == PredictiveModelStatus.DEPRECATED
@@ -0,0 +1,67 @@
+"""
+Tests for concurrent asset production in the orchestrator.
+"""
+import asyncio
+
+import pytest
+
+from app.services.orchestrator.brain import OrchestratorBrain
+from app.services.orchestrator.state import CampaignState, Deliverable
+
+
+def make_brain(monkeypatch, delays, failing=()):
+    """A brain whose department tasks take `delays[brief]` seconds (failing for `failing`)."""
+    brain = OrchestratorBrain(openrouter_api_key="key", sync_to_convex=False)
+    monkeypatch.setattr(
+        brain.router, "get_production_pipeline",
+        lambda brief: [{"department": "copywriter", "action": "write", "input": {"brief": brief["id"]}}],
+    )
+
+    async def execute(state, department, action, input_data, context):
+        await asyncio.sleep(delays[input_data["brief"]])
+        if input_data["brief"] in failing:
+            raise RuntimeError(f"{input_data['brief']} failed")
+        return {"brief": input_data["brief"]}
+
+    async def compose(brief, outputs):
+        return Deliverable(id=outputs["copywriter"]["brief"], type="social_post")
+
+    monkeypatch.setattr(brain, "_execute_department_task", execute)
+    monkeypatch.setattr(brain, "_compose_deliverable", compose)
+    return brain
+
+
+def make_state(count: int) -> CampaignState:
+    state = CampaignState(campaign_id="c1", organization_id="o1", user_request="launch")
+    state.creative_briefs = [{"id": f"b{i}"} for i in range(count)]
+    return state
+
+
+class TestProductionPhase:
+    """Tests for _production_phase."""
+
+    @pytest.mark.asyncio
+    async def test_deliverables_keep_brief_order(self, monkeypatch):
+        """Test briefs finishing out of order still yield deliverables in brief order."""
+        brain = make_brain(monkeypatch, {"b0": 0.03, "b1": 0.01, "b2": 0.02})
+        state = make_state(3)
+
+        await brain._production_phase(state)
+
+        assert [(d.id, d.order) for d in state.deliverables] == [("b0", 0), ("b1", 1), ("b2", 2)]
+        assert state.progress == 1.0 and not state.errors
+
+    @pytest.mark.asyncio
+    async def test_failed_briefs_are_recorded(self, monkeypatch):
+        """Test a failing brief is reported while the others are kept, and all failing fails the phase."""
+        brain = make_brain(monkeypatch, {"b0": 0.0, "b1": 0.0, "b2": 0.0}, failing={"b1"})
+        state = make_state(3)
+
+        await brain._production_phase(state)
+
+        assert [d.id for d in state.deliverables] == ["b0", "b2"]
+        assert state.errors == ["Brief 2: b1 failed"]
+
+        brain = make_brain(monkeypatch, {"b0": 0.0, "b1": 0.0}, failing={"b0", "b1"})
+        with pytest.raises(RuntimeError, match="b0 failed"):
+            await brain._production_phase(make_state(2))